@@ -30,6 +30,8 @@ from core.services.consent_validator import ConsentValidator
 from core.services.notarizer import BlockchainNotarizer
 from core.cqrs.commands import CommandHandler
 from core.cqrs.queries import QueryHandler
+from core.services.principal_cache import principal_cache
+from core.services.rate_limit import policy_key, rate_limiter
 
 _attachment_store_instance = AttachmentStore()
 
@@ -194,6 +196,13 @@ def current_user(
     if not token:
         raise HTTPException(401, "Not authenticated — access token is missing")
 
+    # Steady state: a token seen in the last few seconds is served from memory
+    # (core/services/principal_cache.py); revocations and user changes evict it.
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    generation = principal_cache.generation()
+
     try:
         payload = jwt.decode(token, JWT_PUBLIC_KEY, algorithms=[ALGORITHM])
         jti = payload.get("jti")
@@ -205,7 +214,9 @@ def current_user(
         user = user_repo.load_user(username)
         if not user:
             raise HTTPException(401, "Invalid token — user not found")
-        return user.to_dict()
+        principal = user.to_dict()
+        principal_cache.put(token, payload, principal, generation)
+        return principal
     except jwt.ExpiredSignatureError:
         raise HTTPException(401, "Token expired")
     except jwt.PyJWTError:
@@ -219,6 +230,23 @@ def require_role(*roles: str):
         return u
     return dependency
 
+def rate_limited(policy_name: str):
+    """Dependency factory applying a per-user rate limit policy (see core.services.rate_limit)."""
+    def dependency(request: Request, u: dict = Depends(current_user)) -> dict:
+        policy = rate_limiter.policies.get(policy_name)
+        if policy is None:
+            return u
+        key = policy_key(policy, ip=_get_client_ip(request), username=u["username"],
+                         path_params=request.path_params)
+        decision = rate_limiter.check(policy_name, key)
+        if not decision.allowed:
+            raise HTTPException(
+                429, f"Too many attempts. Please wait {decision.retry_after_header} seconds.",
+                headers={"Retry-After": decision.retry_after_header},
+            )
+        return u
+    return dependency
+
 def _get_client_ip(request: Request) -> str:
     """Extracts client IP securely using resolve_secure_client_ip."""
     from backend.middleware.ip_allowlist import resolve_secure_client_ip
@@ -37,9 +37,8 @@ from core.security import get_device_id
 import database.storage as storage
 
 # Middlewares
-from backend.middleware.csrf import CSRFMiddleware
 from backend.middleware.rate_limiter import RateLimiterMiddleware
-from backend.middleware.xss_protection import XSSProtectionMiddleware
+from backend.middleware.security import SecurityMiddleware
 from backend.middleware.ip_allowlist import IPAllowlistMiddleware
 
 # Routers
@@ -76,11 +75,11 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type", "X-CSRF-Token"],
 )
 
-# Custom Middlewares
-app.add_middleware(IPAllowlistMiddleware)
-app.add_middleware(CSRFMiddleware)
+# Custom Middlewares — pure ASGI. The last one added runs first, so requests pass
+# the IP allowlist, then CSRF + security headers, then rate limits, then CORS.
 app.add_middleware(RateLimiterMiddleware)
-app.add_middleware(XSSProtectionMiddleware)
+app.add_middleware(SecurityMiddleware)
+app.add_middleware(IPAllowlistMiddleware)
 
 # Register routers
 app.include_router(auth_router)
@@ -102,6 +101,10 @@ app.include_router(onboarding_router)
 from backend.routers.erasure import router as erasure_router
 app.include_router(erasure_router)
 
+# Bulk access/audit ledger export for compliance auditors
+from backend.routers.compliance import router as compliance_router
+app.include_router(compliance_router)
+
 import logging
 
 logging.basicConfig(
@@ -131,8 +134,45 @@ def startup_event():
             logger.warning(f"Demo chart seeding skipped: {e}")
     else:
         logger.info("Production Mode — Skipping default user seeding")
+
+    # Load revocations into memory and prune expired ones in the background.
+    from database.revocation_list import revocation_list
+    revocation_list.refresh()
+    revocation_list.start()
+
+    # Idle buckets of the shared rate-limit store are pruned in the background.
+    from core.services.rate_limit import rate_limiter
+    rate_limiter.start()
+
+    # Quiet keys of the shared anomaly counters are pruned in the background too.
+    from core.services.anomaly_engine import anomaly_engine
+    anomaly_engine.start()
+
+    # `kill -HUP <worker>` rebuilds the IP allowlist from VHV_ALLOWLIST_FILE.
+    from backend.middleware.ip_allowlist import install_reload_handler
+    install_reload_handler()
+
     logger.info(f"VIP Health Vault API v5.0.0 ready - Device: {get_device_id()[:16]}...")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop background work and refresh SQLite planner statistics before exiting."""
+    from database.sql_db import default_sql_db
+    from database.revocation_list import revocation_list
+    from core.services.alert_writer import alert_writer
+    from core.services.rate_limit import rate_limiter
+    from core.services.anomaly_engine import anomaly_engine
+    from core.events.stream import event_stream
+    revocation_list.stop()
+    alert_writer.stop()
+    rate_limiter.stop()
+    anomaly_engine.stop()
+    event_stream.stop()
+    try:
+        default_sql_db.optimize()
+    except Exception as e:
+        logger.warning(f"PRAGMA optimize skipped: {e}")
+
 @app.get("/api/v1/health", summary="System Health Metrics")
 def health_check():
     """
@@ -168,21 +208,6 @@ STATIC = os.path.join(os.path.dirname(__file__), "static")
 if os.path.isdir(STATIC):
     app.mount("/static", StaticFiles(directory=STATIC), name="static")
 
-    @app.middleware("http")
-    async def revalidate_frontend_assets(request, call_next):
-        """
-        Force browsers to revalidate the SPA shell and its ES modules.
-
-        Without this a browser keeps serving heuristically-cached JavaScript after
-        a deployment, so frontend security fixes silently fail to reach anyone who
-        already visited the vault.
-        """
-        response = await call_next(request)
-        path = request.url.path
-        if path == "/" or path.startswith("/static/"):
-            response.headers["Cache-Control"] = "no-cache, must-revalidate"
-        return response
-
     @app.get("/", include_in_schema=False)
     async def frontend_root():
         return FileResponse(os.path.join(STATIC, "index.html"))
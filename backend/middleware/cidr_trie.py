@@ -0,0 +1,101 @@
+"""
+backend/middleware/cidr_trie.py — Compiled CIDR matcher for the IP allowlist
+=============================================================================
+A path-compressed binary radix trie per address family. Each node stores the
+full prefix it stands for (``bits`` = the top ``length`` bits of an address), so
+a lookup compares whole prefixes and only branches where two networks diverge.
+A match takes as many steps as there are stored prefixes on the address's path,
+usually one or two, however long the allowlist is.
+
+Networks nested in an allowed network are dropped when they are inserted: the
+enclosing one already answers for them.
+"""
+
+import ipaddress
+from typing import Iterable, Optional, Union
+
+_Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+class _Node:
+    __slots__ = ("bits", "length", "terminal", "children")
+
+    def __init__(self, bits: int, length: int, terminal: bool):
+        self.bits = bits
+        self.length = length
+        self.terminal = terminal
+        self.children = [None, None]
+
+
+class _FamilyTrie:
+    def __init__(self, width: int):
+        self.width = width
+        self.root = _Node(0, 0, False)
+
+    def insert(self, prefix: int, length: int) -> None:
+        node = self.root
+        while not node.terminal:
+            if length == node.length:
+                node.terminal, node.children = True, [None, None]
+                return
+            branch = (prefix >> (length - node.length - 1)) & 1
+            child = node.children[branch]
+            if child is None:
+                node.children[branch] = _Node(prefix, length, True)
+                return
+            shared = min(length, child.length)
+            diff = (prefix >> (length - shared)) ^ (child.bits >> (child.length - shared))
+            common = shared - diff.bit_length()
+            if common == child.length:
+                node = child
+                continue
+            if common == length:
+                node.children[branch] = _Node(prefix, length, True)
+                return
+            split = _Node(prefix >> (length - common), common, False)
+            child_branch = (child.bits >> (child.length - common - 1)) & 1
+            split.children[child_branch] = child
+            split.children[1 - child_branch] = _Node(prefix, length, True)
+            node.children[branch] = split
+            return
+
+    def match(self, address: int) -> bool:
+        width, node = self.width, self.root
+        while not node.terminal:
+            if node.length == width:
+                return False
+            child = node.children[(address >> (width - node.length - 1)) & 1]
+            if child is None or (address >> (width - child.length)) != child.bits:
+                return False
+            node = child
+        return True
+
+
+class CIDRTrie:
+    """Answers "is this address inside any of these networks?" for IPv4 and IPv6."""
+
+    def __init__(self, networks: Iterable[_Network] = ()):
+        self._families = {4: _FamilyTrie(32), 6: _FamilyTrie(128)}
+        self.size = 0
+        for net in networks:
+            self.add(net)
+
+    def add(self, network: _Network) -> None:
+        self._families[network.version].insert(
+            int(network.network_address) >> (network.max_prefixlen - network.prefixlen),
+            network.prefixlen,
+        )
+        self.size += 1
+
+    def match(self, address: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+        mapped: Optional[ipaddress.IPv4Address] = getattr(address, "ipv4_mapped", None)
+        if mapped is not None:
+            # Dual-stack sockets report IPv4 peers as ::ffff:a.b.c.d.
+            address = mapped
+        return self._families[address.version].match(int(address))
+
+    def __contains__(self, ip_str: str) -> bool:
+        try:
+            return self.match(ipaddress.ip_address(ip_str))
+        except ValueError:
+            return False
@@ -1,41 +1,38 @@
+"""
+backend/middleware/csrf.py — Double-submit CSRF token rules
+============================================================
+Unsafe API requests must echo the ``csrf_token`` cookie in ``X-CSRF-Token``.
+Safe methods, logins, WebAuthn flows and non-API paths are exempt, and they are
+where a browser without a token is issued one. The check itself runs inside
+``SecurityMiddleware`` (backend/middleware/security.py), in the same pass that
+adds the security headers.
+"""
+
 import os
 import secrets
-from fastapi import Request
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-
-class CSRFMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        is_testing = os.getenv("TESTING", "false").lower() == "true"
-        if (
-            request.method in ("GET", "HEAD", "OPTIONS")
-            or not path.startswith("/api/")
-            or path.endswith("/login")
-            or "/webauthn/" in path             # WebAuthn passkey flows
-            or is_testing
-        ):
-            response = await call_next(request)
-            if not request.cookies.get("csrf_token"):
-                env = os.environ.get("ENVIRONMENT", "production")
-                is_secure = (env == "production")
-                response.set_cookie(
-                    "csrf_token",
-                    secrets.token_hex(32),
-                    samesite="strict",
-                    secure=is_secure,
-                    httponly=False  # Must be readable by JavaScript
-                )
-            return response
-
-        # Unsafe requests (POST, PUT, DELETE) on API paths
-        csrf_cookie = request.cookies.get("csrf_token")
-        csrf_header = request.headers.get("x-csrf-token")
-
-        if not csrf_cookie or not csrf_header or csrf_cookie != csrf_header:
-            return JSONResponse(
-                status_code=403,
-                content={"detail": "CSRF token validation failed — missing or mismatched token"}
-            )
-
-        return await call_next(request)
+from typing import Optional
+
+CSRF_COOKIE = "csrf_token"
+CSRF_FAILURE = {"detail": "CSRF token validation failed — missing or mismatched token"}
+
+
+def csrf_exempt(method: str, path: str) -> bool:
+    return (
+        method in ("GET", "HEAD", "OPTIONS")
+        or not path.startswith("/api/")
+        or path.endswith("/login")
+        or "/webauthn/" in path             # WebAuthn passkey flows
+        or os.getenv("TESTING", "false").lower() == "true"
+    )
+
+
+def csrf_valid(cookie: Optional[str], header: Optional[str]) -> bool:
+    return bool(cookie) and bool(header) and secrets.compare_digest(cookie, header)
+
+
+def new_csrf_cookie() -> bytes:
+    """A ``Set-Cookie`` value for a fresh token; readable by JavaScript by design."""
+    value = f"{CSRF_COOKIE}={secrets.token_hex(32)}; Path=/; SameSite=strict"
+    if os.environ.get("ENVIRONMENT", "production") == "production":
+        value += "; Secure"
+    return value.encode("latin-1")
@@ -4,14 +4,30 @@ backend/middleware/ip_allowlist.py — Network Level Isolation Middleware
 Restricts incoming API access strictly to authorized internal CIDR subnets,
 private VPNs, and loopback addresses. Blocks public internet IP ranges.
 Hardened against X-Forwarded-For header spoofing attacks.
+
+The allowed networks come from ``ALLOWLISTED_NETWORKS`` plus, optionally, the
+file named by ``VHV_ALLOWLIST_FILE`` (one CIDR per line, ``#`` comments). They
+are compiled once into a radix trie (backend/middleware/cidr_trie.py). Recent
+verdicts are kept in an LRU of ``VHV_IP_VERDICT_CACHE_SIZE`` entries.
+
+Sending SIGHUP to a worker re-reads the file and rebuilds the trie. A ward VLAN
+can be added without a restart; edit the file and signal the workers.
 """
 
 import os
 import ipaddress
+import signal
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Tuple
+
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
+from backend.middleware.cidr_trie import CIDRTrie
+from backend.middleware.xss_protection import with_security_headers
+
 
 DEFAULT_ALLOWED_SUBNETS = [
     "127.0.0.1/32",
@@ -21,6 +37,15 @@ DEFAULT_ALLOWED_SUBNETS = [
     "192.168.0.0/16",
 ]
 
+_LOOPBACK_NAMES = ("testclient", "localhost", "127.0.0.1", "::1")
+
+
+@lru_cache(maxsize=8)
+def _proxy_settings(trust_raw: str, extra_raw: str) -> Tuple[bool, FrozenSet[str]]:
+    trusted = {"127.0.0.1", "::1", "testclient", "localhost"}
+    trusted.update(p.strip() for p in extra_raw.split(",") if p.strip())
+    return trust_raw.lower() in ("true", "1", "yes"), frozenset(trusted)
+
 
 def resolve_secure_client_ip(request: Request) -> str:
     """
@@ -29,15 +54,14 @@ def resolve_secure_client_ip(request: Request) -> str:
     1. TRUST_PROXIES=true environment variable is explicitly enabled, AND
     2. The direct socket peer host is loopback, testclient, or a trusted proxy.
     Otherwise, returns direct request.client.host to prevent header spoofing bypasses.
+
+    The proxy settings are parsed once per distinct environment value, not per call.
     """
     peer_ip = request.client.host if request.client else "127.0.0.1"
 
-    trust_proxies = os.getenv("TRUST_PROXIES", "false").lower() in ("true", "1", "yes")
-    trusted_proxy_hosts = {"127.0.0.1", "::1", "testclient", "localhost"}
-
-    extra_trusted = os.getenv("TRUSTED_PROXIES", "").strip()
-    if extra_trusted:
-        trusted_proxy_hosts.update([p.strip() for p in extra_trusted.split(",") if p.strip()])
+    trust_proxies, trusted_proxy_hosts = _proxy_settings(
+        os.getenv("TRUST_PROXIES", "false"), os.getenv("TRUSTED_PROXIES", "").strip()
+    )
 
     if trust_proxies and peer_ip in trusted_proxy_hosts:
         forwarded = request.headers.get("X-Forwarded-For")
@@ -60,66 +84,154 @@ def resolve_secure_client_ip(request: Request) -> str:
     return peer_ip
 
 
-class IPAllowlistMiddleware(BaseHTTPMiddleware):
-    """
-    Middleware enforcing IP allowlisting for network-level isolation.
-    """
+def _read_allowlist_file(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
 
-    def __init__(self, app):
-        super().__init__(app)
-        self.enabled = os.getenv("VIP_IP_ALLOWLIST_ENABLED", "true").lower() in ("true", "1", "yes")
 
-        custom_networks = os.getenv("ALLOWLISTED_NETWORKS", "").strip()
-        subnet_strings = [s.strip() for s in custom_networks.split(",") if s.strip()] if custom_networks else DEFAULT_ALLOWED_SUBNETS
+class IPAllowlist:
+    """The compiled allowlist and its verdict cache; shared by the middleware and SIGHUP."""
+
+    def __init__(self, subnets: Optional[Iterable[str]] = None, enabled: Optional[bool] = None,
+                 cache_size: Optional[int] = None):
+        self._subnets = list(subnets) if subnets is not None else None
+        self._enabled = enabled
+        self.cache_size = (int(os.getenv("VHV_IP_VERDICT_CACHE_SIZE", "4096"))
+                           if cache_size is None else cache_size)
+        # Re-entrant: the SIGHUP handler runs reload() on the main thread, possibly
+        # while that same thread is inside is_allowed().
+        self._lock = threading.RLock()
+        self._verdicts: "OrderedDict[str, bool]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0}
+        self.reload()
 
-        self.allowed_networks = []
-        for s in subnet_strings:
+    def _subnet_strings(self) -> list:
+        if self._subnets is not None:
+            return self._subnets
+        custom_networks = os.getenv("ALLOWLISTED_NETWORKS", "").strip()
+        subnets = [s.strip() for s in custom_networks.split(",") if s.strip()]
+        path = os.getenv("VHV_ALLOWLIST_FILE", "").strip()
+        if path:
+            try:
+                subnets += _read_allowlist_file(path)
+            except OSError as e:
+                print(f"[IPAllowlist Warning] Could not read {path}: {e}")
+        return subnets or DEFAULT_ALLOWED_SUBNETS
+
+    def reload(self) -> None:
+        """Re-read the configuration, rebuild the trie and forget every cached verdict."""
+        enabled = (os.getenv("VIP_IP_ALLOWLIST_ENABLED", "true").lower() in ("true", "1", "yes")
+                   if self._enabled is None else self._enabled)
+        networks = []
+        for s in self._subnet_strings():
             try:
-                self.allowed_networks.append(ipaddress.ip_network(s, strict=False))
+                networks.append(ipaddress.ip_network(s, strict=False))
             except ValueError:
                 print(f"[IPAllowlist Warning] Invalid CIDR subnet format ignored: {s}")
+        trie = CIDRTrie(networks)
+        with self._lock:
+            self.enabled = enabled
+            self.allowed_networks = networks
+            self._trie = trie
+            self._verdicts.clear()
+            self._stats["reloads"] += 1
+
+    def is_allowed(self, ip_str: str) -> bool:
+        if not self.enabled or ip_str in _LOOPBACK_NAMES:
+            return True
+        with self._lock:
+            verdict = self._verdicts.get(ip_str)
+            if verdict is not None:
+                self._verdicts.move_to_end(ip_str)
+                self._stats["hits"] += 1
+                return verdict
+            self._stats["misses"] += 1
+            trie = self._trie
+        verdict = ip_str in trie
+        with self._lock:
+            if trie is self._trie and self.cache_size > 0:
+                self._verdicts[ip_str] = verdict
+                if len(self._verdicts) > self.cache_size:
+                    self._verdicts.popitem(last=False)
+        return verdict
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled, "networks": len(self.allowed_networks),
+                    "cached_verdicts": len(self._verdicts)}
+
+
+ip_allowlist = IPAllowlist()
+
+
+def install_reload_handler(allowlist: IPAllowlist = ip_allowlist) -> bool:
+    """Rebuild ``allowlist`` on SIGHUP; returns False where signals cannot be installed."""
+    if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+        return False
+    previous = signal.getsignal(signal.SIGHUP)
+
+    def on_sighup(signum, frame):
+        allowlist.reload()
+        print(f"[IPAllowlist] Reloaded {len(allowlist.allowed_networks)} networks on SIGHUP.")
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGHUP, on_sighup)
+    return True
+
+
+class IPAllowlistMiddleware:
+    """
+    Pure ASGI middleware enforcing IP allowlisting for network-level isolation.
 
-    def _get_client_ip(self, request: Request) -> str:
-        return resolve_secure_client_ip(request)
+    It is the outermost layer, so a rejection never reaches the rest of the
+    stack; it adds the security headers to its own 403 itself.
+    """
 
-    def is_ip_allowed(self, ip_str: str) -> bool:
-        if not self.enabled:
-            return True
+    def __init__(self, app, allowlist: Optional[IPAllowlist] = None):
+        self.app = app
+        self.allowlist = allowlist or ip_allowlist
 
-        if ip_str in ("testclient", "localhost", "127.0.0.1", "::1"):
-            return True
+    @property
+    def enabled(self) -> bool:
+        return self.allowlist.enabled
 
-        try:
-            ip_obj = ipaddress.ip_address(ip_str)
-            return any(ip_obj in net for net in self.allowed_networks)
-        except ValueError:
-            return False
+    def _get_client_ip(self, request: Request) -> str:
+        return resolve_secure_client_ip(request)
 
-    async def dispatch(self, request: Request, call_next):
-        if not self.enabled:
-            return await call_next(request)
+    def is_ip_allowed(self, ip_str: str) -> bool:
+        return self.allowlist.is_allowed(ip_str)
 
-        # Allow container health checks without network restriction
-        if request.url.path == "/api/v1/health":
-            return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        # Container health checks are allowed without network restriction.
+        if scope["type"] != "http" or not self.enabled or scope["path"] == "/api/v1/health":
+            await self.app(scope, receive, send)
+            return
 
-        client_ip = self._get_client_ip(request)
+        client_ip = self._get_client_ip(Request(scope))
 
         if not self.is_ip_allowed(client_ip):
             from core.services.alert_service import alert_service
-            alert_service.raise_alert(
+            # Queued, not written: a scan must not put SQL on the event loop. Repeats
+            # from one IP are folded into a single row with a count.
+            alert_service.enqueue_alert(
                 alert_type="UNAUTHORIZED_IP_ACCESS",
                 severity="HIGH",
                 title="Blocked Unauthorized IP Connection",
-                description=f"Connection attempt from non-allowlisted IP: {client_ip} to {request.url.path}",
-                client_ip=client_ip
+                description=f"Connection attempt from non-allowlisted IP: {client_ip} to {scope['path']}",
+                client_ip=client_ip,
+                coalesce_key=f"UNAUTHORIZED_IP_ACCESS|{client_ip}",
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=403,
                 content={
                     "detail": "Network Security Violation: IP address not authorized for VIP Vault access.",
                     "client_ip": client_ip
                 }
             )
+            response.raw_headers = with_security_headers(response.raw_headers)
+            await response(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
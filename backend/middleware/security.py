@@ -0,0 +1,61 @@
+"""
+backend/middleware/security.py — CSRF check and response hardening in one pass
+===============================================================================
+A pure ASGI middleware that replaces three ``BaseHTTPMiddleware`` layers (CSRF,
+security headers, and the frontend cache hook in main.py). Each of those layers
+spawned tasks and re-wrapped the response stream on every request, and between
+them they buffered streaming responses. This one only:
+
+1. rejects unsafe API requests whose CSRF token is missing or mismatched
+   (backend/middleware/csrf.py), and issues a token cookie on exempt requests
+   that arrive without one;
+2. adds the precomputed security headers (backend/middleware/xss_protection.py)
+   to every response, including its own rejections;
+3. forces revalidation of the SPA shell and its ES modules. Without this, a
+   browser keeps serving heuristically cached JavaScript after a deployment,
+   and frontend security fixes never reach anyone who already visited the vault.
+
+The response body is passed through untouched, chunk by chunk.
+"""
+
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+
+from backend.middleware.csrf import CSRF_COOKIE, CSRF_FAILURE, csrf_exempt, csrf_valid, new_csrf_cookie
+from backend.middleware.xss_protection import with_security_headers
+
+_REVALIDATE = (b"cache-control", b"no-cache, must-revalidate")
+
+
+class SecurityMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        headers = Headers(scope=scope)
+        cookie_header = headers.get("cookie")
+        cookie = cookie_parser(cookie_header).get(CSRF_COOKIE) if cookie_header else None
+
+        extra = []
+        if path == "/" or path.startswith("/static/"):
+            extra.append(_REVALIDATE)
+
+        async def send_hardened(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = with_security_headers(message.get("headers", []), extra)
+            await send(message)
+
+        if csrf_exempt(method, path):
+            if not cookie:
+                extra.append((b"set-cookie", new_csrf_cookie()))
+        elif not csrf_valid(cookie, headers.get("x-csrf-token")):
+            await JSONResponse(status_code=403, content=CSRF_FAILURE)(scope, receive, send_hardened)
+            return
+
+        await self.app(scope, receive, send_hardened)
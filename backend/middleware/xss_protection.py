@@ -1,7 +1,7 @@
 """
-backend/middleware/xss_protection.py — Security & XSS Protection Middleware
-=============================================================================
-1. Enforces Hardened HTTP Security Headers:
+backend/middleware/xss_protection.py — Security & XSS Protection Headers
+=========================================================================
+1. Defines the hardened HTTP security headers (applied by SecurityMiddleware):
    - Content-Security-Policy (CSP)
    - X-XSS-Protection
    - X-Content-Type-Options
@@ -15,31 +15,34 @@ request payloads. Escaping on the way in corrupts medical records permanently an
 still leaves any unescaped sink exploitable.
 """
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+# Encoded once at import; SecurityMiddleware appends these to every response.
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    # No inline script anywhere: every handler is declared with a
+    # data-action attribute and dispatched from actions.js, so an injected
+    # string cannot execute even if it reaches the DOM.
+    "script-src 'self'; "
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
+    "font-src 'self' https://fonts.gstatic.com data:; "
+    "img-src 'self' data: blob:; "
+    "connect-src 'self'; "
+    "object-src 'none'; "
+    "base-uri 'self'; "
+    "frame-ancestors 'self';"
+)
 
-class XSSProtectionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next) -> Response:
-        response: Response = await call_next(request)
+SECURITY_HEADERS = [
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"SAMEORIGIN"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"content-security-policy", CONTENT_SECURITY_POLICY.encode("latin-1")),
+]
+SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
-        # Apply Hardened HTTP Security Headers
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "SAMEORIGIN"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            # No inline script anywhere: every handler is declared with a
-            # data-action attribute and dispatched from actions.js, so an injected
-            # string cannot execute even if it reaches the DOM.
-            "script-src 'self'; "
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
-            "font-src 'self' https://fonts.gstatic.com data:; "
-            "img-src 'self' data: blob:; "
-            "connect-src 'self'; "
-            "object-src 'none'; "
-            "base-uri 'self'; "
-            "frame-ancestors 'self';"
-        )
-        return response
+
+def with_security_headers(headers: list, extra: list = ()) -> list:
+    """``headers`` with the security headers (and ``extra``) replacing any of the same name."""
+    replaced = SECURITY_HEADER_NAMES.union(name for name, _ in extra if name != b"set-cookie")
+    kept = [(k, v) for k, v in headers if k.lower() not in replaced]
+    return kept + SECURITY_HEADERS + list(extra)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
-from backend.dependencies import get_user_repository, get_command_handler, require_role
+from backend.dependencies import get_user_repository, get_command_handler, get_db_manager, require_role
 from backend.schemas.requests import UserCreate
 from core.cqrs.commands import CreateUserCommand
+from core.events.event_bus import event_bus, SystemAuditEvent
+from core.security import get_device_id
+from core.services.integrity_sweep import IntegritySweep
+from database.connection import LMDBConnectionManager
 from infrastructure.repositories.lmdb_repositories import LMDBUserRepository
 from core.cqrs.commands import CommandHandler
 
@@ -41,3 +45,70 @@ def create_user(
     new_user = command_handler.handle_create_user(cmd)
 
     return {"success": True, "user_id": new_user.id}
+
+
+# ── Vault-wide integrity sweep (core/services/integrity_sweep.py) ──
+
+_MAX_RESULTS_PAGE = 1000
+
+
+@router.post("/integrity/sweep", status_code=202, summary="Start a Vault-Wide Integrity Sweep")
+def start_integrity_sweep(
+    resume: bool = False,
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    try:
+        run = IntegritySweep(db_manager).start(resume=resume, username=u["username"])
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    event_bus.publish(SystemAuditEvent(
+        project_name="__system__",
+        action="INTEGRITY_SWEEP_STARTED",
+        username=u["username"],
+        device_id=get_device_id(),
+        extra={"run_id": run["id"], "resume": resume},
+    ))
+    return run
+
+
+@router.get("/integrity/sweep", summary="Latest Integrity Sweep: Progress and ETA")
+def latest_integrity_sweep(
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    run = IntegritySweep(db_manager).status()
+    if run is None:
+        raise HTTPException(404, "No integrity sweep has run yet")
+    return run
+
+
+@router.get("/integrity/sweep/{run_id}", summary="Integrity Sweep: Progress and ETA")
+def integrity_sweep_status(
+    run_id: str,
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    run = IntegritySweep(db_manager).status(run_id)
+    if run is None:
+        raise HTTPException(404, f"No integrity sweep {run_id}")
+    return run
+
+
+@router.get("/integrity/sweep/{run_id}/results", summary="Integrity Sweep: Per-Patient Verdicts")
+def integrity_sweep_results(
+    run_id: str,
+    failed_only: bool = False,
+    offset: int = 0,
+    limit: int = 100,
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    if not 1 <= limit <= _MAX_RESULTS_PAGE or offset < 0:
+        raise HTTPException(400, f"limit must be between 1 and {_MAX_RESULTS_PAGE}, offset at least 0")
+    sweep = IntegritySweep(db_manager)
+    if sweep.status(run_id) is None:
+        raise HTTPException(404, f"No integrity sweep {run_id}")
+    # Verdicts name the chain store (a pseudonym), never the patient.
+    return {"run_id": run_id, "offset": offset,
+            "results": sweep.results(run_id, offset, limit, failed_only)}
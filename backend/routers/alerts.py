@@ -2,12 +2,16 @@
 backend/routers/alerts.py — Security Alerts & Dual-Control API Router
 ======================================================================
 Endpoints for viewing real-time security alerts and executing Dual-Control
-co-approvals for VIP vault management.
+co-approvals for VIP vault management. Dashboards subscribe to
+``GET /security/stream`` (Server-Sent Events) instead of polling the alert table.
 """
 
+import asyncio
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import StreamingResponse
 from backend.dependencies import current_user
+from core.events.stream import event_stream, build_filter, format_sse
 from core.services.alert_service import alert_service
 from core.services.dual_control import dual_control_engine
 from pydantic import BaseModel
@@ -15,6 +19,10 @@ from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/v1/security", tags=["security"])
 
+# Seconds of silence after which a comment line is sent, keeping proxies from
+# closing an idle stream and letting us notice a departed client.
+_STREAM_KEEPALIVE = 15.0
+
 
 class DualControlReq(BaseModel):
     request_type: str
@@ -40,6 +48,78 @@ def get_security_alerts(
     }
 
 
+@router.get("/stream", summary="Live Security Event Stream (Server-Sent Events)")
+async def stream_security_events(
+    request: Request,
+    kinds: Optional[str] = None,
+    severity: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    since: Optional[str] = None,
+    catch_up: bool = False,
+    last_event_id: Optional[str] = Header(None),
+    u: dict = Depends(current_user)
+):
+    """
+    Push alerts and access/audit events as they happen.
+
+    Filters take comma-separated values: ``kinds`` (alert, access, audit),
+    ``severity``, ``alert_type`` (alert type or ledger action) and ``patient_id``.
+    A reconnecting client resumes from ``Last-Event-ID`` (or ``since``) and first
+    receives the logged events it missed, whichever worker published them. A
+    ``reset`` event means the gap was too old to replay. ``catch_up=true``
+    returns only that backlog and closes.
+    """
+    if u["role"] not in ("admin", "security_officer"):
+        raise HTTPException(403, "Access restricted to Security Officers and System Administrators.")
+
+    stream_filter = build_filter(kinds, severity, alert_type, patient_id)
+    resume = last_event_id or since
+
+    async def events():
+        yield b"retry: 3000\n\n"
+        if catch_up:
+            backlog, gap = event_stream.replay(stream_filter, resume)
+            if gap:
+                yield b"event: reset\ndata: {}\n\n"
+            for token, event in backlog:
+                yield format_sse(token, event)
+            return
+
+        sub, backlog, gap = event_stream.subscribe(stream_filter, resume)
+        try:
+            if gap:
+                yield b"event: reset\ndata: {}\n\n"
+            for token, event in backlog:
+                yield format_sse(token, event)
+            while True:
+                try:
+                    token, event = await asyncio.wait_for(sub.queue.get(), timeout=_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    if sub.overflowed:
+                        # Fell behind the log itself; nothing more will be queued.
+                        yield b"event: overflow\ndata: {}\n\n"
+                        return
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(token, event)
+                if sub.overflowed and sub.queue.empty():
+                    # Too slow to keep up; end the stream so the client reconnects
+                    # with its last id and replays the rest from the buffer.
+                    yield b"event: overflow\ndata: {}\n\n"
+                    return
+        finally:
+            event_stream.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/alerts/acknowledge/{alert_id}", summary="Acknowledge Security Alert")
 def acknowledge_security_alert(
     alert_id: str,
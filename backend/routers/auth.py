@@ -125,8 +125,8 @@ def logout(
             jti = payload.get("jti")
             exp = payload.get("exp")
             if jti and exp:
+                # Expired revocations are pruned in the background (database/revocation_list.py).
                 storage.blacklist_token(jti, exp, db_manager)
-                storage.clean_expired_blacklisted_tokens(db_manager)
         except Exception:
             pass
 
@@ -310,6 +310,9 @@ def revoke_webauthn_credential(
     if not deleted:
         raise HTTPException(404, f"Passkey credential {req.credential_id} for user {req.username} not found.")
 
+    from core.services.principal_cache import principal_cache
+    principal_cache.invalidate_user(req.username)
+
     from core.services.alert_service import alert_service
     alert_service.raise_alert(
         alert_type="PASSKEY_REVOKED",
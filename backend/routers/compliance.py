@@ -0,0 +1,118 @@
+"""
+backend/routers/compliance.py — Bulk ledger export for compliance auditors
+==========================================================================
+GDPR/KVKK audits need the full access ledger and system audit log of every
+project, not the capped per-patient views under /blockchain/{id}. The export is
+streamed as gzip-compressed NDJSON in columnar batches (see
+core/services/ledger_export.py), with the access hash chain verified as it
+streams, so the server never materialises the whole ledger in memory.
+
+Insider-threat questions ("which charts did this user open?") are answered from
+the cross-patient access index (database/access_index.py) instead of a sweep of
+every patient store; each hit is checked against its per-patient ledger entry.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from backend.dependencies import require_role, get_db_manager
+from core.events.event_bus import event_bus, SystemAuditEvent
+from core.security import get_device_id
+from core.services.ledger_export import LedgerExporter, LEDGERS
+from database.access_index import query_access_index, rebuild_access_index
+from database.connection import LMDBConnectionManager
+
+router = APIRouter(prefix="/api/v1/compliance", tags=["compliance"])
+
+_MAX_BATCH_SIZE = 5000
+_MAX_INDEX_PAGE = 1000
+
+
+@router.get("/export", summary="Export Access & Audit Ledgers (gzip NDJSON)")
+def export_ledgers(
+    ledger: str = "all",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    batch_size: int = 500,
+    u: dict = Depends(require_role("admin", "auditor")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    if ledger == "all":
+        ledgers = LEDGERS
+    elif ledger in LEDGERS:
+        ledgers = (ledger,)
+    else:
+        raise HTTPException(400, f"ledger must be one of: all, {', '.join(LEDGERS)}")
+    if not 1 <= batch_size <= _MAX_BATCH_SIZE:
+        raise HTTPException(400, f"batch_size must be between 1 and {_MAX_BATCH_SIZE}")
+
+    # The export itself is an access to every patient's trail; record who pulled it.
+    event_bus.publish(SystemAuditEvent(
+        project_name="__system__",
+        action="LEDGER_EXPORTED",
+        username=u["username"],
+        device_id=get_device_id(),
+        extra={"ledgers": list(ledgers), "since": since, "until": until},
+    ))
+
+    exporter = LedgerExporter(db_manager=db_manager, batch_size=batch_size)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return StreamingResponse(
+        exporter.iter_ndjson_gzip(ledgers, since, until),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="vhv-ledgers-{stamp}.ndjson.gz"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/access-index/{username}", summary="Everything a User Accessed, Across Patients")
+def access_index_for_user(
+    username: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    u: dict = Depends(require_role("admin", "auditor")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    if not 1 <= limit <= _MAX_INDEX_PAGE:
+        raise HTTPException(400, f"limit must be between 1 and {_MAX_INDEX_PAGE}")
+    try:
+        page = query_access_index(username, since, until, limit, cursor, db_manager=db_manager)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    event_bus.publish(SystemAuditEvent(
+        project_name="__system__",
+        action="ACCESS_INDEX_QUERIED",
+        username=u["username"],
+        device_id=get_device_id(),
+        extra={"subject": username, "since": since, "until": until},
+    ))
+    return {
+        "username": username,
+        "hits": page["hits"],
+        "next_cursor": page["next_cursor"],
+        "all_verified": all(h["verified"] for h in page["hits"]),
+    }
+
+
+@router.post("/access-index/rebuild", summary="Rebuild the Cross-Patient Access Index")
+def rebuild_index(
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    result = rebuild_access_index(db_manager=db_manager)
+    event_bus.publish(SystemAuditEvent(
+        project_name="__system__",
+        action="ACCESS_INDEX_REBUILT",
+        username=u["username"],
+        device_id=get_device_id(),
+        extra=result,
+    ))
+    return {"success": True, **result}
@@ -2,7 +2,8 @@ import json
 import re
 from fastapi import APIRouter, HTTPException, Depends
 from backend.dependencies import (
-    get_user_repository, get_command_handler, get_consent_validator, current_user, get_db_manager
+    get_user_repository, get_command_handler, get_consent_validator, current_user, get_db_manager,
+    rate_limited
 )
 from backend.schemas.requests import ConsentReq, BreakGlassReq
 from core.cqrs.commands import GrantConsentCommand, RevokeConsentCommand
@@ -120,7 +121,7 @@ def revoke_consent(
 def break_glass(
     patient_id: str,
     data: BreakGlassReq,
-    u: dict = Depends(current_user),
+    u: dict = Depends(rate_limited("break_glass")),
     consent_validator: ConsentValidator = Depends(get_consent_validator)
 ):
     check_patient_id(patient_id)
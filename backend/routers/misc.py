@@ -22,6 +22,12 @@ from backend.routers.records import check_patient_id
 from core.cqrs.queries import GetNotificationsQuery
 from core.security import get_device_id
 from database.connection import LMDBConnectionManager
+from database.sql_db import default_sql_db
+from core.services.principal_cache import principal_cache
+from database.revocation_list import revocation_list
+from core.services.rate_limit import rate_limiter
+from backend.middleware.ip_allowlist import ip_allowlist
+from core.services.alert_writer import alert_writer
 from core.services.record_service import RecordService
 from core.services.audit_service import AuditService
 from core.cqrs.queries import QueryHandler
@@ -76,7 +82,7 @@ def chain_status(
         # how much of a record they have - metadata this vault exists to conceal.
         raise HTTPException(403, "Access denied")
 
-    chain = record_service.get_chain(patient_id)
+    chain = record_service.get_chain_headers(patient_id)
     brk = record_service.find_broken_link_index(patient_id)
 
     # Run on-chain verification
@@ -107,11 +113,16 @@ def audit_log(
     patient_id: str,
     limit: int = 50,
     source: str = "db",
+    offset: int = 0,
     u: dict = Depends(require_role("admin", "auditor")),
     audit_service: AuditService = Depends(get_audit_service)
 ):
-    logs = audit_service.get_audit_logs(patient_id, limit, source)
-    return {"patient_id": patient_id, "logs": logs, "source": source}
+    if source not in ("db", "blockchain", "merged"):
+        raise HTTPException(400, "source must be one of: db, blockchain, merged")
+    if offset < 0 or limit < 1:
+        raise HTTPException(400, "offset must be >= 0 and limit >= 1")
+    logs = audit_service.get_audit_logs(patient_id, limit, source, offset)
+    return {"patient_id": patient_id, "logs": logs, "source": source, "offset": offset}
 
 
 @router.get("/blockchain/{patient_id}/access-logs", summary="Patient Access Log")
@@ -154,6 +165,23 @@ def system_status(
     }
 
 
+@router.get("/system/metrics", summary="Runtime Metrics")
+def system_metrics(
+    u: dict = Depends(require_role("admin")),
+    db_manager: LMDBConnectionManager = Depends(get_db_manager),
+):
+    return {
+        "lmdb_envs": db_manager.stats(),
+        "sql_pool":  default_sql_db.pool_stats(),
+        "principal_cache": principal_cache.stats(),
+        "revocation_list": revocation_list.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "ip_allowlist": ip_allowlist.stats(),
+        "alert_writer": alert_writer.stats(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
 @router.get("/system/config", summary="Public System Configuration")
 def get_system_config():
     return {
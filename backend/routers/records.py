@@ -11,7 +11,7 @@ from pydantic import ValidationError
 
 from backend.dependencies import (
     current_user, get_record_service, get_command_handler, get_query_handler, get_consent_validator, get_db_manager,
-    get_attachment_store, get_notification_repository
+    get_attachment_store, get_notification_repository, rate_limited
 )
 from core.ports.repositories import INotificationRepository
 from core.services.attachment_store import AttachmentStore
@@ -251,7 +251,7 @@ def get_records(
             db_manager=db_manager,
         )
 
-    chain = record_service.get_chain(patient_id)
+    chain = record_service.get_chain_headers(patient_id)
     return {
         "patient_id":   patient_id,
         "total_blocks": len(chain),
@@ -299,7 +299,7 @@ def decrypt_record(
     request: Request,
     block_index: int = Path(..., ge=0),
     req: DecryptRequest = None,
-    u: dict = Depends(current_user),
+    u: dict = Depends(rate_limited("decrypt")),
     query_handler: QueryHandler = Depends(get_query_handler),
     db_manager: LMDBConnectionManager = Depends(get_db_manager)
 ):
@@ -539,19 +539,17 @@ def get_merkle_proof_endpoint(
         raise HTTPException(403, "Access denied: You can only view proofs for your own records")
 
     project_name = record_service._get_project_name(patient_id)
-    chain = record_service.block_repo.load_all_blocks(project_name)
-    if not chain:
-        raise HTTPException(404, f"No blockchain record chain found for patient {patient_id}")
-
     target_block = None
     target_idx_in_hashes = -1
     hashes = []
-    for idx, b in enumerate(chain):
+    for b in record_service.block_repo.iter_headers(project_name):
         if b.hash:
             hashes.append(b.hash)
             if b.index == block_index:
                 target_block = b
                 target_idx_in_hashes = len(hashes) - 1
+    if not hashes:
+        raise HTTPException(404, f"No blockchain record chain found for patient {patient_id}")
 
     if not target_block or target_idx_in_hashes == -1:
         raise HTTPException(404, f"Block #{block_index} not found in chain for patient {patient_id}")
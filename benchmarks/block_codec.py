@@ -0,0 +1,100 @@
+"""
+benchmarks/block_codec.py — JSON vs binary block storage
+========================================================
+Writes the same chain once in each block format (database/block_codec.py):
+JSON, binary with the data inline, and binary split into headers and
+``payload_`` entries. Reports bytes per stored block, the environment's used
+pages and the time to scan the chain back: fully decoded with
+``storage.load_all_blocks``, and as the header-only ``BlockView``s that
+integrity walks, notarization and Merkle proofs stream
+(``LMDBBlockRepository.iter_headers``).
+
+    python -m benchmarks.block_codec --blocks 5000 --scans 5
+"""
+
+import argparse
+import base64
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain.factories import BlockFactory
+from database import storage
+from database.block_codec import encode_for_storage, storage_entries
+from database.connection import LMDBConnectionManager
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+
+_MAP = 256 * 1024 * 1024
+
+
+def _blocks(count: int):
+    blocks = [BlockFactory.create_genesis_block()]
+    for i in range(1, count):
+        blocks.append(BlockFactory.create_data_block(
+            i, blocks[-1].hash,
+            # A record as RecordService stores it: encrypted at rest, about 1 KB.
+            "vhv-rest:" + base64.urlsafe_b64encode(os.urandom(768)).decode(),
+        ))
+    return [b.to_dict() for b in blocks]
+
+
+def run(fmt: str, blocks, scans: int) -> dict:
+    base = tempfile.mkdtemp(prefix="vhv-codec-bench-")
+    try:
+        mgr = LMDBConnectionManager(base, _MAP)
+
+        def txn_block(txn):
+            for b in blocks:
+                if fmt == "inline":
+                    value, entries = encode_for_storage(b, "binary"), {}
+                else:
+                    value, entries = storage_entries(b, fmt)
+                txn.put(f"{b['index']:010d}".encode(), value)
+                for key, entry in entries.items():
+                    txn.put(key, entry)
+        mgr.run_write_transaction("patient_bench", txn_block)
+
+        env = mgr.open_db("patient_bench")
+        with env.begin() as txn:
+            stored = sum(len(v) for _, v in txn.cursor())
+        stat = env.stat()
+        pages = stat["branch_pages"] + stat["leaf_pages"] + stat["overflow_pages"]
+
+        started = time.perf_counter()
+        for _ in range(scans):
+            storage.load_all_blocks("patient_bench", mgr)
+        scan_ms = (time.perf_counter() - started) * 1000 / scans
+
+        repo = LMDBBlockRepository(mgr)
+        started = time.perf_counter()
+        for _ in range(scans):
+            for _ in repo.iter_headers("patient_bench"):
+                pass
+        headers_ms = (time.perf_counter() - started) * 1000 / scans
+        mgr.close_all()
+        return {"format": fmt, "bytes_per_block": stored / len(blocks), "pages": pages,
+                "scan_ms": scan_ms, "headers_ms": headers_ms}
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--scans", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    blocks = _blocks(args.blocks)
+    print(f"{'format':<7} {'bytes/block':>11} {'pages':>7} {'scan ms':>8} {'headers ms':>11}")
+    for fmt in ("json", "inline", "binary"):
+        r = run(fmt, blocks, args.scans)
+        print(f"{r['format']:<7} {r['bytes_per_block']:>11.0f} {r['pages']:>7} {r['scan_ms']:>8.1f} "
+              f"{r['headers_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+benchmarks/group_commit.py — Chain appends per second with and without group commit
+===================================================================================
+Runs concurrent clinician threads, each appending blocks to a chain, against
+one manager with group commit off (a write transaction and fsync per append)
+and then on (database/group_commit.py). Reports appends/sec and the average
+number of appends each commit carried.
+
+    python -m benchmarks.group_commit --threads 1 8 32 --appends 200
+
+Threads write to a handful of shared chains, as clinicians on one ward do.
+The numbers depend on the fsync latency of the disk under ``$TMPDIR``.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import storage
+from database.lmdb_layout import create_db_manager
+
+_MAP = 64 * 1024 * 1024
+
+
+def _append(mgr, project: str, payload: bytes):
+    def txn_block(txn):
+        with storage.read_transaction(project, mgr) as view:
+            last = view.get(b"meta_last_index")
+        index = int(last) + 1 if last else 0
+        txn.put(f"{index:010d}".encode(), payload)
+        txn.put(b"meta_last_index", str(index).encode())
+    mgr.run_write_transaction(project, txn_block)
+
+
+def run(group_commit: bool, threads: int, appends: int, chains: int, layout: str) -> dict:
+    base = tempfile.mkdtemp(prefix="vhv-group-commit-bench-")
+    payload = os.urandom(512)
+    try:
+        mgr = create_db_manager(base, _MAP, layout=layout)
+        mgr.group_commit_enabled = group_commit
+
+        def clinician(n: int) -> None:
+            project = f"patient_{n % chains:03d}"
+            for _ in range(appends):
+                _append(mgr, project, payload)
+
+        workers = [threading.Thread(target=clinician, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        seconds = time.perf_counter() - started
+        avg_batch = mgr.group_commit.stats()["avg_batch"] if group_commit else 1.0
+        mgr.close_all()
+        return {"appends_per_sec": threads * appends / seconds, "avg_batch": avg_batch}
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--appends", type=int, default=200, help="appends per thread")
+    parser.add_argument("--chains", type=int, default=4)
+    parser.add_argument("--layout", default="per_project", choices=("per_project", "consolidated"))
+    args = parser.parse_args(argv)
+
+    print(f"{'threads':>7} {'mode':<6} {'appends/s':>10} {'per commit':>11}")
+    for threads in args.threads:
+        for group_commit in (False, True):
+            r = run(group_commit, threads, args.appends, args.chains, args.layout)
+            mode = "group" if group_commit else "single"
+            print(f"{threads:>7} {mode:<6} {r['appends_per_sec']:>10.0f} {r['avg_batch']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
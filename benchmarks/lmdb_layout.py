@@ -0,0 +1,83 @@
+"""
+benchmarks/lmdb_layout.py — Per-project vs consolidated LMDB layout
+===================================================================
+Creates the same set of chains in each layout (database/lmdb_layout.py) and
+reports:
+
+- write throughput: single-block commits spread over random chains, as the
+  record endpoints produce them;
+- startup: a fresh manager listing every chain and reading each one's
+  ``meta_last_index``, as a backup or integrity sweep starts.
+
+    python -m benchmarks.lmdb_layout --patients 200 --writes 2000
+
+Both runs use real fsyncs, so the numbers depend on the disk under ``$TMPDIR``.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.lmdb_layout import create_db_manager
+
+_MAP = 64 * 1024 * 1024
+
+
+def _put_block(index: int, payload: bytes):
+    def txn_block(txn):
+        txn.put(f"{index:010d}".encode(), payload)
+        txn.put(b"meta_last_index", str(index).encode())
+    return txn_block
+
+
+def run(layout: str, patients: int, writes: int) -> dict:
+    base = tempfile.mkdtemp(prefix="vhv-layout-bench-")
+    names = [f"patient_{i:05d}" for i in range(patients)]
+    payload = os.urandom(512)
+    try:
+        mgr = create_db_manager(base, _MAP, layout=layout, max_open=max(patients, 16))
+        for name in names:
+            mgr.run_write_transaction(name, _put_block(0, payload))
+
+        rng = random.Random(42)
+        next_index = dict.fromkeys(names, 1)
+        started = time.perf_counter()
+        for _ in range(writes):
+            name = rng.choice(names)
+            mgr.run_write_transaction(name, _put_block(next_index[name], payload))
+            next_index[name] += 1
+        write_seconds = time.perf_counter() - started
+        mgr.close_all()
+
+        started = time.perf_counter()
+        cold = create_db_manager(base, _MAP, layout=layout, max_open=max(patients, 16))
+        for name in cold.list_projects():
+            with cold.open_db(name).begin() as txn:
+                txn.get(b"meta_last_index")
+        startup_ms = (time.perf_counter() - started) * 1000
+        cold.close_all()
+        return {"layout": layout, "writes_per_sec": writes / write_seconds, "startup_ms": startup_ms}
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print(f"{'layout':<13} {'writes/s':>10} {'startup ms':>11}")
+    for layout in ("per_project", "consolidated"):
+        r = run(layout, args.patients, args.writes)
+        print(f"{r['layout']:<13} {r['writes_per_sec']:>10.0f} {r['startup_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
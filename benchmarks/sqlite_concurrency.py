@@ -0,0 +1,98 @@
+"""
+benchmarks/sqlite_concurrency.py — SQLite write throughput under several workers
+================================================================================
+Simulates uvicorn workers that each write small rows (a rate-limit hit, an
+alert) to one SQLite file. It compares the stock ``sqlite3.connect()`` settings
+with the vault's profile (database/sqlite_profile.py) and reports commits/sec
+and ``database is locked`` failures for each worker count.
+
+    python -m benchmarks.sqlite_concurrency --workers 1 4 8 --seconds 3
+
+Profile settings come from the usual ``VHV_SQLITE_*`` variables, so a candidate
+configuration can be measured before it is deployed.
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import sqlite_profile
+
+_DDL = "CREATE TABLE IF NOT EXISTS hits (id INTEGER PRIMARY KEY, key TEXT NOT NULL, ts REAL NOT NULL)"
+
+
+def _open(path: str, mode: str):
+    if mode == "profile":
+        return sqlite_profile.connect(path, sqlite_profile.SQLiteProfile.from_env())
+    return sqlite3.connect(path)
+
+
+def _worker(path: str, mode: str, seconds: float, worker_id: int, out) -> None:
+    conn = _open(path, mode)
+    commits = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            conn.execute("INSERT INTO hits (key, ts) VALUES (?, ?)", (f"w{worker_id}", time.time()))
+            # Readers share the file too: the limiter counts before it writes.
+            conn.execute("SELECT COUNT(*) FROM hits WHERE key = ?", (f"w{worker_id}",)).fetchone()
+            conn.commit()
+            commits += 1
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            conn.rollback()
+            locked += 1
+    conn.close()
+    out.put((commits, locked))
+
+
+def run(mode: str, workers: int, seconds: float) -> dict:
+    base = tempfile.mkdtemp(prefix="vhv-sqlite-bench-")
+    path = os.path.join(base, "bench.db")
+    try:
+        conn = _open(path, mode)
+        conn.execute(_DDL)
+        conn.commit()
+        conn.close()
+
+        out = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_worker, args=(path, mode, seconds, i, out))
+                 for i in range(workers)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        commits = sum(r[0] for r in results)
+        return {
+            "mode": mode, "workers": workers,
+            "writes_per_sec": commits / seconds,
+            "locked_errors": sum(r[1] for r in results),
+        }
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<8} {'workers':>7} {'writes/s':>10} {'locked':>7}")
+    for workers in args.workers:
+        for mode in ("stock", "profile"):
+            r = run(mode, workers, args.seconds)
+            print(f"{r['mode']:<8} {r['workers']:>7} {r['writes_per_sec']:>10.0f} {r['locked_errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -104,26 +104,24 @@ class CommandHandler:
 
     def handle_add_record(self, cmd: AddRecordCommand) -> Block:
         project_name = self.record_service._get_project_name(cmd.patient_id)
-        with LMDBUnitOfWork(project_name):
-            return self.record_service.add_record(
-                patient_id=cmd.patient_id,
-                data=cmd.data,
-                is_protected=cmd.is_protected,
-                protection_password=cmd.protection_password,
-                username=cmd.username,
-            )
+        return LMDBUnitOfWork.run(project_name, lambda: self.record_service.add_record(
+            patient_id=cmd.patient_id,
+            data=cmd.data,
+            is_protected=cmd.is_protected,
+            protection_password=cmd.protection_password,
+            username=cmd.username,
+        ))
 
     def handle_add_correction(self, cmd: AddCorrectionCommand) -> Block:
         project_name = self.record_service._get_project_name(cmd.patient_id)
-        with LMDBUnitOfWork(project_name):
-            return self.record_service.add_correction_block(
-                patient_id=cmd.patient_id,
-                block_index=cmd.block_index,
-                corrected_data=cmd.corrected_data,
-                encryption_password=cmd.encryption_password,
-                username=cmd.username,
-                reason=cmd.reason,
-            )
+        return LMDBUnitOfWork.run(project_name, lambda: self.record_service.add_correction_block(
+            patient_id=cmd.patient_id,
+            block_index=cmd.block_index,
+            corrected_data=cmd.corrected_data,
+            encryption_password=cmd.encryption_password,
+            username=cmd.username,
+            reason=cmd.reason,
+        ))
 
     def handle_create_user(self, cmd: CreateUserCommand) -> User:
         with LMDBUnitOfWork("__users__"):
@@ -50,10 +50,10 @@ class QueryHandler:
         role = query.requester_role
         username = query.requester_username
 
-        # Get records chain
-        chain = self.record_service.get_chain(patient_id)
-        final_data = self.record_service.get_final_data(patient_id)
-        corrections = self.record_service.get_corrections_index(patient_id)
+        # Load the chain once, without its audit blocks, and resolve against it.
+        chain = self.record_service.get_chain(patient_id, include_audit=False)
+        final_data = self.record_service.get_final_data(patient_id, chain)
+        corrections = self.record_service.get_corrections_index(patient_id, chain)
         records = []
 
         for block in chain:
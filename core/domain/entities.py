@@ -1,7 +1,7 @@
 import hashlib
 import json
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, Optional
 from core.utils.crypto_utils import calculate_merkle_root
 
 @dataclass
@@ -159,3 +159,85 @@ class Block:
             merkle_root=data.get("merkle_root"),
         )
 
+
+_UNLOADED = object()
+
+
+class BlockView:
+    """
+    A stored block as the read paths see it: every header field set, ``data``
+    decoded on first access by ``load``.
+
+    It reads like a ``Block``: the same attributes, ``create_hash`` and
+    ``to_dict``. It has ``__slots__`` instead of a ``__dict__``, and never
+    recomputes anything on construction. Scans that only need indexes and
+    hashes, like notarization, Merkle proofs and chain length, never pay to
+    decode a payload.
+    """
+
+    __slots__ = ("index", "timestamp", "previous_hash", "signature", "is_protected",
+                 "protection_hash", "nonce", "device_id", "hash", "merkle_root", "_data", "_load")
+
+    def __init__(
+        self,
+        index: int,
+        timestamp: float,
+        previous_hash: str,
+        signature: str,
+        is_protected: bool = False,
+        protection_hash: Optional[str] = None,
+        nonce: Optional[str] = None,
+        device_id: Optional[str] = None,
+        hash: Optional[str] = None,
+        merkle_root: Optional[str] = None,
+        data: Any = _UNLOADED,
+        load: Optional[Callable[[], Any]] = None,
+    ):
+        self.index = index
+        self.timestamp = timestamp
+        self.previous_hash = previous_hash
+        self.signature = signature
+        self.is_protected = is_protected
+        self.protection_hash = protection_hash
+        self.nonce = nonce
+        self.device_id = device_id
+        self.hash = hash
+        self.merkle_root = merkle_root
+        self._data = data
+        self._load = load
+
+    @property
+    def data(self) -> Any:
+        if self._data is _UNLOADED:
+            self._data = self._load()
+            self._load = None
+        return self._data
+
+    @property
+    def data_loaded(self) -> bool:
+        return self._data is not _UNLOADED
+
+    create_hash = Block.create_hash
+    to_dict = Block.to_dict
+
+    def payload_intact(self) -> bool:
+        """Whether ``data`` still hashes to the header's Merkle root. Reads the payload."""
+        return not self.merkle_root or calculate_merkle_root(self.data) == self.merkle_root
+
+    def to_block(self) -> Block:
+        return Block(
+            index=self.index,
+            timestamp=self.timestamp,
+            data=self.data,
+            previous_hash=self.previous_hash,
+            signature=self.signature,
+            is_protected=self.is_protected,
+            protection_hash=self.protection_hash,
+            nonce=self.nonce,
+            device_id=self.device_id,
+            hash=self.hash,
+            merkle_root=self.merkle_root,
+        )
+
+    def __repr__(self) -> str:
+        return f"BlockView(index={self.index}, hash={self.hash!r}, data_loaded={self.data_loaded})"
@@ -30,6 +30,18 @@ class SystemAuditEvent(Event):
     device_id: str
     extra: Optional[dict] = None
 
+@dataclass
+class AlertRaisedEvent(Event):
+    alert_id: str
+    alert_type: str
+    severity: str
+    title: str
+    description: str
+    username: Optional[str]
+    client_ip: Optional[str]
+    created_at: float
+    extra: Optional[dict] = None
+
 
 class EventBus:
     def __init__(self):
@@ -0,0 +1,457 @@
+"""
+core/events/stream.py — Fan-out of security events to live dashboards
+=====================================================================
+Security dashboards used to poll ``GET /api/v1/security/alerts``, and every
+poll was a fresh SQL connection plus an ``ORDER BY created_at DESC`` query.
+This hub is fed directly from the ``EventBus``: alerts and access/audit events
+are published once, normalised once, kept in a bounded log, and pushed to every
+subscriber whose filters match. No subscriber ever touches the database.
+
+``VHV_EVENT_STREAM_BACKEND`` selects the log:
+
+  lmdb    (default) a local LMDB append log (``__event_stream__``) that every
+          uvicorn worker on the host writes to and tails, every
+          ``VHV_EVENT_STREAM_POLL_SECONDS`` (default 0.25) while it has
+          subscribers. A dashboard sees the events of all workers, and can
+          resume on any of them.
+  memory  a ring buffer per process. A dashboard only sees the events of the
+          worker that serves it, so this is for tests and single-worker
+          deployments. It is the default when ``TESTING=true``.
+
+Every event carries a resume token ``"<epoch>.<seq>"``. ``seq`` is monotonic
+within one log; ``epoch`` identifies that log, so a token issued before a restart
+(memory) or a reset of the store (lmdb) is recognised as stale. A reconnecting
+client passes its last token and receives whatever it missed that is still in
+the log. If the gap can no longer be filled, it is told so with a ``reset``
+marker rather than silently losing events.
+
+Publishing may happen on any thread (sync endpoints run in the threadpool);
+delivery hops onto each subscriber's event loop via ``call_soon_threadsafe``.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from core.events.event_bus import (
+    event_bus, AlertRaisedEvent, RecordAddedEvent, RecordReadEvent, SystemAuditEvent,
+)
+from database.connection import LMDBConnectionManager
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+STREAM_BUFFER_SIZE = _env_int("VHV_EVENT_STREAM_BUFFER", 1000)
+SUBSCRIBER_QUEUE_SIZE = _env_int("VHV_EVENT_STREAM_QUEUE", 256)
+
+# (epoch, head seq, [(seq, event), ...] after the requested seq)
+LogRead = Tuple[Optional[str], int, List[Tuple[int, dict]]]
+
+
+@dataclass(frozen=True)
+class StreamFilter:
+    """Per-subscriber filter. An empty set means "no constraint on this field"."""
+    kinds: FrozenSet[str] = frozenset()
+    severities: FrozenSet[str] = frozenset()
+    types: FrozenSet[str] = frozenset()
+    projects: FrozenSet[str] = frozenset()
+
+    def matches(self, event: dict) -> bool:
+        if self.kinds and event["kind"] not in self.kinds:
+            return False
+        if self.severities and event["severity"] not in self.severities:
+            return False
+        if self.types and event["type"] not in self.types:
+            return False
+        if self.projects and event.get("project") not in self.projects:
+            return False
+        return True
+
+
+@dataclass(eq=False)
+class Subscription:
+    filter: StreamFilter
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+    # Set when this subscriber fell behind and events were dropped for it; the
+    # stream then ends so the client reconnects and resumes from the log.
+    overflowed: bool = False
+    # The last seq this subscriber has received, in its backlog or live.
+    after: int = 0
+
+    def _offer(self, item: Tuple[str, dict]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class MemoryEventLog:
+    """The last ``size`` events of this process."""
+
+    shared = False
+
+    def __init__(self, size: int = STREAM_BUFFER_SIZE):
+        self.epoch = secrets.token_hex(4)
+        self._buffer: deque = deque(maxlen=size)
+        self._head = 0
+        self._lock = threading.Lock()
+
+    def append(self, event: dict) -> Tuple[str, int]:
+        with self._lock:
+            self._head += 1
+            self._buffer.append((self._head, event))
+            return self.epoch, self._head
+
+    def head(self) -> int:
+        return self._head
+
+    def read(self, after: int) -> LogRead:
+        with self._lock:
+            newer = max(0, min(self._head - after, len(self._buffer)))
+            return self.epoch, self._head, list(self._buffer)[len(self._buffer) - newer:]
+
+
+class LMDBEventLog:
+    """The last ``size`` events of every worker on the host, in a local LMDB store."""
+
+    PROJECT = "__event_stream__"
+    _HEAD = b"head"
+    _EPOCH = b"epoch"
+    _PREFIX = b"ev_"
+    shared = True
+
+    def __init__(self, db_manager: Optional[LMDBConnectionManager] = None, size: int = STREAM_BUFFER_SIZE):
+        self._manager = db_manager
+        self.size = size
+
+    def _mgr(self) -> LMDBConnectionManager:
+        if self._manager is not None:
+            return self._manager
+        from database.storage import default_db_manager
+        return default_db_manager
+
+    def _key(self, seq: int) -> bytes:
+        return self._PREFIX + f"{seq:020d}".encode()
+
+    @property
+    def epoch(self) -> Optional[str]:
+        return self.read(self.head())[0]
+
+    def append(self, event: dict) -> Tuple[str, int]:
+        body = json.dumps(event, ensure_ascii=False, default=str).encode("utf-8")
+        out = {}
+
+        def txn_block(txn):
+            epoch = txn.get(self._EPOCH)
+            if epoch is None:
+                # A new (or reset) log: tokens from the old one must read as stale.
+                epoch = secrets.token_hex(4).encode()
+                txn.put(self._EPOCH, epoch)
+            seq = int(txn.get(self._HEAD) or 0) + 1
+            txn.put(self._key(seq), body)
+            txn.put(self._HEAD, str(seq).encode())
+            if seq > self.size:
+                txn.delete(self._key(seq - self.size))
+            out["epoch"], out["seq"] = epoch.decode(), seq
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return out["epoch"], out["seq"]
+
+    def head(self) -> int:
+        manager = self._mgr()
+        if not manager.project_exists(self.PROJECT):
+            return 0
+        with manager.open_db(self.PROJECT).begin(write=False) as txn:
+            return int(txn.get(self._HEAD) or 0)
+
+    def read(self, after: int) -> LogRead:
+        manager = self._mgr()
+        if not manager.project_exists(self.PROJECT):
+            return None, 0, []
+        with manager.open_db(self.PROJECT).begin(write=False) as txn:
+            epoch = txn.get(self._EPOCH)
+            head = int(txn.get(self._HEAD) or 0)
+            items = []
+            cursor = txn.cursor()
+            if head > after and cursor.set_range(self._key(after + 1)):
+                for key, value in cursor:
+                    if not key.startswith(self._PREFIX):
+                        break
+                    items.append((int(key[len(self._PREFIX):]), json.loads(value)))
+        return (epoch.decode() if epoch else None), head, items
+
+
+class EventStreamHub:
+    """Bounded replay log plus push fan-out to filtered subscribers."""
+
+    def __init__(self, buffer_size: int = STREAM_BUFFER_SIZE, log=None,
+                 poll_interval: Optional[float] = None):
+        self.log = log if log is not None else MemoryEventLog(buffer_size)
+        self.poll_interval = (float(os.getenv("VHV_EVENT_STREAM_POLL_SECONDS", "0.25"))
+                              if poll_interval is None else poll_interval)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        # Serialises delivery; taken before ``_lock``, never after it.
+        self._pump_lock = threading.Lock()
+        self._seen: Tuple[Optional[str], int] = (None, 0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def epoch(self) -> Optional[str]:
+        return self.log.epoch
+
+    @staticmethod
+    def _parse_token(token: Optional[str], epoch: Optional[str]) -> Optional[int]:
+        """The seq a resume token points at, or None if it is not from this log."""
+        if not token:
+            return None
+        token_epoch, _, seq = token.partition(".")
+        if token_epoch != epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, event: dict) -> str:
+        """Record ``event`` and push it to every matching subscriber. Thread-safe."""
+        epoch, seq = self.log.append(event)
+        if self._subscribers:
+            self.pump()
+        return f"{epoch}.{seq}"
+
+    def pump(self) -> int:
+        """Deliver everything appended to the log since the last pump; returns how many."""
+        with self._pump_lock:
+            seen_epoch, seen = self._seen
+            epoch, head, items = self.log.read(seen)
+            if epoch != seen_epoch:
+                # The log was reset under us; its events are all new.
+                epoch, head, items = self.log.read(0)
+                seen = 0
+            self._seen = (epoch, head)
+            if not items:
+                return 0
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if items[0][0] != seen + 1:
+                # We fell further behind than the log keeps: those subscribers
+                # must reconnect, and their resume tokens then report the gap.
+                for sub in subscribers:
+                    sub.overflowed = True
+                return 0
+            for seq, event in items:
+                item = (f"{epoch}.{seq}", {**event, "seq": seq})
+                for sub in subscribers:
+                    if seq > sub.after and sub.filter.matches(event):
+                        sub.after = seq
+                        try:
+                            sub.loop.call_soon_threadsafe(sub._offer, item)
+                        except RuntimeError:
+                            # The subscriber's loop is closed; it is removed on unsubscribe.
+                            pass
+            return len(items)
+
+    def subscribe(
+        self,
+        stream_filter: StreamFilter,
+        last_event_id: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> Tuple[Subscription, List[Tuple[str, dict]], bool]:
+        """
+        Register a subscriber on ``loop`` (default: the running loop).
+
+        Returns ``(subscription, backlog, gap)``. ``backlog`` holds the logged
+        events after ``last_event_id`` that match the filter; it is read under
+        the same locks as the registration, so nothing is missed or repeated at
+        the seam. ``gap`` is True when the token is stale or older than the log.
+        """
+        sub = Subscription(stream_filter, loop or asyncio.get_running_loop())
+        with self._pump_lock, self._lock:
+            if last_event_id:
+                epoch, head, backlog, gap = self._backlog(stream_filter, last_event_id)
+            else:
+                epoch, head, _ = self.log.read(self.log.head())
+                backlog, gap = [], False
+            sub.after = head
+            if not self._subscribers:
+                # Nothing was delivered while nobody listened; start from here.
+                self._seen = (epoch, head)
+            self._subscribers.append(sub)
+        if self.log.shared:
+            self.start()
+        return sub, backlog, gap
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def replay(self, stream_filter: StreamFilter, last_event_id: Optional[str] = None) -> Tuple[List[Tuple[str, dict]], bool]:
+        """The logged events after ``last_event_id``, without subscribing."""
+        return self._backlog(stream_filter, last_event_id)[2:]
+
+    def _backlog(self, stream_filter: StreamFilter, last_event_id: Optional[str]):
+        # No token means "everything still in the log".
+        epoch, head, items = self.log.read(0)
+        after = self._parse_token(last_event_id, epoch) if last_event_id else 0
+        oldest = items[0][0] if items else head + 1
+        gap = bool(last_event_id) and (after is None or after < oldest - 1)
+        after = after or 0
+        return epoch, head, [
+            (f"{epoch}.{seq}", {**event, "seq": seq}) for seq, event in items
+            if seq > after and stream_filter.matches(event)
+        ], gap
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    # ── tailing a shared log ─────────────────────────────────
+    def start(self) -> None:
+        """Tail the log for events published by other workers (shared logs only)."""
+        with self._lock:
+            if self._thread is not None or self.poll_interval <= 0:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._tail, name="event-stream-tail", daemon=True)
+        self._thread.start()
+
+    def _tail(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            if not self._subscribers:
+                continue
+            try:
+                self.pump()
+            except Exception as e:
+                print(f"[EventStream] Tail failed: {e}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# ── EventBus → stream adapters ────────────────────────────────
+
+def _alert_event(event: AlertRaisedEvent) -> dict:
+    extra = event.extra or {}
+    return {
+        "kind": "alert",
+        "type": event.alert_type,
+        "severity": event.severity,
+        "timestamp": event.created_at,
+        "alert_id": event.alert_id,
+        "title": event.title,
+        "description": event.description,
+        "username": event.username,
+        "client_ip": event.client_ip,
+        "project": extra.get("project_name") or _project_for(
+            extra.get("patient_id") or extra.get("target_patient_id")),
+        "metadata": extra,
+    }
+
+
+def _project_for(patient_id: Optional[str]) -> Optional[str]:
+    if not patient_id:
+        return None
+    try:
+        from core.pseudonymization.service import project_name_for
+        return project_name_for(patient_id)
+    except Exception:
+        return None
+
+
+def _ledger_event(kind: str, action: str, event: Any, extra: Optional[dict]) -> dict:
+    return {
+        "kind": kind,
+        "type": action,
+        "severity": "INFO",
+        "timestamp": time.time(),
+        "username": event.username,
+        "project": event.project_name,
+        "device_id": event.device_id,
+        "metadata": extra or {},
+    }
+
+
+def _on_alert(event: AlertRaisedEvent) -> None:
+    event_stream.publish(_alert_event(event))
+
+
+def _on_record_added(event: RecordAddedEvent) -> None:
+    event_stream.publish(_ledger_event(
+        "access", "BLOCK_ADDED", event,
+        {"block_index": event.block_index, "is_protected": event.is_protected},
+    ))
+
+
+def _on_record_read(event: RecordReadEvent) -> None:
+    event_stream.publish(_ledger_event(
+        "access", event.action, event, {"block_index": event.block_index, **(event.extra or {})},
+    ))
+
+
+def _on_system_audit(event: SystemAuditEvent) -> None:
+    event_stream.publish(_ledger_event("audit", event.action, event, event.extra))
+
+
+def _make_hub() -> EventStreamHub:
+    default = "memory" if os.getenv("TESTING", "false").lower() == "true" else "lmdb"
+    backend = os.getenv("VHV_EVENT_STREAM_BACKEND", default).strip().lower()
+    if backend == "memory":
+        return EventStreamHub()
+    return EventStreamHub(log=LMDBEventLog())
+
+
+event_stream = _make_hub()
+
+event_bus.subscribe(AlertRaisedEvent, _on_alert)
+event_bus.subscribe(RecordAddedEvent, _on_record_added)
+event_bus.subscribe(RecordReadEvent, _on_record_read)
+event_bus.subscribe(SystemAuditEvent, _on_system_audit)
+
+
+def build_filter(
+    kinds: Optional[str] = None,
+    severity: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    patient_id: Optional[str] = None,
+) -> StreamFilter:
+    """Build a filter from comma-separated query parameters."""
+    def split(value: Optional[str], upper: bool = False) -> FrozenSet[str]:
+        if not value:
+            return frozenset()
+        parts = (p.strip() for p in value.split(","))
+        return frozenset((p.upper() if upper else p) for p in parts if p)
+
+    projects = frozenset(
+        p for p in (_project_for(pid) for pid in split(patient_id)) if p
+    )
+    if patient_id and not projects:
+        # An unresolvable patient must match nothing, not everything.
+        projects = frozenset({""})
+    return StreamFilter(
+        kinds=split(kinds, upper=False),
+        severities=split(severity, upper=True),
+        types=split(alert_type, upper=True),
+        projects=projects,
+    )
+
+
+def format_sse(token: str, event: Dict[str, Any]) -> bytes:
+    body = json.dumps(event, ensure_ascii=False, default=str)
+    return f"id: {token}\nevent: {event['kind']}\ndata: {body}\n\n".encode("utf-8")
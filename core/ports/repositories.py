@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Optional, List
-from core.domain.entities import User, Block
+from typing import Iterator, Optional, List
+from core.domain.entities import User, Block, BlockView
 
 class IUserRepository(ABC):
     @abstractmethod
@@ -36,8 +36,23 @@ class IBlockRepository(ABC):
         pass
 
     @abstractmethod
-    def load_all_blocks(self, project_name: str) -> List[Block]:
-        """Loads all blocks for a given project sequentially."""
+    def load_all_blocks(self, project_name: str, include_audit: bool = True) -> List[Block]:
+        """Loads all blocks for a given project sequentially; optionally without audit blocks."""
+        pass
+
+    @abstractmethod
+    def load_block_headers(self, project_name: str) -> List[BlockView]:
+        """Loads all blocks in order, reading a block's data only when it is accessed."""
+        pass
+
+    @abstractmethod
+    def iter_headers(self, project_name: str) -> Iterator[BlockView]:
+        """Streams the chain's blocks in order without reading their payloads; data loads on access."""
+        pass
+
+    @abstractmethod
+    def load_chain_audit_entries(self, project_name: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        """Pages through the chain's audit blocks, newest first, without decoding the chain."""
         pass
 
     @abstractmethod
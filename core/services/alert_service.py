@@ -15,30 +15,10 @@ from database.sql_db import get_sql_db
 class AlertService:
     """
     Centralized Security Alert Manager & Anomaly Detection Pipeline.
-    """
-
-    def __init__(self):
-        self._ensure_table()
 
-    def _ensure_table(self):
-        db = get_sql_db()
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS security_alerts (
-                    alert_id TEXT PRIMARY KEY,
-                    alert_type TEXT NOT NULL,
-                    severity TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    username TEXT,
-                    client_ip TEXT,
-                    created_at REAL NOT NULL,
-                    acknowledged INTEGER DEFAULT 0,
-                    metadata_json TEXT
-                )
-            """)
-            conn.commit()
+    The ``security_alerts`` table is created by database/migrations.py at startup,
+    not on every call.
+    """
 
     def raise_alert(
         self,
@@ -50,7 +30,6 @@ class AlertService:
         client_ip: Optional[str] = None,
         extra: Optional[dict] = None
     ) -> str:
-        self._ensure_table()
         alert_id = f"alt_{secrets.token_hex(10)}"
         now = time.time()
         meta_json = json.dumps(extra or {})
@@ -68,20 +47,59 @@ class AlertService:
             conn.commit()
 
         print(f"[SECURITY ALERT - {severity}] {title}: {description} (User: {username}, IP: {client_ip})")
+
+        # Push to live dashboards (core/events/stream.py) instead of having them poll.
+        from core.events.event_bus import event_bus, AlertRaisedEvent
+        event_bus.publish(AlertRaisedEvent(
+            alert_id=alert_id,
+            alert_type=alert_type,
+            severity=severity,
+            title=title,
+            description=description,
+            username=username,
+            client_ip=client_ip,
+            created_at=now,
+            extra=extra,
+        ))
         return alert_id
 
+    def enqueue_alert(
+        self,
+        alert_type: str,
+        severity: str,
+        title: str,
+        description: str,
+        username: Optional[str] = None,
+        client_ip: Optional[str] = None,
+        extra: Optional[dict] = None,
+        coalesce_key: Optional[str] = None,
+    ) -> str:
+        """
+        Like ``raise_alert`` but never touches the database on the caller's thread.
+
+        The alert is written by the background writer (core/services/alert_writer.py),
+        so this is safe to call from async middleware. Alerts sharing a
+        ``coalesce_key`` within the coalescing window become one row with a count.
+        """
+        from core.services.alert_writer import alert_writer
+        return alert_writer.submit({
+            "alert_type": alert_type, "severity": severity, "title": title,
+            "description": description, "username": username, "client_ip": client_ip,
+            "extra": extra,
+        }, coalesce_key=coalesce_key)
+
     def get_recent_alerts(self, limit: int = 50, severity_filter: Optional[str] = None) -> List[Dict]:
         db = get_sql_db()
         with db.get_connection() as conn:
             cursor = conn.cursor()
             if severity_filter:
                 cursor.execute(
-                    "SELECT alert_id, alert_type, severity, title, description, username, client_ip, created_at, acknowledged, metadata_json FROM security_alerts WHERE severity = ? ORDER BY created_at DESC LIMIT ?",
+                    "SELECT alert_id, alert_type, severity, title, description, username, client_ip, created_at, acknowledged, metadata_json, occurrences, last_seen_at FROM security_alerts WHERE severity = ? ORDER BY created_at DESC LIMIT ?",
                     (severity_filter.upper(), limit)
                 )
             else:
                 cursor.execute(
-                    "SELECT alert_id, alert_type, severity, title, description, username, client_ip, created_at, acknowledged, metadata_json FROM security_alerts ORDER BY created_at DESC LIMIT ?",
+                    "SELECT alert_id, alert_type, severity, title, description, username, client_ip, created_at, acknowledged, metadata_json, occurrences, last_seen_at FROM security_alerts ORDER BY created_at DESC LIMIT ?",
                     (limit,)
                 )
             rows = cursor.fetchall()
@@ -98,7 +116,9 @@ class AlertService:
                 "client_ip": r[6],
                 "created_at": r[7],
                 "acknowledged": bool(r[8]),
-                "metadata": json.loads(r[9]) if r[9] else {}
+                "metadata": json.loads(r[9]) if r[9] else {},
+                "occurrences": r[10] or 1,
+                "last_seen_at": r[11] or r[7],
             })
         return alerts
 
@@ -113,3 +133,7 @@ class AlertService:
 
 # Global singleton instance
 alert_service = AlertService()
+
+# The anomaly detectors raise their alerts through this service; load them with it
+# so they are subscribed to the event bus wherever alerts can be raised.
+import core.services.anomaly_engine  # noqa: E402,F401
@@ -0,0 +1,200 @@
+"""
+core/services/alert_writer.py — Background, batched alert persistence
+=====================================================================
+``AlertService.raise_alert`` writes its row before it returns. That is right for
+break-glass and anomaly alerts, but not for alerts raised on the event loop by
+middleware. A scan from a blocked host used to run one INSERT per rejected
+request, and every other request on the worker waited behind it.
+
+``AlertWriter.submit`` only appends to an in-memory queue and returns at once.
+A daemon thread writes the queue every ``VHV_ALERT_FLUSH_SECONDS`` (default 1),
+or sooner once ``VHV_ALERT_BATCH_SIZE`` alerts are waiting, in one transaction.
+
+Alerts submitted with a ``coalesce_key`` (e.g. ``UNAUTHORIZED_IP_ACCESS|<ip>``)
+are merged per key for ``VHV_ALERT_COALESCE_SECONDS`` (default 60). The first
+occurrence in a window inserts a row, and later ones only bump that row's
+``occurrences`` and ``last_seen_at`` (migration 5). A thousand probes produce
+one row per minute, not a thousand rows. Each worker coalesces on its own.
+
+Only new rows are published on the event bus, once they are stored. When the
+queue is full, alerts are dropped and counted rather than blocking the request.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database.sql_db import get_sql_db
+
+
+def _ph(db, sql: str) -> str:
+    return sql.replace("?", "%s") if db.is_postgres else sql
+
+
+class AlertWriter:
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 coalesce_window: Optional[float] = None, max_pending: int = 10000,
+                 db_getter=None, clock=time.time):
+        self.batch_size = int(os.getenv("VHV_ALERT_BATCH_SIZE", "100")) if batch_size is None else batch_size
+        self.flush_interval = (float(os.getenv("VHV_ALERT_FLUSH_SECONDS", "1"))
+                               if flush_interval is None else flush_interval)
+        self.coalesce_window = (float(os.getenv("VHV_ALERT_COALESCE_SECONDS", "60"))
+                                if coalesce_window is None else coalesce_window)
+        self.max_pending = max_pending
+        self._db_getter = db_getter or get_sql_db
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}          # alert_id -> queued insert or count bump
+        self._windows: Dict[str, tuple] = {}          # coalesce_key -> (alert_id, window_start)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"submitted": 0, "coalesced": 0, "inserted": 0, "updated": 0,
+                       "batches": 0, "dropped": 0, "failures": 0}
+
+    # ── producer side (request path) ────────────────────────
+    def submit(self, alert: dict, coalesce_key: Optional[str] = None) -> str:
+        """Queue ``alert`` (the ``security_alerts`` columns) and return its alert_id."""
+        now = self._clock()
+        with self._lock:
+            self._stats["submitted"] += 1
+            window = self._windows.get(coalesce_key) if coalesce_key else None
+            if window is not None and now - window[1] < self.coalesce_window:
+                alert_id = window[0]
+                entry = self._pending.setdefault(alert_id, {"alert_id": alert_id, "new": False, "count": 0})
+                entry["count"] += 1
+                entry["last_seen_at"] = now
+                self._stats["coalesced"] += 1
+                return alert_id
+            if len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                return ""
+            alert_id = alert.get("alert_id") or f"alt_{secrets.token_hex(10)}"
+            self._pending[alert_id] = {**alert, "alert_id": alert_id, "created_at": now,
+                                       "last_seen_at": now, "new": True, "count": 1}
+            if coalesce_key:
+                self._windows[coalesce_key] = (alert_id, now)
+            full = len(self._pending) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wake.set()
+        return alert_id
+
+    # ── consumer side (writer thread) ───────────────────────
+    def flush(self) -> int:
+        """Write everything queued so far in one transaction; returns rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.values()), {}
+                horizon = self._clock() - self.coalesce_window
+                self._windows = {k: w for k, w in self._windows.items() if w[1] > horizon}
+            if not batch:
+                return 0
+            inserts = [e for e in batch if e["new"]]
+            updates = [e for e in batch if not e["new"]]
+            try:
+                self._write(inserts, updates)
+            except Exception as e:
+                print(f"[AlertWriter] Batch of {len(batch)} failed, will retry: {e}")
+                with self._lock:
+                    self._stats["failures"] += 1
+                    for entry in batch:
+                        self._requeue(entry)
+                return 0
+            with self._lock:
+                self._stats["inserted"] += len(inserts)
+                self._stats["updated"] += len(updates)
+                self._stats["batches"] += 1
+        for entry in inserts:
+            self._published(entry)
+        return len(batch)
+
+    def _requeue(self, entry: dict) -> None:
+        current = self._pending.get(entry["alert_id"])
+        if current is None:
+            self._pending[entry["alert_id"]] = entry
+        else:
+            # More occurrences arrived while the batch was being written.
+            current["count"] += entry["count"]
+            current["new"] = current["new"] or entry["new"]
+            if entry["new"]:
+                self._pending[entry["alert_id"]] = {**entry, "count": current["count"],
+                                                    "last_seen_at": current["last_seen_at"]}
+
+    def _write(self, inserts: List[dict], updates: List[dict]) -> None:
+        db = self._db_getter()
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            if inserts:
+                cursor.executemany(_ph(db, """
+                    INSERT INTO security_alerts (alert_id, alert_type, severity, title, description, username,
+                                                 client_ip, created_at, metadata_json, occurrences, last_seen_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """),
+                    [(e["alert_id"], e["alert_type"], e["severity"], e["title"], e["description"],
+                      e.get("username"), e.get("client_ip"), e["created_at"],
+                      json.dumps(e.get("extra") or {}), e["count"], e["last_seen_at"]) for e in inserts],
+                )
+            if updates:
+                cursor.executemany(
+                    _ph(db, "UPDATE security_alerts SET occurrences = occurrences + ?, last_seen_at = ? WHERE alert_id = ?"),
+                    [(e["count"], e["last_seen_at"], e["alert_id"]) for e in updates],
+                )
+            conn.commit()
+
+    def _published(self, entry: dict) -> None:
+        print(f"[SECURITY ALERT - {entry['severity']}] {entry['title']}: {entry['description']} "
+              f"(User: {entry.get('username')}, IP: {entry.get('client_ip')})")
+        from core.events.event_bus import event_bus, AlertRaisedEvent
+        event_bus.publish(AlertRaisedEvent(
+            alert_id=entry["alert_id"],
+            alert_type=entry["alert_type"],
+            severity=entry["severity"],
+            title=entry["title"],
+            description=entry["description"],
+            username=entry.get("username"),
+            client_ip=entry.get("client_ip"),
+            created_at=entry["created_at"],
+            extra=entry.get("extra"),
+        ))
+
+    # ── lifecycle ────────────────────────────────────────────
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._stop.is_set():
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+
+            def run():
+                while not self._stop.is_set():
+                    self._wake.wait(self.flush_interval)
+                    self._wake.clear()
+                    self.flush()
+
+            self._thread = threading.Thread(target=run, name="alert-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread and write whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+        self.flush()
+        self._stop.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending), "open_windows": len(self._windows)}
+
+
+alert_writer = AlertWriter()
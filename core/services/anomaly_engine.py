@@ -0,0 +1,192 @@
+"""
+core/services/anomaly_engine.py — Sliding-window anomaly detection on the event bus
+===================================================================================
+Detectors used to live inside the objects that produced the events. For example,
+ConsentValidator kept its own break-glass history. Those objects are built per
+request, so a detector's state never outlived a single call. The engine
+instead listens to the EventBus. It counts security-relevant actions per user
+and per client IP in shared sliding windows (core/services/sliding_window.py)
+and raises an alert when a rule's threshold is crossed.
+
+Rules are data. The defaults below can be overridden or extended with
+``VHV_ANOMALY_RULES``, a JSON list of rule objects. Entries match the defaults
+by ``name``, and ``"enabled": false`` drops a rule. ``VHV_ANOMALY_BACKEND``
+selects ``lmdb`` (default; one store shared by every worker on the host) or
+``memory`` (the default when ``TESTING=true``, so test runs do not share counts
+through backend/projects).
+
+A rule fires once when its count *reaches* the threshold. It only fires again
+after the window has drained below it, so a sustained burst raises one alert,
+not one per event. A key therefore never needs more than ``threshold + 1``
+timestamps, and none older than its rule's window.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field, asdict
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from core.events.event_bus import event_bus, AlertRaisedEvent, RecordReadEvent, SystemAuditEvent
+from core.services.sliding_window import LMDBSlidingWindowStore, MemorySlidingWindowStore
+
+
+@dataclass(frozen=True)
+class AnomalyRule:
+    name: str
+    actions: FrozenSet[str]
+    scope: str                      # "user" or "ip"
+    threshold: int
+    window_seconds: float
+    severity: str = "HIGH"
+    title: str = "{name}: {count} events by {subject} in {minutes} min"
+    enabled: bool = True
+
+
+DEFAULT_RULES = (
+    AnomalyRule(
+        name="REPEATED_BREAK_GLASS_ABUSE",
+        actions=frozenset({"BREAK_GLASS_BYPASS"}),
+        scope="user", threshold=3, window_seconds=900, severity="CRITICAL",
+        title="CRITICAL ANOMALY: Repeated Break-Glass Overrides by {subject}",
+    ),
+    AnomalyRule(
+        name="REPEATED_DECRYPT_FAILURES",
+        actions=frozenset({"BLOCK_READ_FAILED"}),
+        scope="user", threshold=5, window_seconds=300, severity="HIGH",
+        title="Repeated failed record decryptions by {subject}",
+    ),
+    AnomalyRule(
+        name="LOGIN_BRUTE_FORCE_USER",
+        actions=frozenset({"LOGIN_FAILED", "PASSKEY_LOGIN_FAILED"}),
+        scope="user", threshold=5, window_seconds=300, severity="HIGH",
+        title="Repeated failed logins for account {subject}",
+    ),
+    AnomalyRule(
+        name="LOGIN_BRUTE_FORCE_IP",
+        actions=frozenset({"LOGIN_FAILED", "PASSKEY_LOGIN_FAILED"}),
+        scope="ip", threshold=10, window_seconds=300, severity="HIGH",
+        title="Repeated failed logins from {subject}",
+    ),
+    AnomalyRule(
+        name="REPEATED_DUAL_CONTROL_VIOLATIONS",
+        actions=frozenset({"DUAL_CONTROL_VIOLATION_BLOCKED"}),
+        scope="user", threshold=3, window_seconds=900, severity="CRITICAL",
+        title="Repeated Dual-Control violations by {subject}",
+    ),
+)
+
+
+def load_rules(raw: Optional[str] = None) -> List[AnomalyRule]:
+    """The default rules with ``VHV_ANOMALY_RULES`` (or ``raw``) applied on top."""
+    rules: Dict[str, AnomalyRule] = {r.name: r for r in DEFAULT_RULES}
+    raw = os.getenv("VHV_ANOMALY_RULES") if raw is None else raw
+    if raw:
+        try:
+            overrides = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"VHV_ANOMALY_RULES is not valid JSON: {e}")
+        for spec in overrides:
+            base = asdict(rules[spec["name"]]) if spec.get("name") in rules else {}
+            merged = {**base, **spec}
+            merged["actions"] = frozenset(a.upper() for a in merged.get("actions", ()))
+            if merged.get("scope") not in ("user", "ip"):
+                raise ValueError(f"anomaly rule {merged.get('name')!r}: scope must be 'user' or 'ip'")
+            rules[merged["name"]] = AnomalyRule(**merged)
+    return [r for r in rules.values() if r.enabled and r.actions]
+
+
+def _make_store():
+    default = "memory" if os.getenv("TESTING", "false").lower() == "true" else "lmdb"
+    backend = os.getenv("VHV_ANOMALY_BACKEND", default).strip().lower()
+    if backend == "memory":
+        return MemorySlidingWindowStore()
+    return LMDBSlidingWindowStore()
+
+
+@dataclass
+class AnomalyEngine:
+    rules: List[AnomalyRule] = field(default_factory=load_rules)
+    store: object = field(default_factory=_make_store)
+
+    def __post_init__(self):
+        self._by_action: Dict[str, List[AnomalyRule]] = {}
+        for rule in self.rules:
+            for action in rule.actions:
+                self._by_action.setdefault(action, []).append(rule)
+        self.use_store(self.store)
+
+    def use_store(self, store) -> None:
+        """Count into ``store`` from now on; quiet keys expire after the longest rule window."""
+        longest = max((r.window_seconds for r in self.rules), default=0)
+        if longest:
+            store.max_window = longest
+        self.store = store
+
+    def start(self) -> None:
+        if hasattr(self.store, "start"):
+            self.store.start()
+
+    def stop(self) -> None:
+        if hasattr(self.store, "stop"):
+            self.store.stop()
+
+    def observe(self, action: str, username: Optional[str], client_ip: Optional[str]) -> List[str]:
+        """Count one occurrence of ``action``; returns the names of rules that fired."""
+        fired = []
+        for rule in self._by_action.get(action, ()):
+            subject = username if rule.scope == "user" else client_ip
+            if not subject or subject in ("internal", "unknown"):
+                continue
+            count = self.store.hit(f"{rule.name}|{subject}", rule.window_seconds,
+                                   limit=rule.threshold + 1)
+            if count == rule.threshold:
+                self._raise(rule, subject, count, username, client_ip)
+                fired.append(rule.name)
+        return fired
+
+    def _raise(self, rule: AnomalyRule, subject: str, count: int, username, client_ip) -> None:
+        from core.services.alert_service import alert_service
+        minutes = int(rule.window_seconds // 60) or 1
+        alert_service.raise_alert(
+            alert_type=rule.name,
+            severity=rule.severity,
+            title=rule.title.format(name=rule.name, subject=subject, count=count, minutes=minutes),
+            description=(
+                f"{count} x {'/'.join(sorted(rule.actions))} by {rule.scope} {subject} "
+                f"within {minutes} minutes (threshold {rule.threshold})."
+            ),
+            username=username,
+            client_ip=client_ip,
+            extra={"anomaly_rule": rule.name, "scope": rule.scope, "subject": subject,
+                   "count": count, "window_seconds": rule.window_seconds},
+        )
+
+    def actions(self) -> Iterable[str]:
+        return self._by_action.keys()
+
+
+def _ip_from(extra: Optional[dict]) -> Optional[str]:
+    extra = extra or {}
+    return extra.get("client_ip") or extra.get("ip")
+
+
+def _on_alert(event: AlertRaisedEvent) -> None:
+    # Alerts raised by the engine itself are outputs, never inputs.
+    if (event.extra or {}).get("anomaly_rule"):
+        return
+    anomaly_engine.observe(event.alert_type, event.username, event.client_ip)
+
+
+def _on_record_read(event: RecordReadEvent) -> None:
+    anomaly_engine.observe(event.action, event.username, _ip_from(event.extra))
+
+
+def _on_system_audit(event: SystemAuditEvent) -> None:
+    anomaly_engine.observe(event.action, event.username, _ip_from(event.extra))
+
+
+anomaly_engine = AnomalyEngine()
+
+event_bus.subscribe(AlertRaisedEvent, _on_alert)
+event_bus.subscribe(RecordReadEvent, _on_record_read)
+event_bus.subscribe(SystemAuditEvent, _on_system_audit)
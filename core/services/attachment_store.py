@@ -17,10 +17,10 @@ path, keeping every attachment on the same disk as the records they belong to.
 import hashlib
 from typing import Optional
 
-from database.connection import LMDBConnectionManager
+from database.connection import ATTACHMENT_PROJECT, LMDBConnectionManager
 
 # A dedicated LMDB namespace, kept apart from any patient chain.
-_ATTACHMENT_PROJECT = "attachments"
+_ATTACHMENT_PROJECT = ATTACHMENT_PROJECT
 _KEY_PREFIX = "attachment_"
 
 
@@ -57,3 +57,39 @@ class AttachmentStore:
         if value is None:
             raise FileNotFoundError(f"Attachment {ref} not found in the encrypted store")
         return value.decode("utf-8")
+
+    def exists(self, ref: str) -> bool:
+        manager = self._mgr()
+        if not manager.project_exists(_ATTACHMENT_PROJECT):
+            return False
+        with manager.open_db(_ATTACHMENT_PROJECT).begin(write=False) as txn:
+            return txn.get(f"{_KEY_PREFIX}{ref}".encode("utf-8")) is not None
+
+    def verify(self, batch_size: int = 256) -> dict:
+        """
+        Re-hash every blob against its reference, ``batch_size`` blobs per read
+        transaction. Returns ``{"entries", "corrupt"}``; nothing is decrypted.
+        """
+        manager = self._mgr()
+        entries, corrupt = 0, []
+        if not manager.project_exists(_ATTACHMENT_PROJECT):
+            return {"entries": 0, "corrupt": corrupt}
+        prefix = _KEY_PREFIX.encode("utf-8")
+        start = prefix
+        while True:
+            last = None
+            with manager.open_db(_ATTACHMENT_PROJECT).begin(write=False, buffers=True) as txn:
+                cursor = txn.cursor()
+                if cursor.set_range(start):
+                    for n, (key, value) in enumerate(cursor):
+                        key = bytes(key)
+                        if n >= batch_size or not key.startswith(prefix):
+                            break
+                        last = key
+                        ref = key[len(prefix):].decode("utf-8")
+                        entries += 1
+                        if hashlib.sha256(value).hexdigest() != ref:
+                            corrupt.append(ref)
+            if last is None:
+                return {"entries": entries, "corrupt": corrupt}
+            start = last + b"\x00"
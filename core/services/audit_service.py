@@ -7,27 +7,38 @@ class AuditService:
         self.audit_repo = audit_repo
         self.record_service = record_service
 
-    def get_audit_logs(self, patient_id: str, limit: int = 50, source: str = "db") -> List[dict]:
+    def get_audit_logs(self, patient_id: str, limit: int = 50, source: str = "db", offset: int = 0) -> List[dict]:
+        """
+        Audit events for a patient, newest first.
+
+        ``source`` is ``"db"`` (the LMDB audit log, falling back to the chain when
+        it is empty), ``"blockchain"`` (the on-chain audit blocks, read from their
+        index without decoding the clinical chain) or ``"merged"`` (both, each
+        entry tagged with its source).
+        """
         project_name = self.record_service._get_project_name(patient_id)
         if source == "blockchain":
-            chain = self.record_service.get_chain(patient_id)
-            logs = []
-            for block in reversed(chain):
-                if isinstance(block.data, dict) and block.data.get("type") == "audit":
-                    logs.append({
-                        "timestamp": block.timestamp,
-                        "action": block.data.get("action"),
-                        "username": block.data.get("username"),
-                        "block_index": block.data.get("target_block_index"),
-                        "device_id": block.device_id,
-                        **{k: v for k, v in block.data.items() if k not in ("type", "action", "username", "target_block_index", "device_id")}
-                    })
-            return logs[:limit]
-
-        logs = self.audit_repo.load_audit_logs(project_name, limit)
+            return self.record_service.block_repo.load_chain_audit_entries(project_name, offset, limit)
+
+        if source == "merged":
+            # Each source is already newest-first; the first offset+limit of the
+            # merge can only come from the first offset+limit of each.
+            window = offset + limit
+            chain_logs = [
+                {**e, "source": "blockchain"}
+                for e in self.record_service.block_repo.load_chain_audit_entries(project_name, 0, window)
+            ]
+            db_logs = [
+                {**e, "source": "db"}
+                for e in self.audit_repo.load_audit_logs(project_name, window)
+            ]
+            merged = sorted(chain_logs + db_logs, key=lambda e: e.get("timestamp") or 0, reverse=True)
+            return merged[offset:window]
+
+        logs = self.audit_repo.load_audit_logs(project_name, offset + limit)
         if not logs:
-            return self.get_audit_logs(patient_id, limit, source="blockchain")
-        return logs
+            return self.get_audit_logs(patient_id, limit, source="blockchain", offset=offset)
+        return logs[offset:]
 
     def get_access_logs(self, patient_id: str, limit: int = 100, source: str = "db") -> List[dict]:
         project_name = self.record_service._get_project_name(patient_id)
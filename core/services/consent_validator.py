@@ -1,7 +1,6 @@
 import json
 import time
 from typing import Optional
-from collections import defaultdict
 import database.storage as storage
 from core.ports.repositories import IBlockRepository
 from core.pseudonymization.service import project_name_for
@@ -9,7 +8,6 @@ from core.pseudonymization.service import project_name_for
 class ConsentValidator:
     def __init__(self, block_repo: IBlockRepository):
         self.block_repo = block_repo
-        self._break_glass_history = defaultdict(list)
 
     def _get_project_name(self, patient_id: str) -> str:
         return project_name_for(patient_id)
@@ -103,7 +101,9 @@ class ConsentValidator:
             extra={"reason": reason, "patient_id": patient_id}
         )
 
-        # Raise Critical Security Alert
+        # Raise Critical Security Alert. Repeated overrides by the same doctor are
+        # detected from this alert by the shared anomaly engine
+        # (core/services/anomaly_engine.py), not per validator instance.
         try:
             from core.services.alert_service import alert_service
             alert_service.raise_alert(
@@ -111,24 +111,10 @@ class ConsentValidator:
                 severity="CRITICAL",
                 title=f"Emergency Break-Glass Access Invoked by {doctor_username}",
                 description=f"Doctor {doctor_username} triggered emergency break-glass override for patient {patient_id}. Reason: {reason}",
-                client_ip="internal"
+                username=doctor_username,
+                client_ip="internal",
+                extra={"patient_id": patient_id}
             )
-
-            # Check for Repeated Break-Glass Anomaly Pattern (3+ overrides in 15 minutes)
-            now = time.time()
-            window = 900  # 15 minutes
-            recent_invocations = [t for t in self._break_glass_history[doctor_username] if now - t <= window]
-            recent_invocations.append(now)
-            self._break_glass_history[doctor_username] = recent_invocations
-
-            if len(recent_invocations) >= 3:
-                alert_service.raise_alert(
-                    alert_type="REPEATED_BREAK_GLASS_ABUSE",
-                    severity="CRITICAL",
-                    title=f"CRITICAL ANOMALY: Repeated Break-Glass Overrides by Dr. {doctor_username}",
-                    description=f"Doctor {doctor_username} triggered {len(recent_invocations)} emergency break-glass overrides within 15 minutes. Potential insider policy abuse or coercion.",
-                    client_ip="internal"
-                )
         except Exception:
             pass
 
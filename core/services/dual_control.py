@@ -16,29 +16,10 @@ from database.sql_db import get_sql_db
 class DualControlEngine:
     """
     Manages dual-control authorization tokens and co-signatures.
-    """
-
-    def __init__(self):
-        self._ensure_table()
 
-    def _ensure_table(self):
-        db = get_sql_db()
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS dual_control_tokens (
-                    token_id TEXT PRIMARY KEY,
-                    request_type TEXT NOT NULL,
-                    target_patient_id TEXT NOT NULL,
-                    requested_by TEXT NOT NULL,
-                    co_signed_by TEXT,
-                    reason TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    created_at REAL NOT NULL,
-                    expires_at REAL NOT NULL
-                )
-            """)
-            conn.commit()
+    The ``dual_control_tokens`` table is created by database/migrations.py at startup,
+    not on every call.
+    """
 
     def request_dual_control_access(
         self,
@@ -48,13 +29,12 @@ class DualControlEngine:
         reason: str,
         validity_minutes: int = 30
     ) -> Dict:
-        self._ensure_table()
         token_id = f"dc_{secrets.token_hex(12)}"
         now = time.time()
         expires_at = now + (validity_minutes * 60)
 
         db = get_sql_db()
-        with db.get_connection() as conn:
+        with db.get_connection(durable=True) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -81,7 +61,7 @@ class DualControlEngine:
             raise ValueError("Only a Security Officer or System Administrator can co-sign dual-control requests.")
 
         db = get_sql_db()
-        with db.get_connection() as conn:
+        with db.get_connection(durable=True) as conn:
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT requested_by, status, expires_at, target_patient_id FROM dual_control_tokens WHERE token_id = ?",
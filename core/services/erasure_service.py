@@ -52,7 +52,7 @@ class ErasureKeyStore:
 
         secret = secrets.token_bytes(32)
         db = get_sql_db()
-        conn = db.get_connection()
+        conn = db.get_connection(durable=True)
         cur = conn.cursor()
         try:
             cur.execute(
@@ -82,7 +82,7 @@ class ErasureKeyStore:
         """Delete the erasure secret. Returns whether one existed. Irreversible."""
         existed = self.get(patient_id) is not None
         db = get_sql_db()
-        conn = db.get_connection()
+        conn = db.get_connection(durable=True)
         cur = conn.cursor()
         try:
             cur.execute(
@@ -0,0 +1,257 @@
+"""
+core/services/integrity_sweep.py — Vault-wide integrity sweep
+=============================================================
+Checking every chain used to mean calling ``/blockchain/{patient_id}/status``
+once per patient, each call walking one chain and its anchor serially. A sweep
+checks every store ``list_projects()`` returns, on a pool of
+``VHV_INTEGRITY_WORKERS`` processes (default: CPU count, at most 4), for:
+
+- chain linkage, block hashes and signatures (``record_service.find_broken_link``);
+- every payload against its block's Merkle root (``BlockView.payload_intact``);
+- the Merkle root anchored by the notarizer (``BlockchainNotarizer.verify_project``);
+- the access ledger's hash chain (``verify_access_log_integrity``);
+- the attachments a record refers to, and every stored attachment against
+  its content address (``AttachmentStore.verify``).
+
+Nothing is decrypted. A record encrypted at rest keeps its attachment reference
+inside the ciphertext, so only references in plaintext records can be followed;
+the attachment store itself is still re-hashed in full.
+
+Each verdict is written to ``database/integrity_reports.py`` the moment it is
+known, together with the run's counts. ``status`` derives progress and an ETA
+from them. A run whose process died is reported as ``interrupted``, and
+``start(resume=True)`` picks it up where it stopped.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Dict, Iterator, List, Optional
+
+import database.integrity_reports as reports
+from core.services.attachment_store import AttachmentStore
+from core.services.notarizer import BlockchainNotarizer
+from core.services.record_service import find_broken_link
+from database.audit_storage import verify_access_log_integrity
+from database.connection import ATTACHMENT_PROJECT, LMDBConnectionManager
+
+_ATTACHMENT_PROJECT = ATTACHMENT_PROJECT
+# Block indexes or refs listed per problem in a verdict; the counts are exact.
+_MAX_LISTED = 20
+# Anchor outcomes that are not a fault: a chain not notarized yet.
+_UNANCHORED = ("Not anchored in local ledger", "No local blocks found")
+
+# Sweeps running in this process, by run id.
+_threads: Dict[str, threading.Thread] = {}
+_threads_lock = threading.RLock()
+
+
+def _default_workers() -> int:
+    try:
+        return max(0, int(os.getenv("VHV_INTEGRITY_WORKERS", "")))
+    except ValueError:
+        return min(4, os.cpu_count() or 1)
+
+
+def check_chain(project_name: str, db_manager: LMDBConnectionManager) -> dict:
+    from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+    repo = LMDBBlockRepository(db_manager)
+    attachments = AttachmentStore(db_manager)
+
+    blocks = repo.load_all_blocks(project_name)
+    broken_at = find_broken_link(blocks)
+    tampered, refs, missing = [], 0, []
+    for block in blocks:
+        if not block.payload_intact():
+            tampered.append(block.index)
+        data = block.data
+        if isinstance(data, dict) and data.get("file_hash"):
+            refs += 1
+            if not attachments.exists(data["file_hash"]):
+                missing.append(block.index)
+    anchor = BlockchainNotarizer(repo).verify_project(project_name)
+    access = verify_access_log_integrity(project_name, db_manager)
+    return {
+        "kind": "chain",
+        "ok": (broken_at == -1 and not tampered and not missing and access["valid"]
+               and (anchor["verified"] or anchor["reason"] in _UNANCHORED)),
+        "blocks": len(blocks),
+        "broken_at": broken_at if broken_at != -1 else None,
+        "tampered_payloads": len(tampered),
+        "tampered_at": tampered[:_MAX_LISTED],
+        "anchor": anchor["reason"],
+        "anchor_verified": anchor["verified"],
+        "access_log": access,
+        "attachment_refs": refs,
+        "missing_attachments": len(missing),
+        "missing_at": missing[:_MAX_LISTED],
+    }
+
+
+def check_attachments(db_manager: LMDBConnectionManager) -> dict:
+    result = AttachmentStore(db_manager).verify()
+    return {
+        "kind": "attachments",
+        "ok": not result["corrupt"],
+        "entries": result["entries"],
+        "corrupt": len(result["corrupt"]),
+        "corrupt_refs": result["corrupt"][:_MAX_LISTED],
+    }
+
+
+def check_project(project_name: str, db_manager: LMDBConnectionManager) -> dict:
+    """One project's verdict; a check that raises is a failed verdict, not a failed sweep."""
+    started = time.perf_counter()
+    verdict = {"project": project_name, "checked_at": time.time()}
+    try:
+        if project_name == _ATTACHMENT_PROJECT:
+            verdict.update(check_attachments(db_manager))
+        else:
+            verdict.update(check_chain(project_name, db_manager))
+    except Exception as e:
+        verdict.update(ok=False, error=f"{type(e).__name__}: {e}")
+    verdict["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return verdict
+
+
+# ── worker processes ─────────────────────────────────────────
+# An LMDB environment must not be used across fork(), so workers are spawned
+# and each opens the vault with a manager of its own.
+_worker_manager: Optional[LMDBConnectionManager] = None
+
+
+def _init_worker(base_dir: str, map_size: int, layout: str) -> None:
+    global _worker_manager
+    from database.lmdb_layout import create_db_manager
+    _worker_manager = create_db_manager(base_dir, map_size, layout=layout)
+
+
+def _check_in_worker(project_name: str) -> dict:
+    return check_project(project_name, _worker_manager)
+
+
+def _owner_alive(run: dict) -> bool:
+    if run.get("pid") == os.getpid():
+        with _threads_lock:
+            thread = _threads.get(run["id"])
+        return thread is not None and thread.is_alive()
+    try:
+        os.kill(run["pid"], 0)
+    except (OSError, KeyError, TypeError):
+        return False
+    return True
+
+
+class IntegritySweep:
+    """Runs vault-wide integrity sweeps and reports on them."""
+
+    def __init__(self, db_manager: Optional[LMDBConnectionManager] = None, workers: Optional[int] = None):
+        self._manager = db_manager
+        self.workers = _default_workers() if workers is None else workers
+
+    def _mgr(self) -> LMDBConnectionManager:
+        if self._manager is not None:
+            return self._manager
+        from database.storage import default_db_manager
+        return default_db_manager
+
+    def _prepare(self, resume: bool, username: str) -> dict:
+        manager = self._mgr()
+        previous = reports.latest_run(manager)
+        if previous and previous["status"] == "running" and _owner_alive(previous):
+            raise RuntimeError(f"integrity sweep {previous['id']} is still running")
+        now = time.time()
+        if resume and previous and previous["status"] != "complete":
+            run = previous
+            run.update(reports.summarize(run["id"], manager))
+            run["resumes"] = run.get("resumes", 0) + 1
+            run.pop("error", None)
+        else:
+            run = {"id": reports.new_run_id(manager), "started_at": now, "started_by": username,
+                   "checked": 0, "failed": 0, "resumes": 0}
+        run.update(status="running", pid=os.getpid(), workers=self.workers, finished_at=None,
+                   resumed_at=now, checked_at_resume=run["checked"], total=None)
+        reports.save_run(run, manager)
+        return run
+
+    def _verdicts(self, projects: List[str]) -> Iterator[dict]:
+        manager = self._mgr()
+        if self.workers <= 1 or len(projects) < 2:
+            for project in projects:
+                yield check_project(project, manager)
+            return
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(projects)),
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(manager.base_dir, manager.default_map_size, manager.layout),
+        ) as pool:
+            futures = {pool.submit(_check_in_worker, project): project for project in projects}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:     # the worker process died
+                    yield {"project": futures[future], "checked_at": time.time(), "ok": False,
+                           "error": f"{type(e).__name__}: {e}"}
+
+    def _run(self, run: dict) -> None:
+        manager = self._mgr()
+        try:
+            done = reports.checked_projects(run["id"], manager)
+            todo = sorted(p for p in manager.list_projects() if p not in done)
+            run["total"] = len(done) + len(todo)
+            reports.save_run(run, manager)
+            for verdict in self._verdicts(todo):
+                run["checked"] += 1
+                run["failed"] += 0 if verdict.get("ok") else 1
+                reports.save_result(run, verdict, manager)
+            run.update(status="complete", finished_at=time.time())
+        except BaseException as e:
+            run.update(status="interrupted", error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            reports.save_run(run, manager)
+
+    def run(self, resume: bool = False, username: str = "system") -> dict:
+        """Sweep the vault in the calling thread; returns the finished run's status."""
+        run = self._prepare(resume, username)
+        self._run(run)
+        return self.status(run["id"])
+
+    def start(self, resume: bool = False, username: str = "system") -> dict:
+        """Sweep the vault in a background thread; returns the run's status right away."""
+        with _threads_lock:
+            run = self._prepare(resume, username)
+            thread = threading.Thread(target=self._run, args=(run,), daemon=True,
+                                      name=f"vhv-integrity-{run['id']}")
+            _threads[run["id"]] = thread
+            thread.start()
+        return self.status(run["id"])
+
+    def wait(self, run_id: str, timeout: Optional[float] = None) -> None:
+        with _threads_lock:
+            thread = _threads.get(run_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self, run_id: Optional[str] = None) -> Optional[dict]:
+        """A run (the latest by default) with ``progress`` and ``eta_seconds``."""
+        manager = self._mgr()
+        run = reports.load_run(run_id, manager) if run_id else reports.latest_run(manager)
+        if run is None:
+            return None
+        if run["status"] == "running" and not _owner_alive(run):
+            run["status"] = "interrupted"
+        total, checked = run.get("total"), run["checked"]
+        run["progress"] = round(checked / total, 4) if total else (1.0 if run["status"] == "complete" else 0.0)
+        run["eta_seconds"] = None
+        checked_since = checked - run.get("checked_at_resume", 0)
+        if run["status"] == "running" and total and checked_since > 0:
+            rate = (time.time() - run["resumed_at"]) / checked_since
+            run["eta_seconds"] = round(rate * (total - checked), 1)
+        return run
+
+    def results(self, run_id: str, offset: int = 0, limit: int = 100, failed_only: bool = False) -> List[dict]:
+        return reports.load_results(run_id, offset, limit, failed_only, self._mgr())
@@ -42,12 +42,8 @@ class BlockchainNotarizer:
         see ADR-0001. Returns the anchor signature.
         """
         project_name = self._get_project_name(patient_id)
-        chain = self.block_repo.load_all_blocks(project_name)
-        if not chain:
-            return None
-
-        # Extract block hashes in index order
-        hashes = [b.hash for b in chain if b.hash]
+        # Extract block hashes in index order, streaming headers only
+        hashes = [b.hash for b in self.block_repo.iter_headers(project_name) if b.hash]
         if not hashes:
             return None
 
@@ -70,16 +66,18 @@ class BlockchainNotarizer:
         """
         Verifies local blocks chain Merkle root against the anchored root.
         """
-        project_name = self._get_project_name(patient_id)
-        chain = self.block_repo.load_all_blocks(project_name)
-        if not chain:
+        return self.verify_project(self._get_project_name(patient_id))
+
+    def verify_project(self, project_name: str) -> Dict[str, str]:
+        """``verify_on_chain`` for a chain store, by its (pseudonymous) project name."""
+        hashes = [b.hash for b in self.block_repo.iter_headers(project_name) if b.hash]
+        if not hashes:
             return {"verified": False, "reason": "No local blocks found", "tx_hash": None}
 
-        hashes = [b.hash for b in chain if b.hash]
         local_root = calculate_merkle_root(hashes)
 
         stored_signature = self.block_repo.load_notarization_tx(project_name)
-        anchored_root = self.get_on_chain_merkle_root(patient_id)
+        anchored_root = self.block_repo.load_simulated_merkle_root(project_name)
 
         if not anchored_root:
             return {
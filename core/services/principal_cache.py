@@ -0,0 +1,246 @@
+"""
+core/services/principal_cache.py — Short-lived cache of authenticated principals
+================================================================================
+``current_user`` runs on every authenticated request. Without a cache it does an
+RS256 signature check, a revocation lookup and a user lookup, and both lookups
+are SQL round trips. This cache holds the verified claims and the user
+projection for a few seconds (``VHV_PRINCIPAL_CACHE_TTL``, default 30; 0
+disables). A repeat request with the same token then skips all three.
+
+Entries are keyed by a digest of the token. They are also indexed by ``jti`` and
+by username so they can be dropped early when something changes:
+
+  * logout / token revocation          -> ``invalidate_token(jti)``
+  * any user save or delete (role, 2FA,
+    account status, password)          -> ``invalidate_user(username)``
+  * passkey revocation                 -> ``invalidate_user(username)``
+
+Invalidations must reach every uvicorn worker, not just the one that made the
+change. They are appended to a small local LMDB log (``__principal_inv__``)
+that every worker opens. Each lookup first reads the log head, a single LMDB
+read, and applies anything new. If a worker finds a gap in the log (pruned, or
+the store was reset), it clears its whole cache. An entry never outlives the
+token's own ``exp``.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from database.connection import LMDBConnectionManager
+
+# Log entries older than this many TTLs cannot affect a live cache entry.
+_PRUNE_AFTER_TTLS = 4
+_PRUNE_EVERY = 256
+
+
+class LMDBInvalidationChannel:
+    """Append-only invalidation log shared by every worker on the host."""
+
+    PROJECT = "__principal_inv__"
+    _HEAD = b"head"
+    _PREFIX = b"inv_"
+
+    def __init__(self, db_manager: Optional[LMDBConnectionManager] = None):
+        self._manager = db_manager
+
+    def _mgr(self) -> LMDBConnectionManager:
+        if self._manager is not None:
+            return self._manager
+        from database.storage import default_db_manager
+        return default_db_manager
+
+    def _key(self, seq: int) -> bytes:
+        return self._PREFIX + f"{seq:020d}".encode()
+
+    def publish(self, kind: str, value: str, retention: float = 300.0) -> int:
+        now = time.time()
+        out = {}
+
+        def txn_block(txn):
+            seq = int(txn.get(self._HEAD) or 0) + 1
+            txn.put(self._key(seq), json.dumps({"k": kind, "v": value, "ts": now}).encode())
+            txn.put(self._HEAD, str(seq).encode())
+            out["seq"] = seq
+            if seq % _PRUNE_EVERY == 0:
+                cursor = txn.cursor()
+                if cursor.set_range(self._PREFIX):
+                    while cursor.key().startswith(self._PREFIX):
+                        if json.loads(cursor.value())["ts"] >= now - retention:
+                            break
+                        if not cursor.delete():
+                            break
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return out["seq"]
+
+    def head(self) -> int:
+        with self._mgr().open_db(self.PROJECT).begin(write=False) as txn:
+            return int(txn.get(self._HEAD) or 0)
+
+    def poll(self, after: int) -> Tuple[int, List[dict], bool]:
+        """(head, events newer than ``after``, whether some were missed)."""
+        with self._mgr().open_db(self.PROJECT).begin(write=False) as txn:
+            head = int(txn.get(self._HEAD) or 0)
+            if head == after:
+                return head, [], False
+            if head < after:
+                return head, [], True       # the log was reset
+            events = []
+            cursor = txn.cursor()
+            first = None
+            if cursor.set_range(self._key(after + 1)):
+                for key, value in cursor:
+                    if not key.startswith(self._PREFIX):
+                        break
+                    seq = int(key[len(self._PREFIX):])
+                    first = seq if first is None else first
+                    events.append(json.loads(value))
+            return head, events, first != after + 1
+
+
+class PrincipalCache:
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 channel: Optional[LMDBInvalidationChannel] = None, clock=time.time):
+        self.ttl = float(os.getenv("VHV_PRINCIPAL_CACHE_TTL", "30")) if ttl is None else ttl
+        self.max_entries = int(os.getenv("VHV_PRINCIPAL_CACHE_SIZE", "10000")) if max_entries is None else max_entries
+        self.channel = channel or LMDBInvalidationChannel()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # token digest -> (expires_at, claims, user)
+        self._entries: "OrderedDict[bytes, Tuple[float, dict, dict]]" = OrderedDict()
+        self._by_jti: Dict[str, bytes] = {}
+        self._by_user: Dict[str, Set[bytes]] = {}
+        self._seen = None
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "resets": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """The cached user for ``token``, or None if it must be authenticated afresh."""
+        if not self.enabled:
+            return None
+        self._sync()
+        key = self._digest(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return dict(entry[2])
+
+    def generation(self) -> Optional[int]:
+        """Take before loading a principal; pass to ``put`` so a racing invalidation wins."""
+        if not self.enabled:
+            return None
+        self._sync()
+        return self._seen
+
+    def put(self, token: str, claims: dict, user: dict, generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        self._sync()
+        if self._seen is None or (generation is not None and self._seen != generation):
+            return      # something was invalidated while this principal was being loaded
+        key = self._digest(token)
+        expires_at = self._clock() + self.ttl
+        if claims.get("exp"):
+            expires_at = min(expires_at, float(claims["exp"]))
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (expires_at, claims, dict(user))
+            if claims.get("jti"):
+                self._by_jti[claims["jti"]] = key
+            self._by_user.setdefault(user.get("username"), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_token(self, jti: str) -> None:
+        self._publish("jti", jti)
+
+    def invalidate_user(self, username: str) -> None:
+        self._publish("user", username)
+
+    def _publish(self, kind: str, value: str) -> None:
+        if not value:
+            return
+        self._apply([{"k": kind, "v": value}])
+        try:
+            self.channel.publish(kind, value, retention=max(self.ttl, 1) * _PRUNE_AFTER_TTLS)
+        except Exception:
+            # Other workers cannot be told; refuse to serve anything cached here either
+            # and rely on the TTL to bound staleness elsewhere.
+            self.clear()
+
+    def _sync(self) -> None:
+        try:
+            if self._seen is None:
+                # Start from the current head; nothing is cached yet.
+                self._seen = self.channel.head()
+                return
+            head, events, gap = self.channel.poll(self._seen)
+        except Exception:
+            self.clear()
+            self._seen = None
+            return
+        if gap:
+            self.clear()
+            with self._lock:
+                self._stats["resets"] += 1
+        elif events:
+            self._apply(events)
+        self._seen = head
+
+    def _apply(self, events: List[dict]) -> None:
+        with self._lock:
+            for event in events:
+                if event["k"] == "jti":
+                    key = self._by_jti.get(event["v"])
+                    keys = [key] if key else []
+                else:
+                    keys = list(self._by_user.get(event["v"], ()))
+                for key in keys:
+                    self._drop(key)
+                self._stats["invalidations"] += 1
+
+    def _drop(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, claims, user = entry
+        if self._by_jti.get(claims.get("jti")) == key:
+            del self._by_jti[claims["jti"]]
+        keys = self._by_user.get(user.get("username"))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user.get("username")]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_jti.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "ttl": self.ttl,
+                    "max_entries": self.max_entries}
+
+
+principal_cache = PrincipalCache()
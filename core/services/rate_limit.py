@@ -0,0 +1,320 @@
+"""
+core/services/rate_limit.py — Token-bucket rate limiting by route, user and IP
+==============================================================================
+Replaces the SQL-backed login limiter, which ran a DELETE, a COUNT(*) and an
+INSERT for every attempt and let everything through when the database was slow.
+It was also registered on ``/api/auth/login``, a path that does not exist, so
+in practice it never limited anything.
+
+Each policy is a token bucket. It holds ``limit`` tokens, refills completely
+over ``window_seconds``, and every request takes one token. A check is O(1) in
+time and space per key: two floats, no log of past requests.
+
+Policies are keyed by any combination of:
+
+  ip            the resolved client IP
+  user          the authenticated username
+  path:<name>   a path parameter, e.g. ``path:block_index``
+
+Policies with a ``path`` are enforced by ``RateLimiterMiddleware`` before the
+request reaches its route (login, passkey login). The rest are enforced by the
+``rate_limited(name)`` dependency once the caller is authenticated (decrypt
+attempts per user and block, break-glass per doctor). ``VHV_RATE_LIMITS`` is a
+JSON list that overrides or adds policies by ``name``, with the same rules as
+``VHV_ANOMALY_RULES``.
+
+``VHV_RATE_LIMIT_BACKEND`` selects the bucket store:
+
+  memory  (default) per worker. Locks are striped by key, so concurrent
+          checks on different keys do not wait for each other.
+  lmdb    a local LMDB store (``__ratelimit__``) shared by every worker on the
+          host, so a limit holds however the load balancer spreads requests.
+          A check is a write transaction, so ``RateLimiterMiddleware`` runs it
+          in the threadpool, and idle buckets are pruned by a background
+          thread every ``VHV_RATE_LIMIT_PRUNE_SECONDS`` (default 300).
+
+Limiting is off when ``TESTING=true`` unless ``VHV_RATE_LIMIT_ENABLED=true``.
+"""
+
+import json
+import math
+import os
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional, Tuple
+
+from database.connection import LMDBConnectionManager
+
+_PRUNE_EVERY = 512
+_STRIPES = 64
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    limit: int
+    window_seconds: float
+    key: Tuple[str, ...] = ("ip",)
+    method: Optional[str] = None
+    path: Optional[str] = None
+    enabled: bool = True
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window_seconds
+
+
+DEFAULT_POLICIES = (
+    RateLimitPolicy(name="login", limit=5, window_seconds=60,
+                    method="POST", path="/api/v1/auth/login"),
+    RateLimitPolicy(name="passkey_login", limit=10, window_seconds=60,
+                    method="POST", path="/api/v1/auth/webauthn/login"),
+    RateLimitPolicy(name="decrypt", limit=10, window_seconds=300,
+                    key=("user", "path:patient_id", "path:block_index")),
+    RateLimitPolicy(name="break_glass", limit=10, window_seconds=3600, key=("user",)),
+)
+
+
+def load_policies(raw: Optional[str] = None) -> Dict[str, RateLimitPolicy]:
+    """The default policies with ``VHV_RATE_LIMITS`` (or ``raw``) applied on top."""
+    policies = {p.name: p for p in DEFAULT_POLICIES}
+    raw = os.getenv("VHV_RATE_LIMITS") if raw is None else raw
+    if raw:
+        try:
+            overrides = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"VHV_RATE_LIMITS is not valid JSON: {e}")
+        for spec in overrides:
+            base = asdict(policies[spec["name"]]) if spec.get("name") in policies else {}
+            merged = {**base, **spec}
+            merged["key"] = tuple(merged.get("key") or ("ip",))
+            for part in merged["key"]:
+                if part not in ("ip", "user") and not part.startswith("path:"):
+                    raise ValueError(f"rate limit {merged.get('name')!r}: unknown key part {part!r}")
+            policies[merged["name"]] = RateLimitPolicy(**merged)
+    return {name: p for name, p in policies.items() if p.enabled}
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def policy_key(policy: RateLimitPolicy, ip: str = "", username: str = "", path_params=None) -> str:
+    """The bucket key for one caller under ``policy``, e.g. ``dr.smith|VIP-001|3``."""
+    parts = []
+    for part in policy.key:
+        if part == "ip":
+            parts.append(ip)
+        elif part == "user":
+            parts.append(username)
+        else:
+            parts.append(str((path_params or {}).get(part[5:], "")))
+    return "|".join(parts)
+
+
+def _take(tokens: float, last: float, now: float, policy: RateLimitPolicy) -> Tuple[float, bool]:
+    tokens = min(float(policy.limit), tokens + max(0.0, now - last) * policy.rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, True
+    return tokens, False
+
+
+class MemoryBucketStore:
+    """Per-worker buckets: ``{key: [tokens, last]}`` with lock striping."""
+
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}
+        self._locks = [threading.Lock() for _ in range(_STRIPES)]
+        self._checks = 0
+
+    def take(self, key: str, policy: RateLimitPolicy, now: float) -> Tuple[bool, float]:
+        with self._locks[hash(key) % _STRIPES]:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(policy.limit), now]
+            bucket[0], allowed = _take(bucket[0], bucket[1], now, policy)
+            bucket[1] = now
+            tokens = bucket[0]
+        self._checks += 1
+        if self._checks % _PRUNE_EVERY == 0:
+            self.prune(now)
+        return allowed, tokens
+
+    def prune(self, now: float, idle: float = 3600.0) -> int:
+        stale = [k for k, b in list(self._buckets.items()) if now - b[1] > idle]
+        for k in stale:
+            self._buckets.pop(k, None)
+        return len(stale)
+
+    def active_keys(self) -> int:
+        return len(self._buckets)
+
+
+class LMDBBucketStore:
+    """Host-wide buckets in a local LMDB store shared by all workers."""
+
+    PROJECT = "__ratelimit__"
+    _PREFIX = b"tb_"
+    _STRUCT = struct.Struct("<dd")
+    # A take waits on a write transaction (and a group commit's fsync).
+    blocking = True
+
+    def __init__(self, db_manager: Optional[LMDBConnectionManager] = None, clock=time.time):
+        self._manager = db_manager
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _mgr(self) -> LMDBConnectionManager:
+        if self._manager is not None:
+            return self._manager
+        from database.storage import default_db_manager
+        return default_db_manager
+
+    def take(self, key: str, policy: RateLimitPolicy, now: float) -> Tuple[bool, float]:
+        k = self._PREFIX + key.encode("utf-8")
+        out = {}
+
+        def txn_block(txn):
+            raw = txn.get(k)
+            tokens, last = self._STRUCT.unpack(raw) if raw else (float(policy.limit), now)
+            tokens, out["allowed"] = _take(tokens, last, now, policy)
+            txn.put(k, self._STRUCT.pack(tokens, now))
+            out["tokens"] = tokens
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return out["allowed"], out["tokens"]
+
+    def prune(self, now: float, idle: float = 3600.0) -> int:
+        removed = []
+
+        def txn_block(txn):
+            cursor = txn.cursor()
+            if not cursor.set_range(self._PREFIX):
+                return
+            while cursor.key().startswith(self._PREFIX):
+                if now - self._STRUCT.unpack(cursor.value())[1] > idle:
+                    removed.append(cursor.key())
+                    if not cursor.delete():
+                        break
+                elif not cursor.next():
+                    break
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return len(removed)
+
+    # ── background pruning ───────────────────────────────────
+    def start(self, prune_interval: Optional[float] = None) -> None:
+        interval = (float(os.getenv("VHV_RATE_LIMIT_PRUNE_SECONDS", "300"))
+                    if prune_interval is None else prune_interval)
+        if self._thread is not None or interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.prune(self._clock())
+                except Exception as e:
+                    print(f"[RateLimiter] Prune failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="ratelimit-prune", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def _make_store():
+    backend = os.getenv("VHV_RATE_LIMIT_BACKEND", "memory").strip().lower()
+    return LMDBBucketStore() if backend == "lmdb" else MemoryBucketStore()
+
+
+def _default_enabled() -> bool:
+    explicit = os.getenv("VHV_RATE_LIMIT_ENABLED")
+    if explicit is not None:
+        return explicit.strip().lower() == "true"
+    return os.getenv("TESTING", "false").lower() != "true"
+
+
+@dataclass
+class RateLimiter:
+    policies: Dict[str, RateLimitPolicy] = field(default_factory=load_policies)
+    store: object = field(default_factory=_make_store)
+    enabled: Optional[bool] = None
+    clock: object = time.time
+
+    def __post_init__(self):
+        self._route_policies = {
+            (p.method or "*", p.path): p for p in self.policies.values() if p.path
+        }
+        self._metrics_lock = threading.Lock()
+        self._metrics = {name: {"allowed": 0, "limited": 0, "errors": 0} for name in self.policies}
+
+    def is_enabled(self) -> bool:
+        return _default_enabled() if self.enabled is None else self.enabled
+
+    @property
+    def blocking(self) -> bool:
+        """Whether ``check`` may block on I/O, and so must stay off the event loop."""
+        return self.is_enabled() and getattr(self.store, "blocking", False)
+
+    def start(self) -> None:
+        if hasattr(self.store, "start"):
+            self.store.start()
+
+    def stop(self) -> None:
+        if hasattr(self.store, "stop"):
+            self.store.stop()
+
+    def route_policy(self, method: str, path: str) -> Optional[RateLimitPolicy]:
+        return self._route_policies.get((method, path)) or self._route_policies.get(("*", path))
+
+    def check(self, name: str, key: str) -> Decision:
+        policy = self.policies.get(name)
+        if policy is None or not self.is_enabled():
+            return Decision(True, -1, 0.0)
+        try:
+            allowed, tokens = self.store.take(f"{name}|{key}", policy, self.clock())
+        except Exception as e:
+            # A broken shared store must not lock everyone out; it is counted and logged.
+            print(f"[RateLimiter Warning] {name}: store failed ({e}); allowing request.")
+            self._count(name, "errors")
+            return Decision(True, -1, 0.0)
+        self._count(name, "allowed" if allowed else "limited")
+        retry_after = 0.0 if allowed else (1.0 - tokens) / policy.rate
+        return Decision(allowed, int(tokens), retry_after)
+
+    def _count(self, name: str, outcome: str) -> None:
+        with self._metrics_lock:
+            self._metrics.setdefault(name, {"allowed": 0, "limited": 0, "errors": 0})[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            per_policy = {name: dict(m) for name, m in self._metrics.items()}
+        return {
+            "enabled": self.is_enabled(),
+            "backend": "lmdb" if isinstance(self.store, LMDBBucketStore) else "memory",
+            "policies": {
+                name: {"limit": p.limit, "window_seconds": p.window_seconds, "key": list(p.key),
+                       **per_policy.get(name, {})}
+                for name, p in self.policies.items()
+            },
+        }
+
+
+rate_limiter = RateLimiter()
@@ -1,8 +1,9 @@
 import hashlib
 import hmac
+import itertools
 import json
-from typing import Any, Optional, Dict, List
-from core.domain.entities import Block
+from typing import Any, Iterable, Optional, Dict, List
+from core.domain.entities import Block, BlockView
 from core.domain.factories import BlockFactory
 from core.ports.repositories import IBlockRepository
 from core.ports.cryptography import IEncryptionStrategy
@@ -22,6 +23,47 @@ from core.services.erasure_service import get_erasure_key_store
 # plaintext (a dict) or password-protected ciphertext (stored with is_protected).
 _REST_PREFIX = "vhv-rest:"
 
+
+def find_broken_link(blocks: Iterable[Block]) -> int:
+    """
+    Position of the first block in ``blocks``, a chain in index order, whose
+    hash, link, timestamp, nonce or signature does not hold; -1 if none.
+    """
+    blocks = iter(blocks)
+    prev = next(blocks, None)
+    seen_nonces = set()
+    for i, curr in enumerate(blocks, start=1):
+        if curr.hash != curr.create_hash():
+            return i
+
+        if curr.previous_hash != prev.hash:
+            return i
+
+        if curr.timestamp < prev.timestamp:
+            return i
+
+        nonce_key = (curr.timestamp, curr.nonce)
+        if nonce_key in seen_nonces:
+            return i
+        seen_nonces.add(nonce_key)
+
+        if curr.merkle_root is not None:
+            msg = f"{curr.index}|{curr.timestamp}|{curr.merkle_root}|{curr.previous_hash}|{curr.nonce}"
+        else:
+            data_text = (
+                json.dumps(curr.data, sort_keys=True, ensure_ascii=False)
+                if isinstance(curr.data, dict)
+                else str(curr.data)
+            )
+            msg = f"{curr.index}|{curr.timestamp}|{data_text}|{curr.previous_hash}|{curr.nonce}"
+
+        if not verify_message(msg, curr.signature, curr.device_id):
+            return i
+        prev = curr
+
+    return -1
+
+
 class RecordService:
     def __init__(self, block_repo: IBlockRepository, crypto_strategy: IEncryptionStrategy):
         self.block_repo = block_repo
@@ -106,9 +148,26 @@ class RecordService:
             chain = [genesis]
         return chain
 
-    def get_chain(self, patient_id: str) -> List[Block]:
+    def get_chain(self, patient_id: str, include_audit: bool = True) -> List[Block]:
+        """
+        The patient's chain. ``include_audit=False`` drops the on-chain audit
+        blocks (skipped by index, not decoded) — for record views only; chain
+        verification always needs every link.
+        """
+        if not include_audit:
+            blocks = self.block_repo.load_all_blocks(self._get_project_name(patient_id), include_audit=False)
+            if blocks:
+                return blocks
         return self._get_or_create_chain(patient_id)
 
+    def get_chain_headers(self, patient_id: str) -> List[BlockView]:
+        """
+        The patient's chain with no payload decoded until it is read — for
+        lengths, hashes and links.
+        """
+        return (self.block_repo.load_block_headers(self._get_project_name(patient_id))
+                or self._get_or_create_chain(patient_id))
+
     def _anchor_chain(self, patient_id: str) -> None:
         """
         Re-anchors the Merkle root of the patient chain.
@@ -455,8 +514,9 @@ class RecordService:
         ))
         return self._reveal(patient_id, correction_block.index, corrected_data)
 
-    def get_final_data(self, patient_id: str) -> Dict[int, Any]:
-        chain = self._get_or_create_chain(patient_id)
+    def get_final_data(self, patient_id: str, chain: Optional[List[Block]] = None) -> Dict[int, Any]:
+        if chain is None:
+            chain = self._get_or_create_chain(patient_id)
         result: Dict[int, Any] = {}
 
         for block in chain:
@@ -476,7 +536,7 @@ class RecordService:
 
         return result
 
-    def get_corrections_index(self, patient_id: str) -> Dict[int, dict]:
+    def get_corrections_index(self, patient_id: str, chain: Optional[List[Block]] = None) -> Dict[int, dict]:
         """
         Map each corrected record's index to its latest correction's provenance.
 
@@ -484,8 +544,10 @@ class RecordService:
         in the clear — only the corrected clinical payload is encrypted — so this
         needs no decryption. The record itself is never overwritten; this simply
         tells the read layer that a later block supersedes it and by whom/why.
+        Pass ``chain`` when the caller has already loaded it.
         """
-        chain = self._get_or_create_chain(patient_id)
+        if chain is None:
+            chain = self._get_or_create_chain(patient_id)
         corrections: Dict[int, dict] = {}
         for block in chain:
             if isinstance(block.data, dict) and block.data.get("type") == "correction":
@@ -512,37 +574,14 @@ class RecordService:
         return self.find_broken_link_index(patient_id) == -1
 
     def find_broken_link_index(self, patient_id: str) -> int:
-        chain = self._get_or_create_chain(patient_id)
-        seen_nonces = set()
-        for i in range(1, len(chain)):
-            prev = chain[i - 1]
-            curr = chain[i]
-
-            if curr.hash != curr.create_hash():
-                return i
-
-            if curr.previous_hash != prev.hash:
-                return i
-
-            if curr.timestamp < prev.timestamp:
-                return i
-
-            nonce_key = (curr.timestamp, curr.nonce)
-            if nonce_key in seen_nonces:
-                return i
-            seen_nonces.add(nonce_key)
-
-            if curr.merkle_root is not None:
-                msg = f"{curr.index}|{curr.timestamp}|{curr.merkle_root}|{curr.previous_hash}|{curr.nonce}"
-            else:
-                data_text = (
-                    json.dumps(curr.data, sort_keys=True, ensure_ascii=False)
-                    if isinstance(curr.data, dict)
-                    else str(curr.data)
-                )
-                msg = f"{curr.index}|{curr.timestamp}|{data_text}|{curr.previous_hash}|{curr.nonce}"
-
-            if not verify_message(msg, curr.signature, curr.device_id):
-                return i
-
-        return -1
+        """
+        Position of the first block that breaks the chain, or -1. Hashes, links,
+        nonces and signatures are all header fields, so the walk streams headers
+        and reads no payload, except for a legacy block signed over its data.
+        """
+        headers = self.block_repo.iter_headers(self._get_project_name(patient_id))
+        prev = next(headers, None)
+        if prev is None:
+            self._get_or_create_chain(patient_id)
+            return -1
+        return find_broken_link(itertools.chain((prev,), headers))
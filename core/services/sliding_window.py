@@ -0,0 +1,203 @@
+"""
+core/services/sliding_window.py — Sliding-window event counters
+===============================================================
+Counts events per key (a username, an IP, ...) over a trailing time window.
+Used by the anomaly engine (core/services/anomaly_engine.py).
+
+Two backends share one interface:
+
+  MemorySlidingWindowStore  per-process; for tests and single-worker deployments.
+  LMDBSlidingWindowStore    a small local LMDB store (``__anomaly__``) that every
+                            uvicorn worker on the host opens. LMDB serialises
+                            writers across processes, so a hit-and-count is atomic
+                            and every worker sees the same counts.
+
+Only timestamps inside the window are kept, at most ``limit`` of them per key
+(the caller only needs to know whether a threshold was reached), and a key with
+no recent events is dropped by ``prune()``, so memory/disk is O(active keys),
+not O(history). The LMDB store keeps a key's timestamps as packed doubles and is
+pruned by a background thread every ``VHV_ANOMALY_PRUNE_SECONDS`` (default 300)
+rather than on the request path.
+"""
+
+import json
+import os
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from database.connection import LMDBConnectionManager
+
+# Every this many hits, the memory store sweeps keys that have gone quiet.
+_PRUNE_EVERY = 512
+
+
+class MemorySlidingWindowStore:
+    """In-process counters: a deque of timestamps per key."""
+
+    def __init__(self, max_window: float = 3600.0):
+        self.max_window = max_window
+        self._events: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def hit(self, key: str, window: float, now: Optional[float] = None,
+            limit: Optional[int] = None) -> int:
+        """Record one event for ``key`` and return the count inside ``window``.
+
+        With ``limit`` only the newest ``limit`` events are kept, so the count
+        saturates there.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            events = self._events.get(key)
+            if events is None or events.maxlen != limit:
+                events = self._events[key] = deque(events or (), maxlen=limit)
+            events.append(now)
+            while events and events[0] <= now - window:
+                events.popleft()
+            count = len(events)
+            self._hits += 1
+            if self._hits % _PRUNE_EVERY == 0:
+                self._prune_locked(now)
+            return count
+
+    def count(self, key: str, window: float, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            return sum(1 for t in self._events.get(key, ()) if t > now - window)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            return self._prune_locked(time.time() if now is None else now)
+
+    def _prune_locked(self, now: float) -> int:
+        stale = [k for k, ev in self._events.items() if not ev or ev[-1] <= now - self.max_window]
+        for k in stale:
+            del self._events[k]
+        return len(stale)
+
+    def active_keys(self) -> int:
+        with self._lock:
+            return len(self._events)
+
+
+class LMDBSlidingWindowStore:
+    """Host-wide counters in a local LMDB store shared by all workers."""
+
+    PROJECT = "__anomaly__"
+    _PREFIX = b"sw_"
+
+    def __init__(self, db_manager: Optional[LMDBConnectionManager] = None, max_window: float = 3600.0,
+                 clock=time.time):
+        self._manager = db_manager
+        self.max_window = max_window
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _mgr(self) -> LMDBConnectionManager:
+        if self._manager is not None:
+            return self._manager
+        from database.storage import default_db_manager
+        return default_db_manager
+
+    def _key(self, key: str) -> bytes:
+        return self._PREFIX + key.encode("utf-8")
+
+    @staticmethod
+    def _decode(raw: Optional[bytes]) -> List[float]:
+        if not raw:
+            return []
+        if raw[:1] == b"[":
+            return json.loads(raw)      # written by an older release
+        events = array("d")
+        events.frombytes(raw)
+        return events.tolist()
+
+    def hit(self, key: str, window: float, now: Optional[float] = None,
+            limit: Optional[int] = None) -> int:
+        now = time.time() if now is None else now
+        horizon = now - window
+        result = {}
+
+        def txn_block(txn):
+            events = [t for t in self._decode(txn.get(self._key(key))) if t > horizon]
+            events.append(now)
+            if limit is not None:
+                events = events[-limit:]
+            txn.put(self._key(key), array("d", events).tobytes())
+            result["count"] = len(events)
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return result["count"]
+
+    def count(self, key: str, window: float, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        manager = self._mgr()
+        if not manager.project_exists(self.PROJECT):
+            return 0
+        with manager.open_db(self.PROJECT).begin(write=False) as txn:
+            raw = txn.get(self._key(key))
+        return sum(1 for t in self._decode(raw) if t > now - window)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = self._clock() if now is None else now
+        horizon = now - self.max_window
+        removed = []
+
+        def txn_block(txn):
+            cursor = txn.cursor()
+            if not cursor.set_range(self._PREFIX):
+                return
+            while cursor.key().startswith(self._PREFIX):
+                events = self._decode(cursor.value())
+                if not events or events[-1] <= horizon:
+                    removed.append(cursor.key())
+                    if not cursor.delete():
+                        break
+                elif not cursor.next():
+                    break
+
+        self._mgr().run_write_transaction(self.PROJECT, txn_block)
+        return len(removed)
+
+    # ── background pruning ───────────────────────────────────
+    def start(self, prune_interval: Optional[float] = None) -> None:
+        interval = (float(os.getenv("VHV_ANOMALY_PRUNE_SECONDS", "300"))
+                    if prune_interval is None else prune_interval)
+        if self._thread is not None or interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.prune()
+                except Exception as e:
+                    print(f"[AnomalyEngine] Prune failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="anomaly-prune", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def active_keys(self) -> int:
+        manager = self._mgr()
+        if not manager.project_exists(self.PROJECT):
+            return 0
+        n = 0
+        with manager.open_db(self.PROJECT).begin(write=False) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(self._PREFIX):
+                for key in cursor.iternext(keys=True, values=False):
+                    if not key.startswith(self._PREFIX):
+                        break
+                    n += 1
+        return n
@@ -0,0 +1,213 @@
+"""
+database/access_index.py — Cross-patient secondary index over the access ledgers
+================================================================================
+Each patient's access ledger lives in that patient's own LMDB environment, which
+is right for tamper evidence but makes "which charts did dr.smith read this
+week" an O(patients × ledger) sweep. This module keeps a global secondary index
+in its own store (``__access_index__``), maintained by ``append_access_log``:
+
+    key   = username \\x00 timestamp_ns (20d) \\x00 project \\x00 seq (20d)
+    value = {"project", "seq", "timestamp", "action", "hash"}
+
+Keys sort by user, then time, so an investigation is a single range scan. The
+index is derived data and carries no authority of its own: every hit is
+resolved back to the hash-linked per-patient entry and checked against it, and
+``rebuild_access_index`` regenerates the whole index from the ledgers.
+"""
+
+import json
+from typing import Iterator, List, Optional, Tuple
+
+from database.connection import LMDBConnectionManager
+
+INDEX_PROJECT = "__access_index__"
+
+_SEP = b"\x00"
+
+
+def _ts_ns(timestamp: float) -> int:
+    return max(0, int(round(float(timestamp) * 1_000_000_000)))
+
+
+def _index_key(username: str, timestamp: float, project_name: str, seq: int) -> bytes:
+    return _SEP.join((
+        username.encode("utf-8"),
+        f"{_ts_ns(timestamp):020d}".encode("utf-8"),
+        project_name.encode("utf-8"),
+        f"{int(seq):020d}".encode("utf-8"),
+    ))
+
+
+def _index_value(project_name: str, entry: dict) -> bytes:
+    return json.dumps({
+        "project": project_name,
+        "seq": entry["seq"],
+        "timestamp": entry.get("timestamp"),
+        "action": entry.get("action"),
+        "hash": entry.get("hash"),
+    }, ensure_ascii=False).encode("utf-8")
+
+
+def _manager(db_manager: Optional[LMDBConnectionManager]) -> LMDBConnectionManager:
+    from database.storage import default_db_manager
+    return db_manager or default_db_manager
+
+
+def index_access_entries(
+    project_name: str,
+    entries: List[dict],
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> int:
+    """Add ledger entries of ``project_name`` to the index. Idempotent per entry."""
+    manager = _manager(db_manager)
+    rows = [
+        (_index_key(e.get("username") or "", e.get("timestamp") or 0, project_name, e["seq"]),
+         _index_value(project_name, e))
+        for e in entries
+        if "seq" in e
+    ]
+    if not rows:
+        return 0
+
+    def txn_block(txn):
+        for key, value in rows:
+            txn.put(key, value)
+
+    manager.run_write_transaction(INDEX_PROJECT, txn_block)
+    return len(rows)
+
+
+def rebuild_access_index(db_manager: Optional[LMDBConnectionManager] = None, batch_size: int = 500) -> dict:
+    """
+    Regenerate the index from every patient's access ledger.
+
+    Used after a restore, or to backfill ledgers written before the index
+    existed. The old index is dropped first so stale hits cannot survive.
+    """
+    from database.audit_storage import iter_access_log_batches
+    manager = _manager(db_manager)
+
+    def clear(txn):
+        cursor = txn.cursor()
+        if cursor.first():
+            while cursor.delete():
+                pass
+
+    manager.create_project(INDEX_PROJECT)
+    manager.run_write_transaction(INDEX_PROJECT, clear)
+
+    projects = 0
+    indexed = 0
+    for project in sorted(manager.list_projects()):
+        seen = False
+        for batch in iter_access_log_batches(project, batch_size, db_manager=manager):
+            seen = True
+            indexed += index_access_entries(project, batch, db_manager=manager)
+        projects += int(seen)
+    return {"projects": projects, "indexed": indexed}
+
+
+def _resolve(manager: LMDBConnectionManager, hit: dict) -> dict:
+    """Read the per-patient entry a hit points at and check it still matches."""
+    from database.audit_storage import _access_entry_hash
+    project = hit["project"]
+    entry = None
+    if manager.project_exists(project):
+        env = manager.open_db(project)
+        with env.begin(write=False) as txn:
+            raw = txn.get(f"access_log_{project}_{int(hit['seq']):020d}".encode("utf-8"))
+        if raw:
+            try:
+                entry = json.loads(raw.decode("utf-8"))
+            except Exception:
+                entry = None
+
+    verified = bool(
+        entry is not None
+        and entry.get("hash") == hit.get("hash")
+        and _access_entry_hash(entry) == entry.get("hash")
+    )
+    return {**hit, "verified": verified, "entry": entry}
+
+
+def _scan(
+    manager: LMDBConnectionManager,
+    start: bytes,
+    end: bytes,
+    limit: int,
+) -> Tuple[List[Tuple[bytes, dict]], bool]:
+    rows: List[Tuple[bytes, dict]] = []
+    more = False
+    env = manager.open_db(INDEX_PROJECT)
+    with env.begin(write=False) as txn:
+        cursor = txn.cursor()
+        if not cursor.set_range(start):
+            return rows, False
+        for key, value in cursor:
+            if key > end:
+                break
+            if len(rows) >= limit:
+                more = True
+                break
+            try:
+                rows.append((key, json.loads(value.decode("utf-8"))))
+            except Exception:
+                continue
+    return rows, more
+
+
+def query_access_index(
+    username: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    resolve: bool = True,
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> dict:
+    """
+    Every access ``username`` made across all patients, oldest first.
+
+    Returns ``{"hits", "next_cursor"}``. ``next_cursor`` is opaque; pass it back
+    to continue from the last hit. With ``resolve`` each hit carries the
+    per-patient ledger entry and ``verified`` — whether it still exists and its
+    hash matches both the index and its own content.
+    """
+    manager = _manager(db_manager)
+    user = username.encode("utf-8") + _SEP
+    start = user + f"{_ts_ns(since) if since is not None else 0:020d}".encode("utf-8")
+    end_ts = _ts_ns(until) if until is not None else 10 ** 20 - 1
+    end = user + f"{end_ts:020d}".encode("utf-8") + b"\xff"
+    if cursor:
+        try:
+            after = bytes.fromhex(cursor)
+        except ValueError:
+            raise ValueError("invalid cursor")
+        if not after.startswith(user):
+            raise ValueError("cursor does not belong to this query")
+        start = max(start, after + b"\x00")
+    if not manager.project_exists(INDEX_PROJECT):
+        return {"hits": [], "next_cursor": None}
+
+    rows, more = _scan(manager, start, end, max(1, int(limit)))
+    hits = [_resolve(manager, hit) if resolve else hit for _, hit in rows]
+    next_cursor = rows[-1][0].hex() if more and rows else None
+    return {"hits": hits, "next_cursor": next_cursor}
+
+
+def iter_access_index(
+    username: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    db_manager: Optional[LMDBConnectionManager] = None,
+    page_size: int = 500,
+) -> Iterator[dict]:
+    """Unpaginated form of ``query_access_index`` (hits are not resolved)."""
+    cursor = None
+    while True:
+        page = query_access_index(username, since, until, page_size, cursor,
+                                  resolve=False, db_manager=db_manager)
+        yield from page["hits"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
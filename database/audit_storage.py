@@ -5,8 +5,8 @@ database/audit_storage.py — Access and system audit logging persistence layer
 import hashlib
 import json
 import time
-from typing import Optional, List
-from database.connection import LMDBConnectionManager
+from typing import Iterator, Optional, List
+from database.connection import LMDBConnectionManager, active_project, run_after_commit
 
 
 def _access_entry_hash(entry: dict) -> str:
@@ -42,9 +42,13 @@ def append_access_log(
     tamper-evident ledger verifiable via ``verify_access_log_integrity``. Reads are
     frequent, so this lives beside the clinical chain rather than adding a block
     per read to it.
+
+    Each entry is also added to the cross-patient index in
+    ``database.access_index`` once it is durable.
     """
     from database.storage import default_db_manager
     manager = db_manager or default_db_manager
+    written = []
 
     def txn_block(txn):
         head_key = f"meta_access_head_{project_name}".encode("utf-8")
@@ -72,9 +76,22 @@ def append_access_log(
         txn.put(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
         txn.put(head_key, entry["hash"].encode("utf-8"))
         txn.put(seq_key, str(seq).encode("utf-8"))
+        written.append(entry)
 
     manager.run_write_transaction(project_name, txn_block)
 
+    def index():
+        from database.access_index import index_access_entries
+        try:
+            index_access_entries(project_name, written, db_manager=manager)
+        except Exception as e:
+            # The index is derived; rebuild_access_index() restores a missed entry.
+            print(f"[Access Index Warning] could not index {project_name}: {e}")
+
+    # Inside a unit of work on this project the entry only exists once it commits.
+    if not (active_project.get() == project_name and run_after_commit(index)):
+        index()
+
 
 def verify_access_log_integrity(
     project_name: str,
@@ -96,8 +113,11 @@ def verify_access_log_integrity(
     entries = []
     with env.begin(write=False) as txn:
         prefix = f"access_log_{project_name}_".encode("utf-8")
-        for key, value in txn.cursor():
-            if key.startswith(prefix):
+        cursor = txn.cursor()
+        if cursor.set_range(prefix):
+            for key, value in cursor:
+                if not key.startswith(prefix):
+                    break
                 try:
                     entries.append(json.loads(value.decode("utf-8")))
                 except Exception:
@@ -119,6 +139,77 @@ def verify_access_log_integrity(
     return {"valid": True, "count": len(chained), "broken_at": None}
 
 
+def _iter_prefix_batches(
+    manager: LMDBConnectionManager,
+    project_name: str,
+    prefix: bytes,
+    batch_size: int,
+) -> Iterator[List[dict]]:
+    """
+    Yield the decoded values under ``prefix`` in key order, ``batch_size`` at a time.
+
+    Each batch is read in its own short read transaction and the scan resumes from
+    the last key seen, so a caller streaming a large ledger never holds a reader
+    slot (or the whole ledger) for longer than one batch.
+    """
+    start = prefix
+    while True:
+        batch = []
+        last_key = None
+        env = manager.open_db(project_name)
+        with env.begin(write=False) as txn:
+            cursor = txn.cursor()
+            if not cursor.set_range(start):
+                return
+            for key, value in cursor:
+                if not key.startswith(prefix):
+                    break
+                last_key = key
+                try:
+                    batch.append(json.loads(value.decode("utf-8")))
+                except Exception:
+                    continue
+                if len(batch) >= batch_size:
+                    break
+        if last_key is None:
+            return
+        if batch:
+            yield batch
+        start = last_key + b"\x00"
+
+
+def iter_access_log_batches(
+    project_name: str,
+    batch_size: int = 500,
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> Iterator[List[dict]]:
+    """
+    Stream the access ledger in ``seq`` order, one bounded batch at a time.
+
+    Keys are zero-padded on ``seq`` (see ``append_access_log``), so key order is
+    ledger order and the hash chain can be verified incrementally as it streams.
+    """
+    from database.storage import default_db_manager
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return iter(())
+    prefix = f"access_log_{project_name}_".encode("utf-8")
+    return _iter_prefix_batches(manager, project_name, prefix, batch_size)
+
+
+def iter_audit_log_batches(
+    project_name: str,
+    batch_size: int = 500,
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> Iterator[List[dict]]:
+    """Stream the system audit log in write order, one bounded batch at a time."""
+    from database.storage import default_db_manager
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return iter(())
+    return _iter_prefix_batches(manager, project_name, b"audit_", batch_size)
+
+
 def load_access_logs(project_name: str, limit: int = 100, db_manager: Optional[LMDBConnectionManager] = None) -> List[dict]:
     from database.storage import default_db_manager
     manager = db_manager or default_db_manager
@@ -174,18 +265,24 @@ def load_audit_logs(project_name: str, limit: int = 100, db_manager: Optional[LM
     if not manager.project_exists(project_name):
         return []
 
+    # Keys are `audit_{time_ns}`, so the newest entries are the last keys of the
+    # family: walk back from its end and stop after `limit`, rather than decoding
+    # the whole log to sort it.
     env = manager.open_db(project_name)
     logs = []
     with env.begin(write=False) as txn:
         cursor = txn.cursor()
-        all_audit = []
-        for key, value in cursor:
-            if key.startswith(b"audit_"):
-                try:
-                    log = json.loads(value.decode("utf-8"))
-                    all_audit.append(log)
-                except Exception:
-                    continue
-        all_audit.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-        logs = all_audit[:limit]
+        if cursor.set_range(b"audit_\xff"):
+            positioned = cursor.prev()
+        else:
+            positioned = cursor.last()
+        while positioned and len(logs) < limit:
+            if not cursor.key().startswith(b"audit_"):
+                break
+            try:
+                logs.append(json.loads(cursor.value().decode("utf-8")))
+            except Exception:
+                pass
+            positioned = cursor.prev()
+    logs.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
     return logs
@@ -0,0 +1,349 @@
+"""
+database/backup.py — Online backups of the LMDB stores
+======================================================
+Copying ``projects/*/chaindata.lmdb`` with ``cp`` while the vault writes can
+capture a torn page. ``backup`` uses LMDB's own compacting copy
+(``env.copy(compact=True)``) instead. It copies one consistent read snapshot of
+each environment, without the free pages, while writers carry on. Environments
+are copied in parallel, at most ``VHV_BACKUP_WORKERS`` (default 4) at a time,
+so one huge store (``attachments``) does not hold up the rest.
+
+Each copy runs in a spawned process with its own handle on the environment.
+A copy in the vault's process would hold a transaction for its whole length,
+and LMDB only grows a map while the process has none open, so a write that
+filled the map mid-backup would fail instead of growing it. A reader in
+another process is registered in the lock file like any other, so writers
+keep its snapshot intact, and growing the map does not disturb it.
+
+Each backup is a directory ``<dest>/<id>/`` laid out like ``projects/``, plus a
+``manifest.json``. The manifest records, for every environment, its file's
+SHA-256 and, for every chain in it, the chain head:
+
+- last block index and hash;
+- Merkle root over the block hashes, and the root anchored by the notarizer;
+- access-ledger sequence number and head hash.
+
+The heads are read from the copy, never from the live store, and only from
+block headers, so nothing is decrypted. The manifest is signed under the KMS
+key (``core.security.signaturedata``), bound to a fixed context rather than to
+this host's device ID, so it verifies on the host it is restored to.
+
+``--incremental`` starts from the newest manifest in ``dest``. An environment
+whose chains kept their ``meta_last_index`` and access-ledger ``seq``, and whose
+LMDB transaction ID has not moved (which catches every other write), is not
+copied again. The new manifest points at the earlier backup's file instead.
+In the consolidated layout every chain shares ``__chains__``, so a write to any
+chain copies all of them again.
+
+    python -m database.backup create /srv/backups [--incremental] [--workers 8]
+    python -m database.backup verify /srv/backups/20261019T101500Z
+    python -m database.backup restore /srv/backups/20261019T101500Z /srv/vault/projects
+
+``verify`` checks the signature, every file's checksum, and every chain head
+against the copy. A chain that was anchored at backup time must still match its
+anchor. ``restore`` assembles the files of a backup, incremental or not, into an
+empty projects directory.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import lmdb
+
+from database.connection import LMDBConnectionManager, _env_int
+from database.lmdb_layout import CHAINS_PROJECT
+
+MANIFEST = "manifest.json"
+MANIFEST_FORMAT = "vhv-backup/1"
+# The signature context: a backup must verify on whichever host restores it.
+_SIGNING_CONTEXT = "vhv-backup-manifest"
+_DB_FILE = "chaindata.lmdb"
+_DATA_FILE = "data.mdb"
+
+
+def _sign(manifest: Dict[str, Any]) -> str:
+    from core.security import signaturedata
+    body = json.dumps({k: v for k, v in manifest.items() if k != "signature"}, sort_keys=True)
+    return signaturedata(body, _SIGNING_CONTEXT)
+
+
+def _signature_valid(manifest: Dict[str, Any]) -> bool:
+    from core.security import verify_message
+    body = json.dumps({k: v for k, v in manifest.items() if k != "signature"}, sort_keys=True)
+    return verify_message(body, manifest.get("signature") or "", _SIGNING_CONTEXT)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _environments(manager: LMDBConnectionManager) -> Dict[str, List[str]]:
+    """Every live environment under the projects directory, with the chains it holds."""
+    base = manager.ensure_projects_dir()
+    envs = {
+        name: [] for name in sorted(os.listdir(base))
+        if os.path.isdir(os.path.join(base, name, _DB_FILE))
+        # Left over from the other layout if it is not its own environment key.
+        and manager._env_key(name) == name
+    }
+    for project in manager.list_projects():
+        env_name = manager._env_key(project)
+        if env_name in envs:
+            envs[env_name].append(project)
+    return envs
+
+
+def _state(manager: LMDBConnectionManager, env_name: str, chains: List[str]) -> Dict[str, Any]:
+    """What an incremental backup compares to decide whether an environment changed."""
+    from database.storage import read_transaction
+    heads = {}
+    for project in chains:
+        with read_transaction(project, manager) as txn:
+            last = txn.get(b"meta_last_index")
+            seq = txn.get(f"meta_access_seq_{project}".encode("utf-8"))
+            heads[project] = [int(last) if last else -1, int(seq) if seq else 0]
+    return {"last_txnid": manager.open_db(env_name).info()["last_txnid"], "heads": heads}
+
+
+def _chain_head(txn, project: str, db=None) -> Dict[str, Any]:
+    """A chain's head as read from a backup copy: headers and meta keys only."""
+    from core.utils.crypto_utils import calculate_merkle_root
+    from database.block_codec import decode_header
+
+    def meta(name: str) -> Optional[str]:
+        value = txn.get(f"meta_{name}_{project}".encode("utf-8"), db=db)
+        return value.decode("utf-8") if value else None
+
+    hashes, head_hash = [], None
+    for key, value in txn.cursor(db=db):
+        if not key[:1].isdigit():
+            break
+        head_hash = decode_header(value)[0].get("hash")
+        if head_hash:
+            hashes.append(head_hash)
+    last = txn.get(b"meta_last_index", db=db)
+    merkle_root = calculate_merkle_root(hashes) if hashes else None
+    anchored_root = meta("simulated_merkle_root")
+    return {
+        "last_index": int(last) if last else -1,
+        "head_hash": head_hash,
+        "merkle_root": merkle_root,
+        "anchored_root": anchored_root,
+        "anchored": anchored_root is not None and anchored_root == merkle_root,
+        "access_seq": int(meta("access_seq") or 0),
+        "access_head": meta("access_head"),
+    }
+
+
+def _read_heads(data_dir: str, env_name: str, chains: List[str]) -> Dict[str, Dict[str, Any]]:
+    consolidated = env_name == CHAINS_PROJECT
+    env = lmdb.open(data_dir, readonly=True, lock=False, subdir=True,
+                    max_dbs=len(chains) + 1 if consolidated else 0)
+    try:
+        with env.begin() as txn:
+            return {
+                project: _chain_head(
+                    txn, project,
+                    env.open_db(project.encode("utf-8"), txn=txn, create=False) if consolidated else None,
+                )
+                for project in chains
+            }
+    finally:
+        env.close()
+
+
+def _compact_copy(env_path: str, data_dir: str) -> None:
+    """Runs in a copy process: a compacting copy of one environment's read snapshot."""
+    env = lmdb.open(env_path, readonly=True, subdir=True, max_dbs=0)
+    try:
+        env.copy(data_dir, compact=True)
+    finally:
+        env.close()
+
+
+def _copy_env(manager: LMDBConnectionManager, env_name: str, chains: List[str],
+              target_dir: str, copier: Executor) -> Dict[str, Any]:
+    state = _state(manager, env_name, chains)
+    data_dir = os.path.join(target_dir, env_name, _DB_FILE)
+    os.makedirs(data_dir)
+    started = time.perf_counter()
+    copier.submit(_compact_copy, manager.get_db_path(env_name), data_dir).result()
+    data_file = os.path.join(data_dir, _DATA_FILE)
+    return {
+        "path": os.path.join(env_name, _DB_FILE, _DATA_FILE),
+        "bytes": os.path.getsize(data_file),
+        "sha256": _sha256(data_file),
+        "copy_ms": round((time.perf_counter() - started) * 1000, 1),
+        "state": state,
+        "chains": _read_heads(data_dir, env_name, chains),
+    }
+
+
+def _backup_ids(dest: str) -> List[str]:
+    if not os.path.isdir(dest):
+        return []
+    return sorted(d for d in os.listdir(dest) if os.path.isfile(os.path.join(dest, d, MANIFEST)))
+
+
+def load_manifest(backup_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(backup_dir, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def backup(dest: str, manager: Optional[LMDBConnectionManager] = None, incremental: bool = False,
+           workers: Optional[int] = None, log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Back up every environment into a new ``<dest>/<id>/``; returns its signed manifest."""
+    from database.storage import default_db_manager
+    manager = manager or default_db_manager
+    workers = workers or _env_int("VHV_BACKUP_WORKERS", 4)
+
+    previous = None
+    if incremental:
+        manifests = [load_manifest(os.path.join(dest, i)) for i in _backup_ids(dest)]
+        previous = max(manifests, key=lambda m: m["created_at"]) if manifests else None
+
+    backup_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    suffix = 0
+    while os.path.exists(os.path.join(dest, backup_id + (f"-{suffix}" if suffix else ""))):
+        suffix += 1
+    backup_id += f"-{suffix}" if suffix else ""
+    target_dir = os.path.join(dest, backup_id)
+    os.makedirs(target_dir)
+
+    envs = _environments(manager)
+    entries: Dict[str, Dict[str, Any]] = {}
+    to_copy = []
+    for env_name, chains in envs.items():
+        earlier = (previous or {}).get("environments", {}).get(env_name)
+        if earlier and earlier["state"] == _state(manager, env_name, chains):
+            entries[env_name] = dict(earlier)
+            log(f"unchanged {env_name}")
+        else:
+            to_copy.append(env_name)
+
+    if to_copy:
+        workers = min(max(1, workers), len(to_copy))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as copier, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vhv-backup") as pool:
+            copies = {name: pool.submit(_copy_env, manager, name, envs[name], target_dir, copier)
+                      for name in to_copy}
+            for env_name, future in copies.items():
+                entries[env_name] = {"source": backup_id, **future.result()}
+                log(f"copied    {env_name:<40} {entries[env_name]['bytes']:>12} bytes")
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "id": backup_id,
+        "created_at": time.time(),
+        "layout": manager.layout,
+        "incremental": previous is not None,
+        "base": previous["id"] if previous else None,
+        "copied": sorted(to_copy),
+        "environments": dict(sorted(entries.items())),
+    }
+    manifest["signature"] = _sign(manifest)
+    with open(os.path.join(target_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _data_file(backup_dir: str, entry: Dict[str, Any]) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(backup_dir)), entry["source"], entry["path"])
+
+
+def verify(backup_dir: str) -> Dict[str, Any]:
+    """Check a backup without decrypting it; ``problems`` lists everything that failed."""
+    manifest = load_manifest(backup_dir)
+    problems = []
+    if not _signature_valid(manifest):
+        problems.append("manifest signature does not verify")
+    for env_name, entry in manifest["environments"].items():
+        data_file = _data_file(backup_dir, entry)
+        if not os.path.isfile(data_file):
+            problems.append(f"{env_name}: {data_file} is missing")
+            continue
+        if _sha256(data_file) != entry["sha256"]:
+            problems.append(f"{env_name}: checksum mismatch")
+            continue
+        heads = _read_heads(os.path.dirname(data_file), env_name, list(entry["chains"]))
+        for project, recorded in entry["chains"].items():
+            # Equal heads include an equal anchor verdict: a chain anchored at
+            # backup time still matches its anchor in the copy.
+            if heads.get(project) != recorded:
+                problems.append(f"{env_name}/{project}: chain head differs from the manifest")
+    return {
+        "id": manifest["id"],
+        "valid": not problems,
+        "environments": len(manifest["environments"]),
+        "chains": sum(len(e["chains"]) for e in manifest["environments"].values()),
+        "unanchored": sorted(
+            f"{env_name}/{project}"
+            for env_name, entry in manifest["environments"].items()
+            for project, head in entry["chains"].items()
+            if head["last_index"] >= 0 and not head["anchored"]
+        ),
+        "problems": problems,
+    }
+
+
+def restore(backup_dir: str, target: str, log: Callable[[str], None] = print) -> int:
+    """Assemble a verified backup into the empty projects directory ``target``."""
+    report = verify(backup_dir)
+    if not report["valid"]:
+        raise RuntimeError("backup does not verify: " + "; ".join(report["problems"]))
+    if os.path.isdir(target) and os.listdir(target):
+        raise RuntimeError(f"{target} is not empty")
+    manifest = load_manifest(backup_dir)
+    for env_name, entry in manifest["environments"].items():
+        data_dir = os.path.join(target, env_name, _DB_FILE)
+        os.makedirs(data_dir)
+        shutil.copyfile(_data_file(backup_dir, entry), os.path.join(data_dir, _DATA_FILE))
+        log(f"restored  {env_name}")
+    return len(manifest["environments"])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Back up, verify and restore the vault's LMDB stores.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="copy every environment into a new backup under DEST")
+    create.add_argument("dest")
+    create.add_argument("--incremental", action="store_true",
+                        help="copy only environments changed since the newest backup in DEST")
+    create.add_argument("--workers", type=int, help="environments copied at once (VHV_BACKUP_WORKERS)")
+    check = sub.add_parser("verify", help="check a backup's signature, checksums and chain heads")
+    check.add_argument("backup_dir")
+    put_back = sub.add_parser("restore", help="rebuild a projects directory from a backup")
+    put_back.add_argument("backup_dir")
+    put_back.add_argument("target")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        manifest = backup(args.dest, incremental=args.incremental, workers=args.workers)
+        print(f"backup {manifest['id']}: {len(manifest['copied'])} of "
+              f"{len(manifest['environments'])} environment(s) copied")
+        return 0
+    if args.command == "verify":
+        report = verify(args.backup_dir)
+        for problem in report["problems"]:
+            print(f"  {problem}")
+        print(f"backup {report['id']}: {report['environments']} environment(s), {report['chains']} chain(s), "
+              f"{len(report['unanchored'])} not anchored - {'OK' if report['valid'] else 'FAILED'}")
+        return 0 if report["valid"] else 1
+    restored = restore(args.backup_dir, args.target)
+    print(f"{restored} environment(s) restored into {args.target}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
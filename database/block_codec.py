@@ -0,0 +1,520 @@
+"""
+database/block_codec.py — Versioned binary encoding of chain blocks
+===================================================================
+Blocks used to be stored as ``json.dumps(block.to_dict())``. Every digest in
+them (hash, previous_hash, merkle_root, the HMAC signature) is a 64-character
+hex string, so a third of a typical block was hex doubling 32 bytes, and every
+scan re-parsed all of it.
+
+``encode_block`` writes format version 1:
+
+    magic 0xB7 · version · flags · varint index
+    timestamp · hash · previous_hash · merkle_root · signature · nonce
+    device_id · protection_hash
+    varint length + data (compact JSON, opaque to the codec)
+    [varint length + JSON object of anything else]      if FLAG_EXTRAS
+
+A data block from ``BlockFactory`` has a float timestamp, four SHA-256 digests
+and a 16-byte nonce. With ``FLAG_FIXED`` those six fields are one fixed-width
+struct: a double, four 32-byte digests and 16 bytes. Any other block stores its
+timestamp as a double or a zigzag varint.
+
+device_id and protection_hash, and any field outside the fixed struct, are a tag
+byte and a body. The body is one of:
+
+- nothing;
+- 32 raw bytes for a lowercase SHA-256 hex digest;
+- length-prefixed raw bytes for other lowercase hex;
+- length-prefixed UTF-8.
+
+A value the layout cannot represent exactly goes to the extras section untouched.
+That covers a string timestamp, a non-string hash, or a key that
+``Block.to_dict`` does not have. ``decode_block`` therefore returns exactly the
+strings that were stored. The block hash is computed over those text fields, so
+it is the same in either format.
+
+Chain-level work (integrity walks, notarization, Merkle proofs, listings) only
+needs headers, so the vault stores a binary block split in two. With
+``FLAG_SPLIT`` the data section is left out and the header holds no payload at
+all; the data goes under ``payload_{merkle_root}`` in the same store, where a
+header scan never touches its pages (``storage_entries``). The Merkle root the
+header carries still verifies the payload on demand. A block without a fixed
+header (genesis has no Merkle root) keeps its data inline.
+
+``decode_block`` reads both formats; a JSON block starts with ``{``, never with
+the magic byte. New blocks are written in ``VHV_BLOCK_FORMAT`` (``binary``, the
+default, or ``json``). Existing chains are converted in place, block by block,
+while the vault runs:
+
+    python -m database.block_codec migrate                 every chain to binary
+    python -m database.block_codec migrate --to json       back to JSON
+    python -m database.block_codec migrate --dry-run       count, change nothing
+"""
+
+import argparse
+import json
+import os
+import struct
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MAGIC = 0xB7
+_MAGIC_BYTE = bytes((MAGIC,))
+VERSION = 1
+FORMATS = ("binary", "json")
+
+FLAG_PROTECTED = 0x01
+FLAG_FLOAT_TIMESTAMP = 0x02
+FLAG_EXTRAS = 0x04
+FLAG_FIXED = 0x08
+FLAG_SPLIT = 0x10
+
+PAYLOAD_PREFIX = b"payload_"
+
+_TAG_NONE, _TAG_DIGEST, _TAG_HEX, _TAG_TEXT = range(4)
+
+# Text fields in encoding order; ``Block.to_dict`` key order is rebuilt on decode.
+_TEXT_FIELDS = ("hash", "previous_hash", "merkle_root", "signature", "nonce", "device_id", "protection_hash")
+_BLOCK_KEYS = ("index", "timestamp", "data", "previous_hash", "signature", "is_protected",
+               "nonce", "device_id", "hash", "merkle_root", "protection_hash")
+_DOUBLE = struct.Struct(">d")
+# FLAG_FIXED: a float timestamp, four SHA-256 digests and a 16-byte nonce, as
+# BlockFactory writes every data block, in one fixed-width struct.
+_FIXED_FIELDS = ("hash", "previous_hash", "merkle_root", "signature", "nonce")
+_FIXED = struct.Struct(">d32s32s32s32s16s")
+_loads = json.loads
+
+
+def block_format() -> str:
+    fmt = os.getenv("VHV_BLOCK_FORMAT", "binary").strip().lower()
+    return fmt if fmt in FORMATS else "binary"
+
+
+def is_binary(value: bytes) -> bool:
+    return bool(value) and value[0] == MAGIC
+
+
+# ── varints ──────────────────────────────────────────────
+def _put_varint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    n, shift = byte & 0x7F, 7
+    while True:
+        pos += 1
+        byte = buf[pos]
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos + 1
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n // 2 if not n & 1 else -(n + 1) // 2
+
+
+# ── text fields ──────────────────────────────────────────
+def _hex_bytes(text: str) -> Optional[bytes]:
+    """The bytes ``text`` is the lowercase hex of, or None if it is anything else."""
+    if len(text) % 2:
+        return None
+    try:
+        raw = bytes.fromhex(text)
+    except ValueError:
+        return None
+    return raw if raw.hex() == text else None
+
+
+def _put_text(out: bytearray, value: Optional[str]) -> None:
+    if value is None:
+        out.append(_TAG_NONE)
+        return
+    raw = _hex_bytes(value)
+    if raw is not None and len(raw) == 32:
+        out.append(_TAG_DIGEST)
+        out += raw
+    elif raw is not None:
+        out.append(_TAG_HEX)
+        _put_varint(out, len(raw))
+        out += raw
+    else:
+        encoded = value.encode("utf-8")
+        out.append(_TAG_TEXT)
+        _put_varint(out, len(encoded))
+        out += encoded
+
+
+def _get_text(buf, pos: int) -> Tuple[Optional[str], int]:
+    tag = buf[pos]
+    if tag == _TAG_DIGEST:
+        return buf[pos + 1:pos + 33].hex(), pos + 33
+    if tag == _TAG_NONE:
+        return None, pos + 1
+    size, pos = _get_varint(buf, pos + 1)
+    end = pos + size
+    if tag == _TAG_HEX:
+        return buf[pos:end].hex(), end
+    if tag == _TAG_TEXT:
+        return str(buf[pos:end], "utf-8"), end
+    raise ValueError(f"unknown field tag {tag}")
+
+
+# ── blocks ───────────────────────────────────────────────
+def encode_block(block_data: Dict[str, Any], split: bool = False) -> bytes:
+    """
+    ``block_data`` (a ``Block.to_dict()``) in binary format version 1.
+
+    ``split=True`` leaves the data section out of a block whose fixed header
+    carries a Merkle root (``FLAG_SPLIT``). Its data is then stored on its own,
+    as ``encode_payload(data)`` under ``payload_key(merkle_root)``.
+    """
+    extras = {k: v for k, v in block_data.items() if k not in _BLOCK_KEYS}
+    index = block_data.get("index")
+    if not (type(index) is int and index >= 0):
+        extras["index"], index = index, 0
+    timestamp = block_data.get("timestamp")
+    if type(timestamp) not in (int, float):
+        extras["timestamp"], timestamp = timestamp, 0
+    is_protected = block_data.get("is_protected", False)
+    if type(is_protected) is not bool:
+        extras["is_protected"], is_protected = is_protected, False
+    texts = []
+    for name in _TEXT_FIELDS:
+        value = block_data.get(name)
+        if value is not None and not isinstance(value, str):
+            extras[name], value = value, None
+        texts.append(value)
+
+    fixed = None
+    if type(timestamp) is float:
+        fixed = [_hex_bytes(value) if value is not None else None for value in texts[:5]]
+        if [len(raw) if raw is not None else 0 for raw in fixed] != [32, 32, 32, 32, 16]:
+            fixed = None
+
+    split = bool(split and fixed)
+    flags = ((FLAG_PROTECTED if is_protected else 0)
+             | (FLAG_FLOAT_TIMESTAMP if type(timestamp) is float else 0)
+             | (FLAG_EXTRAS if extras else 0)
+             | (FLAG_FIXED if fixed else 0)
+             | (FLAG_SPLIT if split else 0))
+    out = bytearray((MAGIC, VERSION, flags))
+    _put_varint(out, index)
+    if fixed:
+        out += _FIXED.pack(timestamp, *fixed)
+        texts = texts[5:]
+    elif type(timestamp) is float:
+        out += _DOUBLE.pack(timestamp)
+    else:
+        _put_varint(out, _zigzag(timestamp))
+    for value in texts:
+        _put_text(out, value)
+    if not split:
+        data = encode_payload(block_data.get("data"))
+        _put_varint(out, len(data))
+        out += data
+    if extras:
+        extra = json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _put_varint(out, len(extra))
+        out += extra
+    return bytes(out)
+
+
+def _decode_binary(buf) -> Tuple[Dict[str, Any], int, int]:
+    """The block with ``data`` still None, and where its data section starts and ends."""
+    if buf[1] != VERSION:
+        raise ValueError(f"unsupported block format version {buf[1]}")
+    flags = buf[2]
+    index, pos = _get_varint(buf, 3)
+    if flags & FLAG_FIXED:
+        timestamp, block_hash, previous_hash, merkle_root, signature, nonce = _FIXED.unpack_from(buf, pos)
+        block_hash, previous_hash, merkle_root = block_hash.hex(), previous_hash.hex(), merkle_root.hex()
+        signature, nonce = signature.hex(), nonce.hex()
+        pos += _FIXED.size
+    else:
+        if flags & FLAG_FLOAT_TIMESTAMP:
+            timestamp = _DOUBLE.unpack_from(buf, pos)[0]
+            pos += 8
+        else:
+            raw, pos = _get_varint(buf, pos)
+            timestamp = _unzigzag(raw)
+        block_hash, pos = _get_text(buf, pos)
+        previous_hash, pos = _get_text(buf, pos)
+        merkle_root, pos = _get_text(buf, pos)
+        signature, pos = _get_text(buf, pos)
+        nonce, pos = _get_text(buf, pos)
+    device_id, pos = _get_text(buf, pos)
+    protection_hash, pos = _get_text(buf, pos)
+    if flags & FLAG_SPLIT:
+        start = end = pos
+    else:
+        size, start = _get_varint(buf, pos)
+        end = pos = start + size
+
+    block = {
+        "index": index,
+        "timestamp": timestamp,
+        "data": None,
+        "previous_hash": previous_hash,
+        "signature": signature,
+        "is_protected": bool(flags & FLAG_PROTECTED),
+        "nonce": nonce,
+        "device_id": device_id,
+        "hash": block_hash,
+        "merkle_root": merkle_root,
+        "protection_hash": protection_hash,
+    }
+    if flags & FLAG_EXTRAS:
+        size, pos = _get_varint(buf, pos)
+        block.update(_loads(bytes(buf[pos:pos + size])))
+    return block, start, end
+
+
+def is_split(value) -> bool:
+    """Whether the stored block keeps its data under ``payload_key(merkle_root)``."""
+    return value[:1] == _MAGIC_BYTE and bool(value[2] & FLAG_SPLIT)
+
+
+def payload_key(merkle_root: str) -> bytes:
+    return PAYLOAD_PREFIX + merkle_root.encode("utf-8")
+
+
+_ROOT_OFFSET = 8 + 32 + 32  # timestamp, hash and previous_hash precede it in the fixed struct
+
+
+def split_payload_key(value) -> Optional[bytes]:
+    """Where a split block's payload is stored, read straight off its header; None if not split."""
+    if not is_split(value):
+        return None
+    _, pos = _get_varint(value, 3)
+    pos += _ROOT_OFFSET
+    return payload_key(bytes(value[pos:pos + 32]).hex())
+
+
+def decode_block(value: bytes, payload: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    A stored block, binary or JSON, as the dict ``Block.to_dict`` produced. A
+    split block needs its ``payload``, the value under ``payload_key``.
+    """
+    if value[:1] != _MAGIC_BYTE:
+        return _loads(bytes(value))
+    block, start, end = _decode_binary(value)
+    if block_flags(value) & FLAG_SPLIT:
+        if payload is None:
+            raise ValueError(f"payload of block {block['index']} is missing")
+        block["data"] = decode_payload(payload)
+    else:
+        block["data"] = _loads(bytes(value[start:end]))
+    return block
+
+
+def block_flags(value) -> int:
+    return value[2] if value[:1] == _MAGIC_BYTE else 0
+
+
+def decode_header(value) -> Tuple[Dict[str, Any], Optional[memoryview]]:
+    """
+    Every field of a stored block except ``data``, and the undecoded data section.
+
+    For a binary block the data section is a memoryview over ``value``, valid for
+    as long as ``value`` is; pass it to ``decode_payload`` when it is needed. A
+    split block has no data section here, so its payload is None; its data is
+    under ``payload_key(header["merkle_root"])``. A JSON block has to be parsed
+    whole, so its header already holds ``data`` and the payload is None.
+    """
+    if value[:1] != _MAGIC_BYTE:
+        return _loads(bytes(value)), None
+    block, start, end = _decode_binary(value)
+    del block["data"]
+    if block_flags(value) & FLAG_SPLIT:
+        return block, None
+    return block, memoryview(value)[start:end]
+
+
+def encode_payload(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_payload(payload) -> Any:
+    """A block's ``data`` from its data section or its stored payload."""
+    return _loads(bytes(payload))
+
+
+def encode_for_storage(block_data: Dict[str, Any], fmt: Optional[str] = None) -> bytes:
+    """The block as one self-contained value: JSON, or binary with its data inline."""
+    if (fmt or block_format()) == "json":
+        return json.dumps(block_data, ensure_ascii=False).encode("utf-8")
+    return encode_block(block_data)
+
+
+def storage_entries(block_data: Dict[str, Any], fmt: Optional[str] = None) -> Tuple[bytes, Dict[bytes, bytes]]:
+    """
+    The value for the block's key, and the other entries the block needs.
+
+    In binary format a block with a Merkle root is stored split: the header under
+    the block key and the data as ``{payload_key(merkle_root): payload}``. Every
+    other block is one self-contained value and needs nothing else.
+    """
+    if (fmt or block_format()) == "json":
+        return encode_for_storage(block_data, "json"), {}
+    value = encode_block(block_data, split=True)
+    if not block_flags(value) & FLAG_SPLIT:
+        return value, {}
+    return value, {payload_key(block_data["merkle_root"]): encode_payload(block_data.get("data"))}
+
+
+# ──────────────────────────────────────────────
+# IN-PLACE MIGRATION
+# ──────────────────────────────────────────────
+
+def _round_trips(block_data: Dict[str, Any], encoded: bytes, entries: Dict[bytes, bytes]) -> bool:
+    def normalized(block: Dict[str, Any]) -> Dict[str, Any]:
+        # Absent and None read the same, and a block without is_protected is unprotected.
+        return {"is_protected": False, **{k: v for k, v in block.items() if v is not None}}
+    payload = next(iter(entries.values()), None)
+    return normalized(decode_block(encoded, payload)) == normalized(block_data)
+
+
+def _in_format(value: bytes, to: str) -> bool:
+    if to == "json":
+        return not is_binary(value)
+    # Binary means split wherever the header has a Merkle root to file the payload under.
+    return is_binary(value) and (is_split(value) or not block_flags(value) & FLAG_FIXED)
+
+
+def _drop_orphan_payloads(project_name: str, manager) -> int:
+    """Delete payloads no split header refers to any more; returns how many."""
+    from database.storage import read_transaction
+
+    def txn_block(txn):
+        referenced, payload_keys = set(), []
+        cursor = txn.cursor()
+        for key, value in cursor:
+            if key[:1].isdigit():
+                if is_split(value):
+                    referenced.add(split_payload_key(value))
+            elif key.startswith(PAYLOAD_PREFIX):
+                payload_keys.append(bytes(key))
+        orphans = [key for key in payload_keys if key not in referenced]
+        for key in orphans:
+            txn.delete(key)
+        return len(orphans)
+
+    with read_transaction(project_name, manager) as txn:
+        cursor = txn.cursor()
+        if not cursor.set_range(PAYLOAD_PREFIX) or not bytes(cursor.key()).startswith(PAYLOAD_PREFIX):
+            return 0
+    return manager.run_write_transaction(project_name, txn_block)
+
+
+def migrate_chain(project_name: str, to: str = "binary", manager=None, batch_size: int = 500,
+                  dry_run: bool = False) -> Dict[str, int]:
+    """
+    Rewrite one chain's blocks in ``to`` format, ``batch_size`` blocks per write.
+
+    A block is only rewritten once its new encoding decodes back to the same
+    dict; one that does not is left as it is and counted as ``kept``. Moving to
+    binary splits payloads out of the headers (``storage_entries``); moving to
+    JSON folds them back in and then deletes the payloads left behind.
+    """
+    from database.storage import default_db_manager, read_transaction
+    manager = manager or default_db_manager
+    totals = {"blocks": 0, "converted": 0, "kept": 0, "bytes_before": 0, "bytes_after": 0}
+    start = b"0"
+    while True:
+        pending = []
+        with read_transaction(project_name, manager) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(start):
+                for key, value in cursor:
+                    if not key[:1].isdigit() or len(pending) >= batch_size:
+                        break
+                    payload = None
+                    if is_split(value):
+                        payload = txn.get(split_payload_key(value))
+                    pending.append((bytes(key), bytes(value), payload and bytes(payload)))
+        if not pending:
+            if to == "json" and not dry_run:
+                _drop_orphan_payloads(project_name, manager)
+            return totals
+
+        rewrites = []
+        for key, value, payload in pending:
+            stored = len(value) + len(payload or b"")
+            totals["blocks"] += 1
+            totals["bytes_before"] += stored
+            if _in_format(value, to):
+                totals["bytes_after"] += stored
+                continue
+            try:
+                block_data = decode_block(value, payload)
+                encoded, entries = storage_entries(block_data, to)
+                ok = _round_trips(block_data, encoded, entries)
+            except Exception:
+                ok = False
+            if not ok:
+                totals["kept"] += 1
+                totals["bytes_after"] += stored
+                continue
+            rewrites.append((key, value, encoded, entries))
+            totals["bytes_after"] += len(encoded) + sum(len(v) for v in entries.values())
+
+        if rewrites and not dry_run:
+            def txn_block(txn, rewrites=rewrites):
+                for key, before, after, entries in rewrites:
+                    # A block is never rewritten by the vault, but never clobber one that was.
+                    if txn.get(key) != before:
+                        continue
+                    if any(txn.get(entry_key) not in (None, entry) for entry_key, entry in entries.items()):
+                        continue  # another block's payload holds this Merkle root; stay as is
+                    for entry_key, entry in entries.items():
+                        txn.put(entry_key, entry)
+                    txn.put(key, after)
+            manager.run_write_transaction(project_name, txn_block)
+        totals["converted"] += len(rewrites)
+        start = pending[-1][0] + b"\x00"
+
+
+def migrate(to: str = "binary", manager=None, dry_run: bool = False,
+            log: Callable[[str], None] = print) -> Dict[str, int]:
+    """Convert every chain the manager lists; returns the summed ``migrate_chain`` totals."""
+    from database.storage import default_db_manager
+    if to not in FORMATS:
+        raise ValueError(f"block format must be one of {', '.join(FORMATS)}, not {to!r}")
+    manager = manager or default_db_manager
+    totals = {"chains": 0, "blocks": 0, "converted": 0, "kept": 0, "bytes_before": 0, "bytes_after": 0}
+    for project_name in manager.list_projects():
+        chain = migrate_chain(project_name, to, manager, dry_run=dry_run)
+        totals["chains"] += 1
+        for key, value in chain.items():
+            totals[key] += value
+        if chain["converted"] or chain["kept"]:
+            log(f"  {project_name}: {chain['converted']} converted, {chain['kept']} kept")
+    return totals
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Convert stored chain blocks between JSON and binary.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("migrate", help="rewrite every chain's blocks in one format")
+    run.add_argument("--to", choices=FORMATS, default="binary")
+    run.add_argument("--dry-run", action="store_true", help="count what would change, write nothing")
+    args = parser.parse_args(argv)
+
+    totals = migrate(args.to, dry_run=args.dry_run)
+    verb = "would convert" if args.dry_run else "converted"
+    print(f"{totals['chains']} chains, {totals['blocks']} blocks: {verb} {totals['converted']}, "
+          f"kept {totals['kept']}; {totals['bytes_before']} -> {totals['bytes_after']} bytes")
+
+
+if __name__ == "__main__":
+    main()
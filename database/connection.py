@@ -1,15 +1,43 @@
 import os
 import re
+import shutil
 import threading
+import time
 import lmdb
 import contextvars
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
 
 active_txn = contextvars.ContextVar("active_txn", default=None)
 active_project = contextvars.ContextVar("active_project", default=None)
 # Callbacks that must observe durable state; run by the unit of work after commit.
 after_commit_hooks = contextvars.ContextVar("after_commit_hooks", default=None)
 
+# The project registry: one small environment per projects directory, shared
+# by every worker. Keys are ``project_{name}``; the generation counts changes.
+REGISTRY_DIR = "__registry__"
+_REGISTRY_FILE = "registry.lmdb"
+_REGISTRY_MAP_SIZE = 256 * 1024 * 1024
+_REGISTRY_GENERATION = b"meta_registry_generation"
+_REGISTRY_PREFIX = b"project_"
+
+
+# Stores under the projects directory that are not patient chains, besides the
+# internal ``__*`` ones. They are listed with the chains but never share their
+# environment: a multi-MB upload must not take the chains' writer lock.
+ATTACHMENT_PROJECT = "attachments"
+NON_CHAIN_PROJECTS = frozenset({ATTACHMENT_PROJECT})
+
+
+def is_chain(project_name: str) -> bool:
+    """True for a patient chain store, False for internal and blob stores."""
+    return not project_name.startswith("__") and project_name not in NON_CHAIN_PROJECTS
+
+
+def drop_registry(base_dir: str) -> None:
+    """Forget a projects directory's registry; the next manager rebuilds it from disk."""
+    shutil.rmtree(os.path.join(base_dir, REGISTRY_DIR), ignore_errors=True)
+
 
 def run_after_commit(callback) -> bool:
     """
@@ -25,24 +53,208 @@ def run_after_commit(callback) -> bool:
     return True
 
 
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+_SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value: Optional[str], default: int) -> int:
+    """``"2G"``, ``"512M"`` or a plain byte count; ``default`` if unset or malformed."""
+    if not value or not value.strip():
+        return default
+    clean = value.strip().upper()
+    try:
+        if clean[-1] in _SIZE_UNITS:
+            return int(float(clean[:-1]) * _SIZE_UNITS[clean[-1]])
+        return int(clean)
+    except ValueError:
+        return default
+
+
+class _EnvSlot:
+    __slots__ = ("key", "env", "psize", "refs", "closing", "resizing", "grow_pending", "resizes", "dbs")
+
+    def __init__(self, key: str, env: lmdb.Environment):
+        self.key = key
+        self.env = env
+        self.psize = env.stat()["psize"]
+        self.refs = 0
+        self.closing = False
+        self.resizing = False
+        self.grow_pending = False
+        self.resizes = 0
+        self.dbs: Dict[str, Any] = {}           # named sub-database handles, if any
+
+
+class TrackedTransaction:
+    """
+    An ``lmdb.Transaction`` that hands its environment back to the pool when it
+    commits, aborts or leaves its ``with`` block. The data methods are the raw
+    bound methods, so reads and writes cost nothing extra.
+    """
+
+    def __init__(self, txn: lmdb.Transaction, release: Callable[[], None],
+                 env: Optional[lmdb.Environment] = None, write: bool = False):
+        self._txn = txn
+        self._release = release
+        self.env = env
+        self.write = write
+        self.get = txn.get
+        self.put = txn.put
+        self.delete = txn.delete
+        self.cursor = txn.cursor
+        self.replace = txn.replace
+        self.pop = txn.pop
+        self.stat = txn.stat
+        self.drop = txn.drop
+        self.id = txn.id
+
+    @property
+    def raw(self) -> lmdb.Transaction:
+        return self._txn
+
+    def _done(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def commit(self) -> None:
+        try:
+            self._txn.commit()
+        finally:
+            self._done()
+
+    def abort(self) -> None:
+        try:
+            self._txn.abort()
+        finally:
+            self._done()
+
+    def __enter__(self) -> "TrackedTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def __del__(self):
+        # An abandoned transaction is aborted by lmdb; its reference must go too.
+        try:
+            self._done()
+        except Exception:
+            pass
+
+
+class PooledEnvironment:
+    """
+    What ``open_db`` returns: a handle on a project's environment, not the
+    environment itself. Every ``begin()`` checks the environment out of the pool,
+    reopening it if it was evicted, so a caller may keep the handle for as long as
+    it likes. Other ``lmdb.Environment`` methods are forwarded the same way.
+    """
+
+    __slots__ = ("_manager", "project")
+
+    def __init__(self, manager: "LMDBConnectionManager", project: str):
+        self._manager = manager
+        self.project = project
+
+    def begin(self, **kwargs) -> TrackedTransaction:
+        return self._manager._begin(self.project, **kwargs)
+
+    def __getattr__(self, name: str):
+        getattr(lmdb.Environment, name)            # AttributeError for unknown names
+
+        def call(*args, **kwargs):
+            if isinstance(kwargs.get("txn"), TrackedTransaction):
+                kwargs["txn"] = kwargs["txn"].raw
+            slot = self._manager._acquire(self.project)
+            try:
+                return getattr(slot.env, name)(*args, **kwargs)
+            finally:
+                self._manager._release(slot)
+        return call
+
+
 class LMDBConnectionManager:
     """
     Manages process-wide LMDB Environments.
     Provides thread-safe access, environment caching, and automatic resizing on MapFullError.
+
+    Open environments form an LRU pool of at most ``VHV_LMDB_MAX_OPEN_ENVS``
+    (default 256). Each one is a 2 GB mapping with its own lock file and reader
+    table, so a vault with thousands of patients used to exhaust file descriptors
+    and address space. Every transaction holds a reference on its environment.
+    Only idle environments are evicted, and ``close_db`` waits for in-flight
+    transactions before closing. When every environment is busy, the pool grows
+    past the cap and shrinks again as they are released.
+    ``VHV_LMDB_MAX_READERS`` / ``VHV_LMDB_MAX_SPARE_TXNS`` size each reader table.
+
+    Maps grow in place with ``set_mapsize``, by ``VHV_LMDB_GROWTH_FACTOR``
+    (default 2) up to ``VHV_LMDB_MAP_SIZE_MAX`` (default 1T). Growing used to mean
+    closing the environment under its readers and adding 100 MB, five times at
+    most. LMDB only allows a resize while the process has no transaction open
+    on the environment, so the pool's reference count is the gate. A resize
+    waits for the environment to go idle and holds off new transactions.
+    A write that leaves the map above ``VHV_LMDB_HIGH_WATER`` (default 0.8)
+    marks it to grow the next time it is idle, before a write can fail. A map
+    grown by another worker is adopted on ``MapResizedError``.
+
+    Which projects exist is answered from an in-memory registry, not the disk.
+    ``project_exists`` used to stat the projects directory on every call (and
+    ``get_project_path`` to ``makedirs`` it), several times per request, and
+    ``list_projects`` walked it. The registry is built from the directory once
+    per vault and kept in the ``__registry__`` environment, which every worker
+    shares. ``create_project`` (or opening a new project) registers a name and
+    bumps its generation; a worker re-reads the list when the generation moved.
+    ``reset_project`` clears a chain but keeps its directory, so the name stays
+    registered, as it always stayed listed. Tools that add or remove project
+    directories with the vault stopped call ``drop_registry``.
+
+    This is the ``per_project`` layout; database/lmdb_layout.py has the other.
     """
-    def __init__(self, base_dir: str, default_map_size: int = 2 * 1024 * 1024 * 1024):
+
+    layout = "per_project"
+
+    def __init__(self, base_dir: str, default_map_size: int = 2 * 1024 * 1024 * 1024,
+                 max_open: Optional[int] = None, max_readers: Optional[int] = None,
+                 max_spare_txns: Optional[int] = None, growth_factor: Optional[float] = None,
+                 high_water: Optional[float] = None, max_map_size: Optional[int] = None):
         self.base_dir = base_dir
         self.default_map_size = default_map_size
-        self._envs: Dict[str, lmdb.Environment] = {}
+        self.max_open = _env_int("VHV_LMDB_MAX_OPEN_ENVS", 256) if max_open is None else max_open
+        self.max_readers = _env_int("VHV_LMDB_MAX_READERS", 126) if max_readers is None else max_readers
+        self.max_spare_txns = (_env_int("VHV_LMDB_MAX_SPARE_TXNS", 1)
+                               if max_spare_txns is None else max_spare_txns)
+        self.growth_factor = (float(os.getenv("VHV_LMDB_GROWTH_FACTOR", "2"))
+                              if growth_factor is None else growth_factor)
+        self.high_water = float(os.getenv("VHV_LMDB_HIGH_WATER", "0.8")) if high_water is None else high_water
+        self.max_map_size = (parse_size(os.getenv("VHV_LMDB_MAP_SIZE_MAX"), 1024 ** 4)
+                             if max_map_size is None else max_map_size)
+        self.group_commit_enabled = os.getenv("VHV_LMDB_GROUP_COMMIT", "true").lower() in ("true", "1", "yes")
+        self._group_commit = None
+        self._envs: "OrderedDict[str, _EnvSlot]" = OrderedDict()
         self._map_sizes: Dict[str, int] = {}
-        self._lock = threading.Lock()
+        self._evicted: Set[str] = set()
+        self._lock = threading.Condition()
+        self._registry_env: Optional[lmdb.Environment] = None
+        self._registry_lock = threading.Lock()
+        self._projects: frozenset = frozenset()
+        self._project_list: List[str] = []
+        self._registry_generation = -1
+        self._stats = {"hits": 0, "opens": 0, "reopens": 0, "evictions": 0, "forced_closes": 0,
+                       "over_capacity": 0, "open_ms_total": 0.0, "open_ms_max": 0.0,
+                       "resizes": 0, "high_water_resizes": 0, "adopted_resizes": 0, "resize_failures": 0}
 
     def ensure_projects_dir(self) -> str:
         os.makedirs(self.base_dir, exist_ok=True)
         return self.base_dir
 
     def get_project_path(self, project_name: str) -> str:
-        self.ensure_projects_dir()
         safe_name = self._safe_project_name(project_name)
         return os.path.join(self.base_dir, safe_name)
 
@@ -63,77 +275,336 @@ class LMDBConnectionManager:
         return project_name
 
     def get_db_path(self, project_name: str) -> str:
+        # Only called to open an environment, so the makedirs is not per request.
         project_path = self.get_project_path(project_name)
         os.makedirs(project_path, exist_ok=True)
+        self._register(project_name)
         return os.path.join(project_path, "chaindata.lmdb")
 
     def project_exists(self, project_name: str) -> bool:
-        return os.path.exists(self.get_project_path(project_name))
+        if project_name in self._projects:
+            return True
+        key = _REGISTRY_PREFIX + self._safe_project_name(project_name).encode("utf-8")
+        with self._registry().begin() as txn:
+            if txn.get(key) is None:
+                return False
+        with self._registry_lock:
+            self._projects = self._projects | {project_name}   # registered by another worker
+        return True
 
     def create_project(self, project_name: str) -> bool:
-        project_path = self.get_project_path(project_name)
-        if not os.path.exists(project_path):
-            os.makedirs(project_path)
-            return True
-        return False
+        if self.project_exists(project_name):
+            return False
+        os.makedirs(self.get_project_path(project_name), exist_ok=True)
+        return self._register(project_name)
 
     def list_projects(self) -> List[str]:
-        self.ensure_projects_dir()
-        return [
-            d for d in os.listdir(self.base_dir)
-            if os.path.isdir(os.path.join(self.base_dir, d))
-            and not d.startswith("__")
-        ]
-
-    def open_db(self, project_name: str) -> lmdb.Environment:
-        with self._lock:
-            if project_name not in self._envs:
-                path = self.get_db_path(project_name)
-                if project_name not in self._map_sizes:
-                    self._map_sizes[project_name] = self.default_map_size
-
-                while True:
-                    try:
-                        self._envs[project_name] = lmdb.open(path, map_size=self._map_sizes[project_name], subdir=True)
+        with self._registry().begin() as txn:
+            generation = int(txn.get(_REGISTRY_GENERATION))
+            if generation == self._registry_generation:
+                return list(self._project_list)
+            names = []
+            cursor = txn.cursor()
+            if cursor.set_range(_REGISTRY_PREFIX):
+                for key in cursor.iternext(values=False):
+                    if not key.startswith(_REGISTRY_PREFIX):
                         break
-                    except lmdb.MapFullError:
-                        self._map_sizes[project_name] += 100 * 1024 * 1024
-            return self._envs[project_name]
+                    names.append(key[len(_REGISTRY_PREFIX):].decode("utf-8"))
+        project_list = [name for name in names if not name.startswith("__")]
+        with self._registry_lock:
+            if generation > self._registry_generation:
+                self._projects = frozenset(names)
+                self._project_list = project_list
+                self._registry_generation = generation
+        return list(project_list)
+
+    # ── project registry ─────────────────────────────────────
+    def _registry(self) -> lmdb.Environment:
+        env = self._registry_env
+        if env is not None:
+            return env
+        with self._registry_lock:
+            if self._registry_env is None:
+                path = os.path.join(self.ensure_projects_dir(), REGISTRY_DIR, _REGISTRY_FILE)
+                os.makedirs(path, exist_ok=True)
+                env = lmdb.open(path, map_size=_REGISTRY_MAP_SIZE, subdir=True,
+                                max_readers=self.max_readers, max_spare_txns=self.max_spare_txns)
+                with env.begin(write=True) as txn:
+                    if txn.get(_REGISTRY_GENERATION) is None:
+                        # First use of this directory: register what is already there.
+                        for name in sorted(os.listdir(self.base_dir)):
+                            if name != REGISTRY_DIR and os.path.isdir(os.path.join(self.base_dir, name)):
+                                txn.put(_REGISTRY_PREFIX + name.encode("utf-8"), b"")
+                        txn.put(_REGISTRY_GENERATION, b"1")
+                self._registry_env = env
+            return self._registry_env
 
-    def close_db(self, project_name: str) -> None:
+    def _register(self, project_name: str) -> bool:
+        """Add ``project_name`` to the registry; False if it was there already."""
+        if project_name in self._projects:
+            return False
+        key = _REGISTRY_PREFIX + project_name.encode("utf-8")
+        with self._registry().begin(write=True) as txn:
+            added = txn.get(key) is None
+            if added:
+                txn.put(key, b"")
+                txn.put(_REGISTRY_GENERATION, str(int(txn.get(_REGISTRY_GENERATION)) + 1).encode("ascii"))
+        with self._registry_lock:
+            self._projects = self._projects | {project_name}
+        return added
+
+    # ── environment pool ─────────────────────────────────────
+    def _env_key(self, project_name: str) -> str:
+        """The pool slot (and directory) holding ``project_name``: its own, here."""
+        return project_name
+
+    def _env_options(self, env_key: str) -> dict:
+        return {}
+
+    def _txn_options(self, slot: _EnvSlot, project_name: str, kwargs: dict) -> dict:
+        """The ``env.begin`` arguments for a transaction on ``project_name``."""
+        return kwargs
+
+    def _open_env_locked(self, project_name: str) -> _EnvSlot:
+        path = self.get_db_path(project_name)
+        if project_name not in self._map_sizes:
+            self._map_sizes[project_name] = self.default_map_size
+        self._evict_idle_locked(self.max_open - 1)
+
+        started = time.perf_counter()
+        env = lmdb.open(path, map_size=self._map_sizes[project_name], subdir=True,
+                        max_readers=self.max_readers, max_spare_txns=self.max_spare_txns,
+                        **self._env_options(project_name))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # An existing file keeps the larger size it was last grown to.
+        self._map_sizes[project_name] = env.info()["map_size"]
+
+        self._stats["opens"] += 1
+        self._stats["open_ms_total"] += elapsed_ms
+        self._stats["open_ms_max"] = max(self._stats["open_ms_max"], elapsed_ms)
+        if project_name in self._evicted:
+            self._stats["reopens"] += 1
+        slot = self._envs[project_name] = _EnvSlot(project_name, env)
+        if self._above_high_water(slot):
+            self._grow_idle_locked(slot)
+        return slot
+
+    def _evict_idle_locked(self, keep: int) -> None:
+        while len(self._envs) > max(keep, 0):
+            victim = next((name for name, slot in self._envs.items()
+                           if slot.refs == 0 and not slot.closing and not slot.resizing), None)
+            if victim is None:
+                self._stats["over_capacity"] += 1
+                return
+            self._close_slot_locked(victim)
+            self._evicted.add(victim)
+            self._stats["evictions"] += 1
+
+    def _close_slot_locked(self, project_name: str) -> None:
+        slot = self._envs.pop(project_name)
+        try:
+            slot.env.close()
+        except Exception:
+            pass
+        self._lock.notify_all()
+
+    def _acquire(self, project_name: str) -> _EnvSlot:
+        project_name = self._env_key(project_name)
         with self._lock:
-            if project_name in self._envs:
-                try:
-                    self._envs[project_name].close()
-                except Exception:
-                    pass
-                del self._envs[project_name]
+            slot = self._envs.get(project_name)
+            while slot is not None and (slot.closing or slot.resizing):
+                self._lock.wait()
+                slot = self._envs.get(project_name)
+            if slot is None:
+                slot = self._open_env_locked(project_name)
+            else:
+                self._envs.move_to_end(project_name)
+                self._stats["hits"] += 1
+            slot.refs += 1
+            return slot
+
+    def _release(self, slot: _EnvSlot, wrote: bool = False) -> None:
+        with self._lock:
+            slot.refs -= 1
+            if wrote and not slot.grow_pending and not slot.closing and self._above_high_water(slot):
+                slot.grow_pending = True
+            if slot.refs == 0:
+                self._lock.notify_all()
+                if slot.grow_pending and not slot.resizing and not slot.closing:
+                    self._grow_idle_locked(slot)
+                if len(self._envs) > self.max_open:
+                    self._evict_idle_locked(self.max_open)
+
+    def _begin(self, project_name: str, **kwargs) -> TrackedTransaction:
+        while True:
+            slot = self._acquire(project_name)
+            try:
+                options = self._txn_options(slot, project_name, dict(kwargs))
+                txn = slot.env.begin(**options)
+            except lmdb.MapResizedError:
+                self._release(slot)
+                self._resize(project_name, adopt=True)
+                continue
+            except BaseException:
+                self._release(slot)
+                raise
+            write = options.get("write", False)
+            return TrackedTransaction(txn, lambda: self._release(slot, write), slot.env, write)
+
+    # ── map size ─────────────────────────────────────────────
+    def _usage_locked(self, slot: _EnvSlot) -> tuple:
+        info = slot.env.info()
+        return (info["last_pgno"] + 1) * slot.psize, info["map_size"]
+
+    def _above_high_water(self, slot: _EnvSlot) -> bool:
+        used, size = self._usage_locked(slot)
+        return used > size * self.high_water
+
+    def _next_map_size(self, current: int) -> Optional[int]:
+        target = min(int(current * self.growth_factor), self.max_map_size)
+        return target if target > current else None
+
+    def _set_map_size_locked(self, slot: _EnvSlot, size: int) -> None:
+        slot.env.set_mapsize(size)
+        self._map_sizes[slot.key] = slot.env.info()["map_size"]
+        slot.resizes += 1
+        self._stats["resizes"] += 1
+
+    def _grow_idle_locked(self, slot: _EnvSlot) -> None:
+        slot.grow_pending = False
+        target = self._next_map_size(slot.env.info()["map_size"])
+        if target is not None:
+            self._set_map_size_locked(slot, target)
+            self._stats["high_water_resizes"] += 1
+
+    def _resize(self, project_name: str, adopt: bool = False, timeout: float = 5.0) -> bool:
+        """
+        Grow ``project_name``'s map, or with ``adopt`` take the size another
+        process grew it to. The caller must hold no transaction on it. Returns
+        False if the map is at its ceiling or the environment never went idle.
+        """
+        env_key = self._env_key(project_name)
+        with self._lock:
+            slot = self._envs.get(env_key)
+            if slot is None or slot.closing:
+                if adopt:
+                    return True               # the next open maps the file as it is
+                target = self._next_map_size(self._map_sizes.get(env_key, self.default_map_size))
+                if target is not None:
+                    self._map_sizes[env_key] = target
+                return target is not None
+            if slot.resizing:
+                # Another thread is already resizing it; use its result.
+                self._lock.wait_for(lambda: not slot.resizing)
+                return True
+            slot.resizing = True
+            try:
+                if not self._lock.wait_for(lambda: slot.refs == 0, timeout):
+                    self._stats["resize_failures"] += 1
+                    return False
+                if adopt:
+                    self._set_map_size_locked(slot, 0)
+                    self._stats["adopted_resizes"] += 1
+                    return True
+                target = self._next_map_size(slot.env.info()["map_size"])
+                if target is None:
+                    self._stats["resize_failures"] += 1
+                    return False
+                self._set_map_size_locked(slot, target)
+                return True
+            finally:
+                slot.grow_pending = False
+                slot.resizing = False
+                self._lock.notify_all()
+
+    @property
+    def group_commit(self):
+        """The ``GroupCommitCoordinator`` batching this manager's writes (database/group_commit.py)."""
+        if self._group_commit is None:
+            from database.group_commit import GroupCommitCoordinator
+            with self._lock:
+                if self._group_commit is None:
+                    self._group_commit = GroupCommitCoordinator(self)
+        return self._group_commit
+
+    def open_db(self, project_name: str) -> PooledEnvironment:
+        self._release(self._acquire(project_name))
+        return PooledEnvironment(self, project_name)
+
+    def close_db(self, project_name: str, timeout: float = 5.0) -> None:
+        """Close a project's environment once its in-flight transactions finish."""
+        project_name = self._env_key(project_name)
+        with self._lock:
+            slot = self._envs.get(project_name)
+            if slot is None or slot.closing:
+                return
+            slot.closing = True
+            if not self._lock.wait_for(lambda: slot.refs == 0, timeout):
+                # lmdb invalidates the stragglers' transactions instead of crashing.
+                self._stats["forced_closes"] += 1
+                print(f"[LMDB Warning] Closing {project_name} with {slot.refs} transaction(s) still open.")
+            self._close_slot_locked(project_name)
+
+    def reset_project(self, project_name: str) -> None:
+        """Delete a project's data for good (``storage.reset_db``)."""
+        self.close_db(project_name)
+        path = self.get_db_path(project_name)
+        if os.path.exists(path):
+            try:
+                shutil.rmtree(path)
+            except Exception as e:
+                print(f"DB reset error: {e}")
 
     def close_all(self) -> None:
         with self._lock:
-            for project_name, env in list(self._envs.items()):
-                try:
-                    env.close()
-                except Exception:
-                    pass
-                del self._envs[project_name]
+            projects = list(self._envs)
+        for project_name in projects:
+            self.close_db(project_name)
+        with self._registry_lock:
+            env, self._registry_env = self._registry_env, None
+            self._projects, self._project_list, self._registry_generation = frozenset(), [], -1
+        if env is not None:
+            env.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            opens = self._stats["opens"]
+            return {
+                "layout": self.layout,
+                "open": len(self._envs),
+                "in_use": sum(1 for slot in self._envs.values() if slot.refs),
+                "max_open": self.max_open,
+                "max_readers": self.max_readers,
+                "max_spare_txns": self.max_spare_txns,
+                **{k: v for k, v in self._stats.items() if k != "open_ms_total"},
+                "open_ms_avg": round(self._stats["open_ms_total"] / opens, 3) if opens else 0.0,
+                "maps": {key: self._map_usage_locked(slot) for key, slot in self._envs.items()},
+                "group_commit": self._group_commit.stats() if self._group_commit else None,
+            }
+
+    def _map_usage_locked(self, slot: _EnvSlot) -> dict:
+        used, size = self._usage_locked(slot)
+        return {"map_size": size, "used_bytes": used, "used_pct": round(100.0 * used / size, 1),
+                "resizes": slot.resizes}
 
     def run_write_transaction(self, project_name: str, txn_func) -> Any:
         current_txn = active_txn.get()
         current_project = active_project.get()
         if current_txn is not None and current_project == project_name:
             return txn_func(current_txn)
+        if self.group_commit_enabled:
+            return self.group_commit.run(project_name, txn_func)
+        return self._write_alone(project_name, txn_func)
 
-        if project_name not in self._map_sizes:
-            self._map_sizes[project_name] = self.default_map_size
-
-        for attempt in range(5):
+    def _write_alone(self, project_name: str, txn_func) -> Any:
+        while True:
             try:
-                env = self.open_db(project_name)
-                with env.begin(write=True) as txn:
+                with PooledEnvironment(self, project_name).begin(write=True) as txn:
                     result = txn_func(txn)
                 return result
             except lmdb.MapFullError:
-                self.close_db(project_name)
-                self._map_sizes[project_name] += 100 * 1024 * 1024
-        raise lmdb.MapFullError("LMDB map size reached and could not be increased.")
+                # The aborted transaction has released the environment.
+                if not self._resize(project_name):
+                    raise lmdb.MapFullError(
+                        f"LMDB map for {project_name} is full and could not be grown "
+                        f"(ceiling {self.max_map_size} bytes).")
@@ -0,0 +1,226 @@
+"""
+database/group_commit.py — One LMDB commit for many concurrent writes
+=====================================================================
+Every LMDB write transaction ends in an fsync. Before this, a clinician's
+append was several of them: the unit of work, then the writes that ran after
+it or went to another project, such as the notarization meta keys and the
+event-bus audit entries. Concurrent clinicians queued behind each other's disk
+flushes.
+
+``GroupCommitCoordinator.run(project, txn_func)`` queues the write and waits
+for it. One writer thread per environment drains the queue. It opens a single
+write transaction and runs the queued writes in submission order, each in a
+nested transaction of its own, then commits once. No caller is released before
+that commit is durable.
+
+- A later write sees everything the earlier writes in the batch did, so
+  appends to one chain link exactly as if they ran one after another.
+- A write that raises is rolled back alone, and its future carries the error.
+  The rest of the batch still commits.
+- A write that hits ``MapFullError`` is retried in the next batch once the map
+  has grown.
+- While a batch commits, new writes queue up and form the next batch.
+  ``VHV_LMDB_GROUP_COMMIT_MS`` (default 0) makes the writer wait that much
+  longer for company. ``VHV_LMDB_GROUP_COMMIT_MAX`` (default 64) caps a batch.
+
+Each write runs with ``active_txn``/``active_project`` pointing at its nested
+transaction and with its own ``after_commit_hooks``. That is exactly what a
+unit of work gives it, so repository code needs no changes. ``run`` waits for
+the commit and then runs the hooks on the caller's thread. They cannot run on
+the writer: a hook may write to the same environment (the notarization anchor
+does), and would then wait on its own thread. So there is no fire-and-forget
+entry point.
+
+``LMDBConnectionManager.run_write_transaction`` goes through here unless
+``VHV_LMDB_GROUP_COMMIT=false``. So does ``LMDBUnitOfWork.run``.
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import lmdb
+
+from database.connection import active_project, active_txn, after_commit_hooks
+
+_IDLE_SECONDS = 1.0
+_RETRY = object()
+
+
+class _WriteRequest:
+    __slots__ = ("project", "txn_func", "context", "future", "hooks")
+
+    def __init__(self, project: str, txn_func: Callable[[Any], Any]):
+        self.project = project
+        self.txn_func = txn_func
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+        self.hooks: List[Callable[[], Any]] = []
+
+
+class _EnvQueue:
+    __slots__ = ("cond", "pending", "writer")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending: List[_WriteRequest] = []
+        self.writer: Optional[threading.Thread] = None
+
+
+def _abort_quietly(txn) -> None:
+    try:
+        txn.abort()
+    except Exception:
+        pass
+
+
+class GroupCommitCoordinator:
+    def __init__(self, manager, max_latency_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        self.manager = manager
+        self.max_latency = (float(os.getenv("VHV_LMDB_GROUP_COMMIT_MS", "0"))
+                            if max_latency_ms is None else max_latency_ms) / 1000.0
+        self.max_batch = int(os.getenv("VHV_LMDB_GROUP_COMMIT_MAX", "64")) if max_batch is None else max_batch
+        self._lock = threading.Lock()
+        self._queues: Dict[str, _EnvQueue] = {}
+        self._stats = {"batches": 0, "writes": 0, "failed_writes": 0, "map_full_retries": 0,
+                       "largest_batch": 0}
+
+    # ── caller side ──────────────────────────────────────────
+    def _enqueue(self, project_name: str, txn_func) -> _WriteRequest:
+        request = _WriteRequest(project_name, txn_func)
+        env_key = self.manager._env_key(project_name)
+        with self._lock:
+            queue = self._queues.get(env_key)
+            if queue is None:
+                queue = self._queues[env_key] = _EnvQueue()
+        with queue.cond:
+            queue.pending.append(request)
+            if queue.writer is None:
+                queue.writer = threading.Thread(target=self._drain, args=(env_key, queue),
+                                                name=f"group-commit-{env_key}", daemon=True)
+                queue.writer.start()
+            else:
+                queue.cond.notify_all()
+        return request
+
+    def run(self, project_name: str, txn_func: Callable[[Any], Any]) -> Any:
+        """Queue ``txn_func(txn)``, wait for its commit, then run its after-commit hooks here."""
+        request = self._enqueue(project_name, txn_func)
+        result = request.future.result()
+        for hook in request.hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"[GroupCommit Warning] after-commit hook failed: {e}")
+        return result
+
+    # ── writer thread ────────────────────────────────────────
+    def _drain(self, env_key: str, queue: _EnvQueue) -> None:
+        while True:
+            with queue.cond:
+                if not queue.pending:
+                    queue.cond.wait(_IDLE_SECONDS)
+                if not queue.pending:
+                    queue.writer = None
+                    return
+                first = queue.pending[0].project
+            try:
+                self._commit_batch(queue, first)
+            except BaseException as e:
+                # Nothing queued may be left waiting on a writer that is gone.
+                with queue.cond:
+                    stranded, queue.pending, queue.writer = queue.pending, [], None
+                for request in stranded:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                if isinstance(e, Exception):
+                    return
+                raise
+
+    def _commit_batch(self, queue: _EnvQueue, first_project: str) -> None:
+        parent = self.manager._begin(first_project, write=True)   # waits out any other writer
+        with queue.cond:
+            if self.max_latency > 0 and len(queue.pending) < self.max_batch:
+                queue.cond.wait_for(lambda: len(queue.pending) >= self.max_batch, self.max_latency)
+            batch, queue.pending = queue.pending[:self.max_batch], queue.pending[self.max_batch:]
+
+        done, retry = [], []
+        try:
+            for request in batch:
+                outcome = self._apply(parent, request)
+                if outcome is _RETRY:
+                    retry.append(request)
+                elif outcome is not None:
+                    done.append(outcome)
+            parent.commit()
+        except lmdb.MapFullError:
+            _abort_quietly(parent)
+            retry = [request for request in batch if not request.future.done()]
+            done = []
+        except BaseException as e:
+            _abort_quietly(parent)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["writes"] += len(done)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        for request, result in done:
+            request.future.set_result(result)
+
+        if retry:
+            with self._lock:
+                self._stats["map_full_retries"] += len(retry)
+            if self.manager._resize(first_project):
+                with queue.cond:
+                    queue.pending[:0] = retry
+            else:
+                for request in retry:
+                    request.future.set_exception(lmdb.MapFullError(
+                        f"LMDB map for {request.project} is full and could not be grown."))
+
+    def _apply(self, parent, request: _WriteRequest):
+        """Run one write in a nested transaction: (request, result), ``_RETRY`` or None."""
+        try:
+            child = self.manager._begin(request.project, write=True, parent=parent.raw)
+        except Exception as e:
+            self._fail(request, e)
+            return None
+        request.hooks = []
+        try:
+            result = request.context.run(self._call, request, child)
+            child.commit()
+        except lmdb.MapFullError:
+            _abort_quietly(child)
+            return _RETRY
+        except Exception as e:
+            _abort_quietly(child)
+            self._fail(request, e)
+            return None
+        return request, result
+
+    @staticmethod
+    def _call(request: _WriteRequest, txn) -> Any:
+        active_txn.set(txn)
+        active_project.set(request.project)
+        after_commit_hooks.set(request.hooks)
+        return request.txn_func(txn)
+
+    def _fail(self, request: _WriteRequest, error: BaseException) -> None:
+        with self._lock:
+            self._stats["failed_writes"] += 1
+        request.future.set_exception(error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            queues = list(self._queues.values())
+        stats["queued"] = sum(len(q.pending) for q in queues)
+        stats["writers"] = sum(1 for q in queues if q.writer is not None)
+        stats["avg_batch"] = round(stats["writes"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
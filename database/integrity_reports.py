@@ -0,0 +1,144 @@
+"""
+database/integrity_reports.py — Results of vault-wide integrity sweeps
+======================================================================
+``core/services/integrity_sweep.py`` checks every chain store and records what
+it found here, in its own store (``__integrity__``):
+
+    run_{run_id}                       the run: status, counts, timings
+    result_{run_id}\\x00{project}       one project's verdict
+
+Run IDs are UTC timestamps, so the newest run is the last ``run_`` key. A
+verdict is written as soon as its project is checked. An interrupted run
+therefore keeps everything it finished, and resuming it checks only the
+projects that have no verdict yet.
+"""
+
+import json
+import time
+from typing import Dict, List, Optional, Set
+
+from database.connection import LMDBConnectionManager
+
+REPORT_PROJECT = "__integrity__"
+
+_RUN_PREFIX = b"run_"
+_RESULT_PREFIX = b"result_"
+_SEP = b"\x00"
+
+
+def _manager(db_manager: Optional[LMDBConnectionManager]) -> LMDBConnectionManager:
+    from database.storage import default_db_manager
+    return db_manager or default_db_manager
+
+
+def _run_key(run_id: str) -> bytes:
+    return _RUN_PREFIX + run_id.encode("utf-8")
+
+
+def _result_prefix(run_id: str) -> bytes:
+    return _RESULT_PREFIX + run_id.encode("utf-8") + _SEP
+
+
+def new_run_id(db_manager: Optional[LMDBConnectionManager] = None) -> str:
+    run_id = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    suffix = 0
+    while load_run(run_id + (f"-{suffix:03d}" if suffix else ""), db_manager) is not None:
+        suffix += 1
+    return run_id + (f"-{suffix:03d}" if suffix else "")
+
+
+def save_run(run: dict, db_manager: Optional[LMDBConnectionManager] = None) -> None:
+    value = json.dumps(run, ensure_ascii=False).encode("utf-8")
+
+    def txn_block(txn):
+        txn.put(_run_key(run["id"]), value)
+
+    _manager(db_manager).run_write_transaction(REPORT_PROJECT, txn_block)
+
+
+def load_run(run_id: str, db_manager: Optional[LMDBConnectionManager] = None) -> Optional[dict]:
+    manager = _manager(db_manager)
+    if not manager.project_exists(REPORT_PROJECT):
+        return None
+    with manager.open_db(REPORT_PROJECT).begin(write=False) as txn:
+        value = txn.get(_run_key(run_id))
+    return json.loads(value.decode("utf-8")) if value else None
+
+
+def latest_run(db_manager: Optional[LMDBConnectionManager] = None) -> Optional[dict]:
+    manager = _manager(db_manager)
+    if not manager.project_exists(REPORT_PROJECT):
+        return None
+    with manager.open_db(REPORT_PROJECT).begin(write=False) as txn:
+        cursor = txn.cursor()
+        # Position past the last `run_` key and step back onto it.
+        positioned = cursor.prev() if cursor.set_range(_RUN_PREFIX + b"\xff") else cursor.last()
+        if not positioned or not cursor.key().startswith(_RUN_PREFIX):
+            return None
+        return json.loads(cursor.value().decode("utf-8"))
+
+
+def save_result(run: dict, verdict: dict, db_manager: Optional[LMDBConnectionManager] = None) -> None:
+    """Record a project's verdict and the run's updated counts in one commit."""
+    key = _result_prefix(run["id"]) + verdict["project"].encode("utf-8")
+    value = json.dumps(verdict, ensure_ascii=False).encode("utf-8")
+    run_value = json.dumps(run, ensure_ascii=False).encode("utf-8")
+
+    def txn_block(txn):
+        txn.put(key, value)
+        txn.put(_run_key(run["id"]), run_value)
+
+    _manager(db_manager).run_write_transaction(REPORT_PROJECT, txn_block)
+
+
+def load_results(
+    run_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    failed_only: bool = False,
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> List[dict]:
+    """A page of a run's verdicts in project order; ``failed_only`` skips the clean ones."""
+    manager = _manager(db_manager)
+    if not manager.project_exists(REPORT_PROJECT):
+        return []
+    prefix = _result_prefix(run_id)
+    results, skipped = [], 0
+    with manager.open_db(REPORT_PROJECT).begin(write=False) as txn:
+        cursor = txn.cursor()
+        if not cursor.set_range(prefix):
+            return []
+        for key, value in cursor:
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            verdict = json.loads(value.decode("utf-8"))
+            if failed_only and verdict.get("ok"):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append(verdict)
+    return results
+
+
+def checked_projects(run_id: str, db_manager: Optional[LMDBConnectionManager] = None) -> Set[str]:
+    """The projects that already have a verdict in ``run_id``."""
+    manager = _manager(db_manager)
+    if not manager.project_exists(REPORT_PROJECT):
+        return set()
+    prefix = _result_prefix(run_id)
+    with manager.open_db(REPORT_PROJECT).begin(write=False) as txn:
+        cursor = txn.cursor()
+        checked = set()
+        if cursor.set_range(prefix):
+            for key in cursor.iternext(keys=True, values=False):
+                if not key.startswith(prefix):
+                    break
+                checked.add(key[len(prefix):].decode("utf-8"))
+        return checked
+
+
+def summarize(run_id: str, db_manager: Optional[LMDBConnectionManager] = None) -> Dict[str, int]:
+    """``{"checked", "failed"}`` counted from a run's verdicts."""
+    results = load_results(run_id, limit=2 ** 31, db_manager=db_manager)
+    return {"checked": len(results), "failed": sum(1 for r in results if not r.get("ok"))}
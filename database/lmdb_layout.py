@@ -0,0 +1,348 @@
+"""
+database/lmdb_layout.py — Where patient chains live on disk
+============================================================
+Two layouts sit behind the same ``LMDBConnectionManager`` interface, chosen by
+``VHV_LMDB_LAYOUT``:
+
+``per_project`` (default)
+    Every chain is its own environment at ``projects/<name>/chaindata.lmdb``.
+
+``consolidated``
+    Every chain is a named sub-database of one environment,
+    ``projects/__chains__/chaindata.lmdb``. Listing, backing up or sweeping the
+    vault opens one environment instead of thousands. Writes from concurrent
+    requests share one writer lock, and a write to a second chain inside a unit
+    of work nests in the open transaction and commits with it. The internal
+    ``__*`` stores (users, indexes, rate limits) and the ``attachments`` blob
+    store (``connection.NON_CHAIN_PROJECTS``) keep their own environments.
+
+Callers see no difference: ``open_db(name).begin()`` returns a transaction
+whose default database is the chain, so ``get``/``put``/``cursor`` need no
+``db=`` argument. ``VHV_LMDB_MAX_DBS`` (default 10000) caps the number of chains
+in the consolidated environment. LMDB sizes some per-transaction arrays by it,
+so do not set it far beyond the expected patient count.
+
+Switching layouts moves the data; stop the vault first, then run
+
+    python -m database.lmdb_layout consolidate     per-project dirs -> __chains__
+    python -m database.lmdb_layout split           __chains__ -> per-project dirs
+
+Both copy each chain, check its entry count and only then remove the source
+(``--keep-source`` leaves it in place). Both drop the project registry, which
+the vault rebuilds from the directory when it next starts. ``consolidate`` also
+moves an ``attachments`` store that older versions put in ``__chains__`` back
+into its own environment.
+"""
+
+import argparse
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional
+
+import lmdb
+
+from database.connection import (
+    NON_CHAIN_PROJECTS, LMDBConnectionManager, TrackedTransaction, _EnvSlot, _env_int, active_project,
+    active_txn, drop_registry, is_chain,
+)
+
+LAYOUTS = ("per_project", "consolidated")
+CHAINS_PROJECT = "__chains__"
+_DB_FILE = "chaindata.lmdb"
+
+
+class ConsolidatedLMDBManager(LMDBConnectionManager):
+    """``LMDBConnectionManager`` storing every chain in the ``__chains__`` environment."""
+
+    layout = "consolidated"
+
+    def __init__(self, base_dir: str, default_map_size: int = 2 * 1024 * 1024 * 1024,
+                 max_dbs: Optional[int] = None, **pool_options):
+        super().__init__(base_dir, default_map_size, **pool_options)
+        self.max_dbs = _env_int("VHV_LMDB_MAX_DBS", 10000) if max_dbs is None else max_dbs
+
+    def _env_key(self, project_name: str) -> str:
+        return CHAINS_PROJECT if is_chain(project_name) else project_name
+
+    def _env_options(self, env_key: str) -> dict:
+        return {"max_dbs": self.max_dbs} if env_key == CHAINS_PROJECT else {}
+
+    def _db_name(self, project_name: str) -> bytes:
+        return self._safe_project_name(project_name).encode("utf-8")
+
+    @staticmethod
+    def _writer_in_context(slot: _EnvSlot) -> Optional[lmdb.Transaction]:
+        """This context's open write transaction on the shared environment, if any."""
+        txn = active_txn.get()
+        if isinstance(txn, TrackedTransaction) and txn.write and txn.env is slot.env:
+            return txn.raw
+        return None
+
+    def _handle(self, slot: _EnvSlot, project_name: str, parent: Optional[lmdb.Transaction] = None):
+        dbi = slot.dbs.get(project_name)
+        if dbi is not None:
+            return dbi
+        if parent is not None:
+            # Private to the open transaction until it commits, so not cached.
+            return slot.env.open_db(self._db_name(project_name), txn=parent)
+        # Opening a handle takes a short write transaction of its own. Like the
+        # directory of a per-project chain, the sub-database exists from then on.
+        dbi = slot.dbs[project_name] = slot.env.open_db(self._db_name(project_name))
+        return dbi
+
+    def _txn_options(self, slot: _EnvSlot, project_name: str, kwargs: dict) -> dict:
+        if not is_chain(project_name):
+            return kwargs
+        parent = kwargs.get("parent")
+        if parent is None:
+            parent = self._writer_in_context(slot)
+            if parent is not None and (kwargs.get("write") or project_name not in slot.dbs):
+                # A second writer on this thread would deadlock on LMDB's writer lock.
+                kwargs.update(write=True, parent=parent)
+            else:
+                parent = None
+        kwargs["db"] = self._handle(slot, project_name, parent)
+        return kwargs
+
+    def run_write_transaction(self, project_name: str, txn_func) -> Any:
+        if not is_chain(project_name):
+            return super().run_write_transaction(project_name, txn_func)
+
+        def scoped(txn):
+            # Writes to other chains from inside txn_func nest in this transaction.
+            tokens = active_txn.set(txn), active_project.set(project_name)
+            try:
+                return txn_func(txn)
+            finally:
+                active_txn.reset(tokens[0])
+                active_project.reset(tokens[1])
+
+        current = active_txn.get()
+        if current is not None and active_project.get() == project_name:
+            return txn_func(current)
+        if (isinstance(current, TrackedTransaction) and current.write
+                and self._env_key(active_project.get() or "") == CHAINS_PROJECT
+                and active_project.get() != project_name):
+            # Nested: the outer transaction owns the retry on MapFullError.
+            with self._begin(project_name, write=True) as txn:
+                return scoped(txn)
+        if self.group_commit_enabled:
+            return self.group_commit.run(project_name, txn_func)
+        return self._write_alone(project_name, scoped)
+
+    # ── chain registry ───────────────────────────────────────
+    def _chain_names(self) -> List[str]:
+        with self._begin(CHAINS_PROJECT) as txn:
+            return [key.decode("utf-8") for key in txn.cursor().iternext(values=False)]
+
+    def get_db_path(self, project_name: str) -> str:
+        return super().get_db_path(self._env_key(project_name))
+
+    def project_exists(self, project_name: str) -> bool:
+        if not is_chain(project_name):
+            return super().project_exists(project_name)
+        with self._lock:
+            slot = self._envs.get(CHAINS_PROJECT)
+            if slot is not None and project_name in slot.dbs:
+                return True
+        with self._begin(CHAINS_PROJECT) as txn:
+            return txn.get(self._db_name(project_name)) is not None
+
+    def create_project(self, project_name: str) -> bool:
+        if not is_chain(project_name):
+            return super().create_project(project_name)
+        if self.project_exists(project_name):
+            return False
+        slot = self._acquire(project_name)
+        try:
+            self._handle(slot, project_name, self._writer_in_context(slot))
+        finally:
+            self._release(slot)
+        return True
+
+    def list_projects(self) -> List[str]:
+        return self._chain_names() + sorted(
+            name for name in NON_CHAIN_PROJECTS if LMDBConnectionManager.project_exists(self, name))
+
+    def reset_project(self, project_name: str) -> None:
+        if not is_chain(project_name):
+            return super().reset_project(project_name)
+        slot = self._acquire(project_name)          # held so the handle stays valid
+        try:
+            dbi = self._handle(slot, project_name)
+            with self._begin(CHAINS_PROJECT, write=True) as txn:
+                txn.drop(dbi, delete=True)
+            slot.dbs.pop(project_name, None)
+        finally:
+            self._release(slot)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            slot = self._envs.get(CHAINS_PROJECT)
+            stats["chain_handles"] = len(slot.dbs) if slot else 0
+        return stats
+
+
+def create_db_manager(base_dir: str, default_map_size: int, layout: Optional[str] = None,
+                      **pool_options) -> LMDBConnectionManager:
+    layout = (layout or os.getenv("VHV_LMDB_LAYOUT", "per_project")).strip().lower()
+    if layout == "consolidated":
+        return ConsolidatedLMDBManager(base_dir, default_map_size, **pool_options)
+    if layout != "per_project":
+        raise ValueError(f"VHV_LMDB_LAYOUT must be one of {', '.join(LAYOUTS)}, not {layout!r}")
+    return LMDBConnectionManager(base_dir, default_map_size, **pool_options)
+
+
+# ──────────────────────────────────────────────
+# MIGRATION BETWEEN LAYOUTS (vault stopped)
+# ──────────────────────────────────────────────
+
+def _per_project_chains(base_dir: str) -> List[str]:
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(
+        d for d in os.listdir(base_dir)
+        if is_chain(d) and os.path.isdir(os.path.join(base_dir, d, _DB_FILE))
+    )
+
+
+def _copy_chain(src_txn, src_db, dst_txn, dst_db) -> int:
+    if dst_txn.stat(dst_db)["entries"]:
+        raise RuntimeError("destination already holds data")
+    expected = src_txn.stat(src_db)["entries"]
+    _, added = dst_txn.cursor(db=dst_db).putmulti(src_txn.cursor(db=src_db).iternext(), append=True)
+    if added != expected:
+        raise RuntimeError(f"copied {added} of {expected} entries")
+    return added
+
+
+def _with_growth(env: lmdb.Environment, step: Callable[[], int]) -> int:
+    while True:
+        try:
+            return step()
+        except lmdb.MapFullError:
+            env.set_mapsize(env.info()["map_size"] * 2)
+
+
+def consolidate(base_dir: str, map_size: int, max_dbs: int = 10000, keep_source: bool = False,
+                log: Callable[[str], None] = print) -> Dict[str, int]:
+    """Move every per-project chain into the ``__chains__`` environment."""
+    target_path = os.path.join(base_dir, CHAINS_PROJECT, _DB_FILE)
+    os.makedirs(target_path, exist_ok=True)
+    target = lmdb.open(target_path, map_size=map_size, max_dbs=max_dbs, subdir=True)
+    totals = {"chains": 0, "entries": 0}
+    try:
+        for name in _per_project_chains(base_dir):
+            src = lmdb.open(os.path.join(base_dir, name, _DB_FILE), readonly=True, lock=False, subdir=True)
+            try:
+                def step():
+                    with src.begin() as rtxn, target.begin(write=True) as wtxn:
+                        return _copy_chain(rtxn, src.open_db(None, txn=rtxn), wtxn,
+                                           target.open_db(name.encode("utf-8"), txn=wtxn))
+                entries = _with_growth(target, step)
+            except RuntimeError as e:
+                raise RuntimeError(f"{name}: {e}") from None
+            finally:
+                src.close()
+            if not keep_source:
+                shutil.rmtree(os.path.join(base_dir, name))
+            totals["chains"] += 1
+            totals["entries"] += entries
+            log(f"consolidated {name:<40} {entries:>8} entries")
+        _release_non_chains(base_dir, target, log)
+    finally:
+        target.close()
+        drop_registry(base_dir)
+    return totals
+
+
+def _release_non_chains(base_dir: str, chains: lmdb.Environment, log: Callable[[str], None],
+                        drop: bool = True) -> None:
+    """Move non-chain stores an older ``consolidate`` put in ``__chains__`` to their own environment."""
+    with chains.begin() as txn:
+        names = {key.decode("utf-8") for key in txn.cursor().iternext(values=False)}
+    for name in sorted(NON_CHAIN_PROJECTS & names):
+        path = os.path.join(base_dir, name, _DB_FILE)
+        os.makedirs(path, exist_ok=True)
+        dst = lmdb.open(path, map_size=chains.info()["map_size"], subdir=True)
+        try:
+            def step():
+                with chains.begin() as rtxn, dst.begin(write=True) as wtxn:
+                    src_db = chains.open_db(name.encode("utf-8"), txn=rtxn, create=False)
+                    # Content-addressed entries: ones written there since are kept.
+                    wtxn.cursor().putmulti(rtxn.cursor(db=src_db).iternext(), overwrite=False)
+                    missing = sum(1 for key in rtxn.cursor(db=src_db).iternext(values=False)
+                                  if wtxn.get(key) is None)
+                    if missing:
+                        raise RuntimeError(f"{missing} entries not copied")
+                    return rtxn.stat(src_db)["entries"]
+            entries = _with_growth(dst, step)
+        except RuntimeError as e:
+            raise RuntimeError(f"{name}: {e}") from None
+        finally:
+            dst.close()
+        if drop:
+            with chains.begin(write=True) as txn:
+                txn.drop(chains.open_db(name.encode("utf-8"), txn=txn), delete=True)
+        log(f"released     {name:<40} {entries:>8} entries")
+
+
+def split(base_dir: str, map_size: int, max_dbs: int = 10000, keep_source: bool = False,
+          log: Callable[[str], None] = print) -> Dict[str, int]:
+    """Move every chain out of ``__chains__`` into its own environment."""
+    source_dir = os.path.join(base_dir, CHAINS_PROJECT)
+    totals = {"chains": 0, "entries": 0}
+    if not os.path.isdir(os.path.join(source_dir, _DB_FILE)):
+        return totals
+    source = lmdb.open(os.path.join(source_dir, _DB_FILE), readonly=True, lock=False,
+                       max_dbs=max_dbs, subdir=True)
+    try:
+        with source.begin() as txn:
+            names = [key.decode("utf-8") for key in txn.cursor().iternext(values=False)]
+        _release_non_chains(base_dir, source, log, drop=False)
+        names = [name for name in names if is_chain(name)]
+        for name in names:
+            LMDBConnectionManager._safe_project_name(name)
+            path = os.path.join(base_dir, name, _DB_FILE)
+            os.makedirs(path, exist_ok=True)
+            dst = lmdb.open(path, map_size=map_size, subdir=True)
+            try:
+                def step():
+                    with source.begin() as rtxn, dst.begin(write=True) as wtxn:
+                        src_db = source.open_db(name.encode("utf-8"), txn=rtxn, create=False)
+                        return _copy_chain(rtxn, src_db, wtxn, dst.open_db(None, txn=wtxn))
+                entries = _with_growth(dst, step)
+            except RuntimeError as e:
+                raise RuntimeError(f"{name}: {e}") from None
+            finally:
+                dst.close()
+            totals["chains"] += 1
+            totals["entries"] += entries
+            log(f"split        {name:<40} {entries:>8} entries")
+    finally:
+        source.close()
+    if not keep_source:
+        shutil.rmtree(source_dir)
+    drop_registry(base_dir)
+    return totals
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Move patient chains between LMDB layouts.")
+    parser.add_argument("direction", choices=("consolidate", "split"))
+    parser.add_argument("--base-dir", help="projects directory (default: the vault's)")
+    parser.add_argument("--keep-source", action="store_true", help="leave the old layout in place")
+    args = parser.parse_args(argv)
+
+    from database.storage import LMDB_MAP_SIZE, PROJECTS_DIR
+    migrate = consolidate if args.direction == "consolidate" else split
+    totals = migrate(args.base_dir or PROJECTS_DIR, LMDB_MAP_SIZE,
+                     max_dbs=_env_int("VHV_LMDB_MAX_DBS", 10000), keep_source=args.keep_source)
+    print(f"{totals['chains']} chain(s), {totals['entries']} entries. "
+          f"Set VHV_LMDB_LAYOUT={'consolidated' if migrate is consolidate else 'per_project'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,280 @@
+"""
+database/migrations.py — Versioned schema changes for the SQL backend
+=====================================================================
+``SQLDatabaseManager.init_db`` creates the baseline tables. Everything after the
+baseline is a numbered migration in ``MIGRATIONS``. It is applied once and then
+recorded in ``schema_version``, so a change is never re-run on every start and
+never guessed at by catching errors.
+
+Each migration runs in its own transaction together with its ``schema_version``
+row, so a failure leaves the database at the previous version. Migrations are
+append-only: never edit or renumber one that has shipped. Add a new one instead.
+
+Statements are built per dialect (``Dialect``) so the same registry serves
+SQLite and PostgreSQL. A step that depends on what is already there (adding a
+column only if it is missing) supplies ``apply(cursor, dialect)`` instead.
+
+``SQLDatabaseManager`` runs this at startup, before a worker serves requests
+(unless ``VHV_SQL_AUTO_MIGRATE=false``).
+When several workers start at once, each migration takes the database's
+write lock and re-checks ``schema_version`` inside its transaction. The lock
+is ``BEGIN IMMEDIATE`` on SQLite and a transaction-scoped advisory lock on
+PostgreSQL. Exactly one worker applies each step; the others see it done.
+
+    python -m database.migrations           apply pending migrations, print history
+    python -m database.migrations --status  print history and pending, change nothing
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+
+# pg_advisory_xact_lock key shared by every process migrating this database.
+_PG_LOCK_KEY = 0x5648565F4D4947   # "VHV_MIG"
+
+
+@dataclass(frozen=True)
+class Dialect:
+    is_postgres: bool
+
+    @property
+    def double(self) -> str:
+        return "DOUBLE PRECISION" if self.is_postgres else "REAL"
+
+    def placeholder(self, sql: str) -> str:
+        return sql.replace("?", "%s") if self.is_postgres else sql
+
+    def has_column(self, cursor, table: str, column: str) -> bool:
+        if self.is_postgres:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+                (table, column),
+            )
+            return cursor.fetchone() is not None
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: Optional[Callable[[Dialect], List[str]]] = None
+    apply: Optional[Callable[[Any, Dialect], None]] = None
+
+
+def _security_tables(d: Dialect) -> List[str]:
+    # Previously created lazily by AlertService / DualControlEngine. The DDL is
+    # identical, so databases where those services already ran are unaffected.
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS security_alerts (
+            alert_id TEXT PRIMARY KEY,
+            alert_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            username TEXT,
+            client_ip TEXT,
+            created_at {d.double} NOT NULL,
+            acknowledged INTEGER DEFAULT 0,
+            metadata_json TEXT
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS dual_control_tokens (
+            token_id TEXT PRIMARY KEY,
+            request_type TEXT NOT NULL,
+            target_patient_id TEXT NOT NULL,
+            requested_by TEXT NOT NULL,
+            co_signed_by TEXT,
+            reason TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at {d.double} NOT NULL,
+            expires_at {d.double} NOT NULL
+        )
+        """,
+    ]
+
+
+def _hot_path_indexes(d: Dialect) -> List[str]:
+    return [
+        # Patient notification feed: WHERE patient_id = ? ORDER BY timestamp DESC
+        "CREATE INDEX IF NOT EXISTS idx_notifications_patient_ts ON notifications (patient_id, timestamp)",
+        # Login rate limiter: WHERE ip = ? AND timestamp >= ?, and the expiry sweep
+        "CREATE INDEX IF NOT EXISTS idx_rate_limits_ip_ts ON rate_limits (ip, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_rate_limits_ts ON rate_limits (timestamp)",
+        # Security dashboard: newest first, optionally for one severity
+        "CREATE INDEX IF NOT EXISTS idx_security_alerts_created ON security_alerts (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_security_alerts_severity_created ON security_alerts (severity, created_at)",
+        # Passkey count at login
+        "CREATE INDEX IF NOT EXISTS idx_webauthn_credentials_username ON webauthn_credentials (username)",
+        # Expired-revocation sweep
+        "CREATE INDEX IF NOT EXISTS idx_blacklisted_tokens_exp ON blacklisted_tokens (exp)",
+    ]
+
+
+def _users_account_status(cursor, d: Dialect) -> None:
+    # Used to be an ALTER TABLE on every start with the error swallowed.
+    if not d.has_column(cursor, "users", "account_status"):
+        cursor.execute("ALTER TABLE users ADD COLUMN account_status VARCHAR(30) DEFAULT 'ACTIVE_ENROLLED'")
+
+
+def _revocation_counter(cursor, d: Dialect) -> None:
+    # One counter row bumped with every revocation; workers poll it to sync their
+    # in-memory revocation lists (database/revocation_list.py).
+    cursor.execute("CREATE TABLE IF NOT EXISTS revocation_counter (id INTEGER PRIMARY KEY, value BIGINT NOT NULL)")
+    cursor.execute("SELECT 1 FROM revocation_counter WHERE id = 1")
+    if cursor.fetchone() is None:
+        cursor.execute("INSERT INTO revocation_counter (id, value) VALUES (1, 0)")
+    if not d.has_column(cursor, "blacklisted_tokens", "seq"):
+        cursor.execute("ALTER TABLE blacklisted_tokens ADD COLUMN seq BIGINT NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_blacklisted_tokens_seq ON blacklisted_tokens (seq)")
+
+
+def _alert_occurrences(cursor, d: Dialect) -> None:
+    # Coalesced alerts (core/services/alert_writer.py) count repeats on one row.
+    if not d.has_column(cursor, "security_alerts", "occurrences"):
+        cursor.execute("ALTER TABLE security_alerts ADD COLUMN occurrences INTEGER NOT NULL DEFAULT 1")
+    if not d.has_column(cursor, "security_alerts", "last_seen_at"):
+        cursor.execute(f"ALTER TABLE security_alerts ADD COLUMN last_seen_at {d.double}")
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "security_alerts and dual_control_tokens tables", _security_tables),
+    Migration(2, "composite indexes for hot queries", _hot_path_indexes),
+    Migration(3, "users.account_status for databases that predate onboarding",
+              apply=_users_account_status),
+    Migration(4, "revocation counter and blacklisted_tokens.seq", apply=_revocation_counter),
+    Migration(5, "security_alerts.occurrences and last_seen_at", apply=_alert_occurrences),
+)
+
+
+def _ensure_version_table(cursor, d: Dialect) -> None:
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at {d.double} NOT NULL,
+            duration_ms {d.double} NOT NULL
+        )
+    """)
+
+
+def current_version(db) -> int:
+    d = Dialect(db.is_postgres)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_version_table(cursor, d)
+        conn.commit()
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+        return int(row[0] or 0)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _begin_locked(cursor, d: Dialect) -> None:
+    if d.is_postgres:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_PG_LOCK_KEY,))
+    else:
+        # Takes the write lock now; also needed because sqlite3 does not open a
+        # transaction implicitly before DDL.
+        cursor.execute("BEGIN IMMEDIATE")
+
+
+def migrate(db, migrations=MIGRATIONS) -> List[dict]:
+    """Apply every migration newer than the recorded version; returns what ran."""
+    d = Dialect(db.is_postgres)
+    applied = []
+    version = current_version(db)
+    for m in sorted(migrations, key=lambda m: m.version):
+        if m.version <= version:
+            continue
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            _begin_locked(cursor, d)
+            cursor.execute(d.placeholder("SELECT 1 FROM schema_version WHERE version = ?"), (m.version,))
+            if cursor.fetchone() is not None:
+                conn.rollback()     # another worker got here first
+                version = m.version
+                continue
+            started = time.perf_counter()
+            for stmt in (m.statements(d) if m.statements else ()):
+                cursor.execute(stmt)
+            if m.apply:
+                m.apply(cursor, d)
+            duration_ms = (time.perf_counter() - started) * 1000
+            cursor.execute(
+                d.placeholder(
+                    "INSERT INTO schema_version (version, description, applied_at, duration_ms) "
+                    "VALUES (?, ?, ?, ?)"
+                ),
+                (m.version, m.description, time.time(), duration_ms),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        applied.append({"version": m.version, "description": m.description, "duration_ms": duration_ms})
+        version = m.version
+    return applied
+
+
+def history(db) -> List[dict]:
+    """Applied migrations, oldest first."""
+    current_version(db)     # creates schema_version if needed
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT version, description, applied_at, duration_ms FROM schema_version ORDER BY version"
+        )
+        return [
+            {"version": r[0], "description": r[1], "applied_at": r[2], "duration_ms": r[3]}
+            for r in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def pending(db, migrations=MIGRATIONS) -> List[Migration]:
+    version = current_version(db)
+    return [m for m in sorted(migrations, key=lambda m: m.version) if m.version > version]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply or inspect SQL schema migrations.")
+    parser.add_argument("--status", action="store_true", help="only report; apply nothing")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        os.environ["VHV_SQL_AUTO_MIGRATE"] = "false"
+    from database.sql_db import get_sql_db
+    db = get_sql_db()
+    if not args.status:
+        for step in migrate(db):
+            print(f"applied {step['version']:>3}  {step['duration_ms']:9.1f} ms  {step['description']}")
+
+    for row in history(db):
+        when = datetime.fromtimestamp(row["applied_at"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{row['version']:>3}  {when}  {row['duration_ms']:9.1f} ms  {row['description']}")
+    todo = pending(db)
+    for m in todo:
+        print(f"{m.version:>3}  pending                                  {m.description}")
+    return 1 if todo else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
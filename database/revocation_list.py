@@ -0,0 +1,208 @@
+"""
+database/revocation_list.py — In-memory token revocation list
+=============================================================
+``is_token_blacklisted`` used to run a SQL query for every token checked, yet
+almost no token is ever revoked. Each worker now keeps the live revocations in
+memory behind a Bloom filter. A token that was never revoked is rejected by the
+filter without touching the set or the database.
+
+Consistency across workers comes from ``revocation_counter``, a single-row
+counter bumped in the same transaction that records a revocation; each row in
+``blacklisted_tokens`` carries the counter value (``seq``) it was written with.
+A worker re-reads the counter at most every ``VHV_REVOCATION_REFRESH_SECONDS``
+(default 1; 0 checks on every lookup). When the counter has moved, the worker
+fetches only the rows with a higher ``seq``. A counter that went backwards, or
+a different database, triggers a full reload.
+
+Expired revocations are useless, because the token would be rejected for its
+``exp`` anyway. A background thread prunes them every
+``VHV_REVOCATION_PRUNE_SECONDS`` (default 300), in SQL and in memory, and
+rebuilds the filter. ``clean_expired_blacklisted_tokens`` runs the same prune on
+demand.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import database.sql_db as sql_db
+
+
+def _ph(db, sql: str) -> str:
+    return sql.replace("?", "%s") if db.is_postgres else sql
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self, refresh_interval: Optional[float] = None, db_getter=None, clock=time.time):
+        self.refresh_interval = (
+            float(os.getenv("VHV_REVOCATION_REFRESH_SECONDS", "1"))
+            if refresh_interval is None else refresh_interval
+        )
+        self._db_getter = db_getter or (lambda: sql_db.default_sql_db)
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._revoked: Dict[str, float] = {}
+        self._bloom = BloomFilter(1024)
+        self._source = None
+        self._last_seq: Optional[int] = None
+        self._next_refresh = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"lookups": 0, "bloom_negatives": 0, "false_positives": 0,
+                       "refreshes": 0, "full_reloads": 0, "pruned": 0}
+
+    # ── lookups ──────────────────────────────────────────────
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() >= self._next_refresh or self._db_getter() is not self._source:
+            self.refresh()
+        self._stats["lookups"] += 1
+        if jti not in self._bloom:
+            self._stats["bloom_negatives"] += 1
+            return False
+        exp = self._revoked.get(jti)
+        if exp is None:
+            self._stats["false_positives"] += 1
+            return False
+        return self._clock() <= exp
+
+    def add(self, jti: str, exp: float) -> None:
+        """Record a revocation this worker just committed."""
+        with self._lock:
+            if jti not in self._revoked:
+                self._insert(jti, exp)
+            else:
+                self._revoked[jti] = exp
+
+    # ── synchronisation ──────────────────────────────────────
+    def refresh(self) -> None:
+        db = self._db_getter()
+        with self._lock:
+            conn = db.get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT value FROM revocation_counter WHERE id = 1")
+                row = cursor.fetchone()
+                counter = int(row[0]) if row else 0
+                full = db is not self._source or self._last_seq is None or counter < self._last_seq
+                if full:
+                    cursor.execute(
+                        _ph(db, "SELECT jti, exp FROM blacklisted_tokens WHERE exp >= ?"),
+                        (self._clock(),),
+                    )
+                    self._rebuild({r[0]: float(r[1]) for r in cursor.fetchall()})
+                    self._stats["full_reloads"] += 1
+                elif counter > self._last_seq:
+                    cursor.execute(
+                        _ph(db, "SELECT jti, exp FROM blacklisted_tokens WHERE seq > ?"),
+                        (self._last_seq,),
+                    )
+                    for jti, exp in cursor.fetchall():
+                        self.add(jti, float(exp))
+                self._source = db
+                self._last_seq = counter
+                self._stats["refreshes"] += 1
+            finally:
+                cursor.close()
+                conn.close()
+            self._next_refresh = time.monotonic() + self.refresh_interval
+
+    def prune(self) -> int:
+        """Drop expired revocations from SQL and memory; returns how many were dropped here."""
+        db = self._db_getter()
+        now = self._clock()
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_ph(db, "DELETE FROM blacklisted_tokens WHERE exp < ?"), (now,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        with self._lock:
+            live = {jti: exp for jti, exp in self._revoked.items() if exp >= now}
+            dropped = len(self._revoked) - len(live)
+            self._rebuild(live)
+            self._stats["pruned"] += dropped
+        return dropped
+
+    def _insert(self, jti: str, exp: float) -> None:
+        self._revoked[jti] = exp
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild(self._revoked)
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild(self, revoked: Dict[str, float]) -> None:
+        bloom = BloomFilter(max(1024, 2 * len(revoked)))
+        for jti in revoked:
+            bloom.add(jti)
+        # Publish the filter last, and only once it holds every entry in the set.
+        self._revoked = dict(revoked)
+        self._bloom = bloom
+
+    # ── background pruning ───────────────────────────────────
+    def start(self, prune_interval: Optional[float] = None) -> None:
+        interval = (float(os.getenv("VHV_REVOCATION_PRUNE_SECONDS", "300"))
+                    if prune_interval is None else prune_interval)
+        if self._thread is not None or interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.prune()
+                except Exception as e:
+                    print(f"[Revocation] Prune failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="revocation-prune", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "revoked": len(self._revoked), "last_seq": self._last_seq,
+                    "bloom_bits": self._bloom.size, "bloom_hashes": self._bloom.hashes,
+                    "refresh_interval": self.refresh_interval}
+
+
+revocation_list = RevocationList()
@@ -1,6 +1,4 @@
 import os
-import sqlite3
-import time
 
 # Dynamic PostgreSQL import
 try:
@@ -12,9 +10,22 @@ except ImportError:
     RealDictCursor = None
     POSTGRES_AVAILABLE = False
 
+from database import sqlite_profile
+from database.migrations import migrate
+from database.sql_pool import BoundedPool, ThreadLocalPool
+
 _PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_SQLITE_PATH = os.path.join(_PROJECT_ROOT, "database", "vault.db")
 
+
+def _env_number(name: str, default, cast=float):
+    try:
+        return cast(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+
 class SQLDatabaseManager:
     def __init__(self):
         self.db_url = os.getenv("VHV_DATABASE_URL")
@@ -37,18 +48,51 @@ class SQLDatabaseManager:
             print(f"[SQL DB] Using SQLite database at: {DEFAULT_SQLITE_PATH}")
             # Ensure database directory exists
             os.makedirs(os.path.dirname(DEFAULT_SQLITE_PATH), exist_ok=True)
+            # WAL, busy timeout, mmap and statement cache (database/sqlite_profile.py).
+            self.sqlite_profile = sqlite_profile.SQLiteProfile.from_env()
 
-        self.init_db()
-
-    def get_connection(self):
+        # Pooled connections (database/sql_pool.py): close() returns them to the pool.
+        pool_options = {
+            "max_lifetime": _env_number("VHV_SQL_POOL_MAX_LIFETIME", 1800.0),
+            "health_check_after": _env_number("VHV_SQL_POOL_HEALTH_CHECK_AFTER", 30.0),
+        }
         if self.is_postgres:
-            conn = psycopg2.connect(self.db_url)
-            # Use RealDictCursor to act like dict-like objects
-            return conn
+            self.pool = BoundedPool(
+                lambda: psycopg2.connect(self.db_url),
+                max_size=_env_number("VHV_SQL_POOL_SIZE", 10, int),
+                timeout=_env_number("VHV_SQL_POOL_TIMEOUT", 30.0),
+                **pool_options,
+            )
         else:
-            conn = sqlite3.connect(DEFAULT_SQLITE_PATH)
-            conn.row_factory = sqlite3.Row
-            return conn
+            # Keyed on the path so a re-pointed DEFAULT_SQLITE_PATH is honoured.
+            self.pool = ThreadLocalPool(
+                lambda: sqlite_profile.connect(DEFAULT_SQLITE_PATH, self.sqlite_profile),
+                key=lambda: DEFAULT_SQLITE_PATH,
+                max_idle_per_thread=_env_number("VHV_SQLITE_POOL_IDLE", 4, int),
+                **pool_options,
+            )
+
+        self.init_db()
+
+    def get_connection(self, durable: bool = False):
+        """
+        A pooled connection. ``durable=True`` is for writes that must survive a
+        power loss (revocations, erasure secrets, Dual-Control decisions); on
+        SQLite they are committed at the stricter ``synchronous`` level.
+        """
+        conn = self.pool.connection()
+        if not self.is_postgres:
+            p = self.sqlite_profile
+            conn.raw.set_synchronous(p.durable_synchronous if durable else p.synchronous)
+        return conn
+
+    def optimize(self) -> None:
+        """Refresh SQLite planner statistics; called on shutdown."""
+        if not self.is_postgres:
+            sqlite_profile.optimize(DEFAULT_SQLITE_PATH)
+
+    def pool_stats(self) -> dict:
+        return {"backend": "postgresql" if self.is_postgres else "sqlite", **self.pool.stats()}
 
     def init_db(self):
         """Creates tables if they do not exist."""
@@ -78,13 +122,8 @@ class SQLDatabaseManager:
                     account_status VARCHAR(30) DEFAULT 'ACTIVE_ENROLLED'
                 )
             """)
-            # Existing databases predate the onboarding lifecycle column.
-            try:
-                cursor.execute(
-                    "ALTER TABLE users ADD COLUMN account_status VARCHAR(30) DEFAULT 'ACTIVE_ENROLLED'"
-                )
-            except Exception:
-                pass
+            # Databases that predate the onboarding lifecycle column get it from
+            # migration 3 (database/migrations.py).
 
             # Out-of-band enrollment tokens. A provisioned account stays inactive
             # until the holder redeems a single-use token delivered out of band.
@@ -180,6 +219,15 @@ class SQLDatabaseManager:
             cursor.close()
             conn.close()
 
+        # Everything after the baseline tables is a versioned migration. A deploy
+        # that runs `python -m database.migrations` as a release step can turn
+        # the automatic run off.
+        if os.getenv("VHV_SQL_AUTO_MIGRATE", "true").lower() == "false":
+            return
+        for step in migrate(self):
+            print(f"[SQL DB] Applied migration {step['version']} "
+                  f"({step['description']}) in {step['duration_ms']:.1f} ms")
+
     def seed_default_users(self):
         """Seeds default users if database is empty."""
         conn = self.get_connection()
@@ -282,14 +330,22 @@ default_sql_db = SQLDatabaseManager()
 
 def blacklist_token(jti: str, exp: float) -> None:
     from infrastructure.repositories.sql_repositories import _to_placeholder
-    conn = default_sql_db.get_connection()
+    from database.revocation_list import revocation_list
+    conn = default_sql_db.get_connection(durable=True)
     cursor = conn.cursor()
     try:
+        # The counter bump and the row commit together, so a worker that sees
+        # the new counter value also sees the row (database/revocation_list.py).
+        cursor.execute("UPDATE revocation_counter SET value = value + 1 WHERE id = 1")
+        cursor.execute("SELECT value FROM revocation_counter WHERE id = 1")
+        seq = cursor.fetchone()[0]
         cursor.execute(_to_placeholder("SELECT 1 FROM blacklisted_tokens WHERE jti = ?"), (jti,))
         if cursor.fetchone():
-            cursor.execute(_to_placeholder("UPDATE blacklisted_tokens SET exp = ? WHERE jti = ?"), (exp, jti))
+            cursor.execute(_to_placeholder("UPDATE blacklisted_tokens SET exp = ?, seq = ? WHERE jti = ?"),
+                           (exp, seq, jti))
         else:
-            cursor.execute(_to_placeholder("INSERT INTO blacklisted_tokens (jti, exp) VALUES (?, ?)"), (jti, exp))
+            cursor.execute(_to_placeholder("INSERT INTO blacklisted_tokens (jti, exp, seq) VALUES (?, ?, ?)"),
+                           (jti, exp, seq))
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -297,44 +353,18 @@ def blacklist_token(jti: str, exp: float) -> None:
     finally:
         cursor.close()
         conn.close()
+    revocation_list.add(jti, float(exp))
 
 
 def is_token_blacklisted(jti: str) -> bool:
-    from infrastructure.repositories.sql_repositories import _to_placeholder
-    conn = default_sql_db.get_connection()
-    cursor = conn.cursor()
-    try:
-        sql = _to_placeholder("SELECT exp FROM blacklisted_tokens WHERE jti = ?")
-        cursor.execute(sql, (jti,))
-        row = cursor.fetchone()
-        if row:
-            try:
-                exp = float(row[0])
-            except (TypeError, KeyError, IndexError, ValueError):
-                exp = float(dict(row)["exp"])
-            if time.time() > exp:
-                return False
-            return True
-        return False
-    finally:
-        cursor.close()
-        conn.close()
+    """Answered from the in-memory revocation list; SQL is only read to resync it."""
+    from database.revocation_list import revocation_list
+    return revocation_list.is_revoked(jti)
 
 
 def clean_expired_blacklisted_tokens() -> None:
-    from infrastructure.repositories.sql_repositories import _to_placeholder
-    conn = default_sql_db.get_connection()
-    cursor = conn.cursor()
-    try:
-        sql = _to_placeholder("DELETE FROM blacklisted_tokens WHERE exp < ?")
-        cursor.execute(sql, (time.time(),))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        cursor.close()
-        conn.close()
+    from database.revocation_list import revocation_list
+    revocation_list.prune()
 
 def get_sql_db() -> SQLDatabaseManager:
     return default_sql_db
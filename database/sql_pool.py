@@ -0,0 +1,302 @@
+"""
+database/sql_pool.py — Connection pooling for SQLDatabaseManager
+================================================================
+``get_connection()`` is called many times per request: the principal lookup,
+the token blacklist, erasure keys, dual-control, notifications and alerts. It
+used to open a new ``sqlite3``/``psycopg2`` connection every time, which against
+PostgreSQL costs a TCP and auth handshake per call.
+
+Callers keep the API they already use. ``get_connection()`` returns a
+``PooledConnection`` that behaves like the driver connection. ``close()`` hands
+it back to the pool instead of closing it. Used as a context manager, it
+commits or rolls back like the driver connection and is then returned as well.
+
+SQLite     Connections are bound to the thread that opened them, so each thread
+           keeps its own small list of idle connections. A nested checkout on
+           the same thread (a repository call inside another) gets a separate
+           connection, so one caller's commit or rollback never touches
+           another's work.
+PostgreSQL One bounded pool shared by all threads. A checkout that finds it
+           exhausted waits up to ``timeout`` and then raises ``PoolTimeout``.
+
+Both pools ping a connection that has been idle longer than
+``health_check_after`` before handing it out. They retire connections older
+than ``max_lifetime``. ``stats()`` reports checkout and wait-time figures for
+sizing the pool against the worker count.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became available within the checkout timeout."""
+
+
+class _Entry:
+    __slots__ = ("conn", "created_at", "last_used", "key", "thread")
+
+    def __init__(self, conn: Any, key: Any = None):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.key = key
+        self.thread = threading.get_ident()
+
+
+class PooledConnection:
+    """A checked-out connection; ``close()`` returns it to its pool."""
+
+    __slots__ = ("_pool", "_entry")
+
+    def __init__(self, pool: "_BasePool", entry: _Entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self) -> Any:
+        if self._entry is None:
+            raise RuntimeError("connection has already been returned to the pool")
+        return self._entry.conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+    def close(self) -> None:
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._entry is not None:
+                if exc_type is None:
+                    self.raw.commit()
+                else:
+                    self.raw.rollback()
+        finally:
+            self.close()
+
+    def __del__(self):
+        # A caller that forgot close() must not leak the slot.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class _BasePool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_lifetime: float = 1800.0,
+        health_check_after: float = 30.0,
+    ):
+        self._connect = connect
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "checkouts": 0, "created": 0, "reused": 0, "discarded": 0,
+            "health_check_failures": 0, "waits": 0, "wait_time_total": 0.0,
+            "wait_time_max": 0.0, "timeouts": 0, "in_use": 0,
+        }
+
+    def _bump(self, **deltas: float) -> None:
+        with self._stats_lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    def _record_wait(self, waited: float) -> None:
+        with self._stats_lock:
+            self._stats["waits"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.max_lifetime > 0 and now - entry.created_at > self.max_lifetime
+
+    def _ping(self, conn: Any) -> bool:
+        cur = None
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            return True
+        except Exception:
+            return False
+        finally:
+            try:
+                if cur is not None:
+                    cur.close()
+            except Exception:
+                pass
+
+    def _usable(self, entry: _Entry, now: float) -> bool:
+        """Whether an idle entry may be handed out; discards it if not."""
+        if self._expired(entry, now):
+            self._discard(entry)
+            return False
+        if self.health_check_after >= 0 and now - entry.last_used > self.health_check_after:
+            if not self._ping(entry.conn):
+                self._bump(health_check_failures=1)
+                self._discard(entry)
+                return False
+        return True
+
+    def _new_entry(self, key: Any = None) -> _Entry:
+        entry = _Entry(self._connect(), key)
+        self._bump(created=1)
+        return entry
+
+    def _discard(self, entry: _Entry) -> None:
+        self._bump(discarded=1)
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def _reset(self, entry: _Entry) -> bool:
+        """Roll back whatever the last user left open; False if the connection is unusable."""
+        try:
+            entry.conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checked_out(self, entry: _Entry) -> PooledConnection:
+        self._bump(checkouts=1, in_use=1)
+        return PooledConnection(self, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["wait_time_avg"] = s["wait_time_total"] / s["waits"] if s["waits"] else 0.0
+        return s
+
+
+class ThreadLocalPool(_BasePool):
+    """SQLite: idle connections are kept per thread (sqlite3 objects are thread-bound)."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        key: Callable[[], Any] = lambda: None,
+        max_idle_per_thread: int = 4,
+        **kwargs: Any,
+    ):
+        super().__init__(connect, **kwargs)
+        self._key = key
+        self.max_idle_per_thread = max_idle_per_thread
+        self._local = threading.local()
+
+    def _idle(self) -> List[_Entry]:
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    def connection(self) -> PooledConnection:
+        key = self._key()
+        idle = self._idle()
+        now = time.monotonic()
+        while idle:
+            entry = idle.pop()
+            if entry.key != key:
+                # The database this manager points at has changed (tests swap it).
+                self._discard(entry)
+                continue
+            if self._usable(entry, now):
+                self._bump(reused=1)
+                return self._checked_out(entry)
+        return self._checked_out(self._new_entry(key))
+
+    def _release(self, entry: _Entry) -> None:
+        self._bump(in_use=-1)
+        now = time.monotonic()
+        idle = self._idle()
+        if (
+            entry.thread != threading.get_ident()   # released by the GC on another thread
+            or self._expired(entry, now)
+            or entry.key != self._key()
+            or len(idle) >= self.max_idle_per_thread
+            or not self._reset(entry)
+        ):
+            self._discard(entry)
+            return
+        entry.last_used = now
+        idle.append(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        s = super().stats()
+        s.update(kind="thread-local", idle_this_thread=len(self._idle()),
+                 max_idle_per_thread=self.max_idle_per_thread)
+        return s
+
+
+class BoundedPool(_BasePool):
+    """PostgreSQL: at most ``max_size`` connections shared by every thread."""
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 10, timeout: float = 30.0, **kwargs: Any):
+        super().__init__(connect, **kwargs)
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[_Entry]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def connection(self) -> PooledConnection:
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.timeout)
+            self._record_wait(time.monotonic() - started)
+            if not acquired:
+                self._bump(timeouts=1)
+                raise PoolTimeout(
+                    f"no database connection available within {self.timeout:.1f}s "
+                    f"(pool size {self.max_size})"
+                )
+        try:
+            now = time.monotonic()
+            while True:
+                try:
+                    entry = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._checked_out(self._new_entry())
+                if getattr(entry.conn, "closed", False):
+                    self._discard(entry)
+                    continue
+                if self._usable(entry, now):
+                    self._bump(reused=1)
+                    return self._checked_out(entry)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, entry: _Entry) -> None:
+        self._bump(in_use=-1)
+        try:
+            now = time.monotonic()
+            if self._expired(entry, now) or getattr(entry.conn, "closed", False) or not self._reset(entry):
+                self._discard(entry)
+            else:
+                entry.last_used = now
+                self._idle.put(entry)
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        s = super().stats()
+        s.update(kind="bounded", max_size=self.max_size, idle=self._idle.qsize(), timeout=self.timeout)
+        return s
@@ -0,0 +1,109 @@
+"""
+database/sqlite_profile.py — Connection settings for the SQLite backend
+=======================================================================
+The stock ``sqlite3.connect()`` opens the database in rollback-journal mode with
+``synchronous=FULL`` and a 5 s busy handler. With several uvicorn workers, a
+rate-limiter write on every login or an alert on every violation holds the
+single database lock long enough for other workers to fail with
+``database is locked``.
+
+Every connection in the pool is opened with this profile:
+
+  journal_mode  WAL: readers never block the writer and the writer never blocks
+                readers. The setting is stored in the database file.
+  synchronous   NORMAL by default. In WAL mode this survives an application crash
+                but may lose the last commits on power loss. Writes that must not
+                be lost use ``durable=True`` and run at FULL. These are token
+                revocations, erasure secrets and Dual-Control decisions.
+  busy_timeout  how long a writer waits for the lock before failing.
+  mmap_size     reads are served from a memory map instead of read() calls.
+  statements    size of the per-connection prepared-statement cache.
+
+All settings are read from ``VHV_SQLITE_*`` environment variables when a
+connection is opened. ``optimize()`` runs ``PRAGMA optimize`` and is called on
+shutdown so the query planner's statistics stay current.
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass
+
+_JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"}
+_SYNCHRONOUS = {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}
+
+
+def _choice(name: str, default: str, allowed) -> str:
+    value = os.getenv(name, default).strip().upper()
+    if value not in allowed:
+        raise ValueError(f"{name} must be one of {', '.join(sorted(allowed))}, got {value!r}")
+    return value
+
+
+def _int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {raw!r}")
+
+
+@dataclass(frozen=True)
+class SQLiteProfile:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    durable_synchronous: str = "FULL"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    cached_statements: int = 256
+
+    @classmethod
+    def from_env(cls) -> "SQLiteProfile":
+        d = cls()
+        return cls(
+            journal_mode=_choice("VHV_SQLITE_JOURNAL_MODE", d.journal_mode, _JOURNAL_MODES),
+            synchronous=_choice("VHV_SQLITE_SYNCHRONOUS", d.synchronous, _SYNCHRONOUS),
+            durable_synchronous=_choice("VHV_SQLITE_DURABLE_SYNCHRONOUS", d.durable_synchronous, _SYNCHRONOUS),
+            busy_timeout_ms=_int("VHV_SQLITE_BUSY_TIMEOUT_MS", d.busy_timeout_ms),
+            mmap_size=_int("VHV_SQLITE_MMAP_SIZE", d.mmap_size),
+            cached_statements=_int("VHV_SQLITE_CACHED_STATEMENTS", d.cached_statements),
+        )
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """A sqlite3 connection that remembers its current ``synchronous`` level."""
+
+    synchronous: str = ""
+
+    def set_synchronous(self, level: str) -> None:
+        # Only issued when it changes; normally every checkout is a no-op here.
+        if level != self.synchronous:
+            self.execute(f"PRAGMA synchronous={level}")
+            self.synchronous = level
+
+
+def connect(path: str, profile: SQLiteProfile) -> ProfiledConnection:
+    conn = sqlite3.connect(
+        path,
+        timeout=profile.busy_timeout_ms / 1000.0,
+        cached_statements=profile.cached_statements,
+        factory=ProfiledConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout={int(profile.busy_timeout_ms)}")
+    conn.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+    conn.execute(f"PRAGMA mmap_size={int(profile.mmap_size)}")
+    conn.set_synchronous(profile.synchronous)
+    return conn
+
+
+def optimize(path: str) -> None:
+    """Run ``PRAGMA optimize`` on ``path`` (cheap; only re-analyses what changed)."""
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
@@ -9,13 +9,15 @@ import os
 import json
 import base64
 import lmdb
-import shutil
-from typing import Optional, List, Any
+from contextlib import contextmanager
+from typing import Iterator, Optional, List, Any, Tuple
 
 from database.connection import (  # noqa: F401 - re-exported for callers
     LMDBConnectionManager, active_txn, active_project,
-    after_commit_hooks, run_after_commit,
+    after_commit_hooks, run_after_commit, parse_size,
 )
+from database.block_codec import decode_block, decode_header, decode_payload, encode_for_storage, split_payload_key, storage_entries
+from database.lmdb_layout import create_db_manager
 
 # This module is the storage facade: the unit of work and the repositories reach
 # the transaction context through `storage.active_txn` and friends rather than
@@ -32,27 +34,13 @@ _STORAGE_DIR = os.path.dirname(os.path.abspath(__file__))
 _PROJECT_ROOT = os.path.dirname(_STORAGE_DIR)
 PROJECTS_DIR = os.path.join(_PROJECT_ROOT, "backend", "projects")
 
-env_map_size = os.getenv("VHV_LMDB_MAP_SIZE")
-if env_map_size:
-    try:
-        env_map_size_clean = env_map_size.strip().upper()
-        if env_map_size_clean.endswith("G"):
-            LMDB_MAP_SIZE = int(float(env_map_size_clean[:-1]) * 1024 * 1024 * 1024)
-        elif env_map_size_clean.endswith("M"):
-            LMDB_MAP_SIZE = int(float(env_map_size_clean[:-1]) * 1024 * 1024)
-        elif env_map_size_clean.endswith("K"):
-            LMDB_MAP_SIZE = int(float(env_map_size_clean[:-1]) * 1024)
-        else:
-            LMDB_MAP_SIZE = int(env_map_size_clean)
-    except Exception:
-        LMDB_MAP_SIZE = 2 * 1024 * 1024 * 1024
-else:
-    LMDB_MAP_SIZE = 2 * 1024 * 1024 * 1024
+# Initial size of each map; maps grow in place from here (see LMDBConnectionManager).
+LMDB_MAP_SIZE = parse_size(os.getenv("VHV_LMDB_MAP_SIZE"), 2 * 1024 * 1024 * 1024)
 
 USERS_DB_NAME = "__users__"
 
 # Default instance for process-wide usage and backward compatibility
-default_db_manager = LMDBConnectionManager(PROJECTS_DIR, LMDB_MAP_SIZE)
+default_db_manager = create_db_manager(PROJECTS_DIR, LMDB_MAP_SIZE)
 
 # ──────────────────────────────────────────────
 # BACKWARD COMPATIBLE DELEGATES
@@ -82,6 +70,28 @@ def open_db(project_name: str) -> lmdb.Environment:
 def run_write_transaction(project_name: str, txn_func) -> Any:
     return default_db_manager.run_write_transaction(project_name, txn_func)
 
+@contextmanager
+def read_transaction(project_name: str, db_manager: Optional[LMDBConnectionManager] = None,
+                     buffers: bool = False) -> Iterator[Any]:
+    """
+    A read transaction on the project — or, inside a write to that same project,
+    the write transaction itself, so the reads see what the write has put so far.
+    A group-committed batch relies on this: the second append to a chain must
+    see the first one's index before either is on disk.
+
+    ``buffers=True`` asks for values as buffers into the map rather than copies.
+    They are only valid until the transaction ends, and the write transaction
+    always hands out copies, so callers must accept either.
+    """
+    txn = active_txn.get()
+    if txn is not None and active_project.get() == project_name:
+        yield txn
+        return
+    manager = db_manager or default_db_manager
+    with manager.open_db(project_name).begin(write=False, buffers=buffers) as txn:
+        yield txn
+
+
 def _block_key(index: int) -> bytes:
     return f"{index:010d}".encode("utf-8")
 
@@ -89,54 +99,301 @@ def _block_key(index: int) -> bytes:
 # BLOCK OPERATIONS
 # ──────────────────────────────────────────────
 
+_CHAIN_AUDIT_PREFIX = b"chain_audit_"
+# Set once every audit block of a chain is mirrored under `chain_audit_`. New
+# chains are born indexed (the marker is written with the genesis block); chains
+# that predate the index are backfilled on first use.
+_CHAIN_AUDIT_MARKER = b"meta_chain_audit_indexed"
+_PWD_HASH_PREFIX = b"pwd_hash_"
+
+
+def _chain_audit_key(index: int) -> bytes:
+    return _CHAIN_AUDIT_PREFIX + f"{index:010d}".encode("utf-8")
+
+
+def _chain_audit_entry(block_data: dict) -> Optional[dict]:
+    """The audit-view projection of an on-chain audit block, or None for any other block."""
+    data = block_data.get("data")
+    if not (isinstance(data, dict) and data.get("type") == "audit"):
+        return None
+    return {
+        "chain_index": block_data["index"],
+        "timestamp": block_data.get("timestamp"),
+        "action": data.get("action"),
+        "username": data.get("username"),
+        "block_index": data.get("target_block_index"),
+        "device_id": block_data.get("device_id"),
+        **{k: v for k, v in data.items()
+           if k not in ("type", "action", "username", "target_block_index", "device_id")},
+    }
+
+
 def save_block_to_db(project_name: str, index: int, block_data: dict, db_manager: Optional[LMDBConnectionManager] = None) -> None:
     manager = db_manager or default_db_manager
     def txn_block(txn):
-        key = _block_key(index)
-        value = json.dumps(block_data, ensure_ascii=False).encode("utf-8")
-        txn.put(key, value)
+        value, entries = storage_entries(block_data)
+        if any(txn.get(entry_key) not in (None, entry) for entry_key, entry in entries.items()):
+            # An earlier block's payload has the same Merkle root but other bytes
+            # (the same fields in another order, or 1 where this has "1"); keep
+            # this block's data inline rather than rewrite that one's.
+            value, entries = encode_for_storage(block_data), {}
+        for entry_key, entry in entries.items():
+            txn.put(entry_key, entry)
+        txn.put(_block_key(index), value)
         txn.put(b"meta_last_index", str(index).encode("utf-8"))
+        audit_entry = _chain_audit_entry(block_data)
+        if audit_entry is not None:
+            txn.put(_chain_audit_key(index), json.dumps(audit_entry, ensure_ascii=False).encode("utf-8"))
+        if index == 0:
+            txn.put(_CHAIN_AUDIT_MARKER, b"1")
+    manager.run_write_transaction(project_name, txn_block)
+
+
+def _iter_block_values(txn):
+    # Block keys are zero-padded digits, which sort before every other key
+    # family (meta_, salt_, audit_, ...), so the chain ends at the first
+    # non-digit key.
+    for key, value in txn.cursor():
+        if not key[:1].isdigit():
+            break
+        yield key, value
+
+
+def _decode_stored(txn, value) -> dict:
+    """A stored block with its data, fetched from ``payload_`` if it was split off."""
+    payload_key = split_payload_key(value)
+    return decode_block(value, txn.get(payload_key) if payload_key else None)
+
+
+def ensure_chain_audit_index(project_name: str, db_manager: Optional[LMDBConnectionManager] = None) -> None:
+    """Backfill the `chain_audit_` index for a chain written before it existed."""
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return
+    with read_transaction(project_name, manager) as txn:
+        if txn.get(_CHAIN_AUDIT_MARKER):
+            return
+
+    def txn_block(txn):
+        for key, value in _iter_block_values(txn):
+            try:
+                entry = _chain_audit_entry(_decode_stored(txn, value))
+            except Exception:
+                continue
+            if entry is not None:
+                txn.put(_chain_audit_key(entry["chain_index"]),
+                        json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        txn.put(_CHAIN_AUDIT_MARKER, b"1")
     manager.run_write_transaction(project_name, txn_block)
 
 
-def load_all_blocks(project_name: str, db_manager: Optional[LMDBConnectionManager] = None) -> List[dict]:
+def load_chain_audit_entries(
+    project_name: str,
+    offset: int = 0,
+    limit: int = 50,
+    db_manager: Optional[LMDBConnectionManager] = None,
+) -> List[dict]:
+    """
+    Page through a chain's audit blocks, newest first, from the `chain_audit_`
+    index — the clinical blocks around them are never read or decoded.
+    """
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return []
+    ensure_chain_audit_index(project_name, manager)
+
+    entries = []
+    with read_transaction(project_name, manager) as txn:
+        cursor = txn.cursor()
+        # Position on the last `chain_audit_` key and walk backwards.
+        if cursor.set_range(_CHAIN_AUDIT_PREFIX + b"\xff"):
+            positioned = cursor.prev()
+        else:
+            positioned = cursor.last()
+        skipped = 0
+        while positioned and len(entries) < limit:
+            key = cursor.key()
+            if not key.startswith(_CHAIN_AUDIT_PREFIX):
+                break
+            if skipped < offset:
+                skipped += 1
+            else:
+                try:
+                    entries.append(json.loads(cursor.value().decode("utf-8")))
+                except Exception:
+                    pass
+            positioned = cursor.prev()
+    return entries
+
+
+def _indexed_audit_keys(txn):
+    """(indexed, block keys of the audit blocks): the keys are only known on an indexed chain."""
+    if not txn.get(_CHAIN_AUDIT_MARKER):
+        return False, set()
+    skip = set()
+    cursor = txn.cursor()
+    if cursor.set_range(_CHAIN_AUDIT_PREFIX):
+        for key in cursor.iternext(keys=True, values=False):
+            key = bytes(key)
+            if not key.startswith(_CHAIN_AUDIT_PREFIX):
+                break
+            skip.add(key[len(_CHAIN_AUDIT_PREFIX):])
+    return True, skip
+
+
+def load_all_blocks(
+    project_name: str,
+    db_manager: Optional[LMDBConnectionManager] = None,
+    include_audit: bool = True,
+) -> List[dict]:
+    """
+    Load a chain in index order.
+
+    ``include_audit=False`` leaves out on-chain audit blocks. On an indexed chain
+    they are skipped by key, without JSON-decoding them; use it only for views of
+    the clinical records, never for hash-chain verification, which needs every link.
+    """
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return []
+
+    blocks = []
+    with read_transaction(project_name, manager) as txn:
+        indexed, skip = _indexed_audit_keys(txn) if not include_audit else (False, set())
+        for key, value in _iter_block_values(txn):
+            if key in skip:
+                continue
+            try:
+                block_data = _decode_stored(txn, value)
+            except Exception:
+                continue
+            if not include_audit and not indexed and _chain_audit_entry(block_data) is not None:
+                continue
+            blocks.append(block_data)
+    return blocks
+
+
+def load_block(project_name: str, index: int, db_manager: Optional[LMDBConnectionManager] = None) -> Optional[dict]:
+    """One block by index, or None."""
+    with read_transaction(project_name, db_manager) as txn:
+        value = txn.get(_block_key(index))
+        return _decode_stored(txn, value) if value is not None else None
+
+
+def load_block_headers(
+    project_name: str,
+    db_manager: Optional[LMDBConnectionManager] = None,
+    include_audit: bool = True,
+    payloads: bool = True,
+) -> List[Tuple[dict, Optional[memoryview]]]:
+    """
+    A chain's blocks in index order as ``(header, payload)``, decoding no payload
+    that is not needed.
+
+    ``header`` is the block dict without ``data``; its ``protection_hash`` is the
+    one stored under ``pwd_hash_``, read in the same transaction. ``payload`` is
+    the block's undecoded data section (``block_codec.decode_payload``), copied
+    out of the map, or its ``payload_`` entry if it is stored split. With
+    ``payloads=False`` it is None and nothing is copied, for scans that need
+    only indexes and hashes. A JSON block cannot be split, so its header
+    already holds ``data`` and its payload is None.
+    """
     manager = db_manager or default_db_manager
     if not manager.project_exists(project_name):
         return []
 
-    env = manager.open_db(project_name)
     blocks = []
-    with env.begin(write=False) as txn:
+    with read_transaction(project_name, manager, buffers=True) as txn:
+        indexed, skip = _indexed_audit_keys(txn) if not include_audit else (False, set())
+        pwd_hashes = _pwd_hashes(txn)
         cursor = txn.cursor()
         for key, value in cursor:
-            if (
-                key.startswith(b"meta_")
-                or key.startswith(b"salt_")
-                or key.startswith(b"audit_")
-                or key.startswith(b"user_")
-                or key.startswith(b"access_log_")
-                or key.startswith(b"pwd_hash_")
-                or key.startswith(b"consent_")
-                or key.startswith(b"notif_")
-            ):
+            key = bytes(key)
+            if not key[:1].isdigit():
+                break
+            if key in skip:
                 continue
             try:
-                block_data = json.loads(value.decode("utf-8"))
-                blocks.append(block_data)
+                header, payload = decode_header(value)
+                split_key = split_payload_key(value)
+                if split_key and (payloads or not (include_audit or indexed)):
+                    payload = txn.get(split_key)
+                if not include_audit and not indexed:
+                    data = header["data"] if payload is None else decode_payload(payload)
+                    if _chain_audit_entry({"data": data, "index": header["index"]}) is not None:
+                        continue
             except Exception:
                 continue
+            header["protection_hash"] = pwd_hashes.get(key)
+            if payload is not None:
+                payload = memoryview(bytes(payload)) if payloads else None
+            blocks.append((header, payload))
     return blocks
 
 
+def _pwd_hashes(txn, first: bytes = b"", last: Optional[bytes] = None) -> dict:
+    """Stored ``pwd_hash_`` values by block key, for block keys from ``first`` to ``last``."""
+    pwd_hashes = {}
+    cursor = txn.cursor()
+    if cursor.set_range(_PWD_HASH_PREFIX + first):
+        for key, value in cursor:
+            key = bytes(key)
+            if not key.startswith(_PWD_HASH_PREFIX):
+                break
+            block_key = key[len(_PWD_HASH_PREFIX):]
+            if last is not None and block_key > last:
+                break
+            pwd_hashes[block_key] = str(value, "utf-8")
+    return pwd_hashes
+
+
+def iter_block_headers(
+    project_name: str,
+    db_manager: Optional[LMDBConnectionManager] = None,
+    batch_size: int = 1000,
+) -> Iterator[dict]:
+    """
+    Stream a chain's block headers in index order without reading a payload.
+
+    Headers are read ``batch_size`` at a time, each batch in its own short read
+    transaction, so a long chain is never held in memory or pinned in one
+    snapshot. A header is the block dict without ``data``, with the
+    ``protection_hash`` stored under ``pwd_hash_``. A JSON block cannot be split,
+    so its header still holds ``data``.
+    """
+    manager = db_manager or default_db_manager
+    if not manager.project_exists(project_name):
+        return
+
+    start = b"0"
+    while True:
+        batch, last = [], None
+        with read_transaction(project_name, manager, buffers=True) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(start):
+                for key, value in cursor:
+                    key = bytes(key)
+                    if not key[:1].isdigit() or len(batch) >= batch_size:
+                        break
+                    last = key
+                    try:
+                        header, _ = decode_header(value)
+                    except Exception:
+                        continue
+                    batch.append((key, header))
+            if batch:
+                pwd_hashes = _pwd_hashes(txn, batch[0][0], last)
+        if last is None:
+            return
+        for key, header in batch:
+            header["protection_hash"] = pwd_hashes.get(key)
+            yield header
+        start = last + b"\x00"
+
+
 def reset_db(project_name: str, db_manager: Optional[LMDBConnectionManager] = None) -> None:
     manager = db_manager or default_db_manager
-    manager.close_db(project_name)
-    path = manager.get_db_path(project_name)
-    if os.path.exists(path):
-        try:
-            shutil.rmtree(path)
-        except Exception as e:
-            print(f"DB reset error: {e}")
+    manager.reset_project(project_name)
 
 # ──────────────────────────────────────────────
 # PER-PATIENT ENCRYPTION SALT MANAGEMENT
@@ -152,8 +409,7 @@ def save_patient_salt(project_name: str, salt: bytes, db_manager: Optional[LMDBC
 
 def get_patient_salt(project_name: str, db_manager: Optional[LMDBConnectionManager] = None) -> bytes:
     manager = db_manager or default_db_manager
-    env = manager.open_db(project_name)
-    with env.begin(write=False) as txn:
+    with read_transaction(project_name, manager) as txn:
         key = f"meta_salt_{project_name}".encode("utf-8")
         val = txn.get(key)
         if val:
@@ -174,8 +430,7 @@ def save_block_salt(project_name: str, block_index: int, salt: bytes, db_manager
 
 def load_block_salt(project_name: str, block_index: int, db_manager: Optional[LMDBConnectionManager] = None) -> Optional[bytes]:
     manager = db_manager or default_db_manager
-    env = manager.open_db(project_name)
-    with env.begin(write=False) as txn:
+    with read_transaction(project_name, manager) as txn:
         key = f"salt_{block_index:010d}".encode("utf-8")
         value = txn.get(key)
         if value:
@@ -193,8 +448,7 @@ def save_block_pwd_hash(project_name: str, block_index: int, pwd_hash: str, db_m
 
 def load_block_pwd_hash(project_name: str, block_index: int, db_manager: Optional[LMDBConnectionManager] = None) -> Optional[str]:
     manager = db_manager or default_db_manager
-    env = manager.open_db(project_name)
-    with env.begin(write=False) as txn:
+    with read_transaction(project_name, manager) as txn:
         key = f"pwd_hash_{block_index:010d}".encode("utf-8")
         val = txn.get(key)
         if val:
@@ -263,6 +517,8 @@ def load_audit_logs(project_name: str, limit: int = 100, db_manager: Optional[LM
 
 def blacklist_token(jti: str, exp: float, db_manager: Optional[LMDBConnectionManager] = None) -> None:
     _blacklist_token(jti, exp)
+    from core.services.principal_cache import principal_cache
+    principal_cache.invalidate_token(jti)
 
 def is_token_blacklisted(jti: str, db_manager: Optional[LMDBConnectionManager] = None) -> bool:
     return _is_token_blacklisted(jti)
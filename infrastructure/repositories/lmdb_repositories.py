@@ -1,6 +1,8 @@
 import secrets
-from typing import Optional, List
-from core.domain.entities import User, Block
+from functools import partial
+from typing import Iterator, Optional, List
+from core.domain.entities import User, Block, BlockView
+from database.block_codec import decode_payload
 from core.ports.repositories import IUserRepository, IBlockRepository, IAuditRepository
 import database.storage as storage
 
@@ -35,44 +37,67 @@ class LMDBBlockRepository(IBlockRepository):
     def save_block(self, project_name: str, block: Block) -> None:
         storage.save_block_to_db(project_name, block.index, block.to_dict(), self.db_manager)
 
-    def load_all_blocks(self, project_name: str) -> List[Block]:
-        raw_blocks = storage.load_all_blocks(project_name, self.db_manager)
-        blocks = []
-        for b in raw_blocks:
-            pwd_hash = self.load_block_pwd_hash(project_name, b["index"])
-            block = Block(
-                index=b["index"],
-                timestamp=b["timestamp"],
-                data=b["data"],
-                previous_hash=b["previous_hash"],
-                signature=b["signature"],
-                is_protected=b.get("is_protected", False),
-                protection_hash=pwd_hash,
-                nonce=b.get("nonce", secrets.token_hex(16)),
-                device_id=b.get("device_id"),
-                hash=b.get("hash"),
-                merkle_root=b.get("merkle_root"),
-            )
-            blocks.append(block)
-        return blocks
+    def load_all_blocks(self, project_name: str, include_audit: bool = True) -> List[BlockView]:
+        return [self._view(project_name, header, payload) for header, payload in
+                storage.load_block_headers(project_name, self.db_manager, include_audit=include_audit)]
+
+    def load_block_headers(self, project_name: str) -> List[BlockView]:
+        return list(self.iter_headers(project_name))
+
+    def iter_headers(self, project_name: str) -> Iterator[BlockView]:
+        for header in storage.iter_block_headers(project_name, self.db_manager):
+            yield self._view(project_name, header, None)
+
+    def _view(self, project_name: str, header: dict, payload) -> BlockView:
+        index = header["index"]
+        if "data" in header:
+            data = {"data": header["data"]}
+        elif payload is not None:
+            data = {"load": partial(decode_payload, payload)}
+        else:
+            data = {"load": partial(self._load_data, project_name, index)}
+        view = BlockView(
+            index=index,
+            timestamp=header["timestamp"],
+            previous_hash=header["previous_hash"],
+            signature=header["signature"],
+            is_protected=header.get("is_protected", False),
+            protection_hash=header.get("protection_hash"),
+            nonce=header["nonce"] if "nonce" in header else secrets.token_hex(16),
+            device_id=header.get("device_id"),
+            hash=header.get("hash"),
+            merkle_root=header.get("merkle_root"),
+            **data,
+        )
+        if not view.hash or (not view.merkle_root and index != 0):
+            # What Block.__post_init__ fills in for a block stored without them.
+            block = view.to_block()
+            view.hash, view.merkle_root = block.hash, block.merkle_root
+        return view
+
+    def _load_data(self, project_name: str, index: int):
+        block = storage.load_block(project_name, index, self.db_manager)
+        return block["data"] if block else None
+
+    def load_chain_audit_entries(self, project_name: str, offset: int = 0, limit: int = 50) -> List[dict]:
+        return storage.load_chain_audit_entries(project_name, offset, limit, self.db_manager)
 
     def get_last_index(self, project_name: str) -> int:
         if not self.project_exists(project_name):
             return -1
         try:
             manager = self.db_manager or storage.default_db_manager
-            env = manager.open_db(project_name)
-            with env.begin(write=False) as txn:
+            with storage.read_transaction(project_name, manager) as txn:
                 val = txn.get(b"meta_last_index")
                 if val:
                     return int(val.decode("utf-8"))
         except Exception:
             pass
 
-        blocks = storage.load_all_blocks(project_name, self.db_manager)
-        if blocks:
-            return blocks[-1]["index"]
-        return -1
+        last_index = -1
+        for header in storage.iter_block_headers(project_name, self.db_manager):
+            last_index = header["index"]
+        return last_index
 
     def project_exists(self, project_name: str) -> bool:
         manager = self.db_manager or storage.default_db_manager
@@ -116,8 +141,7 @@ class LMDBBlockRepository(IBlockRepository):
 
     def load_notarization_tx(self, project_name: str) -> Optional[str]:
         manager = self.db_manager or storage.default_db_manager
-        env = manager.open_db(project_name)
-        with env.begin(write=False) as txn:
+        with storage.read_transaction(project_name, manager) as txn:
             key = f"meta_notarization_tx_{project_name}".encode("utf-8")
             val = txn.get(key)
             if val:
@@ -133,8 +157,7 @@ class LMDBBlockRepository(IBlockRepository):
 
     def load_simulated_merkle_root(self, project_name: str) -> Optional[str]:
         manager = self.db_manager or storage.default_db_manager
-        env = manager.open_db(project_name)
-        with env.begin(write=False) as txn:
+        with storage.read_transaction(project_name, manager) as txn:
             key = f"meta_simulated_merkle_root_{project_name}".encode("utf-8")
             val = txn.get(key)
             if val:
@@ -1,7 +1,9 @@
-from typing import Any, Callable, List
+from typing import Any, Callable, List, TypeVar
 from core.ports.unit_of_work import IUnitOfWork
 import database.storage as storage
 
+T = TypeVar("T")
+
 class LMDBUnitOfWork(IUnitOfWork):
     def __init__(self, project_name: str):
         self.project_name = project_name
@@ -40,3 +42,18 @@ class LMDBUnitOfWork(IUnitOfWork):
                 except Exception as e:
                     print(f"[UnitOfWork Warning] after-commit hook failed: {e}")
         self.hooks = []
+
+    @classmethod
+    def run(cls, project_name: str, work: Callable[[], T]) -> T:
+        """
+        Run ``work()`` as one unit of work on the project.
+
+        With group commit on (database/group_commit.py) it is queued and committed
+        together with concurrent units of work on the same environment; its
+        after-commit hooks still run only once the commit is durable.
+        """
+        manager = storage.default_db_manager
+        if storage.active_txn.get() is None and manager.group_commit_enabled:
+            return manager.run_write_transaction(project_name, lambda txn: work())
+        with cls(project_name):
+            return work()
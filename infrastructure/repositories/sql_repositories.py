@@ -1,6 +1,7 @@
 from typing import Optional, List
 from core.domain.entities import User
 from core.ports.repositories import IUserRepository, INotificationRepository
+from core.services.principal_cache import principal_cache
 from database.sql_db import default_sql_db
 
 def _to_placeholder(sql: str) -> str:
@@ -76,6 +77,8 @@ class SQLUserRepository(IUserRepository):
                     user.account_status
                 ))
             conn.commit()
+            # Role, 2FA, status or password may have changed; drop cached sessions.
+            principal_cache.invalidate_user(user.username)
         except Exception as e:
             conn.rollback()
             raise e
@@ -166,6 +169,7 @@ class SQLUserRepository(IUserRepository):
             # For postgres: cursor.rowcount
             affected = cursor.rowcount > 0
             conn.commit()
+            principal_cache.invalidate_user(username)
             return affected
         except Exception as e:
             conn.rollback()
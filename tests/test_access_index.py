@@ -0,0 +1,135 @@
+"""
+tests/test_access_index.py — "everything user X touched" is an index range scan
+================================================================================
+The cross-patient access index must see every ledger append, answer per-user
+time-window queries across patients with stable pagination, and never vouch
+for an entry the tamper-evident per-patient ledger no longer backs.
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from database.access_index import INDEX_PROJECT, query_access_index, rebuild_access_index
+from database.connection import LMDBConnectionManager, active_txn, active_project
+import database.audit_storage as audit_storage
+from database.sql_db import default_sql_db
+
+
+class TestAccessIndex(unittest.TestCase):
+    def setUp(self):
+        active_txn.set(None)
+        active_project.set(None)
+        self.base = os.path.join(os.path.dirname(__file__), "test_access_index_projects")
+        shutil.rmtree(self.base, ignore_errors=True)
+        self.mgr = LMDBConnectionManager(self.base)
+        for patient in ("patient_A", "patient_B", "patient_C"):
+            self.mgr.create_project(patient)
+            for user in ("dr.smith", "dr.jones"):
+                audit_storage.append_access_log(patient, user, "RECORD_DECRYPTED", "dev",
+                                                db_manager=self.mgr)
+
+    def tearDown(self):
+        self.mgr.close_all()
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def test_appends_are_indexed_per_user_across_patients(self):
+        page = query_access_index("dr.smith", db_manager=self.mgr)
+        self.assertEqual(sorted(h["project"] for h in page["hits"]),
+                         ["patient_A", "patient_B", "patient_C"])
+        self.assertTrue(all(h["verified"] for h in page["hits"]))
+        self.assertEqual(page["hits"][0]["entry"]["username"], "dr.smith")
+        self.assertIsNone(page["next_cursor"])
+
+    def test_pagination_walks_every_hit_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = query_access_index("dr.jones", limit=2, cursor=cursor, db_manager=self.mgr)
+            seen.extend((h["project"], h["seq"]) for h in page["hits"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+
+    def test_time_window_bounds_the_scan(self):
+        future = time.time() + 3600
+        self.assertEqual(query_access_index("dr.smith", since=future, db_manager=self.mgr)["hits"], [])
+        self.assertEqual(len(query_access_index("dr.smith", until=future, db_manager=self.mgr)["hits"]), 3)
+
+    def test_tampered_ledger_entry_is_not_verified(self):
+        env = self.mgr.open_db("patient_B")
+        key = "access_log_patient_B_{:020d}".format(1).encode("utf-8")
+        with env.begin(write=True) as txn:
+            entry = json.loads(txn.get(key).decode("utf-8"))
+            entry["action"] = "NOTHING_TO_SEE"
+            txn.put(key, json.dumps(entry).encode("utf-8"))
+
+        hits = query_access_index("dr.smith", db_manager=self.mgr)["hits"]
+        verdicts = {h["project"]: h["verified"] for h in hits}
+        self.assertFalse(verdicts["patient_B"])
+        self.assertTrue(verdicts["patient_A"])
+
+    def test_rebuild_restores_a_lost_index(self):
+        shutil.rmtree(self.mgr.get_project_path(INDEX_PROJECT), ignore_errors=True)
+        self.mgr.close_all()
+        self.assertEqual(query_access_index("dr.smith", db_manager=self.mgr)["hits"], [])
+
+        result = rebuild_access_index(db_manager=self.mgr)
+        self.assertEqual(result, {"projects": 3, "indexed": 6})
+        self.assertEqual(len(query_access_index("dr.smith", db_manager=self.mgr)["hits"]), 3)
+
+    def test_foreign_cursor_is_rejected(self):
+        page = query_access_index("dr.smith", limit=1, db_manager=self.mgr)
+        with self.assertRaises(ValueError):
+            query_access_index("dr.jones", cursor=page["next_cursor"], db_manager=self.mgr)
+
+
+class TestAccessIndexEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.client = TestClient(app)
+
+    def _token(self, username, password):
+        res = self.client.post("/api/v1/auth/login",
+                               json={"username": username, "password": password})
+        self.assertEqual(res.status_code, 200, res.text)
+        return res.json()["access_token"]
+
+    def test_clinician_cannot_query_the_index(self):
+        token = self._token("dr.smith", "Doctor@2026Secure!")
+        res = self.client.get("/api/v1/compliance/access-index/dr.smith",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 403)
+
+    def test_admin_query_returns_a_page(self):
+        token = self._token("admin", "Admin@2026Secure!")
+        res = self.client.get("/api/v1/compliance/access-index/dr.smith?limit=5",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 200, res.text)
+        body = res.json()
+        for field in ("hits", "next_cursor", "all_verified"):
+            self.assertIn(field, body)
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        token = self._token("admin", "Admin@2026Secure!")
+        res = self.client.get("/api/v1/compliance/access-index/dr.smith?cursor=zz",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
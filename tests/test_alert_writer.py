@@ -0,0 +1,130 @@
+"""
+tests/test_alert_writer.py — alerts written off the request path
+================================================================
+Blocked-IP alerts are queued in memory and written in batches by a background
+thread. Repeats from one IP within the coalescing window become one row with an
+``occurrences`` count, and the rejection itself never touches the database.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.sql_db as sql_db
+from backend.middleware.ip_allowlist import IPAllowlist, IPAllowlistMiddleware
+from core.events.event_bus import AlertRaisedEvent, event_bus
+from core.services.alert_writer import AlertWriter
+from database.sql_db import SQLDatabaseManager
+
+
+def _alert(ip="203.0.113.9"):
+    return {"alert_type": "UNAUTHORIZED_IP_ACCESS", "severity": "HIGH", "title": "Blocked",
+            "description": f"probe from {ip}", "client_ip": ip}
+
+
+class TestAlertWriter(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_path = sql_db.DEFAULT_SQLITE_PATH
+        sql_db.DEFAULT_SQLITE_PATH = os.path.join(self.test_dir, "alerts.db")
+        self.addCleanup(self._restore)          # runs last, after each writer's final flush
+        self.db = SQLDatabaseManager()
+        self.now = [1000.0]
+        self.writer = AlertWriter(batch_size=1000, flush_interval=3600, coalesce_window=60,
+                                  db_getter=lambda: self.db, clock=lambda: self.now[0])
+        self.addCleanup(self.writer.stop)
+
+    def _restore(self):
+        sql_db.DEFAULT_SQLITE_PATH = self.original_path
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _rows(self):
+        conn = self.db.get_connection()
+        try:
+            return conn.execute(
+                "SELECT alert_id, client_ip, occurrences, created_at, last_seen_at FROM security_alerts "
+                "ORDER BY created_at").fetchall()
+        finally:
+            conn.close()
+
+    def test_repeats_within_the_window_become_one_counted_row(self):
+        ids = {self.writer.submit(_alert(), coalesce_key="ip|203.0.113.9") for _ in range(40)}
+        self.writer.submit(_alert("198.51.100.2"), coalesce_key="ip|198.51.100.2")
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(self._rows(), [])            # nothing written until the flush
+        self.writer.flush()
+        self.now[0] += 30
+        for _ in range(10):
+            self.writer.submit(_alert(), coalesce_key="ip|203.0.113.9")
+        self.writer.flush()
+        rows = {r[1]: r for r in self._rows()}
+        self.assertEqual(rows["203.0.113.9"][2], 50)
+        self.assertEqual(rows["203.0.113.9"][4], 1030.0)
+        self.assertEqual(rows["198.51.100.2"][2], 1)
+        self.assertEqual(self.writer.stats()["coalesced"], 49)
+
+    def test_a_new_window_starts_a_new_row(self):
+        self.writer.submit(_alert(), coalesce_key="k")
+        self.now[0] += 61
+        self.writer.submit(_alert(), coalesce_key="k")
+        self.writer.flush()
+        self.assertEqual([r[2] for r in self._rows()], [1, 1])
+
+    def test_only_new_rows_are_published_after_they_are_stored(self):
+        seen = []
+
+        def listener(event):
+            seen.append(event.alert_id)
+
+        event_bus.subscribe(AlertRaisedEvent, listener)
+        try:
+            alert_id = self.writer.submit(_alert(), coalesce_key="k")
+            self.writer.submit(_alert(), coalesce_key="k")
+            self.assertEqual(seen, [])
+            self.writer.flush()
+        finally:
+            event_bus._listeners[AlertRaisedEvent].remove(listener)
+        self.assertEqual(seen, [alert_id])
+
+    def test_failed_batch_is_retried_with_later_occurrences(self):
+        self.writer.submit(_alert(), coalesce_key="k")
+        with mock.patch.object(self.writer, "_write", side_effect=RuntimeError("db down")):
+            self.assertEqual(self.writer.flush(), 0)
+        self.writer.submit(_alert(), coalesce_key="k")
+        self.writer.flush()
+        self.assertEqual([r[2] for r in self._rows()], [2])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        writer = AlertWriter(batch_size=1000, flush_interval=3600, max_pending=2, db_getter=lambda: self.db)
+        self.addCleanup(writer.stop)
+        for i in range(5):
+            writer.submit(_alert(f"203.0.113.{i}"))
+        self.assertEqual(writer.stats()["dropped"], 3)
+
+    def test_blocked_requests_are_rejected_without_sql(self):
+        guarded = IPAllowlistMiddleware(FastAPI(), IPAllowlist(["10.0.0.0/8"], enabled=True))
+
+        async def from_public_ip(scope, receive, send):
+            await guarded({**scope, "client": ("203.0.113.50", 4000)}, receive, send)
+
+        client = TestClient(from_public_ip)
+        with mock.patch("core.services.alert_writer.alert_writer", self.writer), \
+                mock.patch.object(self.db, "get_connection", side_effect=AssertionError("SQL on request path")):
+            codes = {client.get("/api/v1/records/VIP-001").status_code for _ in range(25)}
+        self.assertEqual(codes, {403})
+        self.writer.flush()
+        rows = self._rows()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][1:3], ("203.0.113.50", 25))
+
+
+if __name__ == "__main__":
+    unittest.main()
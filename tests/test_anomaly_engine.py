@@ -0,0 +1,155 @@
+"""
+tests/test_anomaly_engine.py — anomaly detectors keep state across requests and workers
+=======================================================================================
+The "3 break-glass overrides in 15 minutes" detector used to live on a
+ConsentValidator that is rebuilt for every request, so it never fired in
+production. Detection now runs in one engine fed by the event bus. Its counters
+live in a sliding-window store that every worker on the host shares.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.services.anomaly_engine import AnomalyEngine, AnomalyRule, load_rules
+from core.services.sliding_window import MemorySlidingWindowStore, LMDBSlidingWindowStore
+from database.connection import LMDBConnectionManager
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestSlidingWindowStores(unittest.TestCase):
+    def test_memory_window_expires_old_events_and_prunes_quiet_keys(self):
+        store = MemorySlidingWindowStore(max_window=60)
+        self.assertEqual(store.hit("k", 60, now=1000), 1)
+        self.assertEqual(store.hit("k", 60, now=1030), 2)
+        self.assertEqual(store.hit("k", 60, now=1070), 2)
+        store.hit("quiet", 60, now=1000)
+        self.assertEqual(store.prune(now=1100), 1)
+        self.assertEqual(store.active_keys(), 1)
+
+    def test_limit_keeps_only_the_newest_events(self):
+        store = MemorySlidingWindowStore(max_window=60)
+        self.assertEqual([store.hit("k", 60, now=1000 + i, limit=3) for i in range(5)], [1, 2, 3, 3, 3])
+
+        base = tempfile.mkdtemp()
+        try:
+            mgr = LMDBConnectionManager(base)
+            store = LMDBSlidingWindowStore(mgr, max_window=60)
+            self.assertEqual([store.hit("k", 60, now=1000 + i, limit=3) for i in range(5)], [1, 2, 3, 3, 3])
+            with mgr.open_db(store.PROJECT).begin() as txn:
+                self.assertEqual(store._decode(txn.get(store._key("k"))), [1002.0, 1003.0, 1004.0])
+            # Events older than the window are dropped on the next hit.
+            self.assertEqual(store.hit("k", 60, now=1063.5, limit=3), 2)
+            mgr.close_all()
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_lmdb_quiet_keys_are_pruned_in_the_background(self):
+        base = tempfile.mkdtemp()
+        try:
+            mgr = LMDBConnectionManager(base)
+            now = [1000.0]
+            store = LMDBSlidingWindowStore(mgr, max_window=60, clock=lambda: now[0])
+            store.hit("quiet", 60, now=1000)
+            store.hit("busy", 60, now=1000)
+            now[0] = 1100.0
+            store.hit("busy", 60, now=1100)
+            store.start(prune_interval=0.05)
+            try:
+                deadline = time.time() + 10
+                while store.active_keys() != 1 and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                store.stop()
+            self.assertEqual(store.active_keys(), 1)
+            self.assertEqual(store.count("busy", 60, now=1100), 1)
+            mgr.close_all()
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+    def test_lmdb_store_is_shared_with_another_process(self):
+        base = tempfile.mkdtemp()
+        try:
+            mgr = LMDBConnectionManager(base)
+            store = LMDBSlidingWindowStore(mgr)
+            store.hit("dr.x", 300)
+            store.hit("dr.x", 300)
+            mgr.close_all()
+
+            script = (
+                "import sys; sys.path.insert(0, {root!r});"
+                "from database.connection import LMDBConnectionManager;"
+                "from core.services.sliding_window import LMDBSlidingWindowStore;"
+                "print(LMDBSlidingWindowStore(LMDBConnectionManager({base!r})).hit('dr.x', 300))"
+            ).format(root=_ROOT, base=base)
+            out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+            self.assertEqual(out.stdout.strip().splitlines()[-1], "3", out.stderr)
+
+            mgr = LMDBConnectionManager(base)
+            self.assertEqual(LMDBSlidingWindowStore(mgr).count("dr.x", 300), 3)
+            mgr.close_all()
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+class TestAnomalyRules(unittest.TestCase):
+    def test_env_overrides_disable_and_extend_defaults(self):
+        rules = {r.name: r for r in load_rules(
+            '[{"name": "LOGIN_BRUTE_FORCE_IP", "threshold": 50},'
+            ' {"name": "REPEATED_DECRYPT_FAILURES", "enabled": false},'
+            ' {"name": "CONSENT_EXPIRY_STORM", "actions": ["consent_expired"], "scope": "user",'
+            '  "threshold": 20, "window_seconds": 60}]'
+        )}
+        self.assertEqual(rules["LOGIN_BRUTE_FORCE_IP"].threshold, 50)
+        self.assertNotIn("REPEATED_DECRYPT_FAILURES", rules)
+        self.assertEqual(rules["CONSENT_EXPIRY_STORM"].actions, frozenset({"CONSENT_EXPIRED"}))
+
+    def test_invalid_scope_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_rules('[{"name": "X", "actions": ["A"], "scope": "patient", "threshold": 1, "window_seconds": 1}]')
+
+    def test_rule_fires_once_when_threshold_is_reached(self):
+        rule = AnomalyRule(name="T", actions=frozenset({"LOGIN_FAILED"}), scope="ip",
+                           threshold=3, window_seconds=300)
+        engine = AnomalyEngine(rules=[rule], store=MemorySlidingWindowStore())
+        engine._raise = lambda *a, **k: None
+        fired = [engine.observe("LOGIN_FAILED", "anyone", "203.0.113.9") for _ in range(5)]
+        self.assertEqual(fired, [[], [], ["T"], [], []])
+        self.assertEqual(engine.store.max_window, 300)
+        # Other IPs are counted separately; events without a subject are ignored.
+        self.assertEqual(engine.observe("LOGIN_FAILED", "anyone", "203.0.113.10"), [])
+        self.assertEqual(engine.observe("LOGIN_FAILED", "anyone", None), [])
+
+
+class TestBreakGlassAcrossRequests(unittest.TestCase):
+    def test_overrides_through_separate_validators_are_correlated(self):
+        from core.services.consent_validator import ConsentValidator
+        from core.services.alert_service import alert_service
+        from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+        import database.storage as storage
+
+        doctor = f"dr.anomaly_{os.getpid()}_{id(self)}"
+        for i in range(3):
+            # A fresh validator per override, exactly as get_consent_validator builds them.
+            ConsentValidator(LMDBBlockRepository()).break_glass_override(
+                patient_id="VIP-ANOMALY-1", doctor_username=doctor,
+                reason=f"ER #{i}", device_id="er-terminal",
+            )
+        storage.reset_db(ConsentValidator(LMDBBlockRepository())._get_project_name("VIP-ANOMALY-1"))
+
+        alerts = alert_service.get_recent_alerts(limit=20)
+        hits = [a for a in alerts
+                if a["alert_type"] == "REPEATED_BREAK_GLASS_ABUSE" and a["username"] == doctor]
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0]["severity"], "CRITICAL")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+tests/test_asgi_middleware.py — pure ASGI middleware keeps its security semantics
+=================================================================================
+The IP allowlist, CSRF check, security headers and rate limiter run as plain
+ASGI callables. They must still reject what they rejected before, harden every
+response (their own rejections included) and let streaming bodies through
+unbuffered.
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from backend.middleware.ip_allowlist import IPAllowlistMiddleware
+
+
+def _probe_app():
+    probe = FastAPI()
+
+    @probe.get("/api/v1/stream")
+    def stream():
+        return StreamingResponse((f"chunk-{i}\n" for i in range(3)), media_type="text/plain")
+
+    @probe.post("/api/v1/echo")
+    def echo():
+        return {"ok": True}
+
+    probe.user_middleware = list(app.user_middleware)
+    return probe
+
+
+class TestASGIMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.env = mock.patch.dict(os.environ, {"TESTING": "false", "ENVIRONMENT": "development"})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        self.client = TestClient(_probe_app())
+
+    def test_no_layer_is_a_base_http_middleware(self):
+        for m in app.user_middleware:
+            self.assertFalse(issubclass(m.cls, BaseHTTPMiddleware), m.cls.__name__)
+
+    def test_streaming_response_is_passed_through_and_hardened(self):
+        with self.client.stream("GET", "/api/v1/stream") as res:
+            chunks = list(res.iter_text())
+            headers = res.headers
+        self.assertEqual("".join(chunks), "chunk-0\nchunk-1\nchunk-2\n")
+        self.assertEqual(headers["x-frame-options"], "SAMEORIGIN")
+        self.assertIn("object-src 'none'", headers["content-security-policy"])
+
+    def test_safe_request_without_a_token_is_issued_one(self):
+        res = self.client.get("/api/v1/stream")
+        self.assertEqual(len(res.cookies.get("csrf_token", "")), 64)
+        self.assertIn("SameSite=strict", res.headers["set-cookie"])
+
+    def test_unsafe_request_needs_a_matching_token(self):
+        res = self.client.post("/api/v1/echo", headers={"X-CSRF-Token": "nope"})
+        self.assertEqual(res.status_code, 403)
+        self.assertIn("CSRF", res.json()["detail"])
+        self.assertEqual(res.headers["x-content-type-options"], "nosniff")
+
+        token = self.client.get("/api/v1/stream").cookies["csrf_token"]
+        self.client.cookies.set("csrf_token", token)
+        res = self.client.post("/api/v1/echo", headers={"X-CSRF-Token": token})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("set-cookie", res.headers)
+
+    def test_frontend_assets_are_revalidated(self):
+        self.assertEqual(TestClient(app).get("/").headers.get("cache-control"), "no-cache, must-revalidate")
+
+    def test_blocked_ip_gets_a_hardened_403(self):
+        guarded = IPAllowlistMiddleware(FastAPI())
+
+        async def from_public_ip(scope, receive, send):
+            await guarded({**scope, "client": ("203.0.113.7", 4000)}, receive, send)
+
+        client = TestClient(from_public_ip)
+        with mock.patch("core.services.alert_service.alert_service.enqueue_alert") as alert:
+            res = client.get("/api/v1/records/VIP-001")
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(res.json()["client_ip"], "203.0.113.7")
+        self.assertIn("content-security-policy", res.headers)
+        alert.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
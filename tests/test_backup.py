@@ -0,0 +1,167 @@
+"""
+tests/test_backup.py — online compacting backups and their signed manifests
+===========================================================================
+``database.backup`` copies every environment while the store stays open,
+records each chain's head in a signed manifest and can restore the lot. An
+incremental backup must copy only what changed, and ``verify`` must catch a
+tampered file or manifest without decrypting anything.
+"""
+
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import lmdb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain.factories import BlockFactory
+from core.utils.crypto_utils import calculate_merkle_root
+import database.backup as backup_module
+from database import storage
+from database.backup import MANIFEST, backup, restore, verify
+from database.lmdb_layout import create_db_manager
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+
+_MAP = 16 * 1024 * 1024
+
+
+def _quiet(_):
+    pass
+
+
+def _gated_copy(gate, env_path, data_dir):
+    """A copy process that holds a read snapshot until the test lets it go on."""
+    env = lmdb.open(env_path, readonly=True, subdir=True, max_dbs=0)
+    with env.begin():
+        open(os.path.join(gate, f"started-{os.path.basename(os.path.dirname(env_path))}"), "w").close()
+        while not os.path.exists(os.path.join(gate, "release")):
+            time.sleep(0.01)
+    env.close()
+    backup_module._compact_copy(env_path, data_dir)
+
+
+class TestBackup(unittest.TestCase):
+    layout = "per_project"
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.dest = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.addCleanup(shutil.rmtree, self.dest, True)
+        self.mgr = create_db_manager(self.base, _MAP, layout=self.layout)
+        self.addCleanup(self.mgr.close_all)
+        self.repo = LMDBBlockRepository(self.mgr)
+        for project in ("patient_a", "patient_b"):
+            self._append(project, {"type": "lab", "result": project})
+        storage.append_access_log("patient_a", "dr_house", "read", db_manager=self.mgr)
+        # What the notarizer anchors after a write to patient_a.
+        self.repo.save_simulated_merkle_root(
+            "patient_a", calculate_merkle_root([b.hash for b in self.repo.iter_headers("patient_a")]))
+
+    def _append(self, project, data):
+        last = self.repo.get_last_index(project)
+        if last < 0:
+            genesis = BlockFactory.create_genesis_block()
+            self.repo.save_block(project, genesis)
+            last = 0
+        previous = self.repo.load_all_blocks(project)[-1]
+        self.repo.save_block(project, BlockFactory.create_data_block(last + 1, previous.hash, data))
+
+    def _env(self, project):
+        return self.mgr._env_key(project)
+
+    def test_backup_records_chain_heads_and_verifies(self):
+        manifest = backup(self.dest, self.mgr, log=_quiet)
+        chains = manifest["environments"][self._env("patient_a")]["chains"]
+        head = chains["patient_a"]
+        self.assertEqual(head["last_index"], 1)
+        self.assertEqual(head["head_hash"], self.repo.load_all_blocks("patient_a")[-1].hash)
+        self.assertTrue(head["anchored"])
+        self.assertEqual(head["access_seq"], 1)
+
+        report = verify(os.path.join(self.dest, manifest["id"]))
+        self.assertTrue(report["valid"], report["problems"])
+        self.assertEqual(report["chains"], 2)
+        self.assertEqual(report["unanchored"], [f"{self._env('patient_b')}/patient_b"])
+
+    def test_incremental_copies_only_changed_environments(self):
+        first = backup(self.dest, self.mgr, log=_quiet)
+        self._append("patient_b", {"type": "lab", "result": "again"})
+        second = backup(self.dest, self.mgr, incremental=True, log=_quiet)
+        self.assertEqual(second["base"], first["id"])
+        self.assertEqual(second["copied"], [self._env("patient_b")])
+        if self._env("patient_a") != self._env("patient_b"):
+            self.assertEqual(second["environments"]["patient_a"]["source"], first["id"])
+        self.assertEqual(backup(self.dest, self.mgr, incremental=True, log=_quiet)["copied"], [])
+
+        target = os.path.join(tempfile.mkdtemp(), "projects")
+        self.addCleanup(shutil.rmtree, os.path.dirname(target), True)
+        restore(os.path.join(self.dest, second["id"]), target, log=_quiet)
+        restored = create_db_manager(target, _MAP, layout=self.layout)
+        self.addCleanup(restored.close_all)
+        self.assertEqual(storage.load_all_blocks("patient_b", restored),
+                         storage.load_all_blocks("patient_b", self.mgr))
+        self.assertEqual(storage.load_all_blocks("patient_a", restored),
+                         storage.load_all_blocks("patient_a", self.mgr))
+
+    def test_the_map_grows_while_a_copy_runs(self):
+        def upload(n):
+            def txn_block(txn):
+                txn.put(f"attachment_{n:04d}".encode(), os.urandom(1024 * 1024))
+            self.mgr.run_write_transaction("attachments", txn_block)
+        upload(0)
+        gate = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, gate, True)
+        started = os.path.join(gate, "started-attachments")
+
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(manifest=backup(self.dest, self.mgr, log=_quiet)))
+        with mock.patch.object(backup_module, "_compact_copy", functools.partial(_gated_copy, gate)):
+            thread.start()
+            deadline = time.monotonic() + 60
+            while not os.path.exists(started) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(os.path.exists(started), "copy process did not start")
+            for n in range(1, 24):               # 24 MB into a 16 MB map
+                upload(n)
+            open(os.path.join(gate, "release"), "w").close()
+            thread.join(60)
+        self.assertGreater(self.mgr.stats()["maps"]["attachments"]["map_size"], _MAP)
+
+        self.assertTrue(verify(os.path.join(self.dest, result["manifest"]["id"]))["valid"])
+
+    def test_tampering_is_caught(self):
+        manifest = backup(self.dest, self.mgr, log=_quiet)
+        backup_dir = os.path.join(self.dest, manifest["id"])
+
+        forged = dict(manifest, copied=[])
+        with open(os.path.join(backup_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(forged, f)
+        self.assertIn("manifest signature does not verify", verify(backup_dir)["problems"])
+
+        with open(os.path.join(backup_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        entry = manifest["environments"][self._env("patient_a")]
+        with open(os.path.join(backup_dir, entry["path"]), "r+b") as f:
+            f.seek(entry["bytes"] - 1)
+            f.write(b"\x01")
+        report = verify(backup_dir)
+        self.assertFalse(report["valid"])
+        with self.assertRaises(RuntimeError):
+            restore(backup_dir, os.path.join(self.base, "restored"), log=_quiet)
+
+
+class TestConsolidatedBackup(TestBackup):
+    layout = "consolidated"
+
+
+if __name__ == "__main__":
+    unittest.main()
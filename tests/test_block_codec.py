@@ -0,0 +1,109 @@
+"""
+tests/test_block_codec.py — binary block encoding and the in-place migrator
+===========================================================================
+A block written in binary must load as exactly the dict its JSON form loaded
+as, so its hash still verifies. Chains holding both formats must load, and
+``migrate`` must convert a store without losing a block.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain.entities import Block
+from core.domain.factories import BlockFactory
+from database import storage
+from database.block_codec import decode_block, encode_block, encode_for_storage, is_binary, migrate
+from database.connection import LMDBConnectionManager
+
+_MAP = 16 * 1024 * 1024
+
+
+def _chain(length: int = 5):
+    blocks = [BlockFactory.create_genesis_block()]
+    for i in range(1, length):
+        blocks.append(BlockFactory.create_data_block(
+            i, blocks[-1].hash, {"type": "lab", "result": f"Hb {12 + i / 10} g/dL", "tags": ["ä", i]},
+            is_protected=i % 2 == 0, protection_hash="$argon2id$v=19$m=65536$x" if i % 2 == 0 else None,
+        ))
+    return blocks
+
+
+class TestBlockCodec(unittest.TestCase):
+    def test_round_trip_keeps_every_field_and_the_hash(self):
+        for block in _chain():
+            encoded = encode_block(block.to_dict())
+            self.assertTrue(is_binary(encoded))
+            decoded = decode_block(encoded)
+            self.assertEqual(decoded, block.to_dict())
+            self.assertEqual(Block.from_dict(decoded).create_hash(), block.hash)
+
+    def test_binary_is_smaller_than_json(self):
+        block = _chain(2)[1].to_dict()
+        self.assertLess(len(encode_block(block)), 0.75 * len(json.dumps(block, ensure_ascii=False)))
+
+    def test_values_outside_the_layout_survive_unchanged(self):
+        odd = {"index": 3, "timestamp": 1700000000, "data": "plain text", "previous_hash": "ABCDEF",
+               "signature": "not-hex", "nonce": "0a1b", "device_id": None, "legacy": {"k": 1}}
+        decoded = decode_block(encode_block(odd))
+        self.assertIs(type(decoded["timestamp"]), int)
+        self.assertEqual({k: decoded[k] for k in odd}, odd)
+
+    def test_json_blocks_still_decode(self):
+        block = _chain(2)[1].to_dict()
+        self.assertEqual(decode_block(json.dumps(block).encode()), block)
+
+    def test_unknown_version_is_rejected(self):
+        encoded = bytearray(encode_block(_chain(1)[0].to_dict()))
+        encoded[1] = 99
+        with self.assertRaises(ValueError):
+            decode_block(bytes(encoded))
+
+
+class TestBlockMigration(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.mgr = LMDBConnectionManager(self.base, _MAP)
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.addCleanup(self.mgr.close_all)
+        self.blocks = [b.to_dict() for b in _chain(6)]
+
+        def write(txn):
+            # The first four blocks as a release before the binary codec wrote them.
+            for b in self.blocks:
+                fmt = "json" if b["index"] < 4 else "binary"
+                txn.put(f"{b['index']:010d}".encode(), encode_for_storage(b, fmt))
+        self.mgr.run_write_transaction("patient_a", write)
+
+    def _stored(self):
+        with self.mgr.open_db("patient_a").begin() as txn:
+            return [bytes(v) for k, v in txn.cursor() if k[:1].isdigit()]
+
+    def test_a_mixed_chain_loads_in_order(self):
+        self.assertEqual([is_binary(v) for v in self._stored()], [False] * 4 + [True] * 2)
+        self.assertEqual(storage.load_all_blocks("patient_a", self.mgr), self.blocks)
+
+    def test_migrate_converts_in_place_and_back(self):
+        # The JSON blocks are re-encoded, and the inline binary ones have their payloads split off.
+        dry = migrate("binary", self.mgr, dry_run=True, log=lambda _: None)
+        self.assertEqual((dry["converted"], [is_binary(v) for v in self._stored()].count(True)), (6, 2))
+
+        totals = migrate("binary", self.mgr, log=lambda _: None)
+        self.assertEqual((totals["chains"], totals["blocks"], totals["converted"], totals["kept"]), (1, 6, 6, 0))
+        self.assertLess(totals["bytes_after"], totals["bytes_before"])
+        self.assertTrue(all(is_binary(v) for v in self._stored()))
+        self.assertEqual(storage.load_all_blocks("patient_a", self.mgr), self.blocks)
+        self.assertEqual(migrate("binary", self.mgr, log=lambda _: None)["converted"], 0)
+
+        migrate("json", self.mgr, log=lambda _: None)
+        self.assertFalse(any(is_binary(v) for v in self._stored()))
+        self.assertEqual(storage.load_all_blocks("patient_a", self.mgr), self.blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+tests/test_block_view.py — chains load as slotted views with lazy payloads
+==========================================================================
+``LMDBBlockRepository`` hands out ``BlockView``s: header fields decoded, data
+decoded only when read. A view must be indistinguishable from the ``Block``
+that was saved, and header-only scans must never decode a payload.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain.entities import BlockView
+from core.domain.factories import BlockFactory
+from core.utils.crypto_utils import calculate_merkle_root
+from database.block_codec import encode_for_storage
+from database.connection import LMDBConnectionManager
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+
+_MAP = 16 * 1024 * 1024
+PROJECT = "patient_view"
+
+
+class TestBlockView(unittest.TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"VHV_BLOCK_FORMAT": "binary"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.base = tempfile.mkdtemp()
+        self.mgr = LMDBConnectionManager(self.base, _MAP)
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.addCleanup(self.mgr.close_all)
+        self.repo = LMDBBlockRepository(self.mgr)
+
+        self.blocks = [BlockFactory.create_genesis_block()]
+        for i in range(1, 5):
+            self.blocks.append(BlockFactory.create_data_block(
+                i, self.blocks[-1].hash, {"type": "lab", "result": f"panel {i}"},
+                is_protected=i == 3, protection_hash="pbkdf2$x" if i == 3 else None,
+            ))
+        for block in self.blocks:
+            self.repo.save_block(PROJECT, block)
+        self.repo.save_block_pwd_hash(PROJECT, 3, "pbkdf2$x")
+
+    def test_views_match_the_saved_blocks(self):
+        views = self.repo.load_all_blocks(PROJECT)
+        self.assertTrue(all(isinstance(v, BlockView) for v in views))
+        self.assertFalse(any(v.data_loaded for v in views))
+        for view, block in zip(views, self.blocks):
+            self.assertEqual(view.to_dict(), block.to_dict())
+            self.assertEqual(view.create_hash(), block.hash)
+        self.assertEqual(views[3].protection_hash, "pbkdf2$x")
+        self.assertFalse(hasattr(views[0], "__dict__"))
+
+    def test_header_only_scans_leave_payloads_alone(self):
+        views = self.repo.load_block_headers(PROJECT)
+        self.assertEqual([v.hash for v in views], [b.hash for b in self.blocks])
+        calculate_merkle_root([v.hash for v in views])  # what the notarizer and proofs do with them
+        self.assertFalse(any(v.data_loaded for v in views))
+        # Read on demand, from the store, after the scan's transaction is long gone.
+        self.assertEqual(views[2].data, self.blocks[2].data)
+        self.assertTrue(views[2].data_loaded)
+
+    def test_json_blocks_arrive_decoded(self):
+        def rewrite(txn):
+            txn.put(b"0000000001", encode_for_storage(self.blocks[1].to_dict(), "json"))
+        self.mgr.run_write_transaction(PROJECT, rewrite)
+        views = self.repo.load_all_blocks(PROJECT)
+        self.assertTrue(views[1].data_loaded)
+        self.assertEqual(views[1].data, self.blocks[1].data)
+        self.assertFalse(views[2].data_loaded)
+
+    def test_last_index_falls_back_to_a_header_scan(self):
+        def drop_meta(txn):
+            txn.delete(b"meta_last_index")
+        self.mgr.run_write_transaction(PROJECT, drop_meta)
+        self.assertEqual(self.repo.get_last_index(PROJECT), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
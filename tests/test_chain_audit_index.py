@@ -0,0 +1,86 @@
+"""
+tests/test_chain_audit_index.py — audit views read an index, not the clinical chain
+===================================================================================
+Every record write also appends an audit block, so half of a chain is audit
+blocks. They are mirrored under `chain_audit_` on append: the audit view pages
+through that index newest-first, record listings skip the audit blocks by key,
+and chains written before the index existed are backfilled on first use.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.storage as storage
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository, LMDBAuditRepository
+from infrastructure.cryptography.crypto_strategies import AESGCMStrategy
+from core.services.record_service import RecordService
+from core.services.audit_service import AuditService
+
+PATIENT_ID = "VIP-AUDIT-IDX-1"
+
+
+class TestChainAuditIndex(unittest.TestCase):
+    def setUp(self):
+        self.block_repo = LMDBBlockRepository()
+        self.record_service = RecordService(self.block_repo, AESGCMStrategy())
+        self.audit_service = AuditService(LMDBAuditRepository(), self.record_service)
+        self.project = self.record_service._get_project_name(PATIENT_ID)
+        storage.reset_db(self.project)
+        for i in range(3):
+            self.record_service.add_record(
+                PATIENT_ID, {"record_type": "lab_result", "title": f"Panel {i}"},
+                username=f"dr.audit{i}",
+            )
+
+    def tearDown(self):
+        storage.reset_db(self.project)
+
+    def test_chain_audit_view_pages_newest_first(self):
+        first = self.audit_service.get_audit_logs(PATIENT_ID, limit=2, source="blockchain")
+        rest = self.audit_service.get_audit_logs(PATIENT_ID, limit=2, source="blockchain", offset=2)
+        self.assertEqual([e["username"] for e in first], ["dr.audit2", "dr.audit1"])
+        self.assertEqual([e["username"] for e in rest], ["dr.audit0"])
+        self.assertEqual(first[0]["action"], "BLOCK_ADDED")
+        self.assertEqual(first[0]["block_index"], 5)
+
+    def test_index_matches_a_full_chain_walk(self):
+        chain = self.block_repo.load_all_blocks(self.project)
+        walked = [b.index for b in reversed(chain)
+                  if isinstance(b.data, dict) and b.data.get("type") == "audit"]
+        indexed = [e["chain_index"] for e in
+                   self.block_repo.load_chain_audit_entries(self.project, 0, 100)]
+        self.assertEqual(indexed, walked)
+
+    def test_record_view_skips_audit_blocks_but_verification_keeps_them(self):
+        records = self.block_repo.load_all_blocks(self.project, include_audit=False)
+        self.assertEqual([b.index for b in records], [0, 1, 3, 5])
+        self.assertEqual(len(self.record_service.get_chain(PATIENT_ID)), 7)
+        self.assertTrue(self.record_service.is_chain_valid(PATIENT_ID))
+
+    def test_legacy_chain_is_backfilled_on_first_use(self):
+        env = storage.open_db(self.project)
+        with env.begin(write=True) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(b"chain_audit_"):
+                while cursor.key().startswith(b"chain_audit_"):
+                    if not cursor.delete():
+                        break
+            txn.delete(b"meta_chain_audit_indexed")
+
+        # Unindexed: record view still drops audit blocks, by decoding them.
+        self.assertEqual(len(self.block_repo.load_all_blocks(self.project, include_audit=False)), 4)
+        entries = self.block_repo.load_chain_audit_entries(self.project, 0, 100)
+        self.assertEqual([e["chain_index"] for e in entries], [6, 4, 2])
+
+    def test_merged_view_tags_each_source(self):
+        merged = self.audit_service.get_audit_logs(PATIENT_ID, limit=50, source="merged")
+        self.assertEqual({e["source"] for e in merged}, {"db", "blockchain"})
+        stamps = [e["timestamp"] for e in merged]
+        self.assertEqual(stamps, sorted(stamps, reverse=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
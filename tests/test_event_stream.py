@@ -0,0 +1,229 @@
+"""
+tests/test_event_stream.py — security dashboards are pushed events, not polling SQL
+===================================================================================
+Alerts and access events fan out from the EventBus to every subscribed dashboard
+through one in-process hub. Subscribers see only what their filters ask for, and
+a reconnecting client resumes from its last event id without losing anything
+that is still buffered.
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from core.events.stream import EventStreamHub, LMDBEventLog, StreamFilter, build_filter, event_stream
+from core.services.alert_service import alert_service
+from database.connection import LMDBConnectionManager
+from database.sql_db import default_sql_db
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _event(kind="alert", type_="BREAK_GLASS_BYPASS", severity="CRITICAL", project="patient_x"):
+    return {"kind": kind, "type": type_, "severity": severity, "project": project}
+
+
+class TestEventStreamHub(unittest.TestCase):
+    def test_publish_from_worker_thread_reaches_subscriber(self):
+        hub = EventStreamHub()
+
+        async def run():
+            sub, backlog, gap = hub.subscribe(StreamFilter())
+            t = threading.Thread(target=hub.publish, args=(_event(),))
+            t.start()
+            token, event = await asyncio.wait_for(sub.queue.get(), timeout=2)
+            t.join()
+            hub.unsubscribe(sub)
+            return token, event, backlog, gap
+
+        token, event, backlog, gap = asyncio.run(run())
+        self.assertEqual(event["type"], "BREAK_GLASS_BYPASS")
+        self.assertTrue(token.startswith(hub.epoch + "."))
+        self.assertEqual((backlog, gap), ([], False))
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_filters_are_applied_before_delivery(self):
+        hub = EventStreamHub()
+
+        async def run():
+            sub, _, _ = hub.subscribe(StreamFilter(severities=frozenset({"CRITICAL"})))
+            hub.publish(_event(severity="LOW"))
+            hub.publish(_event(severity="CRITICAL"))
+            await asyncio.sleep(0)
+            items = []
+            while not sub.queue.empty():
+                items.append(sub.queue.get_nowait()[1])
+            return items
+
+        items = asyncio.run(run())
+        self.assertEqual([e["severity"] for e in items], ["CRITICAL"])
+
+    def test_resume_replays_only_missed_events(self):
+        hub = EventStreamHub()
+        first = hub.publish(_event(type_="A"))
+        hub.publish(_event(type_="B"))
+        hub.publish(_event(type_="C"))
+        backlog, gap = hub.replay(StreamFilter(), first)
+        self.assertFalse(gap)
+        self.assertEqual([e["type"] for _, e in backlog], ["B", "C"])
+
+    def test_gap_beyond_buffer_or_foreign_epoch_is_reported(self):
+        hub = EventStreamHub(buffer_size=2)
+        first = hub.publish(_event(type_="A"))
+        for t in ("B", "C", "D"):
+            hub.publish(_event(type_=t))
+        backlog, gap = hub.replay(StreamFilter(), first)
+        self.assertTrue(gap)
+        self.assertEqual([e["type"] for _, e in backlog], ["C", "D"])
+        self.assertTrue(hub.replay(StreamFilter(), "deadbeef.1")[1])
+
+    def test_slow_subscriber_is_marked_overflowed_not_blocking(self):
+        hub = EventStreamHub()
+
+        async def run():
+            sub, _, _ = hub.subscribe(StreamFilter())
+            for _ in range(sub.queue.maxsize + 5):
+                hub.publish(_event())
+            await asyncio.sleep(0)
+            return sub
+
+        sub = asyncio.run(run())
+        self.assertTrue(sub.overflowed)
+        self.assertEqual(sub.queue.qsize(), sub.queue.maxsize)
+
+    def test_unresolvable_patient_filter_matches_nothing(self):
+        flt = build_filter(patient_id=" , ")
+        self.assertFalse(flt.matches(_event()))
+
+    def test_raised_alert_is_published_to_the_stream(self):
+        alert_id = alert_service.raise_alert(
+            alert_type="STREAM_TEST", severity="LOW", title="t", description="d",
+        )
+        backlog, _ = event_stream.replay(StreamFilter(types=frozenset({"STREAM_TEST"})))
+        self.assertIn(alert_id, [e.get("alert_id") for _, e in backlog])
+
+
+class TestSharedEventLog(unittest.TestCase):
+    """With the lmdb backend every worker on the host writes to and tails one log."""
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.mgr = LMDBConnectionManager(self.base)
+        self.addCleanup(self.mgr.close_all)
+
+    def test_event_published_by_another_process_reaches_subscriber(self):
+        hub = EventStreamHub(log=LMDBEventLog(self.mgr), poll_interval=0.05)
+        self.addCleanup(hub.stop)
+        script = (
+            "import sys; sys.path.insert(0, {root!r});"
+            "from database.connection import LMDBConnectionManager;"
+            "from core.events.stream import EventStreamHub, LMDBEventLog;"
+            "hub = EventStreamHub(log=LMDBEventLog(LMDBConnectionManager({base!r})));"
+            "print(hub.publish({{'kind': 'alert', 'type': 'OTHER_WORKER', 'severity': 'HIGH'}}))"
+        ).format(root=_ROOT, base=self.base)
+
+        async def run():
+            sub, _, _ = hub.subscribe(StreamFilter(types=frozenset({"OTHER_WORKER"})))
+            hub.publish(_event(type_="LOCAL"))
+            out = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: subprocess.run([sys.executable, "-c", script],
+                                             capture_output=True, text=True, timeout=60))
+            token, event = await asyncio.wait_for(sub.queue.get(), timeout=10)
+            hub.unsubscribe(sub)
+            return out, token, event
+
+        out, token, event = asyncio.run(run())
+        self.assertEqual(out.stdout.strip().splitlines()[-1], token, out.stderr)
+        self.assertEqual((event["type"], event["seq"]), ("OTHER_WORKER", 2))
+
+    def test_token_from_one_worker_resumes_on_another(self):
+        worker_a = EventStreamHub(log=LMDBEventLog(self.mgr, size=3))
+        worker_b = EventStreamHub(log=LMDBEventLog(self.mgr, size=3))
+        first = worker_a.publish(_event(type_="A"))
+        worker_b.publish(_event(type_="B"))
+        worker_a.publish(_event(type_="C"))
+        backlog, gap = worker_b.replay(StreamFilter(), first)
+        self.assertFalse(gap)
+        self.assertEqual([e["type"] for _, e in backlog], ["B", "C"])
+
+        worker_b.publish(_event(type_="D"))
+        worker_b.publish(_event(type_="E"))
+        backlog, gap = worker_a.replay(StreamFilter(), first)
+        self.assertTrue(gap)
+        self.assertEqual([e["type"] for _, e in backlog], ["C", "D", "E"])
+
+        # A fresh store is a new log: old tokens are stale there.
+        other = LMDBConnectionManager(tempfile.mkdtemp(dir=self.base))
+        self.addCleanup(other.close_all)
+        fresh = EventStreamHub(log=LMDBEventLog(other))
+        fresh.publish(_event())
+        self.assertTrue(fresh.replay(StreamFilter(), first)[1])
+
+    def test_subscriber_behind_the_log_is_overflowed(self):
+        hub = EventStreamHub(log=LMDBEventLog(self.mgr, size=2), poll_interval=0)
+        writer = LMDBEventLog(self.mgr, size=2)
+
+        async def run():
+            sub, _, _ = hub.subscribe(StreamFilter())
+            for t in ("A", "B", "C"):
+                writer.append(_event(type_=t))     # another worker; not pumped here yet
+            hub.pump()
+            await asyncio.sleep(0)
+            return sub
+
+        sub = asyncio.run(run())
+        self.assertTrue(sub.overflowed)
+        self.assertTrue(sub.queue.empty())
+
+
+class TestEventStreamEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.client = TestClient(app)
+
+    def _token(self, username, password):
+        res = self.client.post("/api/v1/auth/login",
+                               json={"username": username, "password": password})
+        self.assertEqual(res.status_code, 200, res.text)
+        return res.json()["access_token"]
+
+    def test_clinician_cannot_subscribe(self):
+        token = self._token("dr.smith", "Doctor@2026Secure!")
+        res = self.client.get("/api/v1/security/stream?catch_up=true",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 403)
+
+    def test_catch_up_returns_missed_alerts_as_sse(self):
+        token = self._token("sec.officer", "SecOfficer@2026!")
+        marker = event_stream.publish(_event(type_="BEFORE_MARKER"))
+        alert_service.raise_alert(alert_type="STREAM_ENDPOINT_TEST", severity="HIGH",
+                                  title="t", description="d")
+        res = self.client.get(
+            "/api/v1/security/stream?catch_up=true&alert_type=stream_endpoint_test",
+            headers={"Authorization": f"Bearer {token}", "Last-Event-ID": marker},
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.headers["content-type"].startswith("text/event-stream"))
+        self.assertIn("event: alert", res.text)
+        self.assertIn("STREAM_ENDPOINT_TEST", res.text)
+        self.assertNotIn("BEFORE_MARKER", res.text)
+        self.assertNotIn("event: reset", res.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+tests/test_group_commit.py — concurrent writes share one LMDB commit
+====================================================================
+Writes queued while another batch commits go out together in one write
+transaction (database/group_commit.py). Each one must still behave as if it ran
+alone: chain appends link in order, a failing write rolls back by itself, and
+nothing after the commit runs before the data is on disk.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import storage
+from database.connection import LMDBConnectionManager, run_after_commit
+from database.group_commit import GroupCommitCoordinator
+from database.lmdb_layout import ConsolidatedLMDBManager
+
+_MB = 1024 * 1024
+
+
+def _append(mgr, project, payload=b"block"):
+    """A chain append: read the last index through the write, then link to it."""
+    with storage.read_transaction(project, mgr) as txn:
+        last = txn.get(b"meta_last_index")
+    index = int(last) + 1 if last else 0
+    key = f"{index:010d}".encode()
+    with storage.read_transaction(project, mgr) as txn:
+        assert txn.get(key) is None, f"index {index} written twice"
+    txn = storage.active_txn.get()
+    txn.put(key, payload)
+    txn.put(b"meta_last_index", str(index).encode())
+    return index
+
+
+def _read_all(mgr, project):
+    with mgr.open_db(project).begin() as txn:
+        return {k: v for k, v in txn.cursor()}
+
+
+class _Gate:
+    """Holds the first write of a batch open until the rest have queued behind it."""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, txn):
+        self.entered.set()
+        self.release.wait(5)
+        txn.put(b"gate", b"1")
+
+
+class TestGroupCommit(unittest.TestCase):
+    manager_class = LMDBConnectionManager
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.mgr = self.manager_class(self.base, 16 * _MB)
+        self.mgr.group_commit_enabled = True
+        self.addCleanup(self.mgr.close_all)
+
+    def _queue_behind_gate(self, writes, project="patient_a"):
+        """Queue ``writes`` while a gated write holds the writer, then let them all go."""
+        gate = _Gate()
+        coordinator = self.mgr.group_commit
+        first = coordinator._enqueue(project, gate).future
+        gate.entered.wait(5)
+        futures = [coordinator._enqueue(p, w).future for p, w in writes]
+        gate.release.set()
+        first.result(5)
+        return futures
+
+    def test_queued_appends_share_a_commit_and_stay_linked(self):
+        futures = self._queue_behind_gate(
+            [("patient_a", lambda txn: _append(self.mgr, "patient_a")) for _ in range(20)])
+        self.assertEqual([f.result(5) for f in futures], list(range(20)))
+        stats = self.mgr.group_commit.stats()
+        self.assertEqual(stats["batches"], 2)
+        self.assertEqual(stats["largest_batch"], 20)
+        self.assertEqual(_read_all(self.mgr, "patient_a")[b"meta_last_index"], b"19")
+
+    def test_concurrent_callers_never_duplicate_an_index(self):
+        results, errors = [], []
+
+        def clinician():
+            try:
+                for _ in range(10):
+                    results.append(self.mgr.run_write_transaction(
+                        "patient_a", lambda txn: _append(self.mgr, "patient_a")))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=clinician) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), list(range(80)))
+        self.assertLess(self.mgr.group_commit.stats()["batches"], 80)
+
+    def test_a_failing_write_rolls_back_alone(self):
+        def broken(txn):
+            _append(self.mgr, "patient_a", b"half-written")
+            raise ValueError("rejected")
+
+        futures = self._queue_behind_gate([
+            ("patient_a", lambda txn: _append(self.mgr, "patient_a")),
+            ("patient_a", broken),
+            ("patient_a", lambda txn: _append(self.mgr, "patient_a")),
+        ])
+        self.assertEqual(futures[0].result(5), 0)
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertEqual(futures[2].result(5), 1)
+        self.assertNotIn(b"half-written", _read_all(self.mgr, "patient_a").values())
+        self.assertEqual(self.mgr.group_commit.stats()["failed_writes"], 1)
+
+    def test_after_commit_hooks_see_the_committed_write(self):
+        seen = []
+
+        def work(txn):
+            index = _append(self.mgr, "patient_a")
+            run_after_commit(lambda: seen.append(_read_all(self.mgr, "patient_a").get(b"meta_last_index")))
+            return index
+
+        self.mgr.run_write_transaction("patient_a", work)
+        self.assertEqual(seen, [b"0"])
+
+    def test_hooks_of_a_batched_write_run_on_its_caller(self):
+        # The hook writes to the same environment, as the notarization anchor does;
+        # on the writer thread it would wait on itself.
+        hook_threads, results = [], []
+
+        def work(txn):
+            index = _append(self.mgr, "patient_a")
+            run_after_commit(lambda: hook_threads.append(threading.current_thread())
+                             or self.mgr.run_write_transaction("patient_a", lambda t: t.put(b"anchored", b"1")))
+            return index
+
+        gate = _Gate()
+        first = self.mgr.group_commit._enqueue("patient_a", gate).future
+        gate.entered.wait(5)
+        callers = [threading.Thread(target=lambda: results.append(
+            self.mgr.run_write_transaction("patient_a", work))) for _ in range(3)]
+        for t in callers:
+            t.start()
+        gate.release.set()
+        first.result(5)
+        for t in callers:
+            t.join(10)
+        self.assertEqual(sorted(results), [0, 1, 2])
+        self.assertEqual(set(hook_threads), set(callers))
+        self.assertEqual(_read_all(self.mgr, "patient_a")[b"anchored"], b"1")
+
+    def test_map_full_write_is_retried_after_the_map_grows(self):
+        mgr = self.manager_class(self.base, _MB, growth_factor=2.0, high_water=0.99,
+                                 max_map_size=64 * _MB)
+        self.addCleanup(mgr.close_all)
+        mgr.group_commit_enabled = True
+        mgr.run_write_transaction("__attachments__", lambda txn: txn.put(b"scan", os.urandom(3 * _MB)))
+        self.assertEqual(len(_read_all(mgr, "__attachments__")[b"scan"]), 3 * _MB)
+        self.assertGreaterEqual(mgr.group_commit.stats()["map_full_retries"], 1)
+
+    def test_max_latency_collects_writes_into_one_batch(self):
+        self.mgr._group_commit = GroupCommitCoordinator(self.mgr, max_latency_ms=300, max_batch=5)
+        barrier = threading.Barrier(5)
+
+        def clinician():
+            barrier.wait()
+            self.mgr.run_write_transaction("patient_a", lambda txn: _append(self.mgr, "patient_a"))
+
+        threads = [threading.Thread(target=clinician) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.mgr.group_commit.stats()["largest_batch"], 5)
+
+    def test_writes_to_different_chains_in_one_batch_stay_separate(self):
+        futures = self._queue_behind_gate([
+            (name, lambda txn, name=name: _append(self.mgr, name))
+            for name in ("patient_a", "patient_b", "patient_b")
+        ])
+        self.assertEqual([f.result(5) for f in futures], [0, 0, 1])
+        self.assertEqual(_read_all(self.mgr, "patient_b")[b"meta_last_index"], b"1")
+
+
+class TestConsolidatedGroupCommit(TestGroupCommit):
+    manager_class = ConsolidatedLMDBManager
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+tests/test_header_payload_split.py — headers and payloads stored apart
+======================================================================
+A binary block's header stays under its index key and its data goes under
+``payload_{merkle_root}``. Chain-level scans stream the headers
+(``IBlockRepository.iter_headers``) and must never need a payload; a payload
+is still checked against its header's Merkle root on demand.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain.factories import BlockFactory
+from database import storage
+from database.block_codec import is_split, migrate, payload_key
+from database.connection import LMDBConnectionManager
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+
+_MAP = 16 * 1024 * 1024
+PROJECT = "patient_split"
+
+
+class TestHeaderPayloadSplit(unittest.TestCase):
+    def setUp(self):
+        env = mock.patch.dict(os.environ, {"VHV_BLOCK_FORMAT": "binary"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.base = tempfile.mkdtemp()
+        self.mgr = LMDBConnectionManager(self.base, _MAP)
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.addCleanup(self.mgr.close_all)
+        self.repo = LMDBBlockRepository(self.mgr)
+
+        self.blocks = [BlockFactory.create_genesis_block()]
+        for i in range(1, 6):
+            self.blocks.append(BlockFactory.create_data_block(
+                i, self.blocks[-1].hash, {"type": "lab", "result": f"panel {i}"},
+                is_protected=i == 2, protection_hash="pbkdf2$x" if i == 2 else None,
+            ))
+        for block in self.blocks:
+            self.repo.save_block(PROJECT, block)
+        self.repo.save_block_pwd_hash(PROJECT, 2, "pbkdf2$x")
+
+    def _entries(self):
+        with self.mgr.open_db(PROJECT).begin() as txn:
+            return {bytes(k): bytes(v) for k, v in txn.cursor()}
+
+    def _drop_payloads(self):
+        def txn_block(txn):
+            for block in self.blocks[1:]:
+                txn.delete(payload_key(block.merkle_root))
+        self.mgr.run_write_transaction(PROJECT, txn_block)
+
+    def test_data_blocks_keep_their_payload_apart(self):
+        entries = self._entries()
+        self.assertFalse(is_split(entries[b"0000000000"]))  # genesis has no Merkle root to file it under
+        for block in self.blocks[1:]:
+            self.assertTrue(is_split(entries[f"{block.index:010d}".encode()]))
+            self.assertIn(payload_key(block.merkle_root), entries)
+        self.assertEqual(storage.load_all_blocks(PROJECT, self.mgr), [b.to_dict() for b in self.blocks])
+        self.assertEqual(self.repo.load_all_blocks(PROJECT)[3].data, self.blocks[3].data)
+
+    def test_header_scans_never_read_a_payload(self):
+        self._drop_payloads()
+        views = list(self.repo.iter_headers(PROJECT))
+        self.assertEqual([v.hash for v in views], [b.hash for b in self.blocks])
+        self.assertEqual(views[2].protection_hash, "pbkdf2$x")
+        self.assertFalse(any(v.data_loaded for v in views[1:]))
+        self.assertEqual(self.repo.get_last_index(PROJECT), 5)
+
+    def test_headers_stream_in_batches(self):
+        headers = list(storage.iter_block_headers(PROJECT, self.mgr, batch_size=2))
+        self.assertEqual([h["index"] for h in headers], list(range(6)))
+        self.assertEqual([h.get("protection_hash") for h in headers],
+                         [None, None, "pbkdf2$x", None, None, None])
+
+    def test_payload_is_checked_against_its_merkle_root_on_demand(self):
+        def tamper(txn):
+            txn.put(payload_key(self.blocks[4].merkle_root), b'{"type":"lab","result":"normal"}')
+        self.mgr.run_write_transaction(PROJECT, tamper)
+        views = list(self.repo.iter_headers(PROJECT))
+        self.assertEqual([v.index for v in views if not v.payload_intact()], [4])
+
+    def test_equal_merkle_roots_never_overwrite_a_payload(self):
+        # Same fields, other order: the same Merkle root, but other bytes.
+        reordered = BlockFactory.create_data_block(
+            6, self.blocks[-1].hash, {"result": "panel 5", "type": "lab"})
+        self.assertEqual(reordered.merkle_root, self.blocks[5].merkle_root)
+        self.repo.save_block(PROJECT, reordered)
+        self.assertFalse(is_split(self._entries()[b"0000000006"]))
+        loaded = storage.load_all_blocks(PROJECT, self.mgr)
+        self.assertEqual(list(loaded[5]["data"]), ["type", "result"])
+        self.assertEqual(list(loaded[6]["data"]), ["result", "type"])
+
+    def test_migrating_to_json_folds_payloads_back_in(self):
+        migrate("json", self.mgr, log=lambda _: None)
+        self.assertFalse(any(k.startswith(b"payload_") for k in self._entries()))
+        self.assertEqual(storage.load_all_blocks(PROJECT, self.mgr), [b.to_dict() for b in self.blocks])
+
+        self.assertEqual(migrate("binary", self.mgr, log=lambda _: None)["converted"], 6)
+        self.assertTrue(is_split(self._entries()[b"0000000003"]))
+        self.assertEqual(storage.load_all_blocks(PROJECT, self.mgr), [b.to_dict() for b in self.blocks])
+
+
+if __name__ == "__main__":
+    unittest.main()
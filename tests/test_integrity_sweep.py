@@ -0,0 +1,207 @@
+"""
+tests/test_integrity_sweep.py — vault-wide integrity sweeps
+===========================================================
+``IntegritySweep`` checks every chain store, the access ledgers, the Merkle
+anchors and the attachment store, and files one verdict per project in
+``database.integrity_reports``. A sweep that dies part-way must resume with
+only the projects it had not checked yet.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.dependencies import get_db_manager
+from backend.main import app
+import core.services.integrity_sweep as integrity_sweep
+from core.domain.factories import BlockFactory
+from core.security import signaturedata
+from core.services.attachment_store import AttachmentStore
+from core.services.integrity_sweep import IntegritySweep
+from core.utils.crypto_utils import calculate_merkle_root
+from database import integrity_reports as reports
+from database import storage
+from database.block_codec import encode_for_storage
+from database.lmdb_layout import create_db_manager
+from database.sql_db import default_sql_db
+from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository
+
+_MAP = 16 * 1024 * 1024
+PATIENTS = ("patient_a", "patient_b", "patient_c")
+
+
+class TestIntegritySweep(unittest.TestCase):
+    layout = "per_project"
+
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.mgr = create_db_manager(self.base, _MAP, layout=self.layout)
+        self.addCleanup(self.mgr.close_all)
+        self.repo = LMDBBlockRepository(self.mgr)
+        self.attachments = AttachmentStore(self.mgr)
+        self.ref = self.attachments.put("ZW5jcnlwdGVkIHNjYW4=")
+        for project in PATIENTS:
+            self._append(project, {"type": "lab", "result": project})
+            self._append(project, {"type": "scan", "file_hash": self.ref})
+            storage.append_access_log(project, "dr_house", "read", db_manager=self.mgr)
+        # What the notarizer anchors after a write to patient_a.
+        root = calculate_merkle_root([b.hash for b in self.repo.iter_headers("patient_a")])
+        self.repo.save_simulated_merkle_root("patient_a", root)
+        self.repo.save_notarization_tx("patient_a", signaturedata(root))
+
+    def _append(self, project, data):
+        last = self.repo.get_last_index(project)
+        if last < 0:
+            self.repo.save_block(project, BlockFactory.create_genesis_block())
+            last = 0
+        previous = self.repo.load_all_blocks(project)[-1]
+        self.repo.save_block(project, BlockFactory.create_data_block(last + 1, previous.hash, data))
+
+    def _verdicts(self, run_id):
+        return {v["project"]: v for v in reports.load_results(run_id, db_manager=self.mgr)}
+
+    def test_clean_vault_passes(self):
+        run = IntegritySweep(self.mgr, workers=0).run(username="admin")
+        self.assertEqual(run["status"], "complete")
+        self.assertEqual((run["total"], run["checked"], run["failed"]), (4, 4, 0))
+        self.assertEqual(run["progress"], 1.0)
+        verdicts = self._verdicts(run["id"])
+        self.assertEqual(set(verdicts), set(PATIENTS) | {"attachments"})
+        self.assertTrue(verdicts["patient_a"]["anchor_verified"])
+        self.assertEqual(verdicts["patient_b"]["anchor"], "Not anchored in local ledger")
+        self.assertEqual(verdicts["patient_c"]["attachment_refs"], 1)
+        self.assertEqual(verdicts["attachments"]["entries"], 1)
+
+    def test_faults_fail_their_own_project_only(self):
+        self._append("patient_b", {"type": "scan", "file_hash": "0" * 64})
+        self.repo.save_simulated_merkle_root("patient_c", "f" * 64)   # an anchor that does not match
+        block = storage.load_block("patient_a", 1, self.mgr)
+        block["hash"] = "0" * 64
+
+        def tamper(txn):
+            txn.put(b"0000000001", encode_for_storage(block))
+        self.mgr.run_write_transaction("patient_a", tamper)
+
+        sweep = IntegritySweep(self.mgr, workers=0)
+        run = sweep.run()
+        self.assertEqual(run["failed"], 3)
+        verdicts = self._verdicts(run["id"])
+        self.assertEqual(verdicts["patient_a"]["broken_at"], 1)
+        self.assertEqual(verdicts["patient_b"]["missing_at"], [3])
+        self.assertFalse(verdicts["patient_c"]["anchor_verified"])
+        self.assertTrue(verdicts["attachments"]["ok"])
+        self.assertEqual([v["project"] for v in sweep.results(run["id"], failed_only=True)],
+                         ["patient_a", "patient_b", "patient_c"])
+        self.assertEqual(len(sweep.results(run["id"], offset=1, limit=1)), 1)
+
+    def test_corrupt_attachment_is_reported(self):
+        def corrupt(txn):
+            txn.put(f"attachment_{self.ref}".encode(), b"tampered")
+        self.mgr.run_write_transaction("attachments", corrupt)
+        run = IntegritySweep(self.mgr, workers=0).run()
+        verdict = self._verdicts(run["id"])["attachments"]
+        self.assertFalse(verdict["ok"])
+        self.assertEqual(verdict["corrupt_refs"], [self.ref])
+
+    def test_interrupted_sweep_resumes_where_it_stopped(self):
+        checked = []
+        real = integrity_sweep.check_project
+
+        def dies_on_third(project, manager):
+            if len(checked) == 2:
+                raise KeyboardInterrupt
+            checked.append(project)
+            return real(project, manager)
+
+        sweep = IntegritySweep(self.mgr, workers=0)
+        with mock.patch.object(integrity_sweep, "check_project", dies_on_third):
+            with self.assertRaises(KeyboardInterrupt):
+                sweep.run()
+        status = sweep.status()
+        self.assertEqual(status["status"], "interrupted")
+        self.assertEqual((status["checked"], status["total"]), (2, 4))
+        self.assertEqual(status["progress"], 0.5)
+
+        resumed = []
+        with mock.patch.object(integrity_sweep, "check_project",
+                               lambda p, m: resumed.append(p) or real(p, m)):
+            run = sweep.run(resume=True)
+        self.assertEqual(run["id"], status["id"])
+        self.assertEqual(sorted(checked + resumed), sorted(PATIENTS + ("attachments",)))
+        self.assertEqual((run["status"], run["checked"], run["resumes"]), ("complete", 4, 1))
+        self.assertNotIn("error", run)
+
+    def test_a_running_sweep_blocks_a_second_one(self):
+        run = reports.new_run_id(self.mgr)
+        reports.save_run({"id": run, "status": "running", "pid": os.getpid(), "checked": 0,
+                          "failed": 0, "total": 4, "resumed_at": 0}, self.mgr)
+        with mock.patch.object(integrity_sweep, "_owner_alive", return_value=True):
+            with self.assertRaises(RuntimeError):
+                IntegritySweep(self.mgr, workers=0).start()
+        # Nobody is running it any more: it reads as interrupted and can be resumed.
+        self.assertEqual(IntegritySweep(self.mgr).status(run)["status"], "interrupted")
+
+    def test_background_sweep_on_a_process_pool(self):
+        sweep = IntegritySweep(self.mgr, workers=2)
+        run = sweep.start(username="admin")
+        sweep.wait(run["id"], timeout=120)
+        status = sweep.status(run["id"])
+        self.assertEqual((status["status"], status["checked"], status["failed"]), ("complete", 4, 0))
+        self.assertIsNone(status["eta_seconds"])
+
+
+class TestConsolidatedIntegritySweep(TestIntegritySweep):
+    layout = "consolidated"
+
+
+class TestIntegritySweepAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.mgr = create_db_manager(self.base, _MAP)
+        self.addCleanup(self.mgr.close_all)
+        LMDBBlockRepository(self.mgr).save_block("patient_api", BlockFactory.create_genesis_block())
+        app.dependency_overrides[get_db_manager] = lambda: self.mgr
+        self.addCleanup(app.dependency_overrides.pop, get_db_manager, None)
+        self.client = TestClient(app)
+
+    def _headers(self, username, password):
+        res = self.client.post("/api/v1/auth/login", json={"username": username, "password": password})
+        self.assertEqual(res.status_code, 200, res.text)
+        return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    def test_admin_runs_a_sweep_and_reads_its_verdicts(self):
+        doctor = self._headers("dr.smith", "Doctor@2026Secure!")
+        self.assertEqual(self.client.post("/api/v1/admin/integrity/sweep", headers=doctor).status_code, 403)
+
+        admin = self._headers("admin", "Admin@2026Secure!")
+        self.assertEqual(self.client.get("/api/v1/admin/integrity/sweep", headers=admin).status_code, 404)
+        res = self.client.post("/api/v1/admin/integrity/sweep", headers=admin)
+        self.assertEqual(res.status_code, 202, res.text)
+        run_id = res.json()["id"]
+        IntegritySweep(self.mgr).wait(run_id, timeout=120)
+
+        status = self.client.get(f"/api/v1/admin/integrity/sweep/{run_id}", headers=admin).json()
+        self.assertEqual((status["status"], status["checked"], status["failed"]), ("complete", 1, 0))
+        page = self.client.get(f"/api/v1/admin/integrity/sweep/{run_id}/results", headers=admin).json()
+        self.assertEqual([v["project"] for v in page["results"]], ["patient_api"])
+        self.assertEqual(self.client.get(f"/api/v1/admin/integrity/sweep/{run_id}/results?limit=0",
+                                         headers=admin).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/admin/integrity/sweep/nope", headers=admin).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+tests/test_ip_allowlist.py — compiled CIDR allowlist
+====================================================
+The radix trie must give exactly the verdicts of a linear ``ip in net`` scan.
+Verdicts are cached in an LRU, and SIGHUP rebuilds the trie from the allowlist
+file without a restart.
+"""
+
+import ipaddress
+import os
+import random
+import signal
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.middleware.cidr_trie import CIDRTrie
+from backend.middleware.ip_allowlist import IPAllowlist, install_reload_handler
+
+
+def _random_networks(rng, count):
+    nets = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            nets.append(ipaddress.ip_network((rng.getrandbits(32), rng.randint(0, 32)), strict=False))
+        else:
+            nets.append(ipaddress.ip_network((rng.getrandbits(128), rng.randint(0, 128)), strict=False))
+    return nets
+
+
+class TestCIDRTrie(unittest.TestCase):
+    def test_verdicts_match_a_linear_scan(self):
+        rng = random.Random(39)
+        for _ in range(20):
+            nets = _random_networks(rng, 60) + [ipaddress.ip_network("10.1.0.0/16"),
+                                                 ipaddress.ip_network("10.1.2.0/24")]
+            trie = CIDRTrie(nets)
+            probes = [ipaddress.ip_address(rng.getrandbits(32)) for _ in range(300)]
+            probes += [ipaddress.ip_address(rng.getrandbits(128)) for _ in range(300)]
+            probes += [n.network_address for n in nets] + [n.broadcast_address for n in nets]
+            for ip in probes:
+                self.assertEqual(trie.match(ip), any(ip in n for n in nets), str(ip))
+
+    def test_edge_prefixes_and_bad_input(self):
+        trie = CIDRTrie([ipaddress.ip_network("192.168.7.9/32"), ipaddress.ip_network("fd00::/8")])
+        self.assertIn("192.168.7.9", trie)
+        self.assertNotIn("192.168.7.8", trie)
+        self.assertIn("fd12::1", trie)
+        self.assertNotIn("fe80::1", trie)
+        self.assertNotIn("not-an-ip", trie)
+        self.assertIn("203.0.113.1", CIDRTrie([ipaddress.ip_network("0.0.0.0/0")]))
+
+    def test_ipv4_mapped_ipv6_peer_matches_its_ipv4_network(self):
+        self.assertIn("::ffff:10.2.3.4", CIDRTrie([ipaddress.ip_network("10.0.0.0/8")]))
+
+
+class TestIPAllowlist(unittest.TestCase):
+    def test_verdicts_are_cached_and_evicted_lru(self):
+        allowlist = IPAllowlist(["10.0.0.0/8"], enabled=True, cache_size=2)
+        self.assertTrue(allowlist.is_allowed("10.0.0.1"))
+        self.assertFalse(allowlist.is_allowed("203.0.113.5"))
+        self.assertTrue(allowlist.is_allowed("10.0.0.1"))
+        allowlist.is_allowed("10.9.9.9")
+        stats = allowlist.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["cached_verdicts"]), (1, 3, 2))
+        allowlist.is_allowed("203.0.113.5")       # evicted, so looked up again
+        self.assertEqual(allowlist.stats()["misses"], 4)
+
+    def test_loopback_and_disabled_allowlist_always_pass(self):
+        self.assertTrue(IPAllowlist(["10.0.0.0/8"], enabled=True).is_allowed("testclient"))
+        self.assertTrue(IPAllowlist(["10.0.0.0/8"], enabled=False).is_allowed("203.0.113.5"))
+
+    @unittest.skipUnless(hasattr(signal, "SIGHUP"), "SIGHUP is POSIX-only")
+    def test_sighup_rebuilds_from_the_allowlist_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.write("# ward VLANs\n10.20.0.0/16\n")
+        self.addCleanup(os.unlink, f.name)
+        env = {"VHV_ALLOWLIST_FILE": f.name, "ALLOWLISTED_NETWORKS": "", "VIP_IP_ALLOWLIST_ENABLED": "true"}
+        with mock.patch.dict(os.environ, env):
+            allowlist = IPAllowlist()
+            self.assertFalse(allowlist.is_allowed("10.30.0.1"))
+            with open(f.name, "a", encoding="utf-8") as out:
+                out.write("10.30.0.0/16  # new ward\n")
+
+            previous = signal.getsignal(signal.SIGHUP)
+            self.addCleanup(signal.signal, signal.SIGHUP, previous)
+            self.assertTrue(install_reload_handler(allowlist))
+            os.kill(os.getpid(), signal.SIGHUP)
+
+        self.assertTrue(allowlist.is_allowed("10.30.0.1"))
+        self.assertTrue(allowlist.is_allowed("10.20.5.5"))
+        self.assertEqual(allowlist.stats()["reloads"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
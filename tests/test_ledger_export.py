@@ -0,0 +1,165 @@
+"""
+tests/test_ledger_export.py — auditors can pull every ledger, streamed and verified
+===================================================================================
+The compliance export walks each project's access ledger and audit log in
+bounded batches and streams them as gzip NDJSON. Batching must not change what
+is exported, and the hash-chain verdict carried with each batch must catch the
+same tampering the per-patient integrity check does.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from core.services.ledger_export import LedgerExporter
+from database.connection import LMDBConnectionManager, active_txn, active_project
+import database.audit_storage as audit_storage
+from database.sql_db import default_sql_db
+
+PROJECT = "patient_LEDGER_EXPORT_TEST"
+
+
+class TestLedgerExporter(unittest.TestCase):
+    def setUp(self):
+        active_txn.set(None)
+        active_project.set(None)
+        self.base = os.path.join(os.path.dirname(__file__), "test_export_projects")
+        shutil.rmtree(self.base, ignore_errors=True)
+        self.mgr = LMDBConnectionManager(self.base)
+        self.mgr.create_project(PROJECT)
+        for i in range(5):
+            audit_storage.append_access_log(
+                PROJECT, f"dr.user{i}", "RECORD_DECRYPTED", "dev",
+                {"block_index": i}, db_manager=self.mgr,
+            )
+        for i in range(3):
+            audit_storage.append_audit_log(
+                PROJECT, "RECORD_ADDED", "dr.smith", "dev",
+                {"block_index": i}, db_manager=self.mgr,
+            )
+
+    def tearDown(self):
+        self.mgr.close_all()
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _records(self, **kw):
+        exporter = LedgerExporter(db_manager=self.mgr, batch_size=2)
+        raw = b"".join(exporter.iter_ndjson_gzip(**kw))
+        return [json.loads(line) for line in gzip.decompress(raw).decode("utf-8").splitlines()]
+
+    def test_batched_export_covers_every_entry_in_order(self):
+        records = self._records()
+        self.assertEqual(records[0]["type"], "export")
+        self.assertEqual(records[-1]["type"], "export_end")
+
+        access = [r for r in records if r["type"] == "batch" and r["ledger"] == "access"]
+        self.assertEqual([r["rows"] for r in access], [2, 2, 1])
+        seqs = [s for r in access for s in r["columns"]["seq"]]
+        self.assertEqual(seqs, [1, 2, 3, 4, 5])
+        self.assertEqual(access[0]["columns"]["extra"][0], {"block_index": 0})
+
+        audit = [r for r in records if r["type"] == "batch" and r["ledger"] == "audit"]
+        self.assertEqual(sum(r["rows"] for r in audit), 3)
+        self.assertEqual(records[-1]["rows"], {"access": 5, "audit": 3})
+        self.assertTrue(records[-1]["access_chains_valid"])
+
+    def test_streaming_verdict_matches_integrity_check_on_tamper(self):
+        env = self.mgr.open_db(PROJECT)
+        key = f"access_log_{PROJECT}_{3:020d}".encode("utf-8")
+        with env.begin(write=True) as txn:
+            entry = json.loads(txn.get(key).decode("utf-8"))
+            entry["username"] = "attacker"
+            txn.put(key, json.dumps(entry).encode("utf-8"))
+
+        records = self._records(ledgers=("access",))
+        batches = [r for r in records if r["type"] == "batch"]
+        # The batch before the tampered entry was covered by an intact chain.
+        self.assertTrue(batches[0]["verification"]["valid"])
+        self.assertFalse(batches[1]["verification"]["valid"])
+        end = next(r for r in records if r["type"] == "ledger_end")
+        expected = audit_storage.verify_access_log_integrity(PROJECT, db_manager=self.mgr)
+        self.assertEqual(end["verification"]["broken_at"], expected["broken_at"])
+        self.assertFalse(records[-1]["access_chains_valid"])
+
+    def test_truncated_tail_is_detected_by_stored_head(self):
+        env = self.mgr.open_db(PROJECT)
+        with env.begin(write=True) as txn:
+            txn.delete(f"access_log_{PROJECT}_{5:020d}".encode("utf-8"))
+
+        records = self._records(ledgers=("access",))
+        end = next(r for r in records if r["type"] == "ledger_end")
+        self.assertTrue(end["verification"]["valid"])
+        self.assertFalse(end["verification"]["head_matches"])
+        self.assertFalse(records[-1]["access_chains_valid"])
+
+    def test_entries_appended_during_the_export_are_not_a_truncation(self):
+        real = audit_storage.iter_access_log_batches
+
+        def appended_after_last_batch(*args, **kwargs):
+            yield from real(*args, **kwargs)
+            # A request logs an access between the final batch and the verdict.
+            audit_storage.append_access_log(PROJECT, "dr.late", "RECORD_DECRYPTED", "dev",
+                                            db_manager=self.mgr)
+
+        with mock.patch.object(audit_storage, "iter_access_log_batches", appended_after_last_batch):
+            records = self._records(ledgers=("access",))
+        end = next(r for r in records if r["type"] == "ledger_end")
+        self.assertTrue(end["verification"]["valid"])
+        self.assertTrue(end["verification"]["head_matches"])
+        self.assertTrue(records[-1]["access_chains_valid"])
+
+    def test_time_window_filters_rows(self):
+        records = self._records(ledgers=("audit",), since=4102444800.0)
+        self.assertFalse([r for r in records if r["type"] == "batch"])
+        self.assertEqual(records[-1]["rows"], {"audit": 0})
+
+
+class TestLedgerExportEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.client = TestClient(app)
+
+    def _token(self, username, password):
+        res = self.client.post("/api/v1/auth/login",
+                               json={"username": username, "password": password})
+        self.assertEqual(res.status_code, 200, res.text)
+        return res.json()["access_token"]
+
+    def test_patient_cannot_export(self):
+        token = self._token("vip001", "VIPPatient@2026!")
+        res = self.client.get("/api/v1/compliance/export",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 403)
+
+    def test_admin_receives_gzip_ndjson(self):
+        token = self._token("admin", "Admin@2026Secure!")
+        res = self.client.get("/api/v1/compliance/export?ledger=access",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 200, res.text)
+        self.assertIn("attachment", res.headers["content-disposition"])
+        lines = gzip.decompress(res.content).decode("utf-8").splitlines()
+        self.assertEqual(json.loads(lines[0])["type"], "export")
+        self.assertEqual(json.loads(lines[-1])["type"], "export_end")
+
+    def test_unknown_ledger_is_rejected(self):
+        token = self._token("admin", "Admin@2026Secure!")
+        res = self.client.get("/api/v1/compliance/export?ledger=blocks",
+                              headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
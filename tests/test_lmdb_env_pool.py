@@ -0,0 +1,85 @@
+"""
+tests/test_lmdb_env_pool.py — bounded pool of LMDB environments
+===============================================================
+Only a bounded number of patient environments stay open. Idle ones are evicted
+least-recently-used first. An environment with a transaction in flight is never
+closed under it, and a handle from ``open_db`` keeps working after an eviction.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import LMDBConnectionManager
+
+
+class TestEnvironmentPool(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.mgr = LMDBConnectionManager(self.base, default_map_size=16 * 1024 * 1024,
+                                         max_open=2, max_readers=64, max_spare_txns=2)
+
+    def tearDown(self):
+        self.mgr.close_all()
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _put(self, project, key=b"k", value=b"v"):
+        self.mgr.run_write_transaction(project, lambda txn: txn.put(key, value))
+
+    def test_least_recently_used_idle_environment_is_evicted(self):
+        self._put("p1")
+        self._put("p2")
+        self.mgr.open_db("p1")                  # p2 is now the least recently used
+        self._put("p3")
+        self.assertEqual(self.mgr.stats()["open"], 2)
+        self.assertEqual(set(self.mgr._envs), {"p1", "p3"})
+        with self.mgr.open_db("p2").begin() as txn:
+            self.assertEqual(txn.get(b"k"), b"v")
+        stats = self.mgr.stats()
+        self.assertEqual((stats["evictions"], stats["reopens"]), (2, 1))
+
+    def test_busy_environment_is_not_evicted(self):
+        txn = self.mgr.open_db("busy").begin(write=True)
+        txn.put(b"k", b"in-flight")
+        for name in ("a", "b", "c"):
+            self._put(name)
+        self.assertIn("busy", self.mgr._envs)
+        txn.commit()
+        self._put("d")
+        self.assertNotIn("busy", self.mgr._envs)
+        with self.mgr.open_db("busy").begin() as check:
+            self.assertEqual(check.get(b"k"), b"in-flight")
+
+    def test_close_waits_for_an_in_flight_transaction(self):
+        env = self.mgr.open_db("p1")
+        started = threading.Event()
+
+        def writer():
+            with env.begin(write=True) as txn:
+                started.set()
+                time.sleep(0.2)
+                txn.put(b"late", b"1")
+
+        t = threading.Thread(target=writer)
+        t.start()
+        started.wait()
+        self.mgr.close_db("p1")
+        t.join()
+        self.assertEqual(self.mgr.stats()["forced_closes"], 0)
+        with env.begin() as txn:
+            self.assertEqual(txn.get(b"late"), b"1")
+
+    def test_reader_limits_are_applied(self):
+        env = self.mgr.open_db("p1")
+        self.assertEqual(env.max_readers(), 64)
+        self.assertIn("open_ms_avg", self.mgr.stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
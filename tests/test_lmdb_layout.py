@@ -0,0 +1,145 @@
+"""
+tests/test_lmdb_layout.py — consolidated chain layout and the layout migrator
+============================================================================
+With ``VHV_LMDB_LAYOUT=consolidated`` every chain is a named sub-database of
+one environment. Callers must see exactly what the per-project layout gives
+them, and ``consolidate``/``split`` must move chains between the two intact.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import lmdb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import (
+    ATTACHMENT_PROJECT, REGISTRY_DIR, LMDBConnectionManager, active_project, active_txn,
+)
+from database.lmdb_layout import (
+    CHAINS_PROJECT, ConsolidatedLMDBManager, consolidate, create_db_manager, split,
+)
+
+_MAP = 16 * 1024 * 1024
+
+
+def _write(mgr, project, **items):
+    def txn_block(txn):
+        for k, v in items.items():
+            txn.put(k.encode(), v.encode())
+    mgr.run_write_transaction(project, txn_block)
+
+
+def _read_all(mgr, project):
+    with mgr.open_db(project).begin() as txn:
+        return {k.decode(): v.decode() for k, v in txn.cursor()}
+
+
+class TestConsolidatedLayout(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.mgr = ConsolidatedLMDBManager(self.base, _MAP, max_dbs=64)
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.addCleanup(self.mgr.close_all)
+
+    def test_chains_share_one_environment_but_not_keys(self):
+        _write(self.mgr, "patient_a", meta_last_index="3")
+        _write(self.mgr, "patient_b", meta_last_index="7")
+        _write(self.mgr, "__users__", admin="{}")
+        self.assertEqual(_read_all(self.mgr, "patient_a"), {"meta_last_index": "3"})
+        self.assertEqual(_read_all(self.mgr, "patient_b"), {"meta_last_index": "7"})
+        self.assertEqual(self.mgr.list_projects(), ["patient_a", "patient_b"])
+        self.assertTrue(self.mgr.project_exists("patient_a"))
+        self.assertFalse(self.mgr.project_exists("patient_c"))
+        self.assertEqual(sorted(os.listdir(self.base)), [CHAINS_PROJECT, REGISTRY_DIR, "__users__"])
+
+    def test_attachments_keep_their_own_environment(self):
+        _write(self.mgr, "patient_a", k="1")
+        _write(self.mgr, ATTACHMENT_PROJECT, attachment_x="blob")
+        self.assertEqual(self.mgr._env_key(ATTACHMENT_PROJECT), ATTACHMENT_PROJECT)
+        self.assertTrue(os.path.isdir(os.path.join(self.base, ATTACHMENT_PROJECT, "chaindata.lmdb")))
+        with self.mgr.open_db(CHAINS_PROJECT).begin() as txn:
+            self.assertIsNone(txn.get(ATTACHMENT_PROJECT.encode()))
+        self.assertEqual(_read_all(self.mgr, ATTACHMENT_PROJECT), {"attachment_x": "blob"})
+        self.assertEqual(self.mgr.list_projects(), ["patient_a", ATTACHMENT_PROJECT])
+
+    def test_second_chain_written_in_a_unit_of_work_commits_with_it(self):
+        for outcome in ("commit", "abort"):
+            txn = self.mgr.open_db(f"outer_{outcome}").begin(write=True)
+            tokens = active_txn.set(txn), active_project.set(f"outer_{outcome}")
+            try:
+                txn.put(b"k", b"outer")
+                _write(self.mgr, f"inner_{outcome}", k="inner")
+            finally:
+                active_txn.reset(tokens[0])
+                active_project.reset(tokens[1])
+            getattr(txn, outcome)()
+        self.assertEqual(_read_all(self.mgr, "inner_commit"), {"k": "inner"})
+        self.assertEqual(_read_all(self.mgr, "inner_abort"), {})
+
+    def test_reset_drops_only_that_chain(self):
+        _write(self.mgr, "patient_a", k="1")
+        _write(self.mgr, "patient_b", k="2")
+        self.mgr.reset_project("patient_a")
+        self.assertEqual(self.mgr.list_projects(), ["patient_b"])
+        self.assertEqual(_read_all(self.mgr, "patient_a"), {})
+
+    def test_unknown_layout_is_rejected(self):
+        with self.assertRaises(ValueError):
+            create_db_manager(self.base, _MAP, layout="sharded")
+
+
+class TestLayoutMigration(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+
+    def test_round_trip_preserves_every_chain(self):
+        per_project = LMDBConnectionManager(self.base, _MAP)
+        chains = {f"patient_{i}": {f"{n:010d}": f"block {i}.{n}" for n in range(50)} for i in range(5)}
+        for name, blocks in chains.items():
+            _write(per_project, name, **blocks)
+        _write(per_project, "__access_index__", k="v")
+        _write(per_project, ATTACHMENT_PROJECT, attachment_x="blob")
+        per_project.close_all()
+        stores = dict(chains, **{ATTACHMENT_PROJECT: {"attachment_x": "blob"}})
+
+        totals = consolidate(self.base, _MAP, max_dbs=64, log=lambda _: None)
+        self.assertEqual(totals, {"chains": 5, "entries": 250})
+        self.assertEqual(sorted(os.listdir(self.base)), ["__access_index__", CHAINS_PROJECT, ATTACHMENT_PROJECT])
+        merged = ConsolidatedLMDBManager(self.base, _MAP, max_dbs=64)
+        self.assertEqual({name: _read_all(merged, name) for name in merged.list_projects()}, stores)
+        merged.close_all()
+
+        self.assertEqual(split(self.base, _MAP, max_dbs=64, log=lambda _: None)["entries"], 250)
+        restored = LMDBConnectionManager(self.base, _MAP)
+        self.assertEqual({name: _read_all(restored, name) for name in restored.list_projects()}, stores)
+        restored.close_all()
+        self.assertNotIn(CHAINS_PROJECT, os.listdir(self.base))
+
+    def test_consolidate_moves_attachments_out_of_the_shared_environment(self):
+        # Where an older consolidate left them, with an upload made since.
+        path = os.path.join(self.base, CHAINS_PROJECT, "chaindata.lmdb")
+        os.makedirs(path)
+        env = lmdb.open(path, map_size=_MAP, max_dbs=64, subdir=True)
+        with env.begin(write=True) as txn:
+            txn.put(b"attachment_old", b"blob", db=env.open_db(ATTACHMENT_PROJECT.encode(), txn=txn))
+            txn.put(b"0000000000", b"genesis", db=env.open_db(b"patient_a", txn=txn))
+        env.close()
+        per_project = LMDBConnectionManager(self.base, _MAP)
+        _write(per_project, ATTACHMENT_PROJECT, attachment_new="blob")
+        per_project.close_all()
+
+        consolidate(self.base, _MAP, max_dbs=64, log=lambda _: None)
+        merged = ConsolidatedLMDBManager(self.base, _MAP, max_dbs=64)
+        self.addCleanup(merged.close_all)
+        self.assertEqual(merged.list_projects(), ["patient_a", ATTACHMENT_PROJECT])
+        self.assertEqual(_read_all(merged, ATTACHMENT_PROJECT),
+                         {"attachment_new": "blob", "attachment_old": "blob"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+tests/test_lmdb_map_growth.py — maps grow in place, geometrically
+=================================================================
+A full map is grown with ``set_mapsize`` on the open environment, doubling
+each time, instead of closing it under its readers and adding 100 MB. A write
+that crosses the high-water mark grows the map before anything fails, and a map
+grown by another process is adopted.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import lmdb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import LMDBConnectionManager, parse_size
+
+_MB = 1024 * 1024
+
+
+class TestMapGrowth(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+
+    def _manager(self, **kwargs):
+        options = {"growth_factor": 2.0, "high_water": 0.99, "max_map_size": 256 * _MB}
+        options.update(kwargs)
+        mgr = LMDBConnectionManager(self.base, _MB, **options)
+        self.addCleanup(mgr.close_all)
+        return mgr
+
+    def test_a_large_write_doubles_the_map_without_reopening(self):
+        mgr = self._manager()
+        mgr.run_write_transaction("attachments", lambda txn: txn.put(b"scan", os.urandom(6 * _MB)))
+        stats = mgr.stats()
+        self.assertEqual(stats["maps"]["attachments"]["map_size"], 8 * _MB)
+        self.assertEqual((stats["resizes"], stats["opens"]), (3, 1))
+
+    def test_growth_waits_for_readers_instead_of_closing_under_them(self):
+        mgr = self._manager()
+        mgr.run_write_transaction("p1", lambda txn: txn.put(b"k", b"before"))
+        seen, reading = [], threading.Event()
+
+        def reader():
+            with mgr.open_db("p1").begin() as txn:
+                reading.set()
+                time.sleep(0.2)
+                seen.append(txn.get(b"k"))
+
+        t = threading.Thread(target=reader)
+        t.start()
+        reading.wait()
+        mgr.run_write_transaction("p1", lambda txn: txn.put(b"big", os.urandom(2 * _MB)))
+        t.join()
+        self.assertEqual(seen, [b"before"])
+        self.assertEqual(mgr.stats()["forced_closes"], 0)
+
+    def test_ceiling_is_reported_as_map_full(self):
+        mgr = self._manager(max_map_size=2 * _MB)
+        with self.assertRaises(lmdb.MapFullError):
+            mgr.run_write_transaction("p1", lambda txn: txn.put(b"big", os.urandom(6 * _MB)))
+
+    def test_high_water_grows_before_a_write_fails(self):
+        mgr = self._manager(high_water=0.5)
+        mgr.run_write_transaction("p1", lambda txn: txn.put(b"k", os.urandom(600 * 1024)))
+        stats = mgr.stats()
+        self.assertEqual(stats["high_water_resizes"], 1)
+        self.assertEqual(stats["maps"]["p1"]["map_size"], 2 * _MB)
+
+    def test_map_grown_by_another_process_is_adopted(self):
+        mgr = self._manager()
+        mgr.run_write_transaction("p1", lambda txn: txn.put(b"k", b"v"))
+        path = mgr.get_db_path("p1")
+        subprocess.run([sys.executable, "-c", (
+            "import lmdb, sys\n"
+            "env = lmdb.open(sys.argv[1], map_size=1 << 20)\n"
+            "env.set_mapsize(1 << 24)\n"
+            "with env.begin(write=True) as txn: txn.put(b'big', b'x' * (4 << 20))\n"
+        ), path], check=True)
+        with mgr.open_db("p1").begin() as txn:
+            self.assertEqual(len(txn.get(b"big")), 4 * _MB)
+        self.assertEqual(mgr.stats()["adopted_resizes"], 1)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("2G", 0), 2 * 1024 * _MB)
+        self.assertEqual(parse_size("512m", 0), 512 * _MB)
+        self.assertEqual(parse_size("4096", 0), 4096)
+        self.assertEqual(parse_size("lots", 7), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
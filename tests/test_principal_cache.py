@@ -0,0 +1,148 @@
+"""
+tests/test_principal_cache.py — steady-state authentication without SQL round trips
+===================================================================================
+A token that was just verified is served from a short-lived in-memory cache.
+Logout, any change to the user and passkey revocation evict it in every worker
+through a shared invalidation log, so the cache never outlives a revocation.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.dependencies import create_token, current_user
+from backend.main import app
+from core.services.principal_cache import LMDBInvalidationChannel, PrincipalCache, principal_cache
+from database.connection import LMDBConnectionManager
+from database.sql_db import default_sql_db
+from infrastructure.repositories.sql_repositories import SQLUserRepository
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _CountingRepo(SQLUserRepository):
+    def __init__(self):
+        self.loads = 0
+
+    def load_user(self, username):
+        self.loads += 1
+        return super().load_user(username)
+
+
+class TestPrincipalCache(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.channel = LMDBInvalidationChannel(LMDBConnectionManager(self.base))
+        self.now = [1000.0]
+        self.cache = PrincipalCache(ttl=30, max_entries=2, channel=self.channel, clock=lambda: self.now[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def test_entries_expire_with_the_ttl_or_the_token(self):
+        self.cache.put("t1", {"jti": "a", "exp": 1010}, {"username": "u"})
+        self.cache.put("t2", {"jti": "b", "exp": 5000}, {"username": "u"})
+        self.now[0] = 1011
+        self.assertIsNone(self.cache.get("t1"))
+        self.assertEqual(self.cache.get("t2"), {"username": "u"})
+        self.now[0] = 1031
+        self.assertIsNone(self.cache.get("t2"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for t in ("t1", "t2"):
+            self.cache.put(t, {"jti": t}, {"username": t})
+        self.cache.get("t1")
+        self.cache.put("t3", {"jti": "t3"}, {"username": "t3"})
+        self.assertIsNone(self.cache.get("t2"))
+        self.assertIsNotNone(self.cache.get("t1"))
+
+    def test_invalidation_by_jti_and_by_user(self):
+        self.cache.put("t1", {"jti": "a"}, {"username": "u"})
+        self.cache.put("t2", {"jti": "b"}, {"username": "v"})
+        self.cache.invalidate_token("a")
+        self.cache.invalidate_user("v")
+        self.assertIsNone(self.cache.get("t1"))
+        self.assertIsNone(self.cache.get("t2"))
+
+    def test_invalidation_during_load_prevents_caching_a_stale_principal(self):
+        generation = self.cache.generation()
+        PrincipalCache(ttl=30, channel=self.channel).invalidate_user("u")   # another worker
+        self.cache.put("t1", {"jti": "a"}, {"username": "u", "role": "doctor"}, generation)
+        self.assertIsNone(self.cache.get("t1"))
+
+    def test_invalidation_from_another_process_is_applied(self):
+        self.cache.put("t1", {"jti": "a"}, {"username": "dr.other"})
+        script = (
+            "import sys; sys.path.insert(0, {root!r});"
+            "from database.connection import LMDBConnectionManager;"
+            "from core.services.principal_cache import LMDBInvalidationChannel;"
+            "LMDBInvalidationChannel(LMDBConnectionManager({base!r})).publish('user', 'dr.other')"
+        ).format(root=_ROOT, base=self.base)
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertIsNone(self.cache.get("t1"))
+
+    def test_gap_in_the_log_clears_everything(self):
+        self.cache.put("t1", {"jti": "a"}, {"username": "u"})
+        self.cache._seen += 5       # as if entries it never saw had been pruned
+        self.channel.publish("user", "someone-else")
+        self.assertIsNone(self.cache.get("t1"))
+        self.assertEqual(self.cache.stats()["resets"], 1)
+
+
+class TestCurrentUserCaching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        principal_cache.clear()
+        self.repo = _CountingRepo()
+
+    def _creds(self, token):
+        return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def test_repeat_request_does_not_reload_the_user(self):
+        user = self.repo.load_user("dr.smith").to_dict()
+        token = create_token(user)
+        self.repo.loads = 0
+        first = current_user(None, self._creds(token), self.repo)
+        second = current_user(None, self._creds(token), self.repo)
+        self.assertEqual(first["username"], "dr.smith")
+        self.assertEqual(second, first)
+        self.assertEqual(self.repo.loads, 1)
+
+    def test_saving_the_user_evicts_the_cached_principal(self):
+        user = self.repo.load_user("vip001")
+        token = create_token(user.to_dict())
+        current_user(None, self._creds(token), self.repo)
+        user.full_name = "Renamed Patient"
+        try:
+            SQLUserRepository().save_user(user)
+            self.assertEqual(current_user(None, self._creds(token), self.repo)["full_name"], "Renamed Patient")
+        finally:
+            user.full_name = "Ahmet Karataş"
+            SQLUserRepository().save_user(user)
+
+    def test_logout_revokes_a_cached_token(self):
+        client = TestClient(app)
+        res = client.post("/api/v1/auth/login", json={"username": "admin", "password": "Admin@2026Secure!"})
+        self.assertEqual(res.status_code, 200, res.text)
+        headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+        self.assertEqual(client.get("/api/v1/auth/me", headers=headers).status_code, 200)
+        self.assertEqual(client.get("/api/v1/auth/me", headers=headers).status_code, 200)
+        client.post("/api/v1/auth/logout", headers=headers)
+        self.assertEqual(client.get("/api/v1/auth/me", headers=headers).status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+tests/test_project_registry.py — the in-memory project registry
+===============================================================
+``project_exists`` and ``list_projects`` answer from memory instead of the
+projects directory. Every worker sees a project another one created, through
+the shared ``__registry__`` environment, and a vault that predates the
+registry (or a directory changed by a layout migration) is registered from
+disk when it is first used.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import storage
+from database.connection import LMDBConnectionManager, drop_registry
+
+_MAP = 16 * 1024 * 1024
+
+
+class TestProjectRegistry(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, True)
+        self.mgr = self._manager()
+
+    def _manager(self):
+        mgr = LMDBConnectionManager(self.base, _MAP)
+        self.addCleanup(mgr.close_all)
+        return mgr
+
+    def test_lookups_do_not_touch_the_filesystem(self):
+        self.assertTrue(self.mgr.create_project("patient_b"))
+        self.assertFalse(self.mgr.create_project("patient_b"))
+        self.mgr.create_project("patient_a")
+        self.mgr.create_project("__users__")
+        with mock.patch("os.path.exists") as exists, mock.patch("os.makedirs") as makedirs, \
+                mock.patch("os.listdir") as listdir:
+            self.assertTrue(self.mgr.project_exists("patient_a"))
+            self.assertFalse(self.mgr.project_exists("patient_c"))
+            self.assertEqual(self.mgr.list_projects(), ["patient_a", "patient_b"])
+            self.assertEqual(self.mgr.get_project_path("patient_a"), os.path.join(self.base, "patient_a"))
+        exists.assert_not_called()
+        makedirs.assert_not_called()
+        listdir.assert_not_called()
+        with self.assertRaises(ValueError):
+            self.mgr.project_exists("../etc")
+
+    def test_workers_see_each_others_projects(self):
+        other = self._manager()
+        self.assertEqual(other.list_projects(), [])
+        self.mgr.create_project("patient_a")
+        storage.save_block_to_db("patient_b", 0, {"index": 0, "hash": "0" * 64}, self.mgr)
+        self.assertTrue(other.project_exists("patient_a"))
+        self.assertEqual(other.list_projects(), ["patient_a", "patient_b"])
+        self.assertFalse(other.create_project("patient_b"))
+
+    def test_reset_keeps_the_project_listed(self):
+        storage.save_block_to_db("patient_a", 0, {"index": 0, "hash": "0" * 64}, self.mgr)
+        storage.reset_db("patient_a", self.mgr)
+        self.assertTrue(self.mgr.project_exists("patient_a"))
+        self.assertEqual(self.mgr.list_projects(), ["patient_a"])
+        self.assertEqual(storage.load_all_blocks("patient_a", self.mgr), [])
+
+    def test_existing_directories_are_registered_on_first_use(self):
+        os.makedirs(os.path.join(self.base, "patient_old"))
+        self.assertEqual(self.mgr.list_projects(), ["patient_old"])
+
+        # Added with the vault stopped: unknown until the registry is dropped.
+        os.makedirs(os.path.join(self.base, "patient_new"))
+        self.assertFalse(self.mgr.project_exists("patient_new"))
+        self.mgr.close_all()
+        drop_registry(self.base)
+        self.assertEqual(self.mgr.list_projects(), ["patient_new", "patient_old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
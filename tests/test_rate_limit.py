@@ -0,0 +1,180 @@
+"""
+tests/test_rate_limit.py — token-bucket rate limits without SQL
+================================================================
+Login is limited per IP by the middleware, decrypt and break-glass per user by a
+route dependency. Buckets live in memory, or in LMDB when workers must share
+them; each decision is counted per policy for the metrics endpoint.
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from core.services.rate_limit import (
+    LMDBBucketStore, MemoryBucketStore, RateLimitPolicy, RateLimiter, load_policies, policy_key,
+    rate_limiter,
+)
+from database.connection import LMDBConnectionManager
+from database.sql_db import default_sql_db
+
+_POLICY = RateLimitPolicy(name="p", limit=3, window_seconds=30)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        self.base = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def _limiter(self, store):
+        return RateLimiter(policies={"p": _POLICY}, store=store, enabled=True, clock=lambda: self.now[0])
+
+    def _exercise(self, limiter):
+        self.assertEqual([limiter.check("p", "k").allowed for _ in range(4)], [True, True, True, False])
+        denied = limiter.check("p", "k")
+        self.assertAlmostEqual(denied.retry_after, 10.0, places=3)
+        self.assertEqual(denied.retry_after_header, "10")
+        self.assertTrue(limiter.check("p", "other").allowed)
+        self.now[0] += 10
+        self.assertTrue(limiter.check("p", "k").allowed)
+        self.assertFalse(limiter.check("p", "k").allowed)
+
+    def test_memory_bucket_refills_at_limit_per_window(self):
+        self._exercise(self._limiter(MemoryBucketStore()))
+
+    def test_lmdb_buckets_are_shared_between_limiters(self):
+        manager = LMDBConnectionManager(self.base)
+        self._exercise(self._limiter(LMDBBucketStore(manager)))
+        other_worker = self._limiter(LMDBBucketStore(LMDBConnectionManager(self.base)))
+        self.assertFalse(other_worker.check("p", "k").allowed)
+        self.assertNotIn(LMDBBucketStore.PROJECT, manager.list_projects())
+
+    def test_idle_buckets_are_pruned(self):
+        store = MemoryBucketStore()
+        self._limiter(store).check("p", "k")
+        self.assertEqual(store.prune(self.now[0] + 7200), 1)
+        self.assertEqual(store.active_keys(), 0)
+
+    def test_lmdb_idle_buckets_are_pruned_in_the_background(self):
+        manager = LMDBConnectionManager(self.base)
+        store = LMDBBucketStore(manager, clock=lambda: self.now[0])
+        self._limiter(store).check("p", "k")
+        self.now[0] += 7200
+        store.start(prune_interval=0.01)
+        self.addCleanup(store.stop)
+        for _ in range(500):
+            with manager.open_db(LMDBBucketStore.PROJECT).begin() as txn:
+                if txn.stat()["entries"] == 0:
+                    break
+            time.sleep(0.01)
+        else:
+            self.fail("idle bucket was not pruned")
+
+    def test_decisions_are_counted_per_policy(self):
+        limiter = self._limiter(MemoryBucketStore())
+        for _ in range(5):
+            limiter.check("p", "k")
+        stats = limiter.stats()["policies"]["p"]
+        self.assertEqual((stats["allowed"], stats["limited"]), (3, 2))
+
+    def test_disabled_limiter_allows_everything(self):
+        limiter = RateLimiter(policies={"p": _POLICY}, store=MemoryBucketStore(), enabled=False)
+        self.assertTrue(all(limiter.check("p", "k").allowed for _ in range(10)))
+
+
+class TestPolicies(unittest.TestCase):
+    def test_overrides_merge_by_name_and_can_disable(self):
+        policies = load_policies('[{"name": "decrypt", "limit": 20},'
+                                 ' {"name": "passkey_login", "enabled": false},'
+                                 ' {"name": "export", "limit": 2, "window_seconds": 60, "key": ["user"]}]')
+        self.assertEqual(policies["decrypt"].limit, 20)
+        self.assertEqual(policies["decrypt"].key, ("user", "path:patient_id", "path:block_index"))
+        self.assertNotIn("passkey_login", policies)
+        self.assertEqual(policies["export"].key, ("user",))
+
+    def test_unknown_key_part_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_policies('[{"name": "x", "limit": 1, "window_seconds": 1, "key": ["cookie"]}]')
+
+    def test_key_combines_user_and_path_parameters(self):
+        policy = load_policies("")["decrypt"]
+        key = policy_key(policy, ip="10.0.0.1", username="dr.smith",
+                         path_params={"patient_id": "VIP-001", "block_index": "3"})
+        self.assertEqual(key, "dr.smith|VIP-001|3")
+
+
+class TestRateLimitedRoutes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.client = TestClient(app)
+        patches = [mock.patch.object(rate_limiter, "store", MemoryBucketStore()),
+                   mock.patch.object(rate_limiter, "enabled", True)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_sixth_login_attempt_in_a_minute_is_refused(self):
+        codes = [self.client.post("/api/v1/auth/login",
+                                  json={"username": "admin", "password": "wrong"}).status_code
+                 for _ in range(6)]
+        self.assertNotIn(429, codes[:5])
+        self.assertEqual(codes[5], 429)
+        res = self.client.post("/api/v1/auth/login", json={"username": "admin", "password": "wrong"})
+        self.assertIn("Retry-After", res.headers)
+
+    def test_shared_store_is_checked_off_the_event_loop(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base, True)
+        manager = LMDBConnectionManager(base)
+        self.addCleanup(manager.close_all)
+        on_loop = []
+        real_check = rate_limiter.check
+
+        def check(name, key):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return real_check(name, key)
+
+        with mock.patch.object(rate_limiter, "store", LMDBBucketStore(manager)), \
+                mock.patch.object(rate_limiter, "check", check):
+            codes = [self.client.post("/api/v1/auth/login",
+                                      json={"username": "admin", "password": "wrong"}).status_code
+                     for _ in range(6)]
+        self.assertEqual(codes[5], 429)
+        self.assertEqual(on_loop, [False] * 6)
+
+    def test_decrypt_attempts_are_limited_per_block(self):
+        res = self.client.post("/api/v1/auth/login",
+                               json={"username": "vip001", "password": "VIPPatient@2026!"})
+        self.assertEqual(res.status_code, 200, res.text)
+        headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+        url = "/api/v1/records/VIP-001/{}/decrypt"
+        codes = [self.client.post(url.format(0), json={"password": "guess"}, headers=headers).status_code
+                 for _ in range(11)]
+        self.assertNotIn(429, codes[:10])
+        self.assertEqual(codes[10], 429)
+        other = self.client.post(url.format(1), json={"password": "guess"}, headers=headers)
+        self.assertNotEqual(other.status_code, 429)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+tests/test_revocation_list.py — revocation checks are answered from memory
+==========================================================================
+Revoked token ids are held in memory behind a Bloom filter, so the common "not
+revoked" answer costs no SQL. Workers resynchronise through a revocation
+counter in the database. Expired revocations are pruned from SQL and memory.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.sql_db as sql_db
+from database.revocation_list import BloomFilter, RevocationList
+from database.sql_db import SQLDatabaseManager
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_a_low_false_positive_rate(self):
+        bloom = BloomFilter(5000)
+        members = [f"jti-{i}" for i in range(5000)]
+        for m in members:
+            bloom.add(m)
+        self.assertTrue(all(m in bloom for m in members))
+        false_positives = sum(f"other-{i}" in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.01)
+
+
+class TestRevocationList(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_path = sql_db.DEFAULT_SQLITE_PATH
+        self.original_manager = sql_db.default_sql_db
+        sql_db.DEFAULT_SQLITE_PATH = os.path.join(self.test_dir, "revocations.db")
+        sql_db.default_sql_db = self.db = SQLDatabaseManager()
+
+    def tearDown(self):
+        sql_db.DEFAULT_SQLITE_PATH = self.original_path
+        sql_db.default_sql_db = self.original_manager
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _worker(self, interval=0.0):
+        return RevocationList(refresh_interval=interval, db_getter=lambda: self.db)
+
+    def test_revocation_in_one_worker_is_seen_by_another(self):
+        other = self._worker()
+        self.assertFalse(other.is_revoked("jti-a"))
+        with mock.patch("database.revocation_list.revocation_list", self._worker()):
+            sql_db.blacklist_token("jti-a", time.time() + 3600)
+        self.assertTrue(other.is_revoked("jti-a"))
+        self.assertEqual(other.stats()["full_reloads"], 1)
+
+    def test_negative_lookups_between_refreshes_make_no_sql_query(self):
+        worker = self._worker(interval=60)
+        worker.refresh()
+        with mock.patch.object(self.db, "get_connection", side_effect=AssertionError("SQL touched")):
+            for _ in range(100):
+                self.assertFalse(worker.is_revoked(str(uuid.uuid4())))
+        self.assertEqual(worker.stats()["bloom_negatives"], 100)
+
+    def test_counter_moves_with_every_revocation(self):
+        with mock.patch("database.revocation_list.revocation_list", self._worker()):
+            sql_db.blacklist_token("jti-1", time.time() + 60)
+            sql_db.blacklist_token("jti-2", time.time() + 60)
+            sql_db.blacklist_token("jti-1", time.time() + 120)
+        conn = self.db.get_connection()
+        try:
+            seqs = dict(conn.execute("SELECT jti, seq FROM blacklisted_tokens").fetchall())
+            counter = conn.execute("SELECT value FROM revocation_counter WHERE id = 1").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(counter, 3)
+        self.assertEqual(seqs, {"jti-1": 3, "jti-2": 2})
+
+    def test_prune_drops_expired_revocations_everywhere(self):
+        worker = self._worker()
+        with mock.patch("database.revocation_list.revocation_list", worker):
+            sql_db.blacklist_token("expired", time.time() - 1)
+            sql_db.blacklist_token("live", time.time() + 3600)
+        self.assertEqual(worker.prune(), 1)
+        self.assertFalse(worker.is_revoked("expired"))
+        self.assertTrue(worker.is_revoked("live"))
+        conn = self.db.get_connection()
+        try:
+            rows = [r[0] for r in conn.execute("SELECT jti FROM blacklisted_tokens")]
+        finally:
+            conn.close()
+        self.assertEqual(rows, ["live"])
+
+    def test_background_pruner_starts_and_stops(self):
+        worker = self._worker()
+        with mock.patch("database.revocation_list.revocation_list", worker):
+            sql_db.blacklist_token("soon-expired", time.time() - 1)
+        worker.start(prune_interval=0.05)
+        try:
+            deadline = time.time() + 5
+            while worker.stats()["pruned"] == 0 and time.time() < deadline:
+                time.sleep(0.02)
+        finally:
+            worker.stop()
+        self.assertEqual(worker.stats()["pruned"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+tests/test_sql_migrations.py — versioned migrations and index-backed hot queries
+================================================================================
+Schema changes after the baseline are numbered migrations, applied once and
+recorded in ``schema_version``. The hot queries (notification feed, login rate
+limiter, alert dashboard, passkey lookup, revocation sweep) must be answered
+from an index. This is checked with the planner's own EXPLAIN output on SQLite
+and, when ``VHV_TEST_POSTGRES_URL`` is set, on PostgreSQL too.
+"""
+
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.sql_db as sql_db
+from database.migrations import MIGRATIONS, Migration, current_version, history, main, migrate
+from database.sql_db import SQLDatabaseManager
+
+# (query, params, index that must serve it)
+HOT_QUERIES = [
+    ("SELECT * FROM notifications WHERE patient_id = ? ORDER BY timestamp DESC",
+     ("VIP-001",), "idx_notifications_patient_ts"),
+    ("SELECT COUNT(*) FROM rate_limits WHERE ip = ? AND timestamp >= ?",
+     ("203.0.113.1", 0.0), "idx_rate_limits_ip_ts"),
+    ("DELETE FROM rate_limits WHERE timestamp < ?", (0.0,), "idx_rate_limits_ts"),
+    ("SELECT * FROM security_alerts ORDER BY created_at DESC LIMIT ?",
+     (50,), "idx_security_alerts_created"),
+    ("SELECT * FROM security_alerts WHERE severity = ? ORDER BY created_at DESC LIMIT ?",
+     ("CRITICAL", 50), "idx_security_alerts_severity_created"),
+    ("SELECT COUNT(*) FROM webauthn_credentials WHERE username = ?",
+     ("dr.smith",), "idx_webauthn_credentials_username"),
+    ("DELETE FROM blacklisted_tokens WHERE exp < ?", (0.0,), "idx_blacklisted_tokens_exp"),
+]
+
+
+class TestMigrationRunner(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_path = sql_db.DEFAULT_SQLITE_PATH
+        sql_db.DEFAULT_SQLITE_PATH = os.path.join(self.test_dir, "migrations.db")
+        self.db = SQLDatabaseManager()
+
+    def tearDown(self):
+        sql_db.DEFAULT_SQLITE_PATH = self.original_path
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_fresh_database_is_at_latest_version_and_rerun_is_a_no_op(self):
+        self.assertEqual(current_version(self.db), max(m.version for m in MIGRATIONS))
+        self.assertEqual(migrate(self.db), [])
+
+    def test_failed_migration_is_rolled_back_and_not_recorded(self):
+        latest = current_version(self.db)
+        broken = Migration(latest + 1, "broken", lambda d: [
+            "CREATE TABLE half_done (x INTEGER)",
+            "CREATE INDEX idx_missing ON no_such_table (x)",
+        ])
+        with self.assertRaises(Exception):
+            migrate(self.db, MIGRATIONS + (broken,))
+        self.assertEqual(current_version(self.db), latest)
+
+        conn = self.db.get_connection()
+        try:
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+        self.assertNotIn("half_done", tables)
+
+    def test_concurrent_workers_apply_a_migration_exactly_once(self):
+        calls = []
+
+        def slow(cursor, d):
+            calls.append(threading.get_ident())
+            time.sleep(0.2)
+            cursor.execute("CREATE TABLE slow_step (x INTEGER)")
+
+        extra = MIGRATIONS + (Migration(current_version(self.db) + 1, "slow", apply=slow),)
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(migrate(self.db, extra))) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sum(len(r) for r in results), 1)
+        self.assertEqual(history(self.db)[-1]["description"], "slow")
+
+    def test_legacy_users_table_gains_account_status(self):
+        legacy = os.path.join(self.test_dir, "legacy.db")
+        conn = sqlite3.connect(legacy)
+        conn.execute("CREATE TABLE users (id VARCHAR(100) PRIMARY KEY, username VARCHAR(100) UNIQUE NOT NULL, "
+                     "password_hash VARCHAR(255) NOT NULL, role VARCHAR(50) NOT NULL, "
+                     "full_name VARCHAR(100) NOT NULL)")
+        conn.commit()
+        conn.close()
+
+        sql_db.DEFAULT_SQLITE_PATH = legacy
+        db = SQLDatabaseManager()
+        conn = db.get_connection()
+        try:
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(users)")]
+        finally:
+            conn.close()
+        self.assertIn("account_status", columns)
+        self.assertTrue(any("users.account_status" in h["description"] for h in history(db)))
+
+    def test_status_cli_reports_applied_steps_with_timings(self):
+        out = io.StringIO()
+        with mock.patch.dict(os.environ), mock.patch("database.sql_db.get_sql_db", return_value=self.db), \
+                redirect_stdout(out):
+            code = main(["--status"])
+        self.assertEqual(code, 0)
+        self.assertIn("composite indexes for hot queries", out.getvalue())
+        self.assertIn(" ms ", out.getvalue())
+
+    def test_hot_queries_use_an_index_on_sqlite(self):
+        conn = self.db.get_connection()
+        try:
+            for sql, params, index in HOT_QUERIES:
+                plan = " | ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+                self.assertIn(index, plan, sql)
+                self.assertNotIn("TEMP B-TREE", plan, sql)
+        finally:
+            conn.close()
+
+
+def _index_names(node):
+    names = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+@unittest.skipUnless(os.getenv("VHV_TEST_POSTGRES_URL"), "VHV_TEST_POSTGRES_URL not set")
+class TestPostgresQueryPlans(unittest.TestCase):
+    def test_hot_queries_use_an_index_on_postgres(self):
+        with mock.patch.dict(os.environ, {"VHV_DATABASE_URL": os.environ["VHV_TEST_POSTGRES_URL"]}):
+            db = SQLDatabaseManager()
+        self.assertTrue(db.is_postgres)
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            # The test tables are tiny; make the planner show what it would do at scale.
+            cursor.execute("SET enable_seqscan = off")
+            for sql, params, index in HOT_QUERIES:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql.replace("?", "%s"), params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                self.assertIn(index, _index_names(plan[0]["Plan"]), sql)
+        finally:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
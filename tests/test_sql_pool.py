@@ -0,0 +1,181 @@
+"""
+tests/test_sql_pool.py — SQL connections are reused, bounded and returned
+=========================================================================
+``get_connection()`` used to open a fresh driver connection per call, and callers
+that used it as a context manager never closed it. Connections now come from a
+pool. ``close()`` and ``with`` both hand them back, and the PostgreSQL pool
+bounds how many a worker can hold.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.main import app
+from database.sql_db import default_sql_db
+from database.sql_pool import BoundedPool, PoolTimeout, ThreadLocalPool
+
+
+class _FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+        self.commits = 0
+        self.fail_ping = False
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            def execute(self, sql):
+                if conn.fail_ping:
+                    raise RuntimeError("server closed the connection")
+
+            def fetchone(self):
+                return (1,)
+
+            def close(self):
+                pass
+
+        return _Cursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class TestThreadLocalPool(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mktemp(suffix=".db")
+        self.pool = ThreadLocalPool(lambda: sqlite3.connect(self.path), key=lambda: self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_closed_connection_is_reused_and_nested_checkouts_are_separate(self):
+        outer = self.pool.connection()
+        inner = self.pool.connection()
+        self.assertIsNot(outer.raw, inner.raw)
+        outer_raw = outer.raw
+        inner.close()
+        outer.close()
+        again = self.pool.connection()
+        self.assertIs(again.raw, outer_raw)
+        again.close()
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["reused"], stats["in_use"]), (2, 1, 0))
+
+    def test_context_manager_commits_and_returns_the_connection(self):
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+        self.assertEqual(self.pool.stats()["in_use"], 0)
+        check = sqlite3.connect(self.path)
+        self.assertEqual(check.execute("SELECT COUNT(*) FROM t").fetchone()[0], 1)
+        check.close()
+
+    def test_changed_database_path_is_not_served_from_the_old_pool(self):
+        self.pool.connection().close()
+        old_path, self.path = self.path, tempfile.mktemp(suffix=".db")
+        try:
+            conn = self.pool.connection()
+            conn.execute("CREATE TABLE only_here (x INTEGER)")
+            conn.close()
+            self.assertEqual(self.pool.stats()["discarded"], 1)
+        finally:
+            os.remove(old_path)
+
+
+class TestBoundedPool(unittest.TestCase):
+    def test_exhausted_pool_times_out_and_records_the_wait(self):
+        pool = BoundedPool(_FakeConn, max_size=1, timeout=0.05)
+        held = pool.connection()
+        with self.assertRaises(PoolTimeout):
+            pool.connection()
+        held.close()
+        pool.connection().close()
+        stats = pool.stats()
+        self.assertEqual((stats["created"], stats["reused"], stats["timeouts"]), (1, 1, 1))
+        self.assertGreaterEqual(stats["wait_time_max"], 0.05)
+
+    def test_waiter_gets_the_connection_released_by_another_thread(self):
+        pool = BoundedPool(_FakeConn, max_size=1, timeout=2)
+        held = pool.connection()
+        threading.Timer(0.05, held.close).start()
+        conn = pool.connection()
+        self.assertEqual(pool.stats()["waits"], 1)
+        conn.close()
+
+    def test_stale_or_dead_connections_are_replaced(self):
+        pool = BoundedPool(_FakeConn, max_size=2, max_lifetime=0.01, health_check_after=-1)
+        first = pool.connection()
+        raw = first.raw
+        first.close()
+        time.sleep(0.02)
+        second = pool.connection()
+        self.assertIsNot(second.raw, raw)
+        self.assertTrue(raw.closed)
+
+        second.raw.fail_ping = True
+        dead = second.raw
+        second.close()
+        pool.health_check_after = 0
+        time.sleep(0.001)
+        pool.max_lifetime = 0
+        third = pool.connection()
+        self.assertIsNot(third.raw, dead)
+        self.assertEqual(pool.stats()["health_check_failures"], 1)
+        third.close()
+
+    def test_returned_connection_is_rolled_back(self):
+        pool = BoundedPool(_FakeConn, max_size=1)
+        conn = pool.connection()
+        raw = conn.raw
+        conn.close()
+        self.assertEqual(raw.rollbacks, 1)
+        with self.assertRaises(RuntimeError):
+            conn.cursor()
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        default_sql_db.seed_default_users()
+
+    def setUp(self):
+        os.environ["TESTING"] = "true"
+        self.client = TestClient(app)
+
+    def _token(self, username, password):
+        res = self.client.post("/api/v1/auth/login",
+                               json={"username": username, "password": password})
+        self.assertEqual(res.status_code, 200, res.text)
+        return res.json()["access_token"]
+
+    def test_admin_sees_pool_stats_and_clinician_does_not(self):
+        admin = self._token("admin", "Admin@2026Secure!")
+        res = self.client.get("/api/v1/system/metrics", headers={"Authorization": f"Bearer {admin}"})
+        self.assertEqual(res.status_code, 200, res.text)
+        self.assertIn("checkouts", res.json()["sql_pool"])
+
+        doctor = self._token("dr.smith", "Doctor@2026Secure!")
+        res = self.client.get("/api/v1/system/metrics", headers={"Authorization": f"Bearer {doctor}"})
+        self.assertEqual(res.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
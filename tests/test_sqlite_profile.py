@@ -0,0 +1,85 @@
+"""
+tests/test_sqlite_profile.py — SQLite connections open with the tuned profile
+=============================================================================
+Pooled SQLite connections run in WAL mode with a busy timeout and memory-mapped
+reads. Ordinary writes commit at synchronous=NORMAL. Writes that must survive a
+power loss ask for a durable connection and are committed at FULL.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.sql_db as sql_db
+from database.sql_db import SQLDatabaseManager
+from database.sqlite_profile import SQLiteProfile
+
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+class TestSQLiteProfile(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_path = sql_db.DEFAULT_SQLITE_PATH
+        sql_db.DEFAULT_SQLITE_PATH = os.path.join(self.test_dir, "profile.db")
+
+    def tearDown(self):
+        sql_db.DEFAULT_SQLITE_PATH = self.original_path
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_connections_open_in_wal_with_busy_timeout_and_mmap(self):
+        db = SQLDatabaseManager()
+        conn = db.get_connection()
+        try:
+            self.assertEqual(_pragma(conn, "journal_mode").upper(), "WAL")
+            self.assertEqual(_pragma(conn, "synchronous"), 1)
+            self.assertEqual(_pragma(conn, "busy_timeout"), 5000)
+            self.assertGreater(_pragma(conn, "mmap_size"), 0)
+        finally:
+            conn.close()
+
+    def test_durable_checkout_commits_at_full_and_is_reset_afterwards(self):
+        db = SQLDatabaseManager()
+        conn = db.get_connection(durable=True)
+        raw = conn.raw
+        self.assertEqual(_pragma(conn, "synchronous"), 2)
+        conn.close()
+
+        conn = db.get_connection()
+        self.assertIs(conn.raw, raw)
+        self.assertEqual(_pragma(conn, "synchronous"), 1)
+        conn.close()
+
+    def test_settings_come_from_the_environment(self):
+        env = {"VHV_SQLITE_JOURNAL_MODE": "delete", "VHV_SQLITE_SYNCHRONOUS": "full",
+               "VHV_SQLITE_BUSY_TIMEOUT_MS": "250"}
+        with mock.patch.dict(os.environ, env):
+            db = SQLDatabaseManager()
+        conn = db.get_connection()
+        try:
+            self.assertEqual(_pragma(conn, "journal_mode").upper(), "DELETE")
+            self.assertEqual(_pragma(conn, "synchronous"), 2)
+            self.assertEqual(_pragma(conn, "busy_timeout"), 250)
+        finally:
+            conn.close()
+
+    def test_invalid_setting_is_rejected(self):
+        with mock.patch.dict(os.environ, {"VHV_SQLITE_SYNCHRONOUS": "NORMAL; DROP TABLE users"}):
+            with self.assertRaises(ValueError):
+                SQLiteProfile.from_env()
+
+    def test_optimize_runs_on_the_database_file(self):
+        db = SQLDatabaseManager()
+        db.optimize()
+        self.assertTrue(os.path.exists(sql_db.DEFAULT_SQLITE_PATH))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,6 +20,8 @@ from core.services.auth_service import AuthService
 from infrastructure.repositories.lmdb_repositories import LMDBBlockRepository, LMDBUserRepository
 from infrastructure.repositories.sql_repositories import SQLNotificationRepository
 from infrastructure.cryptography.crypto_strategies import AESGCMStrategy
+from core.services.anomaly_engine import anomaly_engine
+from core.services.sliding_window import MemorySlidingWindowStore
 import database.storage as storage
 
 
@@ -29,6 +31,8 @@ class TestTimeBoundConsent(unittest.TestCase):
     def setUp(self):
         self.tmpdir = tempfile.mkdtemp()
         os.environ["TESTING"] = "true"
+        # Fresh anomaly counters, so earlier runs cannot have used up a threshold.
+        anomaly_engine.use_store(MemorySlidingWindowStore())
 
         # Mock DB paths
         self.block_repo = LMDBBlockRepository()